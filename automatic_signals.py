@@ -0,0 +1,245 @@
+#----------------------------------------------------------------------
+# This Module works the fully automatic signals (20-23) on the panel. Each
+# signal has its own state machine - driven only by changes to the section
+# it depends on (and by its own timers) - rather than by the rules that are
+# evaluated in every full pass (see 'sections'):
+#
+#   Entry signals (20 and 22) protect a section within our area of control.
+#   The signal goes to danger when the section ahead is occupied and clears
+#   again once the section has cleared.
+#
+#   Exit signals (21 and 23) are where trains leave our area of control. A
+#   train in the section behind the signal passes it 'run_time' seconds later
+#   (the "signal passed" event is made just as if the button had been pressed)
+#   and the signal then steps back through its aspects (RED, YELLOW, DOUBLE
+#   YELLOW) every 'block_time' seconds as the train clears the block sections
+#   beyond our area of control. A train reaching the signal while it is at
+#   danger waits until it steps to YELLOW.
+#
+# With "fleeting" working (the default) a signal clears itself once the
+# train has cleared the section(s) ahead. If fleeting is turned off for a
+# signal, the signal is held at danger after the next train until it is
+# released by the signalman (see 'release_automatic_signal').
+#
+# This replaces the timed signals (see 'trigger_timed_signal') for the panel -
+# each of which ran its own thread and made a full set of layout callbacks
+# for every aspect change. The rules in 'sections' still describe these
+# signals (so the evaluated copies of the rules - e.g. for the train
+# simulator - are unchanged) but on the panel their overrides and timed
+# signal triggers are left to the state machines (see 'install_filters').
+#
+# Other automatic signals (e.g. a chain of them along a longer main line)
+# can be added to 'automatic_signals' - each state machine only looks at
+# its own section, so adding signals doesn't slow down any of the others.
+#----------------------------------------------------------------------
+
+from model_railway_signals import *
+from model_railway_signals import signals_common
+from model_railway_signals.signals_colour_lights import aspect_type
+import sections
+
+# The automatic signals - entry signals have a "section_ahead" and exit
+# signals have a "section_behind" (with the times in seconds)
+automatic_signals = {
+    20: {"section_ahead": sections.occupied_down_east, "fleeting": True},
+    22: {"section_ahead": sections.occupied_up_west, "fleeting": True},
+    21: {"section_behind": sections.occupied_down_west, "run_time": 5, "block_time": 5, "fleeting": True},
+    23: {"section_behind": sections.occupied_up_east, "run_time": 5, "block_time": 5, "fleeting": True},
+    }
+
+# The aspects an exit signal steps through as the train clears the block sections ahead
+exit_signal_aspects = (aspect_type.RED, aspect_type.YELLOW, aspect_type.DOUBLE_YELLOW)
+
+# Global variables for the state machines - the state of each signal is one of
+# "clear", "occupied" (danger as the section ahead is occupied), "stepping"
+# (an exit signal stepping through its aspects) or "held" (held at danger)
+machines: dict = {}          # {sig_id: {"state": "clear", "aspect": 0, "trains_waiting": 0}}
+watched_sections: dict = {}  # {section_id: [sig_id, ...]}
+section_states: dict = {}    # {section_id: occupied} - as at the last change
+tkinter_window = None
+signal_callback = None
+processing = False
+
+#----------------------------------------------------------------------
+# Internal function to set the aspect a signal shows while it is overridden.
+# The library has no public function for this - its own timed signals set
+# the aspect in the library's dictionary of signals in just the same way
+#----------------------------------------------------------------------
+
+def set_overridden_aspect(sig_id:int, aspect:aspect_type):
+    signals_common.signals[str(sig_id)]["overriddenaspect"] = aspect
+    return()
+
+#----------------------------------------------------------------------
+# Internal function to show the state of a signal on the panel (and update
+# the aspects of the signals behind it)
+#----------------------------------------------------------------------
+
+def show_signal_state(sig_id:int):
+    machine = machines[sig_id]
+    if machine["state"] == "clear":
+        set_overridden_aspect(sig_id, aspect_type.RED)
+        clear_signal_override(sig_id)
+    else:
+        if machine["state"] == "stepping": set_overridden_aspect(sig_id, exit_signal_aspects[machine["aspect"]])
+        else: set_overridden_aspect(sig_id, aspect_type.RED)
+        set_signal_override(sig_id)
+    if "section_behind" in automatic_signals[sig_id]: update_signal(sig_id)
+    sections.refresh_signal_aspects()
+    return()
+
+#----------------------------------------------------------------------
+# Internal function to change the state of a signal once the train has
+# cleared the section(s) ahead - it clears again unless fleeting is off
+#----------------------------------------------------------------------
+
+def section_ahead_cleared(sig_id:int):
+    machines[sig_id]["state"] = "clear" if automatic_signals[sig_id]["fleeting"] else "held"
+    show_signal_state(sig_id)
+    return()
+
+#----------------------------------------------------------------------
+# Internal functions for the exit signals - a train reaching the signal,
+# passing it and then clearing each block section ahead of it
+#----------------------------------------------------------------------
+
+def train_at_exit_signal(sig_id:int):
+    machine = machines[sig_id]
+    if machine["state"] in ("occupied", "held"): machine["trains_waiting"] = machine["trains_waiting"] + 1
+    else: train_passed_exit_signal(sig_id)
+    return()
+
+def train_passed_exit_signal(sig_id:int):
+    machine = machines[sig_id]
+    machine["state"], machine["aspect"] = "occupied", 0
+    if machine["timer"] is not None: tkinter_window.after_cancel(machine["timer"])
+    machine["timer"] = tkinter_window.after(1000*automatic_signals[sig_id]["block_time"], block_section_cleared, sig_id)
+    show_signal_state(sig_id)
+    # Make the signal passed event (this releases the section behind the signal)
+    signal_callback(sig_id, sig_callback_type.sig_passed)
+    return()
+
+def block_section_cleared(sig_id:int):
+    machine = machines[sig_id]
+    machine["timer"] = None
+    machine["aspect"] = machine["aspect"] + 1
+    if machine["aspect"] < len(exit_signal_aspects):
+        machine["state"] = "stepping"
+        machine["timer"] = tkinter_window.after(1000*automatic_signals[sig_id]["block_time"], block_section_cleared, sig_id)
+        show_signal_state(sig_id)
+    else:
+        section_ahead_cleared(sig_id)
+    # A train waiting at the signal can now pass it
+    if machine["trains_waiting"] > 0 and machine["state"] != "held":
+        machine["trains_waiting"] = machine["trains_waiting"] - 1
+        train_passed_exit_signal(sig_id)
+    return()
+
+#----------------------------------------------------------------------
+# Internal function to pass a change of a section on to the state machines
+# of the signals that depend on it
+#----------------------------------------------------------------------
+
+def section_changed(section_id:int, occupied:bool):
+    for sig_id in watched_sections[section_id]:
+        if automatic_signals[sig_id].get("section_ahead") == section_id:
+            if occupied:
+                machines[sig_id]["state"] = "occupied"
+                show_signal_state(sig_id)
+            elif machines[sig_id]["state"] == "occupied":
+                section_ahead_cleared(sig_id)
+        elif occupied:
+            tkinter_window.after(1000*automatic_signals[sig_id]["run_time"], train_at_exit_signal, sig_id)
+    return()
+
+#----------------------------------------------------------------------
+# Externally called function to pass any changes to the sections on to the
+# state machines - to be called following every change to the layout (only
+# the sections the automatic signals depend on are looked at)
+#----------------------------------------------------------------------
+
+def process_changes():
+    global processing
+    # The state machines change the layout themselves (so we get called again)
+    if processing or tkinter_window is None: return()
+    processing = True
+    changed = True
+    while changed:
+        changed = False
+        for section_id in watched_sections.keys():
+            occupied = section_occupied(section_id)
+            if occupied != section_states.get(section_id, False):
+                section_states[section_id] = occupied
+                section_changed(section_id, occupied)
+                changed = True
+    processing = False
+    return()
+
+#----------------------------------------------------------------------
+# Externally called functions to turn fleeting on or off for a signal and
+# to release a signal that is being held at danger
+#----------------------------------------------------------------------
+
+def set_fleeting(sig_id:int, fleeting:bool):
+    if sig_id not in automatic_signals:
+        print ("ERROR: set_fleeting - Signal "+str(sig_id)+" is not an automatic signal")
+    else:
+        automatic_signals[sig_id]["fleeting"] = fleeting
+        if fleeting and machines.get(sig_id, {}).get("state") == "held": release_automatic_signal(sig_id)
+    return()
+
+def release_automatic_signal(sig_id:int):
+    if machines.get(sig_id, {}).get("state") != "held":
+        print ("ERROR: release_automatic_signal - Signal "+str(sig_id)+" is not being held")
+    else:
+        machine = machines[sig_id]
+        machine["state"] = "clear"
+        if section_states.get(automatic_signals[sig_id].get("section_ahead"), False): machine["state"] = "occupied"
+        show_signal_state(sig_id)
+        if machine["trains_waiting"] > 0 and machine["state"] == "clear":
+            machine["trains_waiting"] = machine["trains_waiting"] - 1
+            train_passed_exit_signal(sig_id)
+    return()
+
+#----------------------------------------------------------------------
+# Externally called function to stop the given modules (those that work the
+# signals from the rules - e.g. 'sections' or the generated rules) from
+# overriding or triggering the automatic signals. The library functions in
+# each module are replaced (in the same way as 'rule_evaluator' does)
+#----------------------------------------------------------------------
+
+def install_filters(modules:list):
+    def filtered(function):
+        def filtered_function(*sig_ids:int):
+            sig_ids = [sig_id for sig_id in sig_ids if sig_id not in automatic_signals]
+            if sig_ids: function(*sig_ids)
+        return(filtered_function)
+    def filtered_trigger_timed_signal(sig_id:int, start_delay:int=0, time_delay:int=5):
+        if sig_id not in automatic_signals: trigger_timed_signal(sig_id, start_delay, time_delay)
+    filters = {"set_signal_override": filtered(set_signal_override),
+               "clear_signal_override": filtered(clear_signal_override),
+               "trigger_timed_signal": filtered_trigger_timed_signal}
+    for module in modules:
+        for name, function in filters.items():
+            if name in module.__dict__: module.__dict__[name] = function
+    return()
+
+#----------------------------------------------------------------------
+# Externally called function to start the state machines (after the layout
+# state has been restored). The signal callback is the one used for the
+# panel (for the signal passed events of the exit signals)
+#----------------------------------------------------------------------
+
+def start_automatic_signals(window, signal_callback_function, modules:list):
+    global tkinter_window, signal_callback
+    tkinter_window = window
+    signal_callback = signal_callback_function
+    install_filters(modules)
+    for sig_id, signal in automatic_signals.items():
+        machines[sig_id] = {"state": "clear", "aspect": 0, "trains_waiting": 0, "timer": None}
+        watched_sections.setdefault(signal.get("section_ahead", signal.get("section_behind")), []).append(sig_id)
+        show_signal_state(sig_id)
+    process_changes()
+    return()
+
+###############################################################################
@@ -0,0 +1,205 @@
+#----------------------------------------------------------------------
+# This Module provides the option of evaluating the layout rules (the
+# interlocking, signal overrides, aspect refresh sequence and automatic
+# power switching) on a background thread rather than on the tkinter thread
+#
+# On each input event (a point, signal, section or switch change) the
+# tkinter thread takes an immutable snapshot of the layout state and passes
+# it to the worker thread. The worker evaluates the rules against the snapshot
+# (see 'rule_evaluator') and passes the outputs back to the tkinter thread
+# (which is polled for results). The tkinter thread then works out what has
+# changed (the "diff") compared to what has actually been applied to the
+# layout at that time and applies it
+#
+# Fail-safe rules for applying the diff:
+#   All locks (and signal overrides) are applied before any unlocks.
+#   If the layout has changed again since the snapshot was taken then the
+#   outputs are "stale" - we still apply the locks and overrides (these can
+#   only make things safer) but the unlocks are held back. The later snapshot
+#   is already queued - and as its diff is worked out against what has been
+#   applied (including the locks from the stale outputs) it will release
+#   anything that should then be released
+#   The locks from the interlocking for the new snapshot are also applied
+#   straight away (on the tkinter thread) so a signal that has just been
+#   cleared locks the conflicting signals and points before the callback
+#   returns - the rest of the evaluation is left to the worker thread
+#----------------------------------------------------------------------
+
+from model_railway_signals import *
+import rule_evaluator
+import snapshot
+
+import queue
+import threading
+import types
+
+# How often the tkinter thread checks for results (in milliseconds)
+poll_interval = 10
+
+# Global variables for the handoff between the tkinter and worker threads
+request_queue = queue.Queue()
+result_queue = queue.Queue()
+current_generation = 0       # Incremented on every input event
+applied_outputs: dict = {}   # The outputs that have been applied to the layout
+interlocking_evaluator = None # The evaluator for the locks applied on the tkinter thread
+tkinter_window = None
+refresh_callback = None
+
+#----------------------------------------------------------------------
+# Internal functions to make an immutable copy of a layout state and to
+# return a (mutable) copy of the switches for comparing with the outputs
+#----------------------------------------------------------------------
+
+def freeze_state(state:dict):
+    frozen_state = {}
+    for group, items in state.items():
+        frozen_items = {}
+        for item_id, value in items.items():
+            if isinstance(value, list): value = tuple(value)
+            frozen_items[item_id] = value
+        frozen_state[group] = types.MappingProxyType(frozen_items)
+    return(types.MappingProxyType(frozen_state))
+
+def thaw_switches(state):
+    switches = {}
+    for switch_id, buttons in state["switches"].items(): switches[switch_id] = list(buttons)
+    return(switches)
+
+#----------------------------------------------------------------------
+# Internal function to work out the diff between the evaluated outputs and
+# what has already been applied (the aspect sequence is always returned)
+#----------------------------------------------------------------------
+
+def outputs_diff(outputs:dict, applied:dict):
+    evaluated = {}
+    for group, items in outputs.items():
+        if group != "aspects": evaluated[group] = items
+    diff = snapshot.state_delta(applied, evaluated)
+    diff["aspects"] = outputs["aspects"]
+    return(diff)
+
+#----------------------------------------------------------------------
+# The worker thread - If several requests have been queued up while we were
+# busy then we only need to evaluate the latest one (the state is complete)
+#----------------------------------------------------------------------
+
+def thread_to_evaluate_rules():
+    evaluator = rule_evaluator.create_evaluator()
+    while True:
+        generation, state = request_queue.get()
+        while not request_queue.empty():
+            generation, state = request_queue.get()
+        # Load the rules again if they have been reloaded (see 'hot_reload')
+        if evaluator["rules_version"] != rule_evaluator.rules_version: evaluator = rule_evaluator.create_evaluator()
+        result_queue.put((generation, rule_evaluator.evaluate(evaluator, state)))
+
+#----------------------------------------------------------------------
+# Internal function to apply a diff to the layout (tkinter thread only)
+# Returns True if the complete diff was applied (i.e. it was not stale)
+#----------------------------------------------------------------------
+
+def apply_diff(diff:dict, stale:bool):
+
+    global applied_outputs
+
+    # Apply the locks and overrides first (these are always applied)
+    for group, lock_function in (("signal_locks", lock_signal), ("subsidary_locks", lock_subsidary),
+                        ("point_locks", lock_point), ("overrides", set_signal_override)):
+        if group not in applied_outputs.keys(): applied_outputs[group] = {}
+        for item_id, value in diff.get(group,{}).items():
+            if value:
+                lock_function(int(item_id))
+                applied_outputs[group][item_id] = True
+
+    # Now apply the unlocks, cleared overrides, switches and signal aspects
+    if not stale:
+        for group, unlock_function in (("signal_locks", unlock_signal), ("subsidary_locks", unlock_subsidary),
+                        ("point_locks", unlock_point), ("overrides", clear_signal_override)):
+            for item_id, value in diff.get(group,{}).items():
+                if not value:
+                    unlock_function(int(item_id))
+                    applied_outputs[group][item_id] = False
+        snapshot.apply_layout_state({"switches": diff.get("switches",{})})
+        for sig_id, route, sig_ahead_id in diff["aspects"]:
+            if route is not None: set_route(sig_id, route)
+            update_signal(sig_id, sig_ahead_id)
+    return(not stale)
+
+#----------------------------------------------------------------------
+# Internal function to apply the evaluated outputs to the layout (tkinter
+# thread only). The diff is worked out against what has been applied to the
+# layout now - the power switches are compared against their current state
+#----------------------------------------------------------------------
+
+def apply_outputs(outputs:dict, stale:bool):
+    applied = {"switches": thaw_switches(snapshot.capture_layout_state())}
+    applied.update(applied_outputs)
+    return(apply_diff(outputs_diff(outputs, applied), stale))
+
+#----------------------------------------------------------------------
+# Internal function to poll for results (runs on the tkinter thread)
+#----------------------------------------------------------------------
+
+def poll_for_results():
+    while not result_queue.empty():
+        generation, outputs = result_queue.get()
+        if apply_outputs(outputs, stale = generation < current_generation):
+            refresh_callback()
+    tkinter_window.after(poll_interval, poll_for_results)
+    return()
+
+#----------------------------------------------------------------------
+# Internal function to apply the locks from the interlocking for a snapshot
+# straight away (tkinter thread only) - any unlocks are left to the full
+# evaluation (just as for stale outputs)
+#----------------------------------------------------------------------
+
+def apply_interlocking_locks(state):
+    global interlocking_evaluator
+    # Load the rules again if they have been reloaded (see 'hot_reload')
+    if interlocking_evaluator["rules_version"] != rule_evaluator.rules_version:
+        interlocking_evaluator = rule_evaluator.create_evaluator()
+    outputs = rule_evaluator.evaluate_interlocking(interlocking_evaluator, state)
+    apply_diff(snapshot.state_delta(applied_outputs, outputs), stale=True)
+    return()
+
+#----------------------------------------------------------------------
+# Externally called function to request an evaluation following an input
+# event (a point, signal, section or switch change). Must be called from
+# the tkinter thread as this is where we take the snapshot of the layout
+# (and apply the locks from the interlocking)
+#----------------------------------------------------------------------
+
+def request_evaluation():
+
+    global current_generation
+
+    current_generation = current_generation + 1
+    state = freeze_state(snapshot.capture_layout_state())
+    apply_interlocking_locks(state)
+    request_queue.put((current_generation, state))
+    return()
+
+#----------------------------------------------------------------------
+# Externally called function to start the background evaluation. The
+# layout is evaluated and updated in full (on the tkinter thread) before
+# the worker thread is started. The refresh_callback is made (on the
+# tkinter thread) after each evaluation has been fully applied
+#----------------------------------------------------------------------
+
+def start_background_evaluation(window, callback):
+
+    global tkinter_window, refresh_callback, interlocking_evaluator
+
+    tkinter_window = window
+    refresh_callback = callback
+    interlocking_evaluator = rule_evaluator.create_evaluator()
+    state = freeze_state(snapshot.capture_layout_state())
+    apply_outputs(rule_evaluator.evaluate(interlocking_evaluator, state), stale=False)
+    refresh_callback()
+    worker = threading.Thread(target=thread_to_evaluate_rules, daemon=True)
+    worker.start()
+    tkinter_window.after(poll_interval, poll_for_results)
+    return()
+
+###############################################################################
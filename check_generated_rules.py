@@ -0,0 +1,89 @@
+#----------------------------------------------------------------------
+# This Module checks that the rules generated from 'rule_spec' (see
+# 'rule_compiler') give exactly the same results as the hand written rules
+# in 'interlocking', 'sections' and 'power_switches'. Both sets of rules are
+# evaluated (see 'rule_evaluator') against the same random layout states -
+# every point, FPL, signal, subsidary, section and switch is set at random
+# (so this includes states the layout could never get into) - and all the
+# outputs are compared. The time taken by each set of rules is also shown.
+#
+# This is run by the tests (see 'tests/test_generated_rules.py') - it can
+# also be run on its own for more states (and to compare the times)
+#
+# To run: python3 check_generated_rules.py [number_of_states] [seed]
+#----------------------------------------------------------------------
+
+import rule_evaluator
+import snapshot
+
+import os
+import random
+import sys
+import time
+
+#----------------------------------------------------------------------
+# Internal function to create a random layout state
+#----------------------------------------------------------------------
+
+def random_layout_state(generator:random.Random):
+    state = snapshot.default_layout_state()
+    for group, items in state.items():
+        for item_id, values in items.items():
+            if isinstance(values, list): items[item_id] = [generator.random() < 0.5 for value in values]
+            else: items[item_id] = generator.random() < 0.5
+    return(state)
+
+#----------------------------------------------------------------------
+# Internal function to evaluate the initial interlocking conditions
+#----------------------------------------------------------------------
+
+def evaluate_initial_conditions(evaluator:dict):
+    evaluator["outputs"] = {"signal_locks":{}, "subsidary_locks":{}, "point_locks":{}}
+    evaluator["interlocking"].set_initial_interlocking_conditions()
+    return(evaluator["outputs"])
+
+#----------------------------------------------------------------------
+# Externally called function to check the generated rules against the hand
+# written rules for the given number of random states. Returns the number
+# of states where the outputs were different
+#----------------------------------------------------------------------
+
+def check_generated_rules(number_of_states:int=20000, seed:int=1):
+
+    hand_written = rule_evaluator.create_evaluator(generated_rules=False)
+    generated = rule_evaluator.create_evaluator(generated_rules=True)
+    generator = random.Random(seed)
+    differences = 0
+    if evaluate_initial_conditions(hand_written) != evaluate_initial_conditions(generated):
+        print ("Initial interlocking conditions are different")
+        differences = differences + 1
+    times = {"hand_written": 0.0, "generated": 0.0}
+    for count in range(number_of_states):
+        state = random_layout_state(generator)
+        start_time = time.perf_counter()
+        expected = rule_evaluator.evaluate(hand_written, state)
+        times["hand_written"] = times["hand_written"] + time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        outputs = rule_evaluator.evaluate(generated, state)
+        times["generated"] = times["generated"] + time.perf_counter() - start_time
+        if outputs != expected:
+            differences = differences + 1
+            if differences <= 5:
+                print ("Different outputs for state: "+str(state))
+                for group in expected.keys():
+                    if outputs[group] != expected[group]:
+                        print ("  "+group+" - hand written: "+str(expected[group])+" generated: "+str(outputs[group]))
+    print ("Checked "+str(number_of_states)+" random states - "+str(differences)+" different")
+    for rules, total_time in times.items():
+        print ("  "+rules+": "+format(1000000.0 * total_time / number_of_states, ".1f")+" us per evaluation")
+    return(differences)
+
+if __name__ == "__main__":
+    number_of_states = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    differences = check_generated_rules(number_of_states, seed)
+    # The library leaves threads running so we can't just return
+    sys.stdout.flush()
+    os._exit(1 if differences else 0)
+
+###############################################################################
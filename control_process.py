@@ -0,0 +1,290 @@
+#----------------------------------------------------------------------
+# This Module provides the option of running the control logic for the
+# layout (the interlocking, track occupancy, signal overrides and power
+# section switching) in its own process - separate from the tkinter panel
+#
+# The control process owns the authoritative state of the layout. It
+# receives user commands from the panel (point, FPL, signal, section and
+# switch changes and "signal passed" events) over a local socket, checks
+# them against the current locking, evaluates the rules (see 'rule_evaluator')
+# and then publishes the complete state (including the locks, overrides and
+# any timed signal triggers) to a shared memory block. The panel reads this
+# block and just mirrors it (see 'panel_client'). As the control process
+# never waits on the panel, a slow panel has no effect on the control logic
+#
+# The control process also saves the layout state (see 'snapshot') so the
+# last session can be restored when the control process is next started.
+#
+# To run: python3 control_process.py (my_layout starts this automatically
+# when 'control_process_enabled' is selected)
+#
+# The Shared memory block comprises a 4 byte sequence number followed by one
+# byte per item (in the order given by 'shared_items'). The sequence number
+# is odd while the block is being written so the reader can tell if it has
+# read a partly written block (it just tries again - up to 'read_attempts'
+# times, if it is still odd then the control process has died part way
+# through writing the block). The bits for each item:
+#   points   : bit0 = switched, bit1 = FPL active, bit2 = locked
+#   signals  : bit0 = clear, bit1 = subsidary clear, bit2 = locked,
+#              bit3 = subsidary locked, bit4 = overridden
+#   sections : bit0 = occupied
+#   switches : bit0 = button 1 active, bit1 = button 2 active
+# Followed by 3 bytes for each automatic signal that can be triggered as a
+# timed signal (the trigger count, the start delay and the time delay)
+#----------------------------------------------------------------------
+
+import rule_evaluator
+import snapshot
+
+from multiprocessing import connection
+from multiprocessing import shared_memory
+import copy
+import os
+import struct
+import threading
+
+# Global variables for the connection to the panel and the shared memory
+control_address = ("localhost", 6001)
+
+# The key a panel must give to connect - a new random key is made for each
+# session by the panel that starts the control process (and passed to it in
+# this environment variable - which is then removed so it isn't passed on)
+authkey_variable = "MY_LAYOUT_CONTROL_KEY"
+control_authkey = None
+if authkey_variable in os.environ: control_authkey = bytes.fromhex(os.environ.pop(authkey_variable))
+shared_memory_name = "my_layout_state"
+read_attempts = 10000
+
+# The items in the shared memory block (in order) and the automatic signals
+shared_items = ([("points", str(point_id)) for point_id in snapshot.point_ids] +
+                [("signals", str(sig_id)) for sig_id in snapshot.signal_ids] +
+                [("sections", str(section_id)) for section_id in snapshot.section_ids] +
+                [("switches", str(switch_id)) for switch_id in snapshot.switch_ids])
+timed_signal_ids = (20,21,22,23)
+shared_memory_size = 4 + len(shared_items) + 3*len(timed_signal_ids)
+
+# Global variables for the authoritative state of the layout - the state
+# (in the 'snapshot' format), the locks and overrides (in the 'rule_evaluator'
+# format) and the timed signal triggers {"21": [count, start_delay, time_delay]}
+layout_state: dict = {}
+layout_outputs: dict = {"signal_locks":{}, "subsidary_locks":{}, "point_locks":{}, "overrides":{}}
+timed_signals: dict = {}
+state_lock = threading.Lock()
+evaluator = None
+memory = None
+
+#----------------------------------------------------------------------
+# Externally called functions to encode and decode the shared memory block
+# (the sequence number is not included - this is added when written)
+#----------------------------------------------------------------------
+
+def encode_layout_state(state:dict, outputs:dict, timed:dict):
+    data = bytearray(len(shared_items) + 3*len(timed_signal_ids))
+    for index, (group, item_id) in enumerate(shared_items):
+        if group == "points":
+            switched, fpl = state["points"][item_id]
+            data[index] = (switched | fpl << 1 | outputs["point_locks"].get(item_id, False) << 2)
+        elif group == "signals":
+            sig_clear, sub_clear = state["signals"][item_id]
+            data[index] = (sig_clear | sub_clear << 1 |
+                           outputs["signal_locks"].get(item_id, False) << 2 |
+                           outputs["subsidary_locks"].get(item_id, False) << 3 |
+                           outputs["overrides"].get(item_id, False) << 4)
+        elif group == "sections":
+            data[index] = int(state["sections"][item_id])
+        else:
+            button1, button2 = state["switches"][item_id]
+            data[index] = button1 | button2 << 1
+    index = len(shared_items)
+    for sig_id in timed_signal_ids:
+        data[index:index+3] = bytes(timed.get(str(sig_id), [0,0,0]))
+        index = index + 3
+    return(bytes(data))
+
+def decode_layout_state(data:bytes):
+    state = {"points":{}, "signals":{}, "sections":{}, "switches":{}}
+    outputs = {"signal_locks":{}, "subsidary_locks":{}, "point_locks":{}, "overrides":{}}
+    timed = {}
+    for index, (group, item_id) in enumerate(shared_items):
+        value = data[index]
+        if group == "points":
+            state["points"][item_id] = [bool(value & 1), bool(value & 2)]
+            outputs["point_locks"][item_id] = bool(value & 4)
+        elif group == "signals":
+            state["signals"][item_id] = [bool(value & 1), bool(value & 2)]
+            outputs["signal_locks"][item_id] = bool(value & 4)
+            outputs["subsidary_locks"][item_id] = bool(value & 8)
+            outputs["overrides"][item_id] = bool(value & 16)
+        elif group == "sections":
+            state["sections"][item_id] = bool(value & 1)
+        else:
+            state["switches"][item_id] = [bool(value & 1), bool(value & 2)]
+    index = len(shared_items)
+    for sig_id in timed_signal_ids:
+        timed[str(sig_id)] = list(data[index:index+3])
+        index = index + 3
+    return(state, outputs, timed)
+
+#----------------------------------------------------------------------
+# Externally called functions to write/read the shared memory block
+# read_shared_state returns (sequence_number, data) - or (None, None) if
+# the block is still being written after 'read_attempts' tries
+#----------------------------------------------------------------------
+
+def write_shared_state(shared_memory_block, data:bytes):
+    sequence = struct.unpack_from("<I", shared_memory_block.buf, 0)[0]
+    struct.pack_into("<I", shared_memory_block.buf, 0, (sequence + 1) & 0xFFFFFFFF)
+    shared_memory_block.buf[4:4+len(data)] = data
+    struct.pack_into("<I", shared_memory_block.buf, 0, (sequence + 2) & 0xFFFFFFFF)
+    return()
+
+def read_shared_state(shared_memory_block):
+    for attempt in range(read_attempts):
+        sequence = struct.unpack_from("<I", shared_memory_block.buf, 0)[0]
+        data = bytes(shared_memory_block.buf[4:shared_memory_size])
+        if sequence % 2 == 0 and sequence == struct.unpack_from("<I", shared_memory_block.buf, 0)[0]:
+            return(sequence, data)
+    return(None, None)
+
+#----------------------------------------------------------------------
+# Internal function to create the shared memory block. A block left behind
+# by a control process that crashed (so never removed it) is removed first -
+# only one control process can be listening so it can't still be in use
+#----------------------------------------------------------------------
+
+def create_shared_memory():
+    try:
+        shared_memory_block = shared_memory.SharedMemory(name=shared_memory_name, create=True, size=shared_memory_size)
+    except FileExistsError:
+        print ("Control Process: Removing the shared memory left by the last control process")
+        stale_block = shared_memory.SharedMemory(name=shared_memory_name)
+        stale_block.close()
+        stale_block.unlink()
+        shared_memory_block = shared_memory.SharedMemory(name=shared_memory_name, create=True, size=shared_memory_size)
+    return(shared_memory_block)
+
+#----------------------------------------------------------------------
+# Internal function to check if a command is allowed by the current locking
+# (the same as the buttons on the panel being disabled by the library)
+#----------------------------------------------------------------------
+
+def command_allowed(group:str, item_id:str, value):
+    allowed = True
+    if group == "points" and value != layout_state["points"][item_id]:
+        allowed = not layout_outputs["point_locks"].get(item_id, False)
+    elif group == "signals":
+        sig_clear, sub_clear = layout_state["signals"][item_id]
+        if value[0] != sig_clear and layout_outputs["signal_locks"].get(item_id, False): allowed = False
+        if value[1] != sub_clear and layout_outputs["subsidary_locks"].get(item_id, False): allowed = False
+    return(allowed)
+
+#----------------------------------------------------------------------
+# Internal function to evaluate the rules against the current state and
+# update the authoritative state (the power switches and locks)
+#----------------------------------------------------------------------
+
+def evaluate_layout():
+    outputs = rule_evaluator.evaluate(evaluator, layout_state)
+    layout_state["switches"] = outputs["switches"]
+    for group in layout_outputs.keys():
+        layout_outputs[group].update(outputs[group])
+    return()
+
+#----------------------------------------------------------------------
+# Externally called function to process a command from the panel:
+#   ("points", point_id, [switched, fpl_active])
+#   ("signals", sig_id, [signal_clear, subsidary_clear])
+#   ("sections", section_id, occupied)
+#   ("switches", switch_id, [button1_active, button2_active])
+#   ("sig_passed", sig_id)
+# The new state is always published (even if the command is rejected) so
+# the panel will always be returned to the authoritative state
+#----------------------------------------------------------------------
+
+def process_command(command:tuple):
+    with state_lock:
+        if command[0] == "sig_passed":
+            changes = rule_evaluator.evaluate_signal_passed(evaluator, layout_state, command[1])
+            layout_state["sections"].update(changes["sections"])
+            for sig_id, start_delay, time_delay in changes["timed_signals"]:
+                count = timed_signals.get(str(sig_id), [0,0,0])[0]
+                timed_signals[str(sig_id)] = [(count + 1) % 256, start_delay, time_delay]
+        else:
+            group, item_id, value = command[0], str(command[1]), command[2]
+            if item_id not in layout_state.get(group,{}).keys():
+                print ("ERROR: process_command - "+group+" "+item_id+" does not exist")
+            elif not command_allowed(group, item_id, value):
+                print ("ERROR: process_command - "+group+" "+item_id+" is locked")
+            else:
+                layout_state[group][item_id] = value
+        evaluate_layout()
+        write_shared_state(memory, encode_layout_state(layout_state, layout_outputs, timed_signals))
+        snapshot.save_layout_state(layout_state)
+    return()
+
+#----------------------------------------------------------------------
+# Thread to receive the commands from a connected panel
+#----------------------------------------------------------------------
+
+def thread_to_receive_commands(panel_connection):
+    try:
+        while True:
+            command = panel_connection.recv()
+            if command[0] == "quit": shutdown_control_process()
+            process_command(command)
+    except (EOFError, OSError):
+        print ("Control Process: Panel disconnected")
+    panel_connection.close()
+    return()
+
+#----------------------------------------------------------------------
+# Internal function to shut down the control process (on a "quit" command)
+# We have to use os._exit as the library leaves threads running
+#----------------------------------------------------------------------
+
+def shutdown_control_process():
+    with state_lock:
+        print ("Control Process: Shutting down")
+        memory.close()
+        memory.unlink()
+    os._exit(0)
+
+#----------------------------------------------------------------------
+# Externally called function to run the control process (does not return)
+# The last session is restored (if there is one) before we start listening
+#----------------------------------------------------------------------
+
+def run_control_process():
+
+    global layout_state, evaluator, memory
+
+    if control_authkey is None:
+        print ("ERROR: run_control_process - no key in "+authkey_variable+" (the control process is started by the panel)")
+        return()
+    layout_state = snapshot.default_layout_state()
+    saved_state = snapshot.load_layout_state()
+    if saved_state is not None: snapshot.merge_delta(layout_state, saved_state)
+    snapshot.last_saved_state = copy.deepcopy(layout_state)
+    snapshot.write_snapshot(layout_state)
+    evaluator = rule_evaluator.create_evaluator()
+    evaluate_layout()
+
+    # We start listening first - this fails if another control process is running
+    listener = connection.Listener(control_address, authkey=control_authkey)
+    memory = create_shared_memory()
+    try:
+        write_shared_state(memory, encode_layout_state(layout_state, layout_outputs, timed_signals))
+        print ("Control Process: Listening for panels on "+str(control_address))
+        while True:
+            panel_connection = listener.accept()
+            receiver = threading.Thread(target=thread_to_receive_commands,
+                                        args=(panel_connection,), daemon=True)
+            receiver.start()
+    finally:
+        memory.close()
+        memory.unlink()
+
+if __name__ == "__main__":
+    run_control_process()
+
+###############################################################################
@@ -0,0 +1,733 @@
+#----------------------------------------------------------------------
+# This Module is an in-memory stand-in for the model_railway_signals
+# library - so the layout modules ('interlocking', 'sections' etc) can be
+# run without a display, a DCC bus or any threads. It has the same public
+# functions as the library (create_point, point_switched, lock_signal,
+# set_section_occupied, trigger_timed_signal etc) but the points, sections
+# and track sensors are held in plain lists (indexed by ID) and nothing is
+# drawn. This makes it quick enough for tests that run through tens of
+# thousands of random sequences of events a second.
+#
+# It is selected at import time - 'install' must be called BEFORE any of
+# the layout modules are imported (they all do "from model_railway_signals
+# import *") and the layout can then be created on a headless canvas:
+#     import headless_signals
+#     headless_signals.install()
+#     import interlocking, sections, power_switches
+#     headless_signals.create_layout(point_callback, signal_callback, ...)
+#
+# The signals are held in the same dictionary as the library uses (as the
+# layout modules read some of their attributes - e.g. "siglocked") and the
+# library's 'points' dictionary is made up when it is asked for.
+#
+# Time is kept by a virtual clock rather than the real one. The timed
+# signals (and anything scheduled with the headless window's 'after') only
+# move on when the clock is advanced (see 'advance_clock') - so an hour of
+# timed signal sequences takes no time at all.
+#
+# The panel buttons are pressed with the 'press_*' functions - a button
+# that would be disabled on the panel (e.g. a locked signal) does nothing,
+# just as it wouldn't for the signalman.
+#----------------------------------------------------------------------
+
+import enum
+import heapq
+import math
+import sys
+import types
+
+# The highest ID (plus one) that the points, sections and sensors can have
+max_item_id = 256
+
+#----------------------------------------------------------------------
+# The library types (these are the same as those in the library)
+#----------------------------------------------------------------------
+
+class point_type(enum.Enum):
+    RH = 1
+    LH = 2
+
+class point_callback_type(enum.Enum):
+    null_event = 10
+    point_switched = 11
+    fpl_switched = 12
+
+class route_type(enum.Enum):
+    NONE = 0
+    MAIN = 1
+    LH1 = 2
+    LH2 = 3
+    RH1 = 4
+    RH2 = 5
+
+class sig_callback_type(enum.Enum):
+    null_event = 0
+    sig_switched = 1
+    sub_switched = 2
+    sig_passed = 3
+    sig_updated = 4
+    sig_released = 5
+
+class sig_type(enum.Enum):
+    colour_light = 1
+    ground_pos_light = 2
+    semaphore = 3
+    ground_disc = 4
+
+class signal_sub_type(enum.Enum):
+    home = 1
+    distant = 2
+    red_ylw = 3
+    three_aspect = 4
+    four_aspect = 5
+
+class aspect_type(enum.Enum):
+    NOTSET = 0
+    RED = 1
+    YELLOW = 2
+    GREEN = 3
+    DOUBLE_YELLOW = 4
+    FLASHING_YELLOW = 5
+    FLASHING_DOUBLE_YELLOW = 6
+
+class section_callback_type(enum.Enum):
+    null_event = 20
+    section_switched = 21
+
+class track_sensor_callback_type(enum.Enum):
+    null_event = 30
+    sensor_triggered = 31
+
+class dcc_signal_type(enum.Enum):
+    address_mapped = 1
+
+class signal_state_type(enum.Enum):
+    danger = 1
+    proceed = 2
+    caution = 3
+    prelim_caution = 4
+    flash_caution = 5
+    flash_prelim_caution = 6
+
+# The DCC command sent for each signal aspect (as for the library)
+signal_states = {aspect_type.RED: signal_state_type.danger, aspect_type.YELLOW: signal_state_type.caution,
+                 aspect_type.DOUBLE_YELLOW: signal_state_type.prelim_caution,
+                 aspect_type.FLASHING_YELLOW: signal_state_type.flash_caution,
+                 aspect_type.FLASHING_DOUBLE_YELLOW: signal_state_type.flash_prelim_caution,
+                 aspect_type.GREEN: signal_state_type.proceed}
+
+# The public functions and types of the library (those that are imported
+# by "from model_railway_signals import *")
+library_names = ("point_type", "point_callback_type", "create_point", "lock_point", "unlock_point",
+                 "point_switched", "fpl_active", "toggle_point", "toggle_fpl",
+                 "route_type", "signal_sub_type", "sig_callback_type",
+                 "create_colour_light_signal", "create_ground_position_signal", "set_route",
+                 "update_signal", "lock_signal", "unlock_signal", "toggle_signal", "lock_subsidary",
+                 "unlock_subsidary", "toggle_subsidary", "signal_clear", "subsidary_clear",
+                 "set_signal_override", "clear_signal_override", "set_approach_control",
+                 "clear_approach_control", "trigger_timed_signal", "pulse_signal_passed_button",
+                 "pulse_signal_release_button",
+                 "section_callback_type", "create_section", "section_occupied",
+                 "set_section_occupied", "clear_section_occupied",
+                 "track_sensor_callback_type", "create_track_sensor", "track_sensor_active",
+                 "dcc_signal_type", "initialise_pi_sprog", "service_mode_write_cv",
+                 "request_dcc_power_on", "request_dcc_power_off",
+                 "map_dcc_signal", "map_traintech_signal", "map_dcc_point")
+
+# The points, sections and track sensors - a list for each attribute (indexed by ID)
+point_exists = [False] * max_item_id
+point_switched_states = [False] * max_item_id
+point_fpl_states = [False] * max_item_id
+point_has_fpl = [False] * max_item_id
+point_locked = [False] * max_item_id
+point_also_switch = [0] * max_item_id
+point_auto = [False] * max_item_id
+point_callbacks = [None] * max_item_id
+section_exists = [False] * max_item_id
+section_occupied_states = [False] * max_item_id
+section_callbacks = [None] * max_item_id
+sensor_exists = [False] * max_item_id
+sensor_active_states = [False] * max_item_id
+sensor_callbacks = [None] * max_item_id
+
+# The signals (in the same form as the library - {"1": {"sigclear": False, ...}, ...})
+signals: dict = {}
+
+# The DCC mappings and the DCC commands that have been sent ([clock, point_id, state]
+# for the points and [clock, sig_id, signal_state_type] for the signal aspects)
+dcc_point_mappings: dict = {}
+dcc_signal_mappings: dict = {}
+dcc_commands: list = []
+dcc_signal_commands: list = []
+
+# The virtual clock (in seconds) and the events scheduled on it
+clock = 0.0
+scheduled_events: list = []    # [(time, event_id, function, args), ...] - a heap
+cancelled_events = set()
+last_event_id = 0
+
+#----------------------------------------------------------------------
+# Internal functions to do nothing (the default callbacks)
+#----------------------------------------------------------------------
+
+def null_callback(item_id, callback_type=None):
+    return()
+
+def section_null(section_id, section_callback=section_callback_type.null_event):
+    return()
+
+def sensor_null(sensor_id, sensor_callback=track_sensor_callback_type.null_event):
+    return()
+
+#----------------------------------------------------------------------
+# Headless stand-ins for the tkinter objects the layout modules use - the
+# canvas only keeps the options of each item (so the schematic colours can
+# still be read back) and the window only has the virtual clock
+#----------------------------------------------------------------------
+
+class Widget:
+    def __init__(self, master=None, **options):
+        self.options = options
+    def config(self, **options):
+        self.options.update(options)
+    configure = config
+    def cget(self, option):
+        return(self.options.get(option))
+
+class Canvas(Widget):
+    def __init__(self, master=None, **options):
+        Widget.__init__(self, master, **options)
+        self.items = {}
+        self.last_item = 0
+    def create_item(self, *coords, **options):
+        self.last_item = self.last_item + 1
+        self.items[self.last_item] = options
+        return(self.last_item)
+    create_line = create_oval = create_rectangle = create_polygon = create_text = create_window = create_item
+    def itemconfigure(self, item_id, **options):
+        if item_id in self.items: self.items[item_id].update(options)
+    itemconfig = itemconfigure
+    def itemcget(self, item_id, option):
+        return(self.items.get(item_id, {}).get(option))
+    def find_all(self):
+        return(tuple(self.items.keys()))
+    def delete(self, *item_ids):
+        for item_id in item_ids: self.items.pop(item_id, None)
+    def scale(self, *args): return()
+    def addtag_all(self, *args): return()
+    def bind(self, *args): return()
+    def update_idletasks(self): return()
+
+class Window(Widget):
+    def after(self, delay_ms:int, function, *args):
+        return(schedule_event(delay_ms/1000.0, function, *args))
+    def after_idle(self, function, *args):
+        return(schedule_event(0.0, function, *args))
+    def after_cancel(self, event_id):
+        cancelled_events.add(event_id)
+    def bind(self, *args): return()
+    def update(self): return()
+    def update_idletasks(self): return()
+
+# The (only) headless window - for the modules that schedule their own events
+window = Window()
+
+#----------------------------------------------------------------------
+# Externally called functions for the virtual clock - to schedule an event
+# (returns its ID) and to move the clock on (running any events that fall
+# due in the order they are due)
+#----------------------------------------------------------------------
+
+def schedule_event(delay:float, function, *args):
+    global last_event_id
+    last_event_id = last_event_id + 1
+    heapq.heappush(scheduled_events, (clock + delay, last_event_id, function, args))
+    return(last_event_id)
+
+def advance_clock(seconds:float):
+    global clock
+    end_time = clock + seconds
+    while scheduled_events and scheduled_events[0][0] <= end_time:
+        event_time, event_id, function, args = heapq.heappop(scheduled_events)
+        clock = event_time
+        if event_id in cancelled_events: cancelled_events.discard(event_id)
+        else: function(*args)
+    clock = end_time
+    return()
+
+#----------------------------------------------------------------------
+# Internal function to check an ID can be held in the lists
+#----------------------------------------------------------------------
+
+def valid_id(function_name:str, item_id:int):
+    if not isinstance(item_id, int) or item_id < 1 or item_id >= max_item_id:
+        print ("ERROR: "+function_name+" - ID "+str(item_id)+" must be between 1 and "+str(max_item_id-1))
+        return(False)
+    return(True)
+
+#----------------------------------------------------------------------
+# The Points
+#----------------------------------------------------------------------
+
+def create_point(canvas, point_id:int, pointtype:point_type, x:int, y:int, colour:str,
+                 orientation:int=0, point_callback=null_callback, also_switch:int=0,
+                 reverse:bool=False, auto:bool=False, fpl:bool=False):
+    if not valid_id("create_point", point_id): return([0,0,0,0])
+    if point_exists[point_id]:
+        print ("ERROR: create_point - Point "+str(point_id)+" already exists")
+        return([0,0,0,0])
+    point_exists[point_id] = True
+    point_switched_states[point_id] = False
+    point_fpl_states[point_id] = fpl
+    point_has_fpl[point_id] = fpl
+    point_locked[point_id] = False
+    point_also_switch[point_id] = also_switch
+    point_auto[point_id] = auto
+    point_callbacks[point_id] = point_callback
+    dcc_control.update_dcc_point(point_id, False)
+    # [blade straight, blade switched, route straight, route switched] - as for the library
+    return([canvas.create_line(x, y, fill=colour) for line in range(4)])
+
+def toggle_point(point_id:int, external_callback=null_callback):
+    if not point_exists[point_id]:
+        print ("ERROR: toggle_point - Point "+str(point_id)+" does not exist")
+    else:
+        point_switched_states[point_id] = not point_switched_states[point_id]
+        dcc_control.update_dcc_point(point_id, point_switched_states[point_id])
+        # As for the library the 'also switch' point is toggled by the module's toggle_point
+        if point_also_switch[point_id] != 0: points.toggle_point(point_also_switch[point_id])
+        external_callback(point_id, point_callback_type.point_switched)
+    return()
+
+def toggle_fpl(point_id:int, external_callback=null_callback):
+    if not point_exists[point_id]:
+        print ("ERROR: toggle_fpl - Point "+str(point_id)+" does not exist")
+    else:
+        point_fpl_states[point_id] = not point_fpl_states[point_id]
+        external_callback(point_id, point_callback_type.fpl_switched)
+    return()
+
+def lock_point(*point_ids:int):
+    for point_id in point_ids:
+        # The FPL is activated (if it isn't already) before the point is locked
+        if point_has_fpl[point_id] and not point_fpl_states[point_id]: toggle_fpl(point_id)
+        point_locked[point_id] = True
+    return()
+
+def unlock_point(*point_ids:int):
+    for point_id in point_ids: point_locked[point_id] = False
+    return()
+
+def point_switched(point_id:int):
+    return(point_switched_states[point_id])
+
+def fpl_active(point_id:int):
+    return(point_fpl_states[point_id] or not point_has_fpl[point_id])
+
+#----------------------------------------------------------------------
+# The Signals
+#----------------------------------------------------------------------
+
+def create_signal(function_name:str, sig_id:int, signal:dict):
+    if not valid_id(function_name, sig_id): return()
+    if str(sig_id) in signals:
+        print ("ERROR: "+function_name+" - Signal "+str(sig_id)+" already exists")
+        return()
+    signals[str(sig_id)] = signal
+    update_signal(sig_id)
+    return()
+
+def create_colour_light_signal(canvas, sig_id:int, x:int, y:int, signal_subtype=signal_sub_type.four_aspect,
+                               sig_callback=null_callback, orientation:int=0, sig_passed_button:bool=False,
+                               approach_release_button:bool=False, position_light:bool=False,
+                               mainfeather:bool=False, lhfeather45:bool=False, lhfeather90:bool=False,
+                               rhfeather45:bool=False, rhfeather90:bool=False,
+                               theatre_route_indicator:bool=False, refresh_immediately=True,
+                               fully_automatic:bool=False):
+    override_aspect = aspect_type.YELLOW if signal_subtype == signal_sub_type.distant else aspect_type.RED
+    create_signal("create_colour_light_signal", sig_id,
+                  {"sigtype": sig_type.colour_light, "sigclear": fully_automatic, "automatic": fully_automatic,
+                   "subclear": False, "override": False, "siglocked": False, "sublocked": False,
+                   "hassubsidary": position_light, "releaseonred": False, "releaseonyel": False,
+                   "routeset": route_type.NONE, "theatretext": "NONE", "displayedaspect": aspect_type.NOTSET,
+                   "overriddenaspect": override_aspect, "externalcallback": sig_callback,
+                   "subtype": signal_subtype, "refresh": refresh_immediately, "sigahead": 0})
+    return()
+
+def create_ground_position_signal(canvas, sig_id:int, x:int, y:int, sig_callback=null_callback,
+                                  orientation:int=0, sig_passed_button:bool=False,
+                                  shunt_ahead:bool=False, modern_type:bool=False):
+    create_signal("create_ground_position_signal", sig_id,
+                  {"sigtype": sig_type.ground_pos_light, "sigclear": False, "automatic": False,
+                   "subclear": False, "override": False, "siglocked": False, "sublocked": False,
+                   "hassubsidary": False, "externalcallback": sig_callback, "shuntahead": shunt_ahead})
+    return()
+
+def update_signal(sig_id:int, sig_ahead_id:int=0):
+    signal = signals[str(sig_id)]
+    if signal["sigtype"] != sig_type.colour_light: return()
+    signal["sigahead"] = sig_ahead_id
+    # The aspect is worked out in the same way as the library does
+    if not signal["sigclear"]:
+        aspect = aspect_type.YELLOW if signal["subtype"] == signal_sub_type.distant else aspect_type.RED
+    elif signal["override"]: aspect = signal["overriddenaspect"]
+    elif signal["releaseonred"]: aspect = aspect_type.RED
+    elif signal["subtype"] == signal_sub_type.home: aspect = aspect_type.GREEN
+    elif signal["subtype"] == signal_sub_type.red_ylw: aspect = aspect_type.YELLOW
+    elif signal["releaseonyel"]: aspect = aspect_type.YELLOW
+    elif sig_ahead_id == 0: aspect = aspect_type.GREEN
+    else:
+        signal_ahead = signals[str(sig_ahead_id)]
+        if signal_ahead["sigtype"] != sig_type.colour_light:
+            aspect = aspect_type.GREEN if signal_ahead["sigclear"] else aspect_type.YELLOW
+        elif signal_ahead["displayedaspect"] == aspect_type.RED: aspect = aspect_type.YELLOW
+        elif signal_ahead["displayedaspect"] == aspect_type.YELLOW and signal_ahead["releaseonyel"]:
+            aspect = aspect_type.FLASHING_YELLOW
+        elif signal["subtype"] == signal_sub_type.four_aspect and signal_ahead["displayedaspect"] == aspect_type.YELLOW:
+            aspect = aspect_type.DOUBLE_YELLOW
+        elif signal["subtype"] == signal_sub_type.four_aspect and signal_ahead["displayedaspect"] == aspect_type.FLASHING_YELLOW:
+            aspect = aspect_type.FLASHING_DOUBLE_YELLOW
+        else: aspect = aspect_type.GREEN
+    # The DCC commands are sent when the aspect changes (through the module - as for the library)
+    if aspect != signal["displayedaspect"]:
+        signal["displayedaspect"] = aspect
+        dcc_control.update_dcc_signal(sig_id, signal_states[aspect])
+    return()
+
+def refresh_signal(sig_id:int):
+    signal = signals[str(sig_id)]
+    if signal["sigtype"] != sig_type.colour_light or signal["refresh"]: update_signal(sig_id)
+    return()
+
+def set_route(sig_id:int, route:route_type=route_type.NONE, theatre_text:str="NONE"):
+    signals[str(sig_id)]["routeset"] = route
+    signals[str(sig_id)]["theatretext"] = theatre_text
+    return()
+
+def signal_clear(sig_id:int):
+    return(signals[str(sig_id)]["sigclear"])
+
+def subsidary_clear(sig_id:int):
+    return(signals[str(sig_id)]["subclear"])
+
+def lock_signal(*sig_ids:int):
+    for sig_id in sig_ids: signals[str(sig_id)]["siglocked"] = True
+    return()
+
+def unlock_signal(*sig_ids:int):
+    for sig_id in sig_ids: signals[str(sig_id)]["siglocked"] = False
+    return()
+
+def lock_subsidary(*sig_ids:int):
+    for sig_id in sig_ids: signals[str(sig_id)]["sublocked"] = True
+    return()
+
+def unlock_subsidary(*sig_ids:int):
+    for sig_id in sig_ids: signals[str(sig_id)]["sublocked"] = False
+    return()
+
+def set_signal_override(*sig_ids:int):
+    for sig_id in sig_ids:
+        if not signals[str(sig_id)]["override"]:
+            signals[str(sig_id)]["override"] = True
+            refresh_signal(sig_id)
+    return()
+
+def clear_signal_override(*sig_ids:int):
+    for sig_id in sig_ids:
+        if signals[str(sig_id)]["override"]:
+            signals[str(sig_id)]["override"] = False
+            refresh_signal(sig_id)
+    return()
+
+def toggle_signal(sig_id:int):
+    signals[str(sig_id)]["sigclear"] = not signals[str(sig_id)]["sigclear"]
+    refresh_signal(sig_id)
+    return()
+
+def toggle_subsidary(sig_id:int):
+    signals[str(sig_id)]["subclear"] = not signals[str(sig_id)]["subclear"]
+    return()
+
+def set_approach_control(sig_id:int, release_on_yellow:bool=False):
+    signal = signals[str(sig_id)]
+    if release_on_yellow: signal["releaseonyel"], signal["releaseonred"] = True, False
+    else: signal["releaseonyel"], signal["releaseonred"] = False, True
+    refresh_signal(sig_id)
+    return()
+
+def clear_approach_control(sig_id:int):
+    signal = signals[str(sig_id)]
+    signal["releaseonyel"], signal["releaseonred"] = False, False
+    refresh_signal(sig_id)
+    signal["externalcallback"](sig_id, sig_callback_type.sig_released)
+    return()
+
+def pulse_signal_passed_button(sig_id:int):
+    return()
+
+def pulse_signal_release_button(sig_id:int):
+    return()
+
+#----------------------------------------------------------------------
+# The Timed signals - the signal is overridden (with a signal passed event
+# if there is a start delay) and then steps through its aspects on the
+# virtual clock (in the same way as the library's timed signal thread)
+#----------------------------------------------------------------------
+
+def timed_signal_event(sig_id:int, step:int, time_delay:int):
+    signal = signals[str(sig_id)]
+    if step == 0:
+        signal["override"] = True
+    elif step == 1 and signal["subtype"] in (signal_sub_type.three_aspect, signal_sub_type.four_aspect):
+        signal["overriddenaspect"] = aspect_type.YELLOW
+    elif step == 2 and signal["subtype"] == signal_sub_type.four_aspect:
+        signal["overriddenaspect"] = aspect_type.DOUBLE_YELLOW
+    elif step in (1, 2):
+        # The steps the signal doesn't have are skipped (as there is no delay for them)
+        timed_signal_event(sig_id, step+1, time_delay)
+        return()
+    if step == 3:
+        signal["override"] = False
+        signal["overriddenaspect"] = aspect_type.YELLOW if signal["subtype"] == signal_sub_type.distant else aspect_type.RED
+    refresh_signal(sig_id)
+    if step == 0 and signal["timedstartdelay"] > 0:
+        signal["externalcallback"](sig_id, sig_callback_type.sig_passed)
+    else:
+        signal["externalcallback"](sig_id, sig_callback_type.sig_updated)
+    if step < 3: schedule_event(time_delay, timed_signal_event, sig_id, step+1, time_delay)
+    return()
+
+def trigger_timed_signal(sig_id:int, start_delay:int=0, time_delay:int=5):
+    signal = signals[str(sig_id)]
+    if not signal["override"] and signal["sigtype"] == sig_type.colour_light:
+        signal["timedstartdelay"] = start_delay
+        schedule_event(start_delay, timed_signal_event, sig_id, 0, time_delay)
+    return()
+
+#----------------------------------------------------------------------
+# The Track Occupancy sections
+#----------------------------------------------------------------------
+
+def create_section(canvas, section_id:int, x:int, y:int, section_callback=section_null, label:str="Train On Line"):
+    if not valid_id("create_section", section_id): return()
+    if section_exists[section_id]:
+        print ("ERROR: create_section - Section "+str(section_id)+" already exists")
+        return()
+    section_exists[section_id] = True
+    section_occupied_states[section_id] = False
+    section_callbacks[section_id] = section_callback
+    return()
+
+def section_occupied(section_id:int):
+    return(section_occupied_states[section_id])
+
+def set_section_occupied(section_id:int):
+    section_occupied_states[section_id] = True
+    return()
+
+def clear_section_occupied(section_id:int):
+    section_occupied_states[section_id] = False
+    return()
+
+#----------------------------------------------------------------------
+# The Track Sensors (triggered with 'trigger_track_sensor')
+#----------------------------------------------------------------------
+
+def create_track_sensor(sensor_id:int, gpio_channel:int, sensor_callback=sensor_null, sensor_timeout=3.0):
+    if not valid_id("create_track_sensor", sensor_id): return()
+    sensor_exists[sensor_id] = True
+    sensor_active_states[sensor_id] = False
+    sensor_callbacks[sensor_id] = sensor_callback
+    return()
+
+def track_sensor_active(sensor_id:int):
+    return(sensor_active_states[sensor_id])
+
+def trigger_track_sensor(sensor_id:int, active_time:float=0.5):
+    sensor_active_states[sensor_id] = True
+    schedule_event(active_time, sensor_active_states.__setitem__, sensor_id, False)
+    sensor_callbacks[sensor_id](sensor_id, track_sensor_callback_type.sensor_triggered)
+    return()
+
+#----------------------------------------------------------------------
+# DCC control - the commands for the mapped points and signals are recorded (with the
+# time on the virtual clock) rather than being sent
+#----------------------------------------------------------------------
+
+def initialise_pi_sprog(*args, **kwargs):
+    return(True)
+
+def service_mode_write_cv(cv:int, value:int):
+    return(True)
+
+def request_dcc_power_on():
+    return(True)
+
+def request_dcc_power_off():
+    return(True)
+
+def map_dcc_signal(sig_id:int, *args, **kwargs):
+    dcc_signal_mappings[str(sig_id)] = kwargs
+    return()
+
+map_traintech_signal = map_dcc_signal
+
+def map_dcc_point(point_id:int, address:int, state_reversed:bool=False):
+    dcc_point_mappings[str(point_id)] = {"address": address, "reversed": state_reversed}
+    return()
+
+def point_mapped(point_id:int):
+    return(str(point_id) in dcc_point_mappings)
+
+def sig_mapped(sig_id:int):
+    return(str(sig_id) in dcc_signal_mappings)
+
+def update_dcc_point(point_id:int, state:bool):
+    if str(point_id) in dcc_point_mappings: dcc_commands.append([clock, point_id, state])
+    return()
+
+def update_dcc_signal(sig_id:int, state:signal_state_type):
+    if str(sig_id) in dcc_signal_mappings: dcc_signal_commands.append([clock, sig_id, state])
+    return()
+
+#----------------------------------------------------------------------
+# The library's sub-modules that the layout modules use directly
+#----------------------------------------------------------------------
+
+def rotate_point(ox, oy, px, py, angle):
+    angle = math.radians(angle)
+    return(ox + math.cos(angle)*px - math.sin(angle)*py, oy + math.sin(angle)*px + math.cos(angle)*py)
+
+def rotate_line(ox, oy, px1, py1, px2, py2, angle):
+    return(rotate_point(ox, oy, px1, py1, angle), rotate_point(ox, oy, px2, py2, angle))
+
+def library_points_dictionary(name:str):
+    # The library's dictionary of points is only made up when it is asked for
+    if name != "points": raise AttributeError(name)
+    return({str(point_id): {"switched": point_switched_states[point_id], "locked": point_locked[point_id],
+                            "fpllock": point_fpl_states[point_id], "hasfpl": point_has_fpl[point_id],
+                            "alsoswitch": point_also_switch[point_id]}
+            for point_id in range(max_item_id) if point_exists[point_id]})
+
+signals_common = types.ModuleType("model_railway_signals.signals_common")
+signals_common.signals, signals_common.sig_type = signals, sig_type
+signals_common.route_type, signals_common.sig_callback_type = route_type, sig_callback_type
+signals_common.sig_exists = lambda sig_id: str(sig_id) in signals
+dcc_control = types.ModuleType("model_railway_signals.dcc_control")
+dcc_control.point_mapped, dcc_control.sig_mapped, dcc_control.update_dcc_point = point_mapped, sig_mapped, update_dcc_point
+dcc_control.dcc_point_mappings, dcc_control.dcc_signal_mappings = dcc_point_mappings, dcc_signal_mappings
+dcc_control.update_dcc_signal, dcc_control.signal_state_type = update_dcc_signal, signal_state_type
+points = types.ModuleType("model_railway_signals.points")
+points.point_type, points.point_callback_type, points.__getattr__ = point_type, point_callback_type, library_points_dictionary
+points.toggle_point, points.toggle_fpl = toggle_point, toggle_fpl
+signals_colour_lights = types.ModuleType("model_railway_signals.signals_colour_lights")
+signals_colour_lights.aspect_type, signals_colour_lights.signal_sub_type = aspect_type, signal_sub_type
+common = types.ModuleType("model_railway_signals.common")
+common.fontsize, common.xpadding, common.ypadding, common.bgraised, common.bgsunken = 8, 3, 3, "grey85", "white"
+common.rotate_point, common.rotate_line = rotate_point, rotate_line
+
+#----------------------------------------------------------------------
+# Externally called function to use this module in place of the library -
+# to be called BEFORE any of the layout modules are imported
+#----------------------------------------------------------------------
+
+def install():
+    if "model_railway_signals" in sys.modules and not getattr(sys.modules["model_railway_signals"], "headless", False):
+        print ("ERROR: install - the model_railway_signals library has already been imported")
+        return()
+    library = types.ModuleType("model_railway_signals")
+    library.headless = True
+    library.__all__ = list(library_names)
+    for name in library_names: setattr(library, name, globals()[name])
+    sys.modules["model_railway_signals"] = library
+    for sub_module in (signals_common, dcc_control, points, signals_colour_lights, common):
+        setattr(library, sub_module.__name__.rpartition(".")[2], sub_module)
+        sys.modules[sub_module.__name__] = sub_module
+    return()
+
+#----------------------------------------------------------------------
+# Externally called functions to press the panel buttons. A button that
+# would be disabled on the panel does nothing (and returns False)
+#----------------------------------------------------------------------
+
+def press_point_button(point_id:int):
+    # The "auto" points are only switched with another point (they have no buttons)
+    if point_auto[point_id]: return(False)
+    if point_has_fpl[point_id]: disabled = point_fpl_states[point_id]
+    else: disabled = point_locked[point_id]
+    if disabled: return(False)
+    points.toggle_point(point_id, point_callbacks[point_id])
+    return(True)
+
+def press_fpl_button(point_id:int):
+    if point_auto[point_id] or not point_has_fpl[point_id] or point_locked[point_id]: return(False)
+    toggle_fpl(point_id, point_callbacks[point_id])
+    return(True)
+
+def press_signal_button(sig_id:int):
+    signal = signals[str(sig_id)]
+    if signal["siglocked"] or signal["automatic"]: return(False)
+    toggle_signal(sig_id)
+    signal["externalcallback"](sig_id, sig_callback_type.sig_switched)
+    return(True)
+
+def press_subsidary_button(sig_id:int):
+    signal = signals[str(sig_id)]
+    if not signal["hassubsidary"] or signal["sublocked"]: return(False)
+    toggle_subsidary(sig_id)
+    signal["externalcallback"](sig_id, sig_callback_type.sub_switched)
+    return(True)
+
+def press_signal_passed_button(sig_id:int):
+    refresh_signal(sig_id)
+    signals[str(sig_id)]["externalcallback"](sig_id, sig_callback_type.sig_passed)
+    return(True)
+
+def press_section_button(section_id:int):
+    section_occupied_states[section_id] = not section_occupied_states[section_id]
+    section_callbacks[section_id](section_id, section_callback_type.section_switched)
+    return(True)
+
+#----------------------------------------------------------------------
+# Externally called function to create the layout (just as 'my_layout'
+# does) on a headless canvas - the power switch buttons are created with
+# headless widgets. Returns the canvas
+#----------------------------------------------------------------------
+
+def create_layout(point_callback=null_callback, signal_callback=null_callback,
+                  section_callback=section_null, switch_callback=None, fpl_enabled:bool=True):
+    import power_switches
+    import schematic
+    import sections
+    power_switches.__dict__["Button"] = Widget
+    power_switches.__dict__["tkinter"] = types.SimpleNamespace(font=types.SimpleNamespace(Font=Widget))
+    canvas = Canvas()
+    schematic.create_track_schematic(canvas, point_callback, fpl_enabled=fpl_enabled)
+    schematic.create_layout_signals(canvas, signal_callback)
+    power_switches.create_section_switches(canvas, switch_callback or power_switches.switch_null)
+    sections.create_track_occupancy_switches(canvas, section_callback)
+    return(canvas)
+
+#----------------------------------------------------------------------
+# Externally called function to put everything back as it was before the
+# layout was created (for tests that create the layout more than once)
+#----------------------------------------------------------------------
+
+def reset():
+    global clock, last_event_id
+    for states in (point_exists, point_switched_states, point_fpl_states, point_has_fpl, point_locked, point_auto,
+                   section_exists, section_occupied_states, sensor_exists, sensor_active_states):
+        states[:] = [False] * max_item_id
+    point_also_switch[:] = [0] * max_item_id
+    for callbacks in (point_callbacks, section_callbacks, sensor_callbacks): callbacks[:] = [None] * max_item_id
+    signals.clear()
+    dcc_commands.clear()
+    dcc_signal_commands.clear()
+    scheduled_events.clear()
+    cancelled_events.clear()
+    clock, last_event_id = 0.0, 0
+    if "power_switches" in sys.modules: sys.modules["power_switches"].switches.clear()
+    return()
+
+###############################################################################
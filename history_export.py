@@ -0,0 +1,177 @@
+#----------------------------------------------------------------------
+# This Module exports the history of the layout (see 'session_history') in
+# a columnar format for analysis elsewhere (e.g. with pandas or polars on a
+# laptop after an exhibition weekend). The format is chosen by the name of
+# the export file:
+#   .parquet          - Apache Parquet (needs pyarrow)
+#   .arrow / .feather - Apache Arrow IPC file (needs pyarrow)
+#   .npz              - compressed numpy arrays (needs numpy)
+#
+# Each record becomes a row with the columns:
+#   time  - when the change happened (a timestamp - seconds for .npz)
+#   kind  - what changed (section, signal, aspect, safety_event etc)
+#   id    - the section, signal, point or switch ID
+#   name  - the name of the item (from the 'sections' and 'power_switches'
+#           modules - e.g. "down_platform" or "goods_yard")
+#   value - the new value (e.g. 1 = occupied, 0 = clear)
+# The kind and name columns are dictionary encoded - for .npz files they are
+# indexes into the "kinds" and "names" arrays.
+#
+# The history is read and written a chunk at a time so the memory needed
+# doesn't depend on the length of the history.
+#
+# To run: python3 history_export.py export_file [history_file]
+#----------------------------------------------------------------------
+
+import session_history
+
+import os
+import sys
+import zipfile
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# The number of records read (and written) at a time
+chunk_records = 65536
+
+# The format of each record in the history file (see 'session_history')
+record_type = None if np is None else np.dtype([("time","<f8"), ("kind","u1"), ("id","<u2"), ("value","<i2")])
+
+#----------------------------------------------------------------------
+# Internal function to read the history file a chunk at a time - yields
+# numpy structured arrays of (at most) the given number of records
+#----------------------------------------------------------------------
+
+def read_chunks(history_file:str, records_per_chunk:int):
+    with open(history_file, "rb") as file:
+        while True:
+            data = file.read(records_per_chunk * record_type.itemsize)
+            count = len(data) // record_type.itemsize
+            if count == 0: break
+            yield np.frombuffer(data, dtype=record_type, count=count)
+
+#----------------------------------------------------------------------
+# Internal function to create the name dictionary. Returns the list of names
+# (the first is "" for any item without a name) and a function to look up
+# the index of the name of each record in a chunk
+#----------------------------------------------------------------------
+
+def create_name_dictionary():
+    item_names = session_history.item_names()
+    names = [""] + sorted(set(item_names.values()))
+    keys = np.array(sorted(kind * 65536 + item_id for kind, item_id in item_names.keys()), dtype=np.int64)
+    indexes = np.array([names.index(item_names[(key // 65536, key % 65536)]) for key in keys.tolist()], dtype=np.int16)
+
+    def name_indexes(chunk):
+        chunk_keys = chunk["kind"].astype(np.int64) * 65536 + chunk["id"]
+        position = np.minimum(np.searchsorted(keys, chunk_keys), len(keys) - 1)
+        return(np.where(keys[position] == chunk_keys, indexes[position], 0).astype(np.int16))
+
+    return(names, name_indexes)
+
+#----------------------------------------------------------------------
+# Internal function to export to Parquet or Arrow (one row group or record
+# batch per chunk)
+#----------------------------------------------------------------------
+
+def export_arrow(export_file:str, history_file:str, records_per_chunk:int, parquet:bool):
+
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+
+    names, name_indexes = create_name_dictionary()
+    kinds = pyarrow.array(session_history.history_kinds, type=pyarrow.string())
+    names = pyarrow.array(names, type=pyarrow.string())
+    schema = pyarrow.schema([("time", pyarrow.timestamp("us", tz="UTC")),
+                             ("kind", pyarrow.dictionary(pyarrow.int8(), pyarrow.string())),
+                             ("id", pyarrow.uint16()),
+                             ("name", pyarrow.dictionary(pyarrow.int16(), pyarrow.string())),
+                             ("value", pyarrow.int16())])
+    if parquet: writer = pyarrow.parquet.ParquetWriter(export_file, schema, compression="zstd")
+    else: writer = pyarrow.ipc.new_file(export_file, schema)
+    records = 0
+    with writer:
+        for chunk in read_chunks(history_file, records_per_chunk):
+            columns = [pyarrow.array(np.round(chunk["time"] * 1e6).astype(np.int64), type=schema.field("time").type),
+                       pyarrow.DictionaryArray.from_arrays(chunk["kind"].astype(np.int8), kinds),
+                       pyarrow.array(chunk["id"]),
+                       pyarrow.DictionaryArray.from_arrays(name_indexes(chunk), names),
+                       pyarrow.array(chunk["value"])]
+            batch = pyarrow.record_batch(columns, schema=schema)
+            if parquet: writer.write_batch(batch, row_group_size=records_per_chunk)
+            else: writer.write_batch(batch)
+            records = records + len(chunk)
+    return(records)
+
+#----------------------------------------------------------------------
+# Internal function to export to a compressed numpy (.npz) file. Each column
+# is written as a separate .npy file in the archive - the length of the
+# columns is known from the size of the history file, so each column can be
+# written out a chunk at a time
+#----------------------------------------------------------------------
+
+def export_npz(export_file:str, history_file:str, records_per_chunk:int):
+
+    names, name_indexes = create_name_dictionary()
+    records = os.path.getsize(history_file) // record_type.itemsize
+    columns = {"time": np.dtype("<f8"), "kind": np.dtype("u1"), "id": np.dtype("<u2"),
+               "name": np.dtype("<i2"), "value": np.dtype("<i2")}
+    with zipfile.ZipFile(export_file, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for column, column_type in columns.items():
+            with archive.open(column+".npy", "w", force_zip64=True) as file:
+                header = {"descr": np.lib.format.dtype_to_descr(column_type),
+                          "fortran_order": False, "shape": (records,)}
+                np.lib.format.write_array_header_1_0(file, header)
+                written = 0
+                for chunk in read_chunks(history_file, records_per_chunk):
+                    chunk = chunk[:records - written]
+                    if column == "name": values = name_indexes(chunk)
+                    else: values = chunk[column].astype(column_type)
+                    file.write(values.tobytes())
+                    written = written + len(chunk)
+        with archive.open("kinds.npy", "w") as file: np.save(file, np.array(session_history.history_kinds))
+        with archive.open("names.npy", "w") as file: np.save(file, np.array(names))
+    return(records)
+
+#----------------------------------------------------------------------
+# Externally called function to export the history - returns the number of
+# records exported (or None if the export could not be done)
+#----------------------------------------------------------------------
+
+def export_history(export_file:str, history_file:str=None, records_per_chunk:int=chunk_records):
+
+    if np is None:
+        print ("ERROR: export_history - numpy is needed to export the history (pip install numpy)")
+        return(None)
+    if history_file is None: history_file = session_history.history_file
+    if not os.path.exists(history_file):
+        print ("ERROR: export_history - there is no history in "+history_file)
+        return(None)
+    extension = os.path.splitext(export_file)[1].lower()
+    if extension == ".npz":
+        return(export_npz(export_file, history_file, records_per_chunk))
+    if extension not in (".parquet", ".arrow", ".feather"):
+        print ("ERROR: export_history - unknown export format "+extension+" (use .parquet, .arrow or .npz)")
+        return(None)
+    try:
+        import pyarrow
+    except ImportError:
+        print ("ERROR: export_history - pyarrow is needed to export as "+extension+" (pip install pyarrow)")
+        return(None)
+    return(export_arrow(export_file, history_file, records_per_chunk, parquet=(extension == ".parquet")))
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print ("Usage: python3 history_export.py export_file [history_file]")
+    else:
+        records = export_history(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
+        if records is not None: print ("Exported "+str(records)+" records to "+sys.argv[1])
+    # The library leaves threads running so we can't just return
+    sys.stdout.flush()
+    os._exit(0)
+
+###############################################################################
@@ -0,0 +1,205 @@
+#----------------------------------------------------------------------
+# This Module reloads the layout rules and definitions while the layout is
+# running - so a change to a rule in 'interlocking' (or a colour in
+# 'schematic') can be tried out without restarting and setting everything
+# up again. The points, signals, sections and switches are left as they are.
+#
+# Each module is only reloaded if its source has changed - and then only the
+# functions and module level definitions that have changed are replaced in
+# the running module. Anything that depends on a changed definition is also
+# replaced (e.g. the route table is rebuilt if the routes have changed) but
+# everything else (e.g. the drawing objects in 'schematic') is kept as it is.
+# The definitions that have been removed from the source are removed from
+# the running module (so anything still using them fails rather than quietly
+# running the old code).
+#
+# The functions are changed in place (their code is replaced) so references
+# to them taken at startup - e.g. the callbacks given to the library, the
+# filters installed by other modules or "from power_switches import ..." in
+# the generated rules - run the new code. They run with the globals of the
+# running module. A function is only replaced by a new function object if
+# the running one can't be changed in place (e.g. another module has put its
+# own function in its place) - references to the old one then stay as they
+# were. References to other definitions (e.g. a dictionary or a class) taken
+# at startup always keep the old definition - so these should be looked up
+# in the module when they are used (as the layout modules do).
+#
+# The objects on the panel are only created at startup - so changes to the
+# functions that create them (e.g. 'create_track_schematic') are reported
+# but don't take effect until the next restart. The same goes for the rules
+# used by the control process (which runs the rules in its own process).
+#
+# If a module has an error then it is reported and nothing is replaced (the
+# running rules are left as they were).
+#----------------------------------------------------------------------
+
+import rule_evaluator
+
+import ast
+import importlib
+import importlib.util
+import sys
+import types
+
+# The modules that can be reloaded (in the order they are reloaded)
+reloadable_modules = ("route_conflicts", "rule_spec", "sections", "power_switches", "interlocking", "schematic")
+
+# Global variables for the reloads
+loaded_sources: dict = {}    # {module_name: the source the running module was loaded from}
+
+#----------------------------------------------------------------------
+# Internal function to read the source of a module
+#----------------------------------------------------------------------
+
+def read_source(module_name:str):
+    with open(importlib.util.find_spec(module_name).origin) as file: source = file.read()
+    return(source)
+
+#----------------------------------------------------------------------
+# Internal function to return the module level definitions (functions,
+# classes and assignments) in a source - {name: (definition, names used)}
+#----------------------------------------------------------------------
+
+def module_definitions(source:str):
+    definitions = {}
+    for node in ast.parse(source).body:
+        if isinstance(node, (ast.FunctionDef, ast.ClassDef)): names = [node.name]
+        elif isinstance(node, ast.Assign): names = [target.id for target in node.targets if isinstance(target, ast.Name)]
+        elif isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name): names = [node.target.id]
+        else: continue
+        used = {child.id for child in ast.walk(node) if isinstance(child, ast.Name)}
+        for name in names: definitions[name] = (ast.dump(node), used)
+    return(definitions)
+
+#----------------------------------------------------------------------
+# Internal function to find the definitions that have changed - including
+# the module level assignments that use anything that has changed
+#----------------------------------------------------------------------
+
+def changed_definitions(old_source:str, new_source:str):
+    old_definitions, new_definitions = module_definitions(old_source), module_definitions(new_source)
+    changed = {name for name, (definition, used) in new_definitions.items()
+               if old_definitions.get(name, (None,))[0] != definition}
+    functions = {name for name, (definition, used) in new_definitions.items() if definition.startswith(("FunctionDef", "ClassDef"))}
+    while True:
+        dependent = {name for name, (definition, used) in new_definitions.items()
+                     if name not in changed and name not in functions and used & changed}
+        if not dependent: break
+        changed.update(dependent)
+    return(sorted(changed))
+
+#----------------------------------------------------------------------
+# Internal function to return the names of the module level definitions
+# that have been removed from a source
+#----------------------------------------------------------------------
+
+def removed_definitions(old_source:str, new_source:str):
+    return(sorted(set(module_definitions(old_source)) - set(module_definitions(new_source))))
+
+#----------------------------------------------------------------------
+# Internal function to return a function with the globals of another module
+#----------------------------------------------------------------------
+
+def rebind_function(function:types.FunctionType, module_globals:dict):
+    new_function = types.FunctionType(function.__code__, module_globals, function.__name__,
+                                      function.__defaults__, function.__closure__)
+    new_function.__kwdefaults__ = function.__kwdefaults__
+    new_function.__annotations__ = function.__annotations__
+    new_function.__doc__ = function.__doc__
+    return(new_function)
+
+#----------------------------------------------------------------------
+# Internal function to replace a function in the running module - the code
+# of the running function is replaced if it is the module's own function
+# (and has the same free variables) or it is replaced by a new function
+#----------------------------------------------------------------------
+
+def replace_function(module:types.ModuleType, name:str, function:types.FunctionType):
+    running_function = module.__dict__.get(name)
+    if (isinstance(running_function, types.FunctionType) and running_function.__module__ == module.__name__ and
+            running_function.__code__.co_freevars == function.__code__.co_freevars):
+        running_function.__code__ = function.__code__
+        running_function.__defaults__ = function.__defaults__
+        running_function.__kwdefaults__ = function.__kwdefaults__
+        running_function.__annotations__ = function.__annotations__
+        running_function.__doc__ = function.__doc__
+    else:
+        module.__dict__[name] = rebind_function(function, module.__dict__)
+    return()
+
+#----------------------------------------------------------------------
+# Internal function to reload a module (if its source has changed) -
+# returns the names of the definitions that have been replaced (and the
+# removed definitions - as "-name")
+#----------------------------------------------------------------------
+
+def reload_module(module_name:str):
+    module = sys.modules.get(module_name)
+    if module is None: return([])
+    try:
+        source = read_source(module_name)
+        if source == loaded_sources.setdefault(module_name, source): return([])
+        changed = changed_definitions(loaded_sources[module_name], source)
+        removed = removed_definitions(loaded_sources[module_name], source)
+        # Load a fresh copy of the module to take the new definitions from
+        spec = importlib.util.spec_from_file_location(module_name, module.__file__)
+        new_module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(new_module)
+    except Exception as error:
+        print ("ERROR: reload_module - "+module_name+" not reloaded - "+type(error).__name__+": "+str(error))
+        return([])
+    for name in changed:
+        value = new_module.__dict__[name]
+        if isinstance(value, types.FunctionType): replace_function(module, name, value)
+        else: module.__dict__[name] = value
+    for name in removed:
+        module.__dict__.pop(name, None)
+    loaded_sources[module_name] = source
+    return(changed + ["-"+name for name in removed])
+
+#----------------------------------------------------------------------
+# Externally called function to reload any of the modules that have changed
+# (and the generated rules if they are used and the rules have changed).
+# Returns the changes - {module_name: [names replaced], ...} where the names
+# of the definitions that have been removed start with "-"
+#----------------------------------------------------------------------
+
+def reload_changed_modules(generated_rules:bool=False):
+    changes = {}
+    for module_name in reloadable_modules:
+        changed = reload_module(module_name)
+        if changed: changes[module_name] = changed
+    if generated_rules and ("rule_spec" in changes or "route_conflicts" in changes):
+        import rule_compiler
+        module_file = rule_compiler.generate_rules()
+        generated_module = sys.modules.get(rule_compiler.generated_module_name)
+        if module_file is not None and generated_module is not None:
+            source = read_source(rule_compiler.generated_module_name)
+            if source != loaded_sources.setdefault(rule_compiler.generated_module_name, source):
+                importlib.reload(generated_module)
+                loaded_sources[rule_compiler.generated_module_name] = source
+                changes[rule_compiler.generated_module_name] = sorted(rule_compiler.rule_spec.rule_functions.keys())
+    # Any evaluators (e.g. for background evaluation) need to load the new rules
+    if changes: rule_evaluator.rules_version = rule_evaluator.rules_version + 1
+    for module_name, names in changes.items():
+        print ("Reloaded "+module_name+": "+", ".join(names))
+        restart_needed = [name for name in names if name.startswith("create_")]
+        if restart_needed: print ("  Changes to "+", ".join(restart_needed)+" will take effect on the next restart")
+    if not changes: print ("Reload - nothing has changed")
+    return(changes)
+
+#----------------------------------------------------------------------
+# Externally called function to note the source of each module as it is
+# now - to be called once all the modules have been loaded at startup
+#----------------------------------------------------------------------
+
+def start_hot_reload(generated_rules:bool=False):
+    module_names = list(reloadable_modules)
+    if generated_rules:
+        import rule_compiler
+        module_names.append(rule_compiler.generated_module_name)
+    for module_name in module_names:
+        if module_name in sys.modules: loaded_sources[module_name] = read_source(module_name)
+    return()
+
+###############################################################################
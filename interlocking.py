@@ -4,9 +4,13 @@
 # if the points ahead are not switched correctly (with FPLs activated)
 # for the route controlled by the signal. Similarly points are locked
 # along the route controlled by the signal when the signal is "OFF"
+#
+# Signals are also locked against conflicting movements - the routes and
+# the conflicts between them are defined in 'route_conflicts'
 #----------------------------------------------------------------------
 
 from model_railway_signals import *
+import route_conflicts
 
 #----------------------------------------------------------------------
 # External function to set the initial locking conditions at startup
@@ -26,6 +30,17 @@ def interlock_main_and_subsidary (sig_id):
     if signal_clear(sig_id): lock_subsidary(sig_id)
     else: unlock_subsidary(sig_id)
 
+#----------------------------------------------------------------------
+# Internal functions to find the routes currently cleared and to check if
+# a route is blocked by a conflicting route (see 'route_conflicts')
+#----------------------------------------------------------------------
+
+def find_cleared_routes():
+    return(route_conflicts.find_cleared_routes(point_switched, signal_clear, subsidary_clear))
+
+def route_blocked(route:str, cleared_routes:int):
+    return(route_conflicts.route_blocked(route, cleared_routes))
+
 #----------------------------------------------------------------------
 # Refresh the interlocking (to be called following any changes)
 # Station area is effectively split into East and West
@@ -34,23 +49,17 @@ def interlock_main_and_subsidary (sig_id):
 
 def process_interlocking_west():
 
+    cleared_routes = find_cleared_routes()
+
     # ----------------------------------------------------------------------
     # Signal 1 (West box)
     # Main Signal - Branch Line towards Signal 2
     # ----------------------------------------------------------------------
 
     # Interlock with signals controlling conflicting outbound movements
-    if not point_switched(2) and not point_switched(4):
-        # Route into Platform 3 - Interlock with Signal 6
-        if signal_clear(6) or subsidary_clear(6): lock_signal(1)
-        else: unlock_signal(1)
-    elif not point_switched(2) and point_switched(4) and not point_switched(5):
-        # Route into Goods Loop - Interlock with Signal 5
-        if signal_clear(5) or subsidary_clear(6): lock_signal(1)
-        else: unlock_signal(1)
-    else:
-        # no conflicting movements set up
-        unlock_signal(1)
+    # (from Platform 3 or the Goods Loop onto the branch)
+    if route_blocked("1", cleared_routes): lock_signal(1)
+    else: unlock_signal(1)
     
     # ----------------------------------------------------------------------
     # Signal 2 (West box)
@@ -63,16 +72,9 @@ def process_interlocking_west():
         lock_subsidary(2)
     elif not point_switched(4):
         # Route set into platform 3
-        if not point_switched(6) and not point_switched(8) and (signal_clear(10) or subsidary_clear(10)):
-            # conflicting movement already cleared into platform 3 from branch
-            lock_signal(2)
-            lock_subsidary(2)
-        elif not point_switched(6) and point_switched(8) and point_switched(9) and signal_clear(11):
-            # conflicting movement already cleared into platform 3 from down main
-            lock_signal(2)
-            lock_subsidary(2)
-        elif signal_clear(6) or subsidary_clear(6):
-            # conflicting departure movement already cleared from platform 3
+        if route_blocked("2_platform3", cleared_routes):
+            # conflicting movement already cleared into platform 3 (from the branch
+            # or the down main) or conflicting departure already cleared from platform 3
             lock_signal(2)
             lock_subsidary(2)
         else:
@@ -80,20 +82,9 @@ def process_interlocking_west():
             interlock_main_and_subsidary(2)
     elif not point_switched(5):
         # Route set into Goods Loop
-        if not point_switched(6) and signal_clear(16):
-            # conflicting move already cleared into goods loop from yard
-            lock_signal(2)
-            lock_subsidary(2)
-        elif point_switched(6) and not point_switched(8) and (signal_clear(10) or subsidary_clear(10)):
-            # conflicting movement already cleared into goods loop from branch
-            lock_signal(2)
-            lock_subsidary(2)
-        elif point_switched(6) and point_switched(8) and point_switched(9) and signal_clear(11):
-            # conflicting movement already cleared into goods loop from down main
-            lock_signal(2)
-            lock_subsidary(2)
-        elif signal_clear(5) or subsidary_clear(5):
-            # conflicting departure already cleared from goods loop onto branch
+        if route_blocked("2_goods_loop", cleared_routes):
+            # conflicting movement already cleared into goods loop (from the yard,
+            # branch or down main) or conflicting departure already cleared onto branch
             lock_signal(2)
             lock_subsidary(2)
         else:
@@ -117,24 +108,15 @@ def process_interlocking_west():
         unlock_signal(3)
     elif not point_switched(4):
         # Route set into platform 3
-        if not point_switched(6) and not point_switched(8) and (signal_clear(10) or subsidary_clear(10)):
-            # conflicting movement already cleared into platform 3 from branch
-            lock_signal(3)
-        elif not point_switched(6) and point_switched(8) and point_switched(9) and signal_clear(11):
-            # conflicting movement already cleared into platform 3 from down main
+        if route_blocked("3_platform3", cleared_routes):
+            # conflicting movement already cleared into platform 3 from branch or down main
             lock_signal(3)
         else:
             unlock_signal(3)
     elif not point_switched(5) and fpl_active:
         # Route set into Goods Loop
-        if not point_switched(6) and signal_clear(16):
-            # conflicting move already cleared into goods loop from yard
-            lock_signal(3)
-        elif point_switched(6) and not point_switched(8) and (signal_clear(10) or subsidary_clear(10)):
-            # conflicting movement already cleared into goods loop from branch
-            lock_signal(3)
-        elif point_switched(6) and point_switched(8) and point_switched(9) and signal_clear(11):
-            # conflicting movement already cleared into goods loop from down main
+        if route_blocked("3_goods_loop", cleared_routes):
+            # conflicting movement already cleared into goods loop from yard, branch or down main
             lock_signal(3)
         else:
             unlock_signal(3)
@@ -149,18 +131,18 @@ def process_interlocking_west():
     # ----------------------------------------------------------------------
 
     if point_switched(5):
-        # Shunting move into Goods yard only
+        # Shunting move into Goods yard only - interlock with signal 14
         lock_signal(5)
-        if signal_clear(14): lock_subsidary(5)
+        if route_blocked("5_goods_yard", cleared_routes): lock_subsidary(5)
         else: unlock_subsidary(5)
     elif not fpl_active(4):
         # No Route - Point 4 not locked
         lock_signal(5)
         lock_subsidary(5)
     elif not point_switched(4) and fpl_active(4):
-        # Shunting move into MPD only
+        # Shunting move into MPD only - interlock with signal 15
         lock_signal(5)
-        if signal_clear(15): lock_subsidary(5)
+        if route_blocked("5_mpd", cleared_routes): lock_subsidary(5)
         else: unlock_subsidary(5)
     elif not fpl_active(2):
         # No Route - Point 2 not locked
@@ -168,7 +150,7 @@ def process_interlocking_west():
         lock_subsidary(5)
     elif not point_switched(2):
         # Route is set to Branch - Interlock with Signals 1 and 2
-        if signal_clear(1) or signal_clear(2) or subsidary_clear(2):
+        if route_blocked("5_branch", cleared_routes):
             lock_signal(5)
             lock_subsidary(5)
         else:
@@ -195,7 +177,7 @@ def process_interlocking_west():
         lock_subsidary(6)
     elif not point_switched(2):
         # Route is set to Branch - Interlock with Signals 1 and 2
-        if signal_clear(1) or signal_clear(2) or subsidary_clear(2):
+        if route_blocked("6_branch", cleared_routes):
             lock_signal(6)
             lock_subsidary(6)
         else:
@@ -240,18 +222,10 @@ def process_interlocking_west():
     if not point_switched(5):
         # No route
         lock_signal(14)
-    elif not point_switched(6) and signal_clear(16):
-        # conflicting route set up into goods loop from other end of yard
-        lock_signal(14)
-    elif point_switched(6) and not point_switched(8) and (signal_clear(10) or subsidary_clear(10)):
-        # conflicting route set up into goods loop from branch
-        lock_signal(14)
-    elif point_switched(6) and  point_switched(8) and point_switched(9) and signal_clear(11):
-        # conflicting route set up into goods loop from down main
-        lock_signal(14)
     else:
-        # Route set to goods loop - Interlock with signal 5
-        if signal_clear(5) or subsidary_clear(5):lock_signal(14)
+        # Route set to goods loop - Interlock with conflicting routes set up into the
+        # goods loop (from the other end of the yard, branch or down main) and with signal 5
+        if route_blocked("14_goods_loop", cleared_routes): lock_signal(14)
         else: unlock_signal(14)
 
     # ----------------------------------------------------------------------
@@ -262,18 +236,10 @@ def process_interlocking_west():
     if point_switched(5) or point_switched(4) or not fpl_active(4):
         # No route
         lock_signal(15)
-    elif not point_switched(6) and signal_clear(16):
-        # conflicting route set up into goods loop from other end of yard
-        lock_signal(15)
-    elif point_switched(6) and not point_switched(8) and (signal_clear(10) or subsidary_clear(10)):
-        # conflicting route set up into goods loop from branch
-        lock_signal(15)
-    elif point_switched(6) and  point_switched(8) and point_switched(9) and signal_clear(11):
-        # conflicting route set up into goods loop from down main
-        lock_signal(15)
     else:
-        # Route set to goods loop - Interlock with signal 5
-        if signal_clear(5) or subsidary_clear(5): lock_signal(15)
+        # Route set to goods loop - Interlock with conflicting routes set up into the
+        # goods loop (from the other end of the yard, branch or down main) and with signal 5
+        if route_blocked("15_goods_loop", cleared_routes): lock_signal(15)
         else: unlock_signal(15)
 
     # ----------------------------------------------------------------------
@@ -368,6 +334,8 @@ def process_interlocking_west():
 
 def process_interlocking_east():
 
+    cleared_routes = find_cleared_routes()
+
     # ----------------------------------------------------------------------
     # Signal 4 (East box)
     # Main Signal - Route onto Up Maiin
@@ -393,7 +361,7 @@ def process_interlocking_east():
         # Route selected for goods yard - shunting only
         lock_signal(7)
         # interlock with signal 16 controlling output from the yard
-        if signal_clear(16): lock_subsidary(7)
+        if route_blocked("7_goods_yard", cleared_routes): lock_subsidary(7)
         else: unlock_subsidary(7)
     elif not fpl_active(8):
         # No Route - Point 8 not locked
@@ -402,7 +370,7 @@ def process_interlocking_east():
     elif not point_switched(8):
         # Route selected for Branch line
         # Interlock with signals controling movements from branch line
-        if signal_clear(9) or signal_clear(10) or subsidary_clear(10):
+        if route_blocked("7_branch", cleared_routes):
             lock_signal(7)
             lock_subsidary(7)
         else:
@@ -429,7 +397,7 @@ def process_interlocking_east():
         lock_subsidary(8)
     elif not point_switched(8):
         # Route is set to Branch - Interlock with Signals 9 and 10
-        if signal_clear(9) or signal_clear(10) or subsidary_clear(10):
+        if route_blocked("8_branch", cleared_routes):
             lock_signal(8)
             lock_subsidary(8)
         else:
@@ -450,17 +418,9 @@ def process_interlocking_east():
     # ----------------------------------------------------------------------
 
     # Interlock with signals controlling conflicting outbound movements
-    if not point_switched(8) and not point_switched(6):
-        # Route into Platform 3 - Interlock with Signal 8
-        if signal_clear(8) or subsidary_clear(8): lock_signal(9)
-        else: unlock_signal(9)
-    elif not point_switched(8) and point_switched(6):
-        # Route into Goods Loop - Interlock with Signal 7
-        if signal_clear(7) or subsidary_clear(7): lock_signal(9)
-        else: unlock_signal(9)
-    else:
-        # no conflicting movements set up
-        unlock_signal(9)
+    # (from Platform 3 or the Goods Loop onto the branch)
+    if route_blocked("9", cleared_routes): lock_signal(9)
+    else: unlock_signal(9)
 
     # ----------------------------------------------------------------------
     # Signal 10 (East box)
@@ -473,16 +433,9 @@ def process_interlocking_east():
         lock_subsidary(10)
     elif not point_switched(6):
         # Route set into platform 3
-        if not point_switched(4) and not point_switched(2) and (signal_clear(2) or subsidary_clear(2)):
-            # conflicting movement already cleared into platform 3 from branch
-            lock_signal(10)
-            lock_subsidary(10)
-        elif not point_switched(4) and point_switched(2) and not point_switched(1) and signal_clear(3):
-            # conflicting movement already cleared into platform 3 from up main
-            lock_signal(10)
-            lock_subsidary(10)
-        elif signal_clear(8) or subsidary_clear(8):
-            # conflicting departure movement already cleared from platform 3
+        if route_blocked("10_platform3", cleared_routes):
+            # conflicting movement already cleared into platform 3 (from the branch
+            # or the up main) or conflicting departure already cleared from platform 3
             lock_signal(10)
             lock_subsidary(10)
         else:
@@ -490,24 +443,9 @@ def process_interlocking_east():
             interlock_main_and_subsidary(10)        
     else:
         # Route set into Goods Loop
-        if point_switched(5) and signal_clear(14):
-            # conflicting move already cleared into goods loop from yard
-            lock_signal(10)
-            lock_subsidary(10)
-        elif not point_switched(4) and signal_clear(15):
-            # conflicting move already cleared into goods loop from MPD
-            lock_signal(10)
-            lock_subsidary(10)
-        elif point_switched(4) and not point_switched(2) and (signal_clear(2) or subsidary_clear(2)):
-            # conflicting movement already cleared into goods loop from branch
-            lock_signal(10)
-            lock_subsidary(10)
-        elif point_switched(4) and point_switched(2) and not point_switched(1) and signal_clear(3):
-            # conflicting movement already cleared into goods loop from up main
-            lock_signal(10)
-            lock_subsidary(10)
-        elif signal_clear(5) or subsidary_clear(5):
-            # conflicting departure already cleared from goods loop onto branch
+        if route_blocked("10_goods_loop", cleared_routes):
+            # conflicting movement already cleared into goods loop (from the yard, MPD,
+            # branch or up main) or conflicting departure already cleared from goods loop
             lock_signal(10)
             lock_subsidary(10)
         else:
@@ -534,28 +472,16 @@ def process_interlocking_east():
         lock_signal(11)
     elif not point_switched(6):
         # Route set into platform 3
-        if not point_switched(4) and not point_switched(2) and (signal_clear(2) or subsidary_clear(2)):
-            # conflicting movement already cleared into platform 3 from branch
-            lock_signal(11)
-        elif not point_switched(4) and point_switched(2) and not point_switched(1) and signal_clear(3):
-            # conflicting movement already cleared into platform 3 from up main
+        if route_blocked("11_platform3", cleared_routes):
+            # conflicting movement already cleared into platform 3 from branch or up main
             lock_signal(11)
         else:
             # no conflicting movements
             unlock_signal(11)
     else:
         # Route set into Goods Loop
-        if point_switched(5) and signal_clear(14):
-            # conflicting move already cleared into goods loop from yard
-            lock_signal(11)
-        elif not point_switched(4) and signal_clear(15):
-            # conflicting move already cleared into goods loop from MPD
-            lock_signal(11)
-        elif point_switched(4) and not point_switched(2) and (signal_clear(2) or subsidary_clear(2)):
-            # conflicting movement already cleared into goods loop from branch
-            lock_signal(11)
-        elif point_switched(4) and point_switched(2) and not point_switched(1) and signal_clear(3):
-            # conflicting movement already cleared into goods loop from up main
+        if route_blocked("11_goods_loop", cleared_routes):
+            # conflicting movement already cleared into goods loop from yard, MPD, branch or up main
             lock_signal(11)
         else:
             # no conflicting movements
@@ -568,21 +494,10 @@ def process_interlocking_east():
     if point_switched(10) or point_switched(6) or not fpl_active(6):
         # Route not fully set/locked
         lock_signal(16)
-    elif point_switched(5) and signal_clear(14):
-        # conflicting movement sset up into goods loop from other end of yard
-        lock_signal(16)
-    elif not point_switched(5) and not point_switched(4) and signal_clear(15):
-        # conflicting route set up into goods loop from MPD
-        lock_signal(16)
-    elif not point_switched(5) and point_switched(4) and not point_switched(2) and (signal_clear(2) or subsidary_clear(2)):
-        # conflicting route set up into goods loop from branch
-        lock_signal(16)
-    elif not point_switched(5) and point_switched(4) and  point_switched(2) and not point_switched(1) and signal_clear(3):
-        # conflicting route set up into goods loop from up main
-        lock_signal(16)
     else:
-        # Route set from goods loop - Interlock with signal 7
-        if signal_clear(7) or subsidary_clear(7):lock_signal(16)
+        # Route set into goods loop - Interlock with conflicting routes set up into the
+        # goods loop (from the other end of the yard, MPD, branch or up main) and with signal 7
+        if route_blocked("16_goods_loop", cleared_routes): lock_signal(16)
         else: unlock_signal(16)
         
     # ----------------------------------------------------------------------
@@ -646,8 +561,8 @@ def process_interlocking_east():
     if signal_clear(11) or signal_clear(4):
         # arrival from down main or departure from platform 2 Set/Cleared
         lock_point(9)
-    elif point_switched(9) and point_switched(8) and (signal_clear(7) or signal_clear(8)) :
-        # departute from goods loop or platform 3 onto Down main set/cleared (no shunting onto down main)
+    elif point_switched(8) and (signal_clear(7) or signal_clear(8)) :
+        # departure from goods loop or platform 3 onto Up main set/cleared (no shunting onto up main)
         lock_point(9)
     else:
         unlock_point(9)
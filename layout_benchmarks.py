@@ -0,0 +1,262 @@
+#----------------------------------------------------------------------
+# This Module benchmarks the layout code against synthetic layouts of
+# increasing size (see 'layout_generator') so we can see which parts will
+# hit their limits first as the layouts get bigger. For each layout we
+# measure (in a separate python process - so each starts from scratch):
+#   - the startup time and memory used to load the rules and create an
+#     evaluator (see 'rule_evaluator')
+#   - the time to create the panel (schematic, signals, sections and power
+#     switches), the number of canvas items and the time to update the
+#     schematic - only if there is a display (otherwise these are None)
+#   - the time taken for each part of the rules following a change (track
+#     occupancy overrides, signal aspects, power switching and interlocking)
+#     and for a "signal passed" event
+#
+# The results are saved (as JSON) in the 'benchmark_results' directory so
+# they can be compared with the results of earlier runs.
+#
+# To run: python3 layout_benchmarks.py [series]  (series = stations, loops,
+# yards, block_sections or all)
+#----------------------------------------------------------------------
+
+import layout_generator
+import rule_evaluator
+
+import datetime
+import glob
+import importlib
+import json
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# The directory the results are saved in
+results_directory = "benchmark_results"
+
+# The number of changes (and signal passed events) we time for each layout
+events_to_time = 200
+
+# The layouts to benchmark - each series increases one of the parameters
+# (see 'layout_generator.create_layout') from the baseline layout
+baseline_layout = {"stations":2, "loops":3, "yards":1, "sidings":6, "block_sections":2}
+benchmark_series = {"stations"       : [1, 2, 4, 8, 16, 32, 64],
+                    "loops"          : [2, 4, 8, 16, 32],
+                    "yards"          : [1, 4, 16, 64],
+                    "block_sections" : [1, 4, 16, 64, 256]}
+
+#----------------------------------------------------------------------
+# Externally called function to return the mean, 95th percentile and maximum
+# of a list of times (in seconds) in milliseconds - also used for the
+# latencies of 'train_simulator'
+#----------------------------------------------------------------------
+
+def summarise_times(times:list, decimal_places:int=4):
+    if not times: return({"mean":0.0, "p95":0.0, "max":0.0})
+    times = sorted(times)
+    return({"mean": round(1000.0 * sum(times) / len(times), decimal_places),
+            "p95": round(1000.0 * times[int(0.95 * (len(times)-1))], decimal_places),
+            "max": round(1000.0 * times[-1], decimal_places)})
+
+#----------------------------------------------------------------------
+# Internal function to time the creation and update of the panel. This
+# needs a display - if there isn't one we just return None
+#----------------------------------------------------------------------
+
+def measure_panel():
+    import tkinter
+    try:
+        window = tkinter.Tk()
+    except tkinter.TclError:
+        return(None)
+    canvas = tkinter.Canvas(window, height=1000, width=1900)
+    canvas.pack()
+    null_callback = lambda *args: None
+    schematic = importlib.import_module(layout_generator.module_names["schematic"])
+    sections = importlib.import_module(layout_generator.module_names["sections"])
+    power_switches = importlib.import_module(layout_generator.module_names["power_switches"])
+    start_time = time.perf_counter()
+    schematic.create_track_schematic(canvas, null_callback)
+    schematic.create_layout_signals(canvas, null_callback)
+    power_switches.create_section_switches(canvas, null_callback)
+    sections.create_track_occupancy_switches(canvas, null_callback)
+    window.update()
+    create_time = time.perf_counter() - start_time
+    update_times = []
+    for update in range(20):
+        start_time = time.perf_counter()
+        schematic.update_track_schematic(canvas)
+        window.update()
+        update_times.append(time.perf_counter() - start_time)
+    results = {"create_time": round(create_time, 4),
+               "canvas_items": len(canvas.find_all()),
+               "update_ms": summarise_times(update_times)}
+    window.destroy()
+    return(results)
+
+#----------------------------------------------------------------------
+# Internal function to measure a generated layout (in the layout directory)
+# This is run in its own process - the results are printed as JSON
+#----------------------------------------------------------------------
+
+def measure_layout(directory:str):
+
+    with open(os.path.join(directory, "layout.json")) as file:
+        counts = json.load(file)["counts"]
+    sys.path.insert(0, directory)
+    generator = random.Random(1)
+
+    # The library is the same for every layout so it is loaded (and timed) first
+    start_time = time.perf_counter()
+    importlib.import_module("model_railway_signals")
+    library_time = time.perf_counter() - start_time
+
+    # Startup - loading the rules and creating an evaluator
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    for module_name in layout_generator.module_names.values():
+        importlib.import_module(module_name)
+    evaluator = rule_evaluator.create_evaluator(layout_generator.module_names)
+    startup_time = time.perf_counter() - start_time
+    startup_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    state = {"points": {str(item_id):[False, True] for item_id in range(1, counts["points"]+1)},
+             "signals": {str(item_id):[False, False] for item_id in range(1, counts["signals"]+1)},
+             "sections": {str(item_id):False for item_id in range(1, counts["sections"]+1)},
+             "switches": {str(item_id):[False, False] for item_id in range(1, counts["switches"]+1)}}
+    rule_evaluator.evaluate(evaluator, state)
+
+    # The time for each part of the rules following a random change
+    stages = {"overrides": evaluator["sections"].override_signals_based_on_track_occupancy,
+              "aspects": evaluator["sections"].refresh_signal_aspects,
+              "power": evaluator["power_switches"].update_track_power_section_switches,
+              "interlocking_east": evaluator["interlocking"].process_interlocking_east,
+              "interlocking_west": evaluator["interlocking"].process_interlocking_west}
+    stage_times = {stage:[] for stage in stages.keys()}
+    evaluate_times, passed_times = [], []
+    for event in range(events_to_time):
+        group = generator.choice(("points", "signals", "sections"))
+        item_id = str(generator.randint(1, counts[group]))
+        if group == "sections": state[group][item_id] = not state[group][item_id]
+        else: state[group][item_id][0] = not state[group][item_id][0]
+        start_time = time.perf_counter()
+        rule_evaluator.evaluate(evaluator, state)
+        evaluate_times.append(time.perf_counter() - start_time)
+        for stage, function in stages.items():
+            start_time = time.perf_counter()
+            function()
+            stage_times[stage].append(time.perf_counter() - start_time)
+        start_time = time.perf_counter()
+        rule_evaluator.evaluate_signal_passed(evaluator, state, generator.randint(1, counts["signals"]))
+        passed_times.append(time.perf_counter() - start_time)
+
+    results = {"counts": counts,
+               "library_time": round(library_time, 4),
+               "startup_time": round(startup_time, 4),
+               "startup_memory_kb": round(startup_memory / 1024, 1),
+               "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               "change_ms": summarise_times(evaluate_times),
+               "stage_ms": {stage:summarise_times(times) for stage, times in stage_times.items()},
+               "signal_passed_ms": summarise_times(passed_times),
+               "panel": measure_panel()}
+    print (json.dumps(results))
+    return()
+
+#----------------------------------------------------------------------
+# Externally called function to generate and measure a layout - returns
+# the results (or None if the measurement failed)
+#----------------------------------------------------------------------
+
+def benchmark_layout(parameters:dict):
+    directory = tempfile.mkdtemp(prefix="synthetic_layout_")
+    try:
+        layout = layout_generator.write_layout(directory, **parameters)
+        with open(os.path.join(directory, "layout.json"), "w") as file:
+            json.dump({"parameters":parameters, "counts":layout["counts"]}, file)
+        # The generated modules use our own modules (e.g. 'power_switches')
+        environment = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+        process = subprocess.run([sys.executable, os.path.abspath(__file__), "--measure", directory],
+                                 capture_output=True, text=True, env=environment)
+        if process.returncode != 0:
+            print ("ERROR: benchmark_layout - "+str(parameters)+" failed - "+process.stderr.strip())
+            results = None
+        else:
+            results = json.loads(process.stdout.strip().splitlines()[-1])
+            results["parameters"] = parameters
+    finally:
+        shutil.rmtree(directory)
+    return(results)
+
+#----------------------------------------------------------------------
+# Externally called function to run the benchmarks for the given series
+# (see 'benchmark_series'). The results are saved to a new results file
+# (the name of which is returned)
+#----------------------------------------------------------------------
+
+def run_benchmarks(series_names:list=None):
+    if series_names is None: series_names = list(benchmark_series.keys())
+    results = {"date": datetime.datetime.now().isoformat(timespec="seconds"),
+               "python": sys.version.split()[0], "platform": sys.platform, "series": {}}
+    for series_name in series_names:
+        results["series"][series_name] = []
+        for value in benchmark_series[series_name]:
+            parameters = dict(baseline_layout)
+            parameters[series_name] = value
+            layout_results = benchmark_layout(parameters)
+            if layout_results is not None:
+                results["series"][series_name].append(layout_results)
+                print (series_name+"="+str(value)+"  items: "+str(layout_results["counts"])+
+                       "  startup: "+str(layout_results["startup_time"])+" s"+
+                       "  change: "+str(layout_results["change_ms"]["mean"])+" ms"+
+                       "  passed: "+str(layout_results["signal_passed_ms"]["mean"])+" ms")
+    os.makedirs(results_directory, exist_ok=True)
+    results_file = os.path.join(results_directory, "layout_benchmarks_"+
+                                results["date"].replace(":","").replace("-","")+".json")
+    with open(results_file, "w") as file:
+        json.dump(results, file, indent=1)
+    return(results_file)
+
+#----------------------------------------------------------------------
+# Externally called function to compare two results files - prints the
+# change in the mean times for each layout that is in both files
+#----------------------------------------------------------------------
+
+def compare_results(old_results_file:str, new_results_file:str):
+    with open(old_results_file) as file: old_results = json.load(file)
+    with open(new_results_file) as file: new_results = json.load(file)
+    print ("Comparing "+new_results_file+" with "+old_results_file)
+    for series_name, layouts in new_results["series"].items():
+        old_layouts = {json.dumps(layout["parameters"], sort_keys=True): layout
+                       for layout in old_results["series"].get(series_name, [])}
+        for layout in layouts:
+            old_layout = old_layouts.get(json.dumps(layout["parameters"], sort_keys=True))
+            if old_layout is None: continue
+            changes = []
+            for name, old_value, new_value in (
+                    ("startup", old_layout["startup_time"], layout["startup_time"]),
+                    ("change", old_layout["change_ms"]["mean"], layout["change_ms"]["mean"]),
+                    ("passed", old_layout["signal_passed_ms"]["mean"], layout["signal_passed_ms"]["mean"])):
+                if old_value > 0: changes.append(name+" "+format(100.0 * (new_value - old_value) / old_value, "+.0f")+"%")
+            print ("  "+series_name+"="+str(layout["parameters"][series_name])+"  "+"  ".join(changes))
+    return()
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--measure":
+        measure_layout(sys.argv[2])
+    else:
+        previous_results = sorted(glob.glob(os.path.join(results_directory, "layout_benchmarks_*.json")))
+        series_names = None if len(sys.argv) < 2 or sys.argv[1] == "all" else [sys.argv[1]]
+        results_file = run_benchmarks(series_names)
+        print ("Results saved to "+results_file)
+        if previous_results: compare_results(previous_results[-1], results_file)
+    # The library leaves threads running so we can't just return
+    sys.stdout.flush()
+    os._exit(0)
+
+###############################################################################
@@ -0,0 +1,299 @@
+#----------------------------------------------------------------------
+# This Module "fuzzes" the layout rules ('interlocking', 'sections' and
+# 'power_switches') - it presses the panel buttons at random (point and FPL
+# buttons, signal and subsidary buttons, signal passed buttons and the power
+# section switches - with waits for the timed signals in between) and after
+# every press checks that the layout is still safe:
+#   - no two conflicting routes are cleared at once (see 'route_conflicts')
+#   - no signal is cleared without the points set for one of its routes
+#   - every point on a cleared route is locked (with its FPL active)
+#   - every power section on a cleared route is switched on (unless the
+#     power sections are being switched manually)
+#
+# The layout is run on the headless library (see 'headless_signals') with
+# the same callbacks as 'my_layout' (but without redrawing the schematic or
+# saving the layout state) so each sequence of presses is repeatable. A
+# sequence that breaks one of the rules above is "shrunk" - presses are
+# taken out for as long as it still breaks the same rule - so what is
+# reported is a short sequence that shows the problem.
+#
+# This should be run after any change to the rules (it runs through about
+# half a million presses a minute on each process)
+#
+# To run: python3 layout_fuzzer.py [number_of_steps] [seed] [processes]
+#----------------------------------------------------------------------
+
+import headless_signals
+headless_signals.install()
+
+from model_railway_signals import *
+import interlocking
+import power_switches
+import route_conflicts
+import sections
+
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+# The number of presses in each random sequence (the layout is reset between sequences)
+sequence_length = 200
+
+# The power sections each route runs over - [route, {point_id: switched}, [switch_id, ...]]
+# (the points are any the power section also depends on - as well as those of the route)
+route_power_sections = [
+    ["1", {}, [6]],
+    ["2_platform3", {}, [6, 2]],
+    ["2_goods_loop", {}, [6, 1]],
+    ["3_up_main", {}, [3]],
+    ["3_platform3", {}, [2]],
+    ["3_goods_loop", {}, [1]],
+    ["5_goods_yard", {}, [1]],
+    ["5_mpd", {}, [1]],
+    ["5_branch", {}, [1, 6]],
+    ["5_down_main", {}, [1]],
+    ["6_branch", {}, [2, 6]],
+    ["6_down_main", {}, [2]],
+    ["12_down_main", {}, [4]],
+    ["13_down_main", {}, [5]],
+    ["14_goods_loop", {}, [1]],
+    ["15_goods_loop", {}, [1]],
+    ["4_up_main", {}, [3]],
+    ["7_goods_yard", {}, [1]],
+    ["7_branch", {}, [1, 7]],
+    ["7_up_main", {}, [1]],
+    ["8_branch", {}, [2, 7]],
+    ["8_up_main", {}, [2]],
+    ["9", {}, [7]],
+    ["10_platform3", {}, [7, 2]],
+    ["10_goods_loop", {}, [7, 1]],
+    ["11_main", {7:False}, [4]],
+    ["11_main", {7:True}, [5]],
+    ["11_platform3", {}, [2]],
+    ["11_goods_loop", {}, [1]],
+    ["16_goods_loop", {}, [1]],
+    ]
+
+# The routes (in the order of their bits in the route table) and the panel buttons
+route_names = list(route_conflicts.station_routes.keys())
+point_buttons, fpl_buttons, signal_buttons, subsidary_buttons, signal_ids = [], [], [], [], []
+switch_buttons = []
+
+#----------------------------------------------------------------------
+# The callbacks for the panel (the same as those in 'my_layout')
+#----------------------------------------------------------------------
+
+def process_interlocking():
+    interlocking.process_interlocking_east()
+    interlocking.process_interlocking_west()
+    return()
+
+def point_callback(point_id, callback_type):
+    sections.override_signals_based_on_track_occupancy()
+    sections.refresh_signal_aspects()
+    power_switches.update_track_power_section_switches()
+    process_interlocking()
+    return()
+
+def signal_callback(sig_id, callback_type):
+    if callback_type == sig_callback_type.sig_passed:
+        sections.update_track_occupancy(sig_id)
+        sections.override_signals_based_on_track_occupancy()
+    sections.refresh_signal_aspects()
+    power_switches.update_track_power_section_switches()
+    process_interlocking()
+    return()
+
+def section_callback(section_id, callback_type):
+    sections.override_signals_based_on_track_occupancy()
+    sections.refresh_signal_aspects()
+    return()
+
+def switch_callback(switch_id, button_id):
+    power_switches.update_track_power_section_switches()
+    return()
+
+#----------------------------------------------------------------------
+# Internal function to create the layout from scratch (at the start of
+# each sequence) - and to find the panel buttons the first time
+#----------------------------------------------------------------------
+
+def reset_layout():
+    headless_signals.reset()
+    headless_signals.create_layout(point_callback, signal_callback, section_callback, switch_callback)
+    interlocking.set_initial_interlocking_conditions()
+    process_interlocking()
+    power_switches.update_track_power_section_switches()
+    if not signal_ids:
+        for point_id in range(headless_signals.max_item_id):
+            if headless_signals.point_exists[point_id] and not headless_signals.point_auto[point_id]:
+                point_buttons.append(point_id)
+                if headless_signals.point_has_fpl[point_id]: fpl_buttons.append(point_id)
+        for sig_id, signal in headless_signals.signals.items():
+            signal_ids.append(int(sig_id))
+            if not signal["automatic"]: signal_buttons.append(int(sig_id))
+            if signal["hassubsidary"]: subsidary_buttons.append(int(sig_id))
+        for switch_id in power_switches.switches.keys():
+            switch_buttons.append((int(switch_id), 1))
+            if switch_id in ("1", "2", "6", "7"): switch_buttons.append((int(switch_id), 2))
+    return()
+
+#----------------------------------------------------------------------
+# Internal function to choose a random action (a button press or a wait)
+#----------------------------------------------------------------------
+
+def random_action(generator:random.Random):
+    choice = generator.random()
+    if choice < 0.25: return(("point", generator.choice(point_buttons)))
+    if choice < 0.40: return(("fpl", generator.choice(fpl_buttons)))
+    if choice < 0.65: return(("signal", generator.choice(signal_buttons)))
+    if choice < 0.75: return(("subsidary", generator.choice(subsidary_buttons)))
+    if choice < 0.88: return(("passed", generator.choice(signal_ids)))
+    if choice < 0.95: return(("switch",) + generator.choice(switch_buttons))
+    return(("wait", generator.choice((1, 5, 20))))
+
+#----------------------------------------------------------------------
+# Internal function to do an action (on the headless panel)
+#----------------------------------------------------------------------
+
+def do_action(action:tuple):
+    if action[0] == "point": headless_signals.press_point_button(action[1])
+    elif action[0] == "fpl": headless_signals.press_fpl_button(action[1])
+    elif action[0] == "signal": headless_signals.press_signal_button(action[1])
+    elif action[0] == "subsidary": headless_signals.press_subsidary_button(action[1])
+    elif action[0] == "passed": headless_signals.press_signal_passed_button(action[1])
+    elif action[0] == "switch": power_switches.toggle_switch(action[1], action[2], switch_callback)
+    elif action[0] == "wait": headless_signals.advance_clock(action[1])
+    return()
+
+#----------------------------------------------------------------------
+# Internal function to check the layout is still safe - returns the rule
+# that has been broken (and the details) or None
+#----------------------------------------------------------------------
+
+def check_invariants():
+    table = route_conflicts.route_table
+    cleared_routes = route_conflicts.find_cleared_routes(point_switched, signal_clear, subsidary_clear)
+    cleared = [route for route in route_names if table["bits"][route] & cleared_routes]
+    for route in cleared:
+        if table["conflicts"][route] & cleared_routes:
+            other_route = [other_route for other_route in cleared if table["conflicts"][route] & table["bits"][other_route]][0]
+            return("conflicting_routes_cleared", route+" and "+other_route)
+    for (sig_id, aspect), routes in table["signals"].items():
+        if (subsidary_clear(sig_id) if aspect else signal_clear(sig_id)):
+            if not any(route_bit & cleared_routes for route_bit, point_mask, route_points in routes):
+                return("signal_cleared_without_route", ("subsidary " if aspect else "signal ")+str(sig_id))
+    for route in cleared:
+        for point_id in route_conflicts.station_routes[route][2].keys():
+            if not headless_signals.point_locked[point_id] or not fpl_active(point_id):
+                return("unlocked_point_on_cleared_route", "point "+str(point_id)+" on route "+route)
+    switches = power_switches.switches
+    if cleared and not switches[str(power_switches.power_switch_override)]["switch1"]:
+        for route, points, switch_ids in route_power_sections:
+            if route in cleared and all(point_switched(point_id) == switched for point_id, switched in points.items()):
+                for switch_id in switch_ids:
+                    if not switches[str(switch_id)]["switch1"] and not switches[str(switch_id)]["switch2"]:
+                        return("unpowered_section_on_cleared_route", "power section "+str(switch_id)+" on route "+route)
+    return(None)
+
+#----------------------------------------------------------------------
+# Internal function to run a sequence of actions from a fresh layout -
+# returns [step, rule broken, details] for the first step that breaks a
+# rule (an exception counts as breaking a rule) or None
+#----------------------------------------------------------------------
+
+def run_sequence(actions:list):
+    reset_layout()
+    for step, action in enumerate(actions):
+        try:
+            do_action(action)
+            failure = check_invariants()
+        except Exception as error:
+            failure = ("exception", type(error).__name__+": "+str(error))
+        if failure is not None: return([step, failure[0], failure[1]])
+    return(None)
+
+#----------------------------------------------------------------------
+# Internal function to shrink a sequence that breaks a rule - chunks of
+# actions are taken out (halving the size of the chunks each time round)
+# for as long as the sequence still breaks the same rule. Pairs of actions
+# are then taken out (a button pressed twice does nothing - but taking out
+# only one of the presses would leave the button the other way)
+#----------------------------------------------------------------------
+
+def shrink_sequence(actions:list, failure:list):
+    def still_fails(candidate:list):
+        result = run_sequence(candidate)
+        return(result if result is not None and result[1] == failure[1] else None)
+    actions = actions[:failure[0]+1]
+    chunk_size = max(len(actions) // 2, 1)
+    while True:
+        index = 0
+        while index < len(actions):
+            result = still_fails(actions[:index] + actions[index+chunk_size:])
+            if result is not None: actions, failure = (actions[:index] + actions[index+chunk_size:])[:result[0]+1], result
+            else: index = index + chunk_size
+        if chunk_size == 1: break
+        chunk_size = max(chunk_size // 2, 1)
+    shrunk = True
+    while shrunk:
+        shrunk = False
+        for first in range(len(actions)):
+            for second in range(first+1, len(actions)):
+                candidate = actions[:first] + actions[first+1:second] + actions[second+1:]
+                result = still_fails(candidate)
+                if result is not None:
+                    actions, failure, shrunk = candidate[:result[0]+1], result, True
+                    break
+            if shrunk: break
+    return(actions, failure)
+
+#----------------------------------------------------------------------
+# Externally called function to run random sequences of actions (for the
+# given number of steps in all) - returns the number of steps run and the
+# failures found - [[rule broken, details, shrunk actions], ...] (one for
+# each rule broken)
+#----------------------------------------------------------------------
+
+def fuzz_layout(number_of_steps:int=100000, seed:int=1):
+    generator = random.Random(seed)
+    steps, failures = 0, {}
+    reset_layout()
+    while steps < number_of_steps:
+        actions = [random_action(generator) for count in range(sequence_length)]
+        failure = run_sequence(actions)
+        steps = steps + (failure[0] + 1 if failure is not None else len(actions))
+        if failure is not None and failure[1] not in failures:
+            shrunk_actions, shrunk_failure = shrink_sequence(actions, failure)
+            failures[failure[1]] = [shrunk_failure[1], shrunk_failure[2], shrunk_actions]
+    return(steps, list(failures.values()))
+
+def fuzz_layout_process(arguments:tuple):
+    return(fuzz_layout(*arguments))
+
+if __name__ == "__main__":
+    number_of_steps = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    processes = int(sys.argv[3]) if len(sys.argv) > 3 else os.cpu_count()
+    start_time = time.perf_counter()
+    # Each process runs its share of the steps (with its own seed)
+    with multiprocessing.Pool(processes) as pool:
+        results = pool.map(fuzz_layout_process, [(number_of_steps // processes, seed * 1000 + process)
+                                                 for process in range(processes)])
+    total_time = time.perf_counter() - start_time
+    steps, failures = sum(result[0] for result in results), {}
+    for result in results:
+        for failure in result[1]:
+            if failure[0] not in failures or len(failure[2]) < len(failures[failure[0]][2]): failures[failure[0]] = failure
+    print ("Ran "+str(steps)+" steps in "+format(total_time, ".1f")+" seconds ("+
+           str(int(steps / total_time))+" steps per second on "+str(processes)+" processes)")
+    for rule, details, actions in failures.values():
+        print ("FAILED: "+rule+" - "+details)
+        print ("  after: "+", ".join(" ".join(str(item) for item in action) for action in actions))
+    if not failures: print ("No rules broken")
+    sys.stdout.flush()
+    os._exit(1 if failures else 0)
+
+###############################################################################
@@ -0,0 +1,398 @@
+#----------------------------------------------------------------------
+# This Module generates "synthetic" layouts so we can find out how the
+# schematic, track occupancy, interlocking and power switching code copes
+# with much bigger layouts than ours (see 'layout_benchmarks').
+#
+# A synthetic layout is a double track main line (Down line West to East
+# and Up line East to West) through a number of stations. Each line enters
+# our area of control at a fully automatic signal, then passes through a
+# number of automatic block sections before each station and finally leaves
+# via a timed signal (just like signals 20-23 on our layout). At each
+# station, each line has a home signal, a number of loops (the first being
+# the main platform line) selected by a ladder of facing points, a starter
+# signal for each loop and a ladder of trailing points back onto the main.
+# Each station can also have a number of goods yards - each a ladder of
+# sidings off the last Down loop with a ground signal to get out again.
+#
+# The generated modules have the same functions as our own 'sections',
+# 'interlocking', 'power_switches' and 'schematic' modules (so they can be
+# used in exactly the same way - and by 'rule_evaluator'). They are written
+# out as python source files in the same style as our own modules.
+#----------------------------------------------------------------------
+
+import os
+
+# The names of the generated modules (for each of our own modules)
+module_names = {"sections"       : "synthetic_sections",
+                "interlocking"   : "synthetic_interlocking",
+                "power_switches" : "synthetic_power_switches",
+                "schematic"      : "synthetic_schematic"}
+
+#----------------------------------------------------------------------
+# Internal function to allocate the next ID for a type of item
+#----------------------------------------------------------------------
+
+def next_id(layout:dict, item_type:str):
+    layout["next_ids"][item_type] = layout["next_ids"][item_type] + 1
+    return(layout["next_ids"][item_type])
+
+#----------------------------------------------------------------------
+# Internal function to create a line (Down or Up) through all the stations
+# Returns a list of the signals along the line (in the direction of travel)
+# each being a dictionary of the signal type, the section behind the signal
+# and either the section ahead or (for home signals) the loops at the station
+#----------------------------------------------------------------------
+
+def create_line(layout:dict, line:str, stations:int, loops:int, yards:int,
+                sidings:int, block_sections:int):
+    signals = []
+    section = next_id(layout, "sections")
+    signals.append({"type":"entry", "id":next_id(layout, "signals"), "line":line,
+                    "behind":None, "ahead":section})
+    for station in range(1, stations+1):
+        for block_section in range(block_sections):
+            ahead = next_id(layout, "sections")
+            signals.append({"type":"block", "id":next_id(layout, "signals"), "line":line,
+                            "behind":section, "ahead":ahead})
+            section = ahead
+        home = {"type":"home", "id":next_id(layout, "signals"), "line":line, "station":station,
+                "behind":section, "loops":[]}
+        signals.append(home)
+        ahead = next_id(layout, "sections")
+        for loop in range(loops):
+            home["loops"].append({"section":next_id(layout, "sections"),
+                                  "starter":next_id(layout, "signals"),
+                                  "switch":next_id(layout, "switches"),
+                                  # The first loop (the main platform) is the straight route
+                                  "facing":next_id(layout, "points") if loop > 0 else None,
+                                  "trailing":next_id(layout, "points") if loop > 0 else None})
+        for loop in range(loops):
+            signals.append({"type":"starter", "id":home["loops"][loop]["starter"], "line":line,
+                            "home":home, "loop":loop, "behind":home["loops"][loop]["section"],
+                            "ahead":ahead})
+        section = ahead
+        if line == "down":
+            for yard in range(yards):
+                layout["yards"].append({"station":station, "line":line,
+                                        "loop":home["loops"][-1], "home":home,
+                                        "ground":next_id(layout, "signals"),
+                                        "switch":next_id(layout, "switches"),
+                                        "points":[next_id(layout, "points") for siding in range(sidings)]})
+    signals.append({"type":"exit", "id":next_id(layout, "signals"), "line":line,
+                    "behind":section, "ahead":None})
+    # The last starters at the last station trigger the timed exit signal
+    for signal in signals:
+        if signal["type"] == "starter" and signal["ahead"] == section:
+            signal["exit"] = signals[-1]["id"]
+    return(signals)
+
+#----------------------------------------------------------------------
+# Externally called function to create the description of a synthetic
+# layout (the items and how they are connected). The layout has:
+#   stations       - the number of stations on the main line
+#   loops          - the number of loops at each station (for each line)
+#   yards          - the number of goods yards at each station
+#   sidings        - the number of sidings in each goods yard
+#   block_sections - the number of automatic block sections before each station
+#----------------------------------------------------------------------
+
+def create_layout(stations:int=1, loops:int=2, yards:int=1, sidings:int=4, block_sections:int=1):
+    layout = {"parameters": {"stations":stations, "loops":loops, "yards":yards,
+                             "sidings":sidings, "block_sections":block_sections},
+              "next_ids": {"signals":0, "points":0, "sections":0, "switches":1},
+              "yards": [] }
+    layout["lines"] = {"down": create_line(layout, "down", stations, loops, yards, sidings, block_sections),
+                       "up": create_line(layout, "up", stations, loops, 0, sidings, block_sections)}
+    # The Up line runs through the stations in the opposite direction
+    for signal in layout["lines"]["up"]:
+        if "station" in signal.keys(): signal["station"] = stations + 1 - signal["station"]
+    layout["counts"] = {"signals": layout["next_ids"]["signals"], "points": layout["next_ids"]["points"],
+                        "sections": layout["next_ids"]["sections"], "switches": layout["next_ids"]["switches"]}
+    return(layout)
+
+#----------------------------------------------------------------------
+# Internal functions to return the condition (as python source) for the
+# points to be set for a loop - the facing points for the route from the
+# home signal into the loop or the trailing points for the route out
+#----------------------------------------------------------------------
+
+def route_condition(loops:list, loop:int, points:str):
+    conditions = []
+    for other_loop in range(1, len(loops)):
+        if other_loop < loop or (other_loop > loop and loop == 0):
+            conditions.append("not point_switched("+str(loops[other_loop][points])+")")
+        elif other_loop == loop:
+            conditions.append("point_switched("+str(loops[other_loop][points])+")")
+            break
+    if not conditions: conditions.append("True")
+    return(" and ".join(conditions))
+
+def all_signals(layout:dict):
+    return(layout["lines"]["down"] + layout["lines"]["up"])
+
+def item_list(item_ids:list):
+    return(",".join(str(item_id) for item_id in item_ids))
+
+#----------------------------------------------------------------------
+# Internal functions to generate the source for each of the modules
+#----------------------------------------------------------------------
+
+def generate_sections(layout:dict):
+    source = ["#----------------------------------------------------------------------",
+              "# Synthetic layout - Track Occupancy sections (see 'layout_generator')",
+              "#----------------------------------------------------------------------",
+              "",
+              "from model_railway_signals import *",
+              "",
+              "def create_track_occupancy_switches(canvas, callback):"]
+    for section_id in range(1, layout["counts"]["sections"]+1):
+        source.append("    create_section (canvas, "+str(section_id)+", "+str(100 + 150 * ((section_id-1) % 40))+
+                      ", "+str(40 + 40 * ((section_id-1) // 40))+", section_callback=callback)")
+    source.extend(["    return()", "", "def update_track_occupancy(sig_passed:int):"])
+    for index, signal in enumerate(all_signals(layout)):
+        source.append("    "+("if" if index == 0 else "elif")+" sig_passed == "+str(signal["id"])+":")
+        if signal["behind"] is not None:
+            source.append("        clear_section_occupied("+str(signal["behind"])+")")
+        if signal["type"] == "home":
+            keyword = "if"
+            for loop, details in enumerate(signal["loops"]):
+                source.append("        "+keyword+" "+route_condition(signal["loops"], loop, "facing")+":")
+                source.append("            set_section_occupied("+str(details["section"])+")")
+                keyword = "elif"
+        elif signal["ahead"] is not None:
+            source.append("        set_section_occupied("+str(signal["ahead"])+")")
+        if "exit" in signal.keys():
+            source.append("        trigger_timed_signal("+str(signal["exit"])+",5,5)")
+    source.extend(["    return()", "", "def override_signals_based_on_track_occupancy():"])
+    overridden = [signal["id"] for signal in all_signals(layout) if signal["type"] != "exit"]
+    source.append("    clear_signal_override("+item_list(overridden)+")")
+    for signal in all_signals(layout):
+        if signal["type"] == "home":
+            for loop, details in enumerate(signal["loops"]):
+                source.append("    if section_occupied("+str(details["section"])+") and "+
+                              route_condition(signal["loops"], loop, "facing")+":")
+                source.append("        set_signal_override("+str(signal["id"])+")")
+        elif signal["type"] == "starter":
+            source.append("    if section_occupied("+str(signal["ahead"])+") and "+
+                          route_condition(signal["home"]["loops"], signal["loop"], "trailing")+":")
+            source.append("        set_signal_override("+str(signal["id"])+")")
+        elif signal["type"] != "exit":
+            source.append("    if section_occupied("+str(signal["ahead"])+"):")
+            source.append("        set_signal_override("+str(signal["id"])+")")
+    source.extend(["    return()", "", "def refresh_signal_aspects():"])
+    # The most forward signal first - working back along each line
+    for line in layout["lines"].values():
+        for index in range(len(line)-2, -1, -1):
+            signal, signal_ahead = line[index], line[index+1]
+            if signal["type"] == "home":
+                for loop, details in enumerate(signal["loops"]):
+                    source.append("    "+("if" if loop == 0 else "elif")+" "+
+                                  route_condition(signal["loops"], loop, "facing")+":")
+                    source.append("        set_route("+str(signal["id"])+",route_type."+
+                                  ("MAIN" if loop == 0 else "LH1")+")")
+                    source.append("        update_signal("+str(signal["id"])+",sig_ahead_id="+
+                                  str(details["starter"])+")")
+            else:
+                # The starters for the other loops at the station are not ahead of us
+                if signal["type"] == "starter":
+                    signal_ahead = next(ahead for ahead in line[index+1:] if ahead["type"] != "starter")
+                source.append("    update_signal("+str(signal["id"])+",sig_ahead_id="+str(signal_ahead["id"])+")")
+    source.extend(["    return()", ""])
+    return("\n".join(source))
+
+def generate_interlocking(layout:dict):
+    source = ["#----------------------------------------------------------------------",
+              "# Synthetic layout - Interlocking (see 'layout_generator')",
+              "# The first half of the stations are in the West box - the rest in the East",
+              "#----------------------------------------------------------------------",
+              "",
+              "from model_railway_signals import *",
+              "",
+              "def set_initial_interlocking_conditions():"]
+    starters = [signal["id"] for signal in all_signals(layout) if signal["type"] == "starter"]
+    grounds = [yard["ground"] for yard in layout["yards"]]
+    source.extend(["    lock_signal("+item_list(starters + grounds)+")", "    return()", ""])
+    stations = layout["parameters"]["stations"]
+    for box, box_stations in (("west", range(1, stations//2 + 1)), ("east", range(stations//2 + 1, stations+1))):
+        source.append("def process_interlocking_"+box+"():")
+        source.append("    pass")
+        for signal in all_signals(layout):
+            if signal["type"] == "home" and signal["station"] in box_stations:
+                facing = [details["facing"] for details in signal["loops"] if details["facing"] is not None]
+                trailing = [details["trailing"] for details in signal["loops"] if details["trailing"] is not None]
+                starters = [details["starter"] for details in signal["loops"]]
+                source.append("    # Station "+str(signal["station"])+" ("+signal["line"]+" line) - Home Signal "+
+                              str(signal["id"]))
+                if facing:
+                    source.append("    if "+" or ".join("not fpl_active("+str(point_id)+")" for point_id in facing)+":")
+                    source.append("        lock_signal("+str(signal["id"])+")")
+                    source.append("    else:")
+                    source.append("        unlock_signal("+str(signal["id"])+")")
+                for loop, details in enumerate(signal["loops"]):
+                    others = [starter for starter in starters if starter != details["starter"]]
+                    conditions = ["not ("+route_condition(signal["loops"], loop, "trailing")+")"]
+                    conditions.extend("not fpl_active("+str(point_id)+")" for point_id in trailing)
+                    source.append("    if "+" or ".join(conditions)+":")
+                    source.append("        lock_signal("+str(details["starter"])+")")
+                    if others:
+                        source.append("    elif "+" or ".join("signal_clear("+str(other)+")" for other in others)+":")
+                        source.append("        lock_signal("+str(details["starter"])+")")
+                    source.append("    else:")
+                    source.append("        unlock_signal("+str(details["starter"])+")")
+                for point_id in facing:
+                    source.append("    if signal_clear("+str(signal["id"])+"): lock_point("+str(point_id)+")")
+                    source.append("    else: unlock_point("+str(point_id)+")")
+                for point_id in trailing:
+                    source.append("    if "+" or ".join("signal_clear("+str(starter)+")" for starter in starters)+
+                                  ": lock_point("+str(point_id)+")")
+                    source.append("    else: unlock_point("+str(point_id)+")")
+        for yard in layout["yards"]:
+            if yard["station"] in box_stations:
+                first_point, loop, home = yard["points"][0], yard["loop"], yard["home"]
+                source.append("    # Station "+str(yard["station"])+" - Goods Yard exit Signal "+str(yard["ground"]))
+                source.append("    if not point_switched("+str(first_point)+"):")
+                source.append("        lock_signal("+str(yard["ground"])+")")
+                source.append("    elif signal_clear("+str(home["id"])+") or signal_clear("+str(loop["starter"])+"):")
+                source.append("        lock_signal("+str(yard["ground"])+")")
+                source.append("    else:")
+                source.append("        unlock_signal("+str(yard["ground"])+")")
+                source.append("    if signal_clear("+str(yard["ground"])+") or signal_clear("+str(home["id"])+"):")
+                source.append("        lock_point("+str(first_point)+")")
+                source.append("    else:")
+                source.append("        unlock_point("+str(first_point)+")")
+        source.extend(["    return()", ""])
+    return("\n".join(source))
+
+def generate_power_switches(layout:dict):
+    source = ["#----------------------------------------------------------------------",
+              "# Synthetic layout - Track Power sections (see 'layout_generator')",
+              "#----------------------------------------------------------------------",
+              "",
+              "from model_railway_signals import *",
+              "from power_switches import create_switch, switch_active, set_switch, clear_switch",
+              "",
+              "power_switch_override = 1",
+              "",
+              "def create_section_switches(canvas, switch_callback):",
+              "    create_switch (canvas, power_switch_override, 200,20,label1=\"Manual Power Switching\","
+              "switch_callback=switch_callback)"]
+    for switch_id in range(2, layout["counts"]["switches"]+1):
+        source.append("    create_switch (canvas, "+str(switch_id)+", "+str(100 + 150 * ((switch_id-2) % 40))+
+                      ", "+str(2000 + 40 * ((switch_id-2) // 40))+", label1=\""+str(switch_id)+
+                      "\", switch_callback=switch_callback)")
+    source.extend(["    return()", "", "def update_track_power_section_switches():",
+                   "    if not switch_active (power_switch_override):", "        pass"])
+    for signal in all_signals(layout):
+        if signal["type"] == "home":
+            for loop, details in enumerate(signal["loops"]):
+                source.append("        if signal_clear("+str(details["starter"])+"):")
+                source.append("            set_switch("+str(details["switch"])+")")
+                source.append("        elif signal_clear("+str(signal["id"])+") and "+
+                              route_condition(signal["loops"], loop, "facing")+":")
+                source.append("            set_switch("+str(details["switch"])+")")
+                source.append("        else:")
+                source.append("            clear_switch("+str(details["switch"])+")")
+    source.extend(["    return()", ""])
+    return("\n".join(source))
+
+def generate_schematic(layout:dict):
+    source = ["#----------------------------------------------------------------------",
+              "# Synthetic layout - Schematic (see 'layout_generator')",
+              "#----------------------------------------------------------------------",
+              "",
+              "from model_railway_signals import *",
+              "import synthetic_power_switches as power_switches",
+              "",
+              "off_colour = \"grey75\"",
+              "up_colour = \"red\"",
+              "down_colour = \"green\"",
+              "local_colour = \"orange\"",
+              "",
+              "# The drawing objects for each section we need to change the colour of",
+              "section_lines: dict = {}",
+              "",
+              "def create_track_schematic (canvas, point_callback, fpl_enabled:bool=True):",
+              "    global section_lines"]
+    signal_positions = {}
+    for line_name, line in layout["lines"].items():
+        colour = "down_colour" if line_name == "down" else "up_colour"
+        y = 100 if line_name == "down" else 100 + 50 * (layout["parameters"]["loops"] + 1)
+        direction = 1 if line_name == "down" else -1
+        x = 0 if line_name == "down" else 200 * len(layout["lines"]["down"])
+        for signal in line:
+            signal_positions[signal["id"]] = (x + 50 * direction, y, 0 if direction == 1 else 180)
+            if signal["type"] == "home":
+                for loop, details in enumerate(signal["loops"]):
+                    loop_y = y + 50 * loop
+                    if details["facing"] is not None:
+                        source.append("    create_point (canvas,"+str(details["facing"])+",point_type.RH,"+
+                                      str(x + 100 * direction)+","+str(y)+","+colour+",fpl=fpl_enabled,"+
+                                      "orientation="+str(0 if direction == 1 else 180)+",point_callback=point_callback)")
+                        source.append("    create_point (canvas,"+str(details["trailing"])+",point_type.LH,"+
+                                      str(x + 600 * direction)+","+str(y)+","+colour+",fpl=fpl_enabled,"+
+                                      "orientation="+str(180 if direction == 1 else 0)+",point_callback=point_callback)")
+                    source.append("    section_lines[\""+str(details["section"])+"\"] = [canvas.create_line("+
+                                  str(x + 150 * direction)+","+str(loop_y)+","+str(x + 550 * direction)+","+
+                                  str(loop_y)+",fill=off_colour,width=3)]")
+                    signal_positions[details["starter"]] = (x + 500 * direction, loop_y, 0 if direction == 1 else 180)
+                x = x + 700 * direction
+            elif signal["type"] != "starter":
+                source.append("    canvas.create_line("+str(x)+","+str(y)+","+str(x + 200 * direction)+","+
+                              str(y)+",fill="+colour+",width=3)")
+                x = x + 200 * direction
+    for yard_number, yard in enumerate(layout["yards"]):
+        x, y = 200 + 900 * yard_number, 600 + 50 * layout["parameters"]["loops"]
+        signal_positions[yard["ground"]] = (x - 50, y, 0)
+        source.append("    section_lines[\"yard"+str(yard_number)+"\"] = []")
+        for siding, point_id in enumerate(yard["points"]):
+            source.append("    section_lines[\"yard"+str(yard_number)+"\"] += create_point (canvas,"+str(point_id)+
+                          ",point_type.LH,"+str(x + 50 * siding)+","+str(y - 25 * siding)+",off_colour,"+
+                          "point_callback=point_callback)")
+            source.append("    section_lines[\"yard"+str(yard_number)+"\"] += [canvas.create_line("+
+                          str(x + 50 * siding)+","+str(y - 25 * siding)+","+str(x + 600)+","+
+                          str(y - 25 * siding)+",fill=off_colour,width=3)]")
+    source.extend(["    return()", "", "def create_layout_signals(canvas, sig_callback):"])
+    for signal in all_signals(layout):
+        x, y, orientation = signal_positions[signal["id"]]
+        source.append("    create_colour_light_signal (canvas,"+str(signal["id"])+","+str(x)+","+str(y)+
+                      ",orientation="+str(orientation)+",signal_subtype=signal_sub_type.four_aspect,"+
+                      "sig_callback=sig_callback,"+
+                      ("sig_passed_button=True," if signal["type"] != "exit" else "")+
+                      ("fully_automatic=True," if signal["type"] in ("entry", "block", "exit") else "")+
+                      ("lhfeather45=True," if signal["type"] == "home" else "")+
+                      "refresh_immediately=False)")
+    for yard in layout["yards"]:
+        x, y, orientation = signal_positions[yard["ground"]]
+        source.append("    create_ground_position_signal(canvas,"+str(yard["ground"])+","+str(x)+","+str(y)+
+                      ",sig_callback=sig_callback)")
+    source.extend(["    return()", "", "def update_track_schematic(canvas):"])
+    for signal in all_signals(layout):
+        if signal["type"] == "home":
+            colour = "down_colour" if signal["line"] == "down" else "up_colour"
+            for details in signal["loops"]:
+                source.append("    colour = "+colour+" if power_switches.switch_active("+
+                              str(details["switch"])+",1) else off_colour")
+                source.append("    for i in section_lines[\""+str(details["section"])+"\"]: canvas.itemconfig (i, fill=colour)")
+    for yard_number, yard in enumerate(layout["yards"]):
+        source.append("    colour = local_colour if power_switches.switch_active("+str(yard["switch"])+
+                      ",1) else off_colour")
+        source.append("    for i in section_lines[\"yard"+str(yard_number)+"\"]: canvas.itemconfig (i, fill=colour)")
+    source.extend(["    return()", ""])
+    return("\n".join(source))
+
+#----------------------------------------------------------------------
+# Externally called function to generate a synthetic layout and write the
+# modules to the given directory (which is created if it doesn't exist).
+# Returns the description of the layout (see 'create_layout')
+#----------------------------------------------------------------------
+
+def write_layout(directory:str, stations:int=1, loops:int=2, yards:int=1, sidings:int=4, block_sections:int=1):
+    layout = create_layout(stations, loops, yards, sidings, block_sections)
+    os.makedirs(directory, exist_ok=True)
+    for module, generate in (("sections", generate_sections), ("interlocking", generate_interlocking),
+                             ("power_switches", generate_power_switches), ("schematic", generate_schematic)):
+        with open(os.path.join(directory, module_names[module]+".py"), "w") as file:
+            file.write(generate(layout))
+    return(layout)
+
+###############################################################################
@@ -0,0 +1,103 @@
+#----------------------------------------------------------------------
+# This Module moves all the logging (ours and the library's) off the
+# tkinter thread. Log records are put onto a queue (which never blocks) and
+# written out to the console - and to a log file, if selected - by a
+# background thread. This means a slow console or SD card can't add any
+# delay to the callbacks.
+#
+# Our own events are logged as "structured" records - an event type and a
+# set of named fields (e.g. the signal or point IDs and any timings):
+#   layout_logging.log_event("spad", logging.WARNING, signal=20)
+# These are written to the console as "WARNING: spad signal=20" and to the
+# log file as one JSON object per line:
+#   {"time": 1700000000.123, "level": "WARNING", "event": "spad", "signal": 20}
+#
+# Any code that has to do some work to create an event (e.g. time it) can
+# check if the event will be logged first with 'enabled' - this is cheap
+# (the logging library remembers the answer for each level)
+#----------------------------------------------------------------------
+
+import logging
+import logging.handlers
+import json
+import queue
+
+# The logger for our own events
+logger = logging.getLogger("layout")
+
+# Global variables for the logging
+log_queue = queue.SimpleQueue()
+listener = None
+
+#----------------------------------------------------------------------
+# Formatters for the console and the log file. Any fields given with the
+# event are added to the message (or to the JSON object)
+#----------------------------------------------------------------------
+
+class ConsoleFormatter(logging.Formatter):
+    def format(self, record):
+        message = record.levelname+": "+record.getMessage()
+        for name, value in getattr(record, "fields", {}).items():
+            message = message+" "+name+"="+str(value)
+        return(message)
+
+class StructuredFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {"time": round(record.created, 3), "level": record.levelname, "event": record.getMessage()}
+        entry.update(getattr(record, "fields", {}))
+        return(json.dumps(entry, default=str))
+
+#----------------------------------------------------------------------
+# Externally called function to check if an event at the given level
+# would be logged (to be used before doing any work to create the event)
+#----------------------------------------------------------------------
+
+def enabled(level:int):
+    return(logger.isEnabledFor(level))
+
+#----------------------------------------------------------------------
+# Externally called function to log an event (with any named fields)
+#----------------------------------------------------------------------
+
+def log_event(event:str, level:int=logging.INFO, **fields):
+    if logger.isEnabledFor(level):
+        logger.log(level, event, extra={"fields": fields})
+    return()
+
+#----------------------------------------------------------------------
+# Externally called function to start the logging (replaces any existing
+# logging configuration). Everything at the given level and above is
+# written to the console (and to the log file if one is given)
+#----------------------------------------------------------------------
+
+def start_logging(level:int=logging.INFO, log_file:str=None):
+    global listener
+    root_logger = logging.getLogger()
+    for handler in list(root_logger.handlers):
+        root_logger.removeHandler(handler)
+    root_logger.setLevel(level)
+    root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(ConsoleFormatter())
+    handlers = [console_handler]
+    if log_file is not None:
+        file_handler = logging.FileHandler(log_file)
+        file_handler.setFormatter(StructuredFormatter())
+        handlers.append(file_handler)
+    listener = logging.handlers.QueueListener(log_queue, *handlers)
+    listener.start()
+    return()
+
+#----------------------------------------------------------------------
+# Externally called function to write out anything still on the queue
+# and stop the background thread (to be called on shutdown)
+#----------------------------------------------------------------------
+
+def stop_logging():
+    global listener
+    if listener is not None:
+        listener.stop()
+        listener = None
+    return()
+
+###############################################################################
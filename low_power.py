@@ -0,0 +1,273 @@
+#----------------------------------------------------------------------
+# This Module provides a "low power" profile for running the layout on a Pi
+# that is on battery or passively cooled (where the continuous redraws and
+# polling keep the CPU busy - and so cause thermal throttling):
+#
+#   - The schematic redraws are capped - the requests made within
+#     'min_redraw_interval' of the last redraw are combined into a single
+#     redraw at the end of the interval. A redraw is skipped completely if
+#     none of the points or power section switches have changed since the
+#     last one (the schematic colours only depend on these)
+#   - The polls that only pass changes on (the web mimic frames and the
+#     background evaluation results) are backed off once nothing has changed
+#     on the layout for 'idle_time' - and go back to their normal intervals
+#     on the next change. The first poll after the layout wakes up can be up
+#     to the backed off interval late
+#   - The DCC commands for the signal aspects are batched - only the last
+#     aspect for each signal is sent at the end of each 'dcc_batch_interval'
+#     (so the aspects set and replaced while the aspects are refreshed back
+#     along a route are never sent)
+#
+# The safety responses are never held back - a signal going to DANGER is
+# sent on the DCC bus straight away (replacing any aspect waiting to be
+# sent), the locks are applied as before and the safety event checks (see
+# 'safety_events') and the boundary state from the other signal boxes are
+# never backed off.
+#
+# The CPU time used per hour of operation (by all the threads of the
+# process) can be reported with or without the profile - so the profiles
+# can be compared. In control process mode the control process isn't
+# included (it is a separate process)
+#----------------------------------------------------------------------
+
+from model_railway_signals import *
+from model_railway_signals import dcc_control
+import layout_logging
+import power_switches
+import schematic
+import snapshot
+
+import logging
+import sys
+import threading
+import time
+
+min_redraw_interval = 200  # change to the minimum time (in ms) between redraws of the schematic
+dcc_batch_interval = 100   # change to the time (in ms) the signal aspect DCC commands are held to be batched
+idle_time = 30             # change to the time (in seconds) with no changes before the polls are backed off
+cpu_report_interval = 3600 # change to how often (in seconds) the CPU time used is logged
+
+# The polls that are backed off when the layout is idle {module_name: (interval_name, idle_interval)}
+idle_polls = {"web_mimic": ("frame_interval", 500),
+              "background_evaluation": ("poll_interval", 100)}
+
+# The functions called on every change to the layout (these wake up the polls)
+activity_functions = {"snapshot": ("save_layout_state",),
+                      "background_evaluation": ("request_evaluation",),
+                      "panel_client": ("send_point_change", "send_signal_change", "send_signal_passed",
+                                       "send_section_change", "send_switch_change")}
+
+# Global variables for the redraws of the schematic
+tkinter_window = None
+panel_canvas = None
+last_redraw = 0.0            # When the schematic was last redrawn (time.monotonic)
+redraw_pending = False
+drawn_inputs = None          # The points and switches the schematic was last drawn for
+
+# Global variables for the polls
+last_activity = 0.0          # When the layout last changed (time.monotonic)
+normal_intervals: dict = {}  # {module_name: the normal interval} for the polls that are backed off
+
+# Global variables for the DCC batches
+send_dcc_signal = None       # The library function to send the DCC commands for a signal aspect
+batched_aspects: dict = {}   # {sig_id: the aspect waiting to be sent}
+batch_pending = False
+
+# Counts of what has been saved (reported with the CPU time)
+saved_counts = {"redraws_combined":0, "redraws_skipped":0, "dcc_aspects_replaced":0}
+
+# Global variables for the CPU time
+cpu_start = None             # [time.monotonic, time.process_time] when we started measuring
+
+#----------------------------------------------------------------------
+# Internal function to return the points and power section switches the
+# schematic colours are worked out from
+#----------------------------------------------------------------------
+
+def schematic_inputs():
+    return(tuple(point_switched(point_id) for point_id in snapshot.point_ids) +
+           tuple(power_switches.switch_active(switch_id, button_id)
+                 for switch_id in snapshot.switch_ids for button_id in (1, 2)))
+
+#----------------------------------------------------------------------
+# Internal function to redraw the schematic (if anything it depends on has
+# changed since it was last drawn)
+#----------------------------------------------------------------------
+
+def redraw_schematic():
+    global last_redraw, redraw_pending, drawn_inputs
+    redraw_pending = False
+    last_redraw = time.monotonic()
+    inputs = schematic_inputs()
+    if inputs == drawn_inputs:
+        saved_counts["redraws_skipped"] = saved_counts["redraws_skipped"] + 1
+    else:
+        schematic.update_track_schematic(panel_canvas)
+        drawn_inputs = inputs
+    return()
+
+#----------------------------------------------------------------------
+# Externally called function to bring the schematic up to date - to be
+# called in place of 'schematic.update_track_schematic'. The redraw is
+# made straight away (as it always is before the profile is started)
+# unless the schematic was redrawn less than 'min_redraw_interval' ago.
+# Set force to redraw even if the points and switches haven't changed
+# (e.g. once the colours have been changed)
+#----------------------------------------------------------------------
+
+def request_schematic_update(canvas, force:bool=False):
+    global redraw_pending, drawn_inputs
+    if force: drawn_inputs = None
+    if tkinter_window is None:
+        schematic.update_track_schematic(canvas)
+    elif redraw_pending:
+        saved_counts["redraws_combined"] = saved_counts["redraws_combined"] + 1
+    else:
+        wait = last_redraw + min_redraw_interval / 1000.0 - time.monotonic()
+        if wait <= 0.0:
+            redraw_schematic()
+        else:
+            redraw_pending = True
+            tkinter_window.after(int(1000.0 * wait) + 1, redraw_schematic)
+    return()
+
+#----------------------------------------------------------------------
+# Internal function to note that the layout has changed - the polls that
+# have been backed off go back to their normal intervals
+#----------------------------------------------------------------------
+
+def note_activity():
+    global last_activity
+    last_activity = time.monotonic()
+    if normal_intervals:
+        for module_name, interval in normal_intervals.items():
+            setattr(sys.modules[module_name], idle_polls[module_name][0], interval)
+        normal_intervals.clear()
+        if layout_logging.enabled(logging.DEBUG): layout_logging.log_event("low_power_awake", logging.DEBUG)
+    return()
+
+#----------------------------------------------------------------------
+# Internal function to back off the polls once the layout has been idle
+# for the 'idle_time' (runs on the tkinter thread every 'idle_time')
+#----------------------------------------------------------------------
+
+def check_for_idle():
+    if not normal_intervals and time.monotonic() - last_activity >= idle_time:
+        for module_name, (interval_name, idle_interval) in idle_polls.items():
+            module = sys.modules.get(module_name)
+            if module is not None:
+                normal_intervals[module_name] = getattr(module, interval_name)
+                setattr(module, interval_name, max(idle_interval, normal_intervals[module_name]))
+        if layout_logging.enabled(logging.DEBUG): layout_logging.log_event("low_power_idle", logging.DEBUG)
+    tkinter_window.after(1000 * idle_time, check_for_idle)
+    return()
+
+#----------------------------------------------------------------------
+# Internal function to wake up the polls whenever one of the given functions
+# is called. The functions in each module are replaced (in the same way as
+# 'point_sequencer' replaces the library function to send the DCC commands)
+#----------------------------------------------------------------------
+
+def install_activity_hooks():
+    def hooked(function):
+        def hooked_function(*args, **kwargs):
+            note_activity()
+            return(function(*args, **kwargs))
+        return(hooked_function)
+    for module_name, function_names in activity_functions.items():
+        module = sys.modules.get(module_name)
+        if module is None: continue
+        for function_name in function_names:
+            setattr(module, function_name, hooked(getattr(module, function_name)))
+    return()
+
+#----------------------------------------------------------------------
+# Internal function to send the batched signal aspects - and the function
+# to batch them (this replaces the library's update_dcc_signal function).
+# The aspects set on other threads (e.g. by the library's timed signals)
+# are sent straight away as the batches are sent on the tkinter thread
+#----------------------------------------------------------------------
+
+def send_batched_aspects():
+    global batch_pending
+    batch_pending = False
+    aspects = list(batched_aspects.items())
+    batched_aspects.clear()
+    for sig_id, state in aspects: send_dcc_signal(sig_id, state)
+    return()
+
+def batch_signal_aspect(sig_id:int, state):
+    global batch_pending
+    if state == dcc_control.signal_state_type.danger or threading.current_thread() is not threading.main_thread():
+        batched_aspects.pop(sig_id, None)
+        send_dcc_signal(sig_id, state)
+    else:
+        if sig_id in batched_aspects: saved_counts["dcc_aspects_replaced"] = saved_counts["dcc_aspects_replaced"] + 1
+        batched_aspects[sig_id] = state
+        if not batch_pending:
+            batch_pending = True
+            tkinter_window.after(dcc_batch_interval, send_batched_aspects)
+    return()
+
+#----------------------------------------------------------------------
+# Externally called function to start the low power profile (once the
+# schematic has been drawn and the optional subsystems have been started)
+#----------------------------------------------------------------------
+
+def start_low_power(window, canvas):
+    global tkinter_window, panel_canvas, send_dcc_signal, last_redraw, last_activity, drawn_inputs
+    tkinter_window = window
+    panel_canvas = canvas
+    last_redraw = last_activity = time.monotonic()
+    drawn_inputs = schematic_inputs()
+    install_activity_hooks()
+    send_dcc_signal = dcc_control.update_dcc_signal
+    dcc_control.update_dcc_signal = batch_signal_aspect
+    tkinter_window.after(1000 * idle_time, check_for_idle)
+    return()
+
+#----------------------------------------------------------------------
+# Externally called function to send anything still waiting to be sent
+# (to be called once the main loop has finished)
+#----------------------------------------------------------------------
+
+def stop_low_power():
+    if send_dcc_signal is not None: send_batched_aspects()
+    return()
+
+#----------------------------------------------------------------------
+# Externally called functions to measure the CPU time used per hour of
+# operation. The measurement starts when 'start_cpu_usage' is called (so
+# the startup isn't included) and is logged every 'cpu_report_interval'
+#----------------------------------------------------------------------
+
+def cpu_usage():
+    hours = (time.monotonic() - cpu_start[0]) / 3600.0
+    cpu_seconds = time.process_time() - cpu_start[1]
+    usage = {"hours": round(hours, 3), "cpu_seconds": round(cpu_seconds, 1),
+             "cpu_seconds_per_hour": round(cpu_seconds / hours, 1) if hours > 0.0 else 0.0,
+             "low_power": tkinter_window is not None}
+    usage.update(saved_counts)
+    return(usage)
+
+def log_cpu_usage(window):
+    layout_logging.log_event("cpu_usage", logging.INFO, **cpu_usage())
+    window.after(1000 * cpu_report_interval, log_cpu_usage, window)
+    return()
+
+def start_cpu_usage(window):
+    global cpu_start
+    cpu_start = [time.monotonic(), time.process_time()]
+    window.after(1000 * cpu_report_interval, log_cpu_usage, window)
+    return()
+
+def report_cpu_usage():
+    usage = cpu_usage()
+    print ("CPU usage ("+("low power" if usage["low_power"] else "normal")+" profile): "+
+           format(usage["cpu_seconds_per_hour"], ".1f")+" CPU seconds per hour over "+
+           format(usage["hours"], ".2f")+" hours")
+    if usage["low_power"]:
+        print ("  "+", ".join(name+"="+str(usage[name]) for name in saved_counts.keys()))
+    return()
+
+###############################################################################
@@ -1,13 +1,21 @@
+import startup_profile
 from tkinter import *
 import interlocking
 import schematic
 import sections
 import power_switches
+import snapshot
+import safety_events
+import viewport
 import model_railway_signals 
+import os
+import sys
+# The optional subsystems (background_evaluation, panel_client, signal_boxes
+# and web_mimic) are only imported if they are selected below
 
+import layout_logging
 import logging
-#logging.basicConfig(format='%(levelname)s:%(funcName)s: %(message)s',level=logging.DEBUG)
-logging.basicConfig(format='%(levelname)s: %(message)s',level=logging.DEBUG)
+import time
 
 #----------------------------------------------------------------------
 # Global Variables
@@ -16,6 +24,26 @@ logging.basicConfig(format='%(levelname)s: %(message)s',level=logging.DEBUG)
 
 fullScreenState = False # change to True to open as fullscreen on startup
 fpl_enabled = True      # change to false to Disable FPL for simpler operation
+restore_last_session = True # change to False to always start with everything at default
+background_evaluation_enabled = False # change to True to evaluate the rules on a background thread
+control_process_enabled = False # change to True to run the control logic in a separate process
+report_schematic_timings = False # change to True to print the schematic item count and redraw timings
+zoomable_panel = False  # change to True to zoom (mouse wheel) and pan (middle button drag) the panel
+web_mimic_port = None   # change to a port number (e.g. 8080) to serve a read-only mimic of the panel to web browsers
+web_mimic_host = "localhost" # change to "" to serve the web mimic to other computers on the network (there is no login)
+report_startup_timings = False # change to True to print the time taken by each phase of the startup
+log_level = logging.DEBUG  # change to logging.INFO or logging.WARNING to log less
+log_file = None         # change to a file name (e.g. "layout_log.jsonl") to also write the log as JSON lines
+record_session_history = False # change to True to record every change for analysis (see occupancy_analytics)
+use_generated_rules = False # change to True to use the rules compiled from rule_spec rather than the hand written rules
+automatic_signal_working = False # change to True to work signals 20-23 by their state machines (see automatic_signals) rather than as timed signals from the rules
+point_throw_sequencing = False # change to True to stagger the point motor throws (see point_sequencer)
+hot_reload_enabled = True # change to False to disable reloading the rules and layout definitions (F5) while running
+timetable_file = None   # change to a file name (e.g. "timetable.json") to set the routes from a queue of route requests (see timetable_runner)
+low_power_profile = False # change to True to cap the redraws, back off the polling when idle and batch the DCC signal commands (see low_power)
+report_cpu_usage = False # change to True to print the CPU time used per hour of operation (to compare the profiles)
+signal_box = None # change to "west" or "east" to run as a single signal box (or give it on the command line)
+if len(sys.argv) > 1: signal_box = sys.argv[1]
 
 #----------------------------------------------------------------------
 # a subclass of Canvas for dealing with resizing of windows
@@ -29,6 +57,10 @@ class ResizingCanvas(Canvas):
         self.width = self.winfo_reqwidth()
         
     def on_resize(self,event):
+        # If the panel is zoomable only the objects that can be seen are rescaled
+        if zoomable_panel:
+            viewport.canvas_resized(event.width,event.height)
+            return
         # determine the ratio of old width/height to new width/height
         wscale = event.width/self.width
         hscale = event.height/self.height
@@ -50,74 +82,392 @@ def quitFullScreen(event):
     fullScreenState = False
     window.attributes("-fullscreen",fullScreenState)
     
+#----------------------------------------------------------------------
+# Function to process the interlocking - for the whole station or just for
+# our box if we are running as one of the signal boxes (in which case we
+# also need to tell the other boxes about any changes)
+#----------------------------------------------------------------------
+
+def process_interlocking():
+    if signal_box is not None:
+        signal_boxes.process_interlocking()
+        signal_boxes.send_boundary_state()
+    else:
+        interlocking.process_interlocking_east()
+        interlocking.process_interlocking_west()
+    return()
+
+#----------------------------------------------------------------------
+# Function to pass a change to the layout on to the automatic signals and
+# the timetable (if selected) - to be called before the change is saved
+#----------------------------------------------------------------------
+
+def process_layout_changes():
+    if automatic_signal_working: automatic_signals.process_changes() # the automatic signals follow the sections
+    if timetable_file is not None: timetable_runner.process_changes() # set any routes that are now available
+    return()
+
+#----------------------------------------------------------------------
+# Function to save the state of the layout following a change (so it can be
+# restored on a restart) - and to record the change in the session history
+# (if selected) so the session can be analysed afterwards
+#----------------------------------------------------------------------
+
+def save_layout_state():
+    snapshot.save_layout_state()
+    if record_session_history: session_history.record_changes()
+    return()
+
+#----------------------------------------------------------------------
+# Function to bring the schematic up to date following a change - in the
+# low power profile the redraws are capped (and skipped if the points and
+# switches haven't changed). Set force once the colours have been changed
+#----------------------------------------------------------------------
+
+def update_schematic(force=False):
+    if low_power_profile: low_power.request_schematic_update(canvas,force)
+    else: schematic.update_track_schematic(canvas)
+    return()
+
 #----------------------------------------------------------------------
 # These are the callback functions for the Controls
 #----------------------------------------------------------------------
 
 def switch_button(switch_id,button_id):
 #    print ("***** CALLBACK - Power Section Switch "+str(switch_id)+", button "+str(button_id))
+    start_time = time.perf_counter()
     # A "track power section" switch change
-    schematic.update_track_schematic(canvas) # to reflect any track power section changes
+    if control_process_enabled and panel_client.send_switch_change(switch_id):
+        return()
+    if background_evaluation_enabled:
+        background_evaluation.request_evaluation()
+        return()
+    power_switches.update_track_power_section_switches() # sections on a cleared route stay switched on (unless manual power switching is selected)
+    update_schematic() # to reflect any track power section changes
+    process_layout_changes() # the automatic signals and the timetable follow the change
+    save_layout_state() # save the change so it can be restored on a restart
+    if layout_logging.enabled(logging.DEBUG):
+        layout_logging.log_event("switch_callback", logging.DEBUG, switch=switch_id, button=button_id,
+                                 ms=round(1000.0*(time.perf_counter()-start_time),3))
     return()
 
 def sections_callback_function(section_id,callback_type):
 #    print ("***** CALLBACK - Track Occupancy Section "+str(section_id)+" : "+str(callback_type))
+    start_time = time.perf_counter()
     # Will be a "track occupancy" switch change 
+    if control_process_enabled and panel_client.send_section_change(section_id):
+        return()
+    if background_evaluation_enabled:
+        background_evaluation.request_evaluation()
+        return()
     sections.override_signals_based_on_track_occupancy() # to reflect any manual track occupancy changes
     sections.refresh_signal_aspects() # Ensure any aspect changes are reflected back along the route
+    if signal_box is not None: signal_boxes.send_boundary_state() # sections are shared with the other boxes
+    process_layout_changes() # the automatic signals and the timetable follow the change
+    save_layout_state() # save the change so it can be restored on a restart
+    if layout_logging.enabled(logging.DEBUG):
+        layout_logging.log_event("section_callback", logging.DEBUG, section=section_id,
+                                 ms=round(1000.0*(time.perf_counter()-start_time),3))
     return()
 
 def point_callback_function(point_id,callback_type):
 #    print ("***** CALLBACK - Point " + str(point_id) + " : " + str(callback_type))
+    start_time = time.perf_counter()
+    if control_process_enabled and panel_client.send_point_change(point_id):
+        return()
+    if background_evaluation_enabled:
+        background_evaluation.request_evaluation()
+        return()
     sections.override_signals_based_on_track_occupancy() # to reflect any route changes
     sections.refresh_signal_aspects() # Ensure any aspect changes are reflected back along the route
     power_switches.update_track_power_section_switches() # sections auto switched on point & signal settings
-    schematic.update_track_schematic(canvas) # To reflect any route changes 
-    interlocking.process_interlocking_east()
-    interlocking.process_interlocking_west()
+    update_schematic() # To reflect any route changes 
+    process_interlocking()
+    process_layout_changes() # the automatic signals and the timetable follow the change
+    save_layout_state() # save the change so it can be restored on a restart
+    if layout_logging.enabled(logging.DEBUG):
+        layout_logging.log_event("point_callback", logging.DEBUG, point=point_id,
+                                 ms=round(1000.0*(time.perf_counter()-start_time),3))
     return()
 
 def signal_callback_function(sig_id,callback_type):
 #    print ("***** CALLBACK - Signal " + str(sig_id) + " : " + str(callback_type))
+    start_time = time.perf_counter()
+    if control_process_enabled:
+        if callback_type == model_railway_signals.sig_callback_type.sig_passed:
+            if panel_client.send_signal_passed(sig_id): return()
+        elif callback_type in (model_railway_signals.sig_callback_type.sig_switched,
+                               model_railway_signals.sig_callback_type.sub_switched):
+            if panel_client.send_signal_change(sig_id): return()
+        else:
+            return()
     if callback_type == model_railway_signals.sig_callback_type.sig_passed:
+        safety_events.note_signal_passed(sig_id) # the signal is expected to be overridden
         sections.update_track_occupancy(sig_id) # update route occupancy sections as signal is passed
-        sections.override_signals_based_on_track_occupancy() # to reflect any route occupancy changes
+        if not background_evaluation_enabled:
+            sections.override_signals_based_on_track_occupancy() # to reflect any route occupancy changes
+    if background_evaluation_enabled:
+        background_evaluation.request_evaluation()
+        return()
+    sections.refresh_signal_aspects() # Ensure any aspect changes are reflected back along the route
+    power_switches.update_track_power_section_switches() # sections auto switched on point & signal settings
+    update_schematic() # to reflect any track power section changes 
+    process_interlocking()
+    process_layout_changes() # the automatic signals and the timetable follow the change
+    save_layout_state() # save the change so it can be restored on a restart
+    if layout_logging.enabled(logging.DEBUG):
+        layout_logging.log_event("signal_callback", logging.DEBUG, signal=sig_id,
+                                 ms=round(1000.0*(time.perf_counter()-start_time),3))
+    return()
+
+# Called (on the tkinter thread) once a background evaluation has been applied
+def background_evaluation_applied():
+    update_schematic() # to reflect any route or power section changes
+    process_layout_changes() # the automatic signals and the timetable follow the change
+    save_layout_state() # save the change so it can be restored on a restart
+    return()
+
+# Called (on the tkinter thread) once changes from another signal box have been applied
+def signal_box_changes_received():
+    sections.override_signals_based_on_track_occupancy() # to reflect any route occupancy changes
     sections.refresh_signal_aspects() # Ensure any aspect changes are reflected back along the route
     power_switches.update_track_power_section_switches() # sections auto switched on point & signal settings
-    schematic.update_track_schematic(canvas) # to reflect any track power section changes 
-    interlocking.process_interlocking_east()
-    interlocking.process_interlocking_west()
+    update_schematic() # to reflect any route or power section changes
+    process_interlocking()
+    process_layout_changes() # the automatic signals and the timetable follow the change
+    save_layout_state() # save the change so it can be restored on a restart
+    return()
+
+# Called (on the tkinter thread) once all the points being thrown have reported in
+def points_set(point_ids):
+    if background_evaluation_enabled: background_evaluation.request_evaluation()
+    else: process_interlocking() # the routes over the points can now be set
+    if timetable_file is not None: timetable_runner.points_reported(point_ids)
+    return()
+
+# Called (on the tkinter thread) when F5 is pressed - to reload any rules or layout definitions that have changed
+def reload_layout(event):
+    changes = hot_reload.reload_changed_modules(use_generated_rules and generated_rules is not None)
+    if not changes: return()
+    if use_generated_rules and generated_rules is not None:
+        # The generated rules are used in place of the hand written rules (just as at startup)
+        rule_compiler.install_generated_rules(generated_rules,interlocking,sections,power_switches)
+        if rule_compiler.generated_module_name in changes:
+            if automatic_signal_working: automatic_signals.install_filters([generated_rules])
+            if point_throw_sequencing: point_sequencer.install_filters([generated_rules])
+    if control_process_enabled:
+        update_schematic(force=True) # the control process has its own rules
+    elif background_evaluation_enabled:
+        background_evaluation.request_evaluation()
+    else:
+        sections.override_signals_based_on_track_occupancy()
+        sections.refresh_signal_aspects()
+        power_switches.update_track_power_section_switches()
+        update_schematic(force=True)
+        process_interlocking()
+        process_layout_changes()
+        save_layout_state()
+    return()
+
+# Called (on the tkinter thread) once the panel has mirrored a change from the control process
+def control_process_state_mirrored():
+    if automatic_signal_working: automatic_signals.process_changes() # the automatic signals follow the sections
+    sections.refresh_signal_aspects() # Ensure any aspect changes are reflected back along the route
+    update_schematic() # to reflect any route or power section changes
+    return()
+
+# Called (on the tkinter thread) if the control process is lost - the panel carries on from the state it last mirrored
+def control_process_lost():
+    global control_process_enabled
+    control_process_enabled = False
+    snapshot.start_saving() # carry on saving from where the control process left off
+    safety_events.start_safety_events(window,canvas,[snapshot])
+    sections.override_signals_based_on_track_occupancy()
+    sections.refresh_signal_aspects()
+    power_switches.update_track_power_section_switches()
+    update_schematic(force=True)
+    process_interlocking()
     return()
 
 #------------------------------------------------------------------------------------
 # This is where the code begins
 #------------------------------------------------------------------------------------
 
+# Start the logging (written out on a background thread)
+layout_logging.start_logging(log_level,log_file)
+
+startup_profile.phase_complete("imports")
+
+# Use the rules compiled from 'rule_spec' in place of the hand written rules (if selected)
+# The module is only regenerated (and recompiled) if the rules have changed
+if use_generated_rules:
+    import rule_compiler
+    import rule_evaluator
+    generated_rules = rule_compiler.load_generated_rules()
+    if generated_rules is not None:
+        rule_compiler.install_generated_rules(generated_rules,interlocking,sections,power_switches)
+        rule_evaluator.use_generated_rules = True
+    startup_profile.phase_complete("generated rules")
+
+# Each signal box keeps its own saved state (so they can share a directory)
+if signal_box is not None:
+    import signal_boxes
+    if signal_box not in signal_boxes.signal_boxes:
+        print ("ERROR: signal box '"+signal_box+"' does not exist")
+        print ("Usage: python3 my_layout.py [signal_box] - where signal_box is one of: "+", ".join(signal_boxes.signal_boxes))
+        # The library leaves threads running so we can't just return
+        sys.stdout.flush()
+        os._exit(1)
+    snapshot.snapshot_file = "layout_state_"+signal_box+".json"
+    snapshot.journal_file = "layout_state_"+signal_box+".journal"
+
+# Start the control process (if selected) before we create the panel
+if control_process_enabled:
+    import panel_client
+    print ("Starting Control Process")
+    panel_client.connect_to_control_process()
+
 # Create the Window and canvas
 print ("Creating Window and Canvas")
 window = Tk()
 window.attributes('-fullscreen', fullScreenState)  
-window.title("My Model Railway")
+window.title("My Model Railway" if signal_box is None else "My Model Railway - "+signal_box+" box")
 window.bind("<F11>", toggleFullScreen)
 window.bind("<Escape>", quitFullScreen)
 frame = Frame(window)
 frame.pack(fill=BOTH, expand=YES)
 canvas = ResizingCanvas(frame,highlightthickness=0,height=1000,width=1900)
 canvas.pack(fill=BOTH, expand=YES) 
+startup_profile.phase_complete("window creation")
+
+# Use the low power profile (if selected) - it is started once everything else has been started
+if low_power_profile or report_cpu_usage:
+    import low_power
 
 print ("Creating Layout Schematic")
 # Draw the Schematic track plan (creating points as required)
 # Create the Signals on the Schematic track plan
 schematic.create_track_schematic(canvas,point_callback_function,fpl_enabled=fpl_enabled)
+startup_profile.phase_complete("schematic")
 schematic.create_layout_signals(canvas,signal_callback_function)
+startup_profile.phase_complete("signals")
 
 # Create the section Switches and track occupancy switches for the layout
 power_switches.create_section_switches(canvas,switch_button)
 sections.create_track_occupancy_switches(canvas,sections_callback_function)
+startup_profile.phase_complete("switches")
 
 # Set the initial interlocking conditions and signal aspects
 interlocking.set_initial_interlocking_conditions()
+startup_profile.phase_complete("initial interlocking")
 sections.refresh_signal_aspects()
+startup_profile.phase_complete("first refresh_signal_aspects")
+
+# Restore the state of the last session (in a single batch before the window
+# is drawn) and then refresh everything that depends on it in a single pass
+if restore_last_session and not control_process_enabled and snapshot.restore_layout_state():
+    print ("Restored Layout State from last session")
+    sections.override_signals_based_on_track_occupancy()
+    sections.refresh_signal_aspects()
+    power_switches.update_track_power_section_switches()
+    schematic.update_track_schematic(canvas)
+    process_interlocking()
+startup_profile.phase_complete("restore last session")
+
+# Start the background evaluation of the layout rules (if selected)
+if background_evaluation_enabled:
+    import background_evaluation
+    background_evaluation.start_background_evaluation(window,background_evaluation_applied)
+
+# Start running as one of the signal boxes (if selected)
+if signal_box is not None:
+    rule_modules = [interlocking,sections]
+    if use_generated_rules and generated_rules is not None: rule_modules.append(generated_rules)
+    signal_boxes.start_signal_box(signal_box,window,signal_box_changes_received,rule_modules)
+
+# Mirror the state of the control process onto the panel (if selected)
+if control_process_enabled:
+    panel_client.start_mirroring(window,control_process_state_mirrored,control_process_lost)
+
+# Start the safety event stream (not needed if the control process runs the rules)
+if not control_process_enabled:
+    safety_events.start_safety_events(window,canvas,[snapshot])
+
+# Record the history of the session (if selected) - starting from the restored state
+if record_session_history and not control_process_enabled:
+    import session_history
+    session_history.start_history()
+else:
+    record_session_history = False
+
+# Work the automatic signals by their state machines (if selected) rather than from the rules
+# Not for the signal boxes - where the rules are shared between the boxes
+if automatic_signal_working and signal_box is None:
+    import automatic_signals
+    rule_modules = [sections]
+    if use_generated_rules and generated_rules is not None: rule_modules.append(generated_rules)
+    if background_evaluation_enabled: rule_modules.append(background_evaluation)
+    if control_process_enabled: rule_modules.append(panel_client)
+    automatic_signals.start_automatic_signals(window,signal_callback_function,rule_modules)
+else:
+    automatic_signal_working = False
+
+# Stagger the point motor throws (if selected) - not needed if the control process runs the rules
+if point_throw_sequencing and not control_process_enabled:
+    import point_sequencer
+    rule_modules = [interlocking]
+    if use_generated_rules and generated_rules is not None: rule_modules.append(generated_rules)
+    if background_evaluation_enabled: rule_modules.append(background_evaluation)
+    point_sequencer.start_point_sequencer(window,points_set,rule_modules)
+else:
+    point_throw_sequencing = False
+
+# Run the timetable (if selected) - the routes are set through the panel callbacks
+if timetable_file is not None and not control_process_enabled:
+    import timetable_runner
+    safety_events.install_filters([timetable_runner]) # a point moved while locked is published
+    print ("Queued "+str(timetable_runner.load_timetable(timetable_file))+" route requests from "+timetable_file)
+    timetable_runner.start_timetable_runner(point_callback_function,signal_callback_function)
+else:
+    timetable_file = None
+
+# Reload the rules and layout definitions that have changed when F5 is pressed (if selected)
+if hot_reload_enabled:
+    import hot_reload
+    hot_reload.start_hot_reload(use_generated_rules and generated_rules is not None)
+    window.bind("<F5>", reload_layout)
+
+# Make the panel zoomable (if selected)
+if zoomable_panel:
+    viewport.start_viewport(window,canvas)
+
+# Cap the redraws, back off the polling when idle and batch the DCC signal commands (if selected)
+if low_power_profile:
+    low_power.start_low_power(window,canvas)
+
+startup_profile.phase_complete("optional subsystems")
+
+#----------------------------------------------------------------------
+# Anything that isn't needed to operate the panel is left until the panel
+# has been drawn (so the panel can be used as soon as possible)
+#----------------------------------------------------------------------
+
+def start_deferred_subsystems():
+    startup_profile.phase_complete("panel drawn")
+    # Serve the read-only web mimic of the panel (if selected)
+    if web_mimic_port is not None:
+        import web_mimic
+        web_mimic.start_web_mimic(window,canvas,web_mimic_port,web_mimic_host)
+    # Report the number of drawing objects and the redraw timings (if selected)
+    if report_schematic_timings:
+        print ("Schematic: "+str(schematic.measure_track_schematic(canvas)))
+    startup_profile.phase_complete("deferred subsystems")
+    if report_startup_timings: startup_profile.report_startup_timings()
+    # Measure the CPU time used from here on (if selected)
+    if report_cpu_usage: low_power.start_cpu_usage(window)
+    return()
+
+window.after_idle(start_deferred_subsystems)
 
 print ("Entering Main Loop")
 # Tag all the drawing objects to enable them to be resized when
@@ -125,4 +475,19 @@ print ("Entering Main Loop")
 canvas.addtag_all("all")
 window.mainloop()
 
+if control_process_enabled:
+    panel_client.disconnect_from_control_process()
+
+if record_session_history:
+    session_history.stop_history()
+
+if low_power_profile:
+    low_power.stop_low_power()
+
+if report_cpu_usage:
+    low_power.report_cpu_usage()
+
+# Write out anything still waiting to be logged
+layout_logging.stop_logging()
+
 
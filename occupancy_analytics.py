@@ -0,0 +1,241 @@
+#----------------------------------------------------------------------
+# This Module analyses the history of the layout (see 'session_history')
+# to help with tuning the timetable:
+#   - the utilisation of each track occupancy section (the proportion of
+#     the time the layout was running that the section was occupied)
+#   - the dwell times in the platforms
+#   - the headways (time between trains) on the up and down main lines
+#   - the time lost by trains waiting at signals showing danger (the time
+#     a signal is at danger while a section approaching it is occupied)
+#
+# The history is read straight into numpy arrays and all the calculations
+# are done on whole columns at once (rather than a record at a time) so
+# even the history of several days can be analysed in well under a second.
+# The sections approaching each signal are found from the rules themselves
+# (the sections that are cleared when the signal is passed - see
+# 'rule_evaluator') so nothing needs changing here if the rules change.
+#
+# numpy is needed for this module (pip install numpy)
+#
+# To run: python3 occupancy_analytics.py [history_file] [results_file]
+# (the results can also be saved as JSON for use elsewhere)
+#----------------------------------------------------------------------
+
+import history_export
+import rule_evaluator
+import sections
+import session_history
+import snapshot
+
+import json
+import os
+import sys
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# The platform sections (for the dwell times)
+platform_sections = (sections.occupied_down_platform, sections.occupied_up_platform,
+                     sections.occupied_branch_platform)
+
+# The sections trains enter at the start of each main line (for the headways)
+main_line_sections = {"down_main": sections.occupied_down_east,
+                      "up_main": sections.occupied_up_west}
+
+# The names of the sections (taken from the 'sections' module)
+section_names = {item_id: name for (kind, item_id), name in session_history.item_names().items()
+                 if kind == session_history.history_kinds.index("section")}
+
+#----------------------------------------------------------------------
+# Internal function to read the history file - returns the records sorted
+# into time order (as a numpy structured array with a column for each field)
+#----------------------------------------------------------------------
+
+def read_history(history_file:str):
+    records = np.fromfile(history_file, dtype=history_export.record_type)
+    return(records[np.argsort(records["time"], kind="stable")])
+
+#----------------------------------------------------------------------
+# Internal function to split the records into the changes of value of each
+# item. Returns {(kind, item_id): (times, values)} - where only the records
+# that change the value of the item are kept (every value is recorded again
+# at the start of each session)
+#----------------------------------------------------------------------
+
+def split_into_items(records):
+    order = np.lexsort((records["time"], records["id"], records["kind"]))
+    records = records[order]
+    keys = records["kind"].astype(np.int64) * 65536 + records["id"]
+    starts = np.flatnonzero(np.diff(keys, prepend=-1))
+    ends = np.append(starts[1:], len(records))
+    items = {}
+    for start, end in zip(starts, ends):
+        times, values = records["time"][start:end], records["value"][start:end]
+        changed = np.diff(values, prepend=values[0] - 1) != 0
+        items[(int(records["kind"][start]), int(records["id"][start]))] = (times[changed], values[changed])
+    return(items)
+
+#----------------------------------------------------------------------
+# Internal functions for "step functions" - an item's (times, values) where
+# each value holds from its time until the next. A value before the first
+# time (or for an item with no records at all) is taken as zero
+#----------------------------------------------------------------------
+
+def values_at(step_function, times):
+    step_times, step_values = step_function
+    if len(step_values) == 0: return(np.zeros(np.shape(times), dtype=np.int16))
+    index = np.searchsorted(step_times, times, side="right") - 1
+    return(np.where(index >= 0, step_values[np.maximum(index, 0)], 0))
+
+def inverted(step_function):
+    return(step_function[0], 1 - step_function[1])
+
+def any_of(step_functions:list):
+    times = np.unique(np.concatenate([step_function[0] for step_function in step_functions]))
+    values = np.zeros(len(times), dtype=np.int16)
+    for step_function in step_functions:
+        values = np.maximum(values, values_at(step_function, times))
+    return(times, values)
+
+def time_when_all(step_functions:list, end_time:float):
+    # The total time (up to the end time) for which all the values are non zero
+    times = np.unique(np.concatenate([step_function[0] for step_function in step_functions]))
+    all_set = np.ones(len(times), dtype=bool)
+    for step_function in step_functions:
+        all_set &= values_at(step_function, times) != 0
+    durations = np.diff(np.append(times, end_time))
+    return(float(np.sum(durations[all_set])))
+
+#----------------------------------------------------------------------
+# Internal function to return the times an item was set (e.g. a section
+# became occupied) and how long it stayed set for - up to the end of the
+# session at the latest (the stop times are the end of each session)
+#----------------------------------------------------------------------
+
+def set_intervals(step_function, stop_times, end_time:float):
+    times, values = step_function
+    index = np.flatnonzero(values != 0)
+    stop_times = np.append(stop_times, end_time)
+    latest_ends = stop_times[np.minimum(np.searchsorted(stop_times, times[index]), len(stop_times) - 1)]
+    ends = np.minimum(np.append(times, end_time)[index + 1], latest_ends)
+    return(times[index], ends - times[index])
+
+def summarise(values):
+    if len(values) == 0: return({"count": 0})
+    return({"count": int(len(values)), "mean": round(float(np.mean(values)), 1),
+            "p50": round(float(np.percentile(values, 50)), 1),
+            "p95": round(float(np.percentile(values, 95)), 1),
+            "max": round(float(np.max(values)), 1)})
+
+#----------------------------------------------------------------------
+# Externally called function to find the sections approaching each signal
+# (the sections cleared when the signal is passed with all the sections
+# occupied - for all points normal and all points switched)
+# Returns {sig_id: [section_ids]}
+#----------------------------------------------------------------------
+
+def find_approach_sections():
+    evaluator = rule_evaluator.create_evaluator()
+    approach_sections = {}
+    for points_switched in (False, True):
+        state = snapshot.default_layout_state()
+        for point_id in state["points"].keys(): state["points"][point_id][0] = points_switched
+        for section_id in state["sections"].keys(): state["sections"][section_id] = True
+        for sig_id in snapshot.signal_ids:
+            outputs = rule_evaluator.evaluate_signal_passed(evaluator, state, sig_id)
+            cleared = [int(section_id) for section_id, occupied in outputs["sections"].items() if not occupied]
+            approach_sections.setdefault(sig_id, set()).update(cleared)
+    return({sig_id: sorted(section_ids) for sig_id, section_ids in approach_sections.items() if section_ids})
+
+#----------------------------------------------------------------------
+# Externally called function to analyse a history file. Returns the results
+# as a dictionary (see the top of this module). If include_samples is True
+# then the individual dwell times and headways are also returned
+#----------------------------------------------------------------------
+
+def analyse_history(history_file:str=None, include_samples:bool=False):
+
+    if np is None:
+        print ("ERROR: analyse_history - numpy is needed to analyse the history (pip install numpy)")
+        return(None)
+    if history_file is None: history_file = session_history.history_file
+    records = read_history(history_file)
+    if len(records) == 0:
+        print ("ERROR: analyse_history - there is no history in "+history_file)
+        return(None)
+
+    kind = {name: index for index, name in enumerate(session_history.history_kinds)}
+    items = split_into_items(records)
+    end_time = float(records["time"][-1])
+    no_changes = (np.zeros(0), np.zeros(0, dtype=np.int16))
+    running = items.get((kind["session"], 0), (records["time"][:1], np.ones(1, dtype=np.int16)))
+    running_time = time_when_all([running], end_time)
+    results = {"start": float(records["time"][0]), "end": end_time, "records": int(len(records)),
+               "running_hours": round(running_time / 3600.0, 2),
+               "utilisation": {}, "dwell_times": {}, "headways": {}, "time_lost_at_danger": {}}
+
+    # Section utilisation - only while the layout was running
+    for section_id in snapshot.section_ids:
+        section = items.get((kind["section"], section_id), no_changes)
+        occupied_time = time_when_all([section, running], end_time)
+        results["utilisation"][section_names[section_id]] = round(occupied_time / running_time, 3) if running_time else 0.0
+
+    # Dwell times in the platforms
+    session_starts = running[0][running[1] != 0]
+    session_ends = running[0][running[1] == 0]
+    for section_id in platform_sections:
+        entry_times, dwell_times = set_intervals(items.get((kind["section"], section_id), no_changes), session_ends, end_time)
+        results["dwell_times"][section_names[section_id]] = summarise(dwell_times)
+        if include_samples: results["dwell_times"][section_names[section_id]]["samples"] = dwell_times.tolist()
+
+    # Headways on the main lines - not counting the gaps between sessions
+    for line_name, section_id in main_line_sections.items():
+        entry_times, dwell_times = set_intervals(items.get((kind["section"], section_id), no_changes), session_ends, end_time)
+        sessions = np.searchsorted(session_starts, entry_times, side="right")
+        headways = np.diff(entry_times)[np.diff(sessions) == 0]
+        results["headways"][line_name] = summarise(headways)
+        if include_samples: results["headways"][line_name]["samples"] = headways.tolist()
+
+    # Time lost at signals at danger while the sections approaching them are occupied
+    for sig_id, section_ids in find_approach_sections().items():
+        approach = any_of([items.get((kind["section"], section_id), no_changes) for section_id in section_ids])
+        at_danger = inverted(items.get((kind["signal"], sig_id), no_changes))
+        results["time_lost_at_danger"][str(sig_id)] = round(time_when_all([approach, at_danger, running], end_time), 1)
+
+    return(results)
+
+#----------------------------------------------------------------------
+# Externally called function to print the results of the analysis
+#----------------------------------------------------------------------
+
+def print_report(results:dict):
+    print ("History: "+str(results["records"])+" records  Running: "+str(results["running_hours"])+" hours")
+    print ("Section utilisation:")
+    for name, utilisation in results["utilisation"].items():
+        print ("  "+format(name, "<18")+format(100.0 * utilisation, "6.1f")+" %")
+    print ("Platform dwell times (s):")
+    for name, summary in results["dwell_times"].items():
+        print ("  "+format(name, "<18")+str({key: value for key, value in summary.items() if key != "samples"}))
+    print ("Headways (s):")
+    for name, summary in results["headways"].items():
+        print ("  "+format(name, "<18")+str({key: value for key, value in summary.items() if key != "samples"}))
+    print ("Time lost at danger (s):")
+    for sig_id, lost_time in results["time_lost_at_danger"].items():
+        if lost_time > 0: print ("  Signal "+format(sig_id, "<11")+format(lost_time, "8.1f"))
+    return()
+
+if __name__ == "__main__":
+    history_file = sys.argv[1] if len(sys.argv) > 1 else session_history.history_file
+    results = analyse_history(history_file, include_samples=len(sys.argv) > 2)
+    if results is not None:
+        print_report(results)
+        if len(sys.argv) > 2:
+            with open(sys.argv[2], "w") as file: json.dump(results, file, indent=1)
+            print ("Results saved to "+sys.argv[2])
+    # The library leaves threads running so we can't just return
+    sys.stdout.flush()
+    os._exit(0)
+
+###############################################################################
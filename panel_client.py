@@ -0,0 +1,202 @@
+#----------------------------------------------------------------------
+# This Module turns the tkinter panel into a "thin client" for the control
+# process (see 'control_process'). User changes on the panel are sent to the
+# control process as commands and the panel then mirrors the authoritative
+# state that the control process publishes in shared memory. The panel only
+# has to draw - all the control logic is in the other process (and so can
+# run on another core of the Pi)
+#
+# If the control process is lost (a command can't be sent, it exits or it
+# stops part way through writing the shared state) the panel stops mirroring
+# and the lost_callback is made - so the panel can evaluate the rules itself
+# from the state it last mirrored
+#----------------------------------------------------------------------
+
+from model_railway_signals import *
+import control_process
+import power_switches
+import snapshot
+
+from multiprocessing import connection
+from multiprocessing import resource_tracker
+from multiprocessing import shared_memory
+import os
+import subprocess
+import sys
+import time
+
+# How often the panel checks the shared memory for changes (in milliseconds)
+poll_interval = 20
+
+# Global variables for the connection to the control process
+control = None               # The control process (if we started it)
+control_connection = None
+memory = None
+last_sequence = -1           # The sequence number of the last state we mirrored
+timed_signal_counts: dict = {}
+tkinter_window = None
+refresh_callback = None
+lost_callback = None
+control_lost = False
+
+#----------------------------------------------------------------------
+# Externally called function to start the control process (if it isn't
+# already running) and connect to it. Should be called before the panel is
+# created. We keep trying to connect until the control process is ready.
+# A control process we start is given a new random key for the session - to
+# connect to one that is already running, its key must be given in the
+# environment variable (see 'control_process')
+#----------------------------------------------------------------------
+
+def connect_to_control_process(start_process:bool=True, timeout:float=10.0):
+
+    global control, control_connection, memory
+
+    if start_process:
+        control_process.control_authkey = os.urandom(32)
+        environment = dict(os.environ)
+        environment[control_process.authkey_variable] = control_process.control_authkey.hex()
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "control_process.py")
+        control = subprocess.Popen([sys.executable, script], env=environment)
+    elif control_process.control_authkey is None:
+        print ("ERROR: connect_to_control_process - no key in "+control_process.authkey_variable)
+        raise KeyError(control_process.authkey_variable)
+    start_time = time.time()
+    while control_connection is None:
+        try:
+            control_connection = connection.Client(control_process.control_address,
+                                    authkey=control_process.control_authkey)
+        except ConnectionRefusedError:
+            if time.time() - start_time > timeout:
+                print ("ERROR: connect_to_control_process - control process is not responding")
+                raise
+            time.sleep(0.1)
+    memory = shared_memory.SharedMemory(name=control_process.shared_memory_name)
+    # The block belongs to the control process - stop python from removing it
+    # when the panel exits (it registers the block even though we only attach)
+    resource_tracker.unregister(memory._name, "shared_memory")
+    return()
+
+#----------------------------------------------------------------------
+# Internal function to note that the control process has been lost - we
+# stop mirroring and the lost_callback is made (once only)
+#----------------------------------------------------------------------
+
+def lose_control_process(reason:str):
+    global control_lost
+    if not control_lost:
+        control_lost = True
+        print ("ERROR: Control process lost ("+reason+") - the rules are now evaluated by the panel")
+        if lost_callback is not None: lost_callback()
+    return()
+
+#----------------------------------------------------------------------
+# Externally called functions to send the user changes to the control
+# process (the current state of the item on the panel is sent). Return
+# False if the change couldn't be sent (the control process has been lost)
+#----------------------------------------------------------------------
+
+def send_command(command:tuple):
+    if not control_lost:
+        try:
+            control_connection.send(command)
+        except (OSError, ValueError) as error:
+            lose_control_process("could not send "+command[0]+" change - "+str(error))
+    return(not control_lost)
+
+def send_point_change(point_id:int):
+    return(send_command(("points", point_id, [point_switched(point_id), fpl_active(point_id)])))
+
+def send_signal_change(sig_id:int):
+    return(send_command(("signals", sig_id, [signal_clear(sig_id), subsidary_clear(sig_id)])))
+
+def send_signal_passed(sig_id:int):
+    return(send_command(("sig_passed", sig_id)))
+
+def send_section_change(section_id:int):
+    return(send_command(("sections", section_id, section_occupied(section_id))))
+
+def send_switch_change(switch_id:int):
+    return(send_command(("switches", switch_id, [power_switches.switch_active(switch_id,1),
+                                                 power_switches.switch_active(switch_id,2)])))
+
+#----------------------------------------------------------------------
+# Internal function to mirror the published state onto the panel. Items
+# are only changed if they differ. Locks are applied before unlocks and
+# any new timed signal triggers are then made. Returns True if the state
+# has changed since we last mirrored it
+#----------------------------------------------------------------------
+
+def mirror_shared_state():
+
+    global last_sequence
+
+    sequence, data = control_process.read_shared_state(memory)
+    if sequence is None:
+        lose_control_process("the shared state is never finished being written")
+        return(False)
+    if sequence == last_sequence: return(False)
+    last_sequence = sequence
+    state, outputs, timed = control_process.decode_layout_state(data)
+
+    for group, lock_function in (("signal_locks", lock_signal), ("subsidary_locks", lock_subsidary),
+                        ("point_locks", lock_point), ("overrides", set_signal_override)):
+        for item_id, locked in outputs[group].items():
+            if locked: lock_function(int(item_id))
+    snapshot.apply_layout_state(state)
+    for group, unlock_function in (("signal_locks", unlock_signal), ("subsidary_locks", unlock_subsidary),
+                        ("point_locks", unlock_point), ("overrides", clear_signal_override)):
+        for item_id, locked in outputs[group].items():
+            if not locked: unlock_function(int(item_id))
+
+    for sig_id, (count, start_delay, time_delay) in timed.items():
+        # The first time we see the counts we just take them as they are
+        if sig_id in timed_signal_counts.keys() and timed_signal_counts[sig_id] != count:
+            trigger_timed_signal(int(sig_id), start_delay, time_delay)
+        timed_signal_counts[sig_id] = count
+    return(True)
+
+#----------------------------------------------------------------------
+# Internal function to poll the shared memory (runs on the tkinter thread)
+# until the control process is lost
+#----------------------------------------------------------------------
+
+def poll_shared_state():
+    if control is not None and control.poll() is not None:
+        lose_control_process("exited with code "+str(control.returncode))
+    elif mirror_shared_state():
+        refresh_callback()
+    if not control_lost: tkinter_window.after(poll_interval, poll_shared_state)
+    return()
+
+#----------------------------------------------------------------------
+# Externally called function to mirror the current state onto the panel
+# (before the window is first drawn) and then keep it mirrored. The
+# refresh_callback is made following every change (to redraw the signal
+# aspects and the schematic) and the lost_callback if the control process
+# is lost
+#----------------------------------------------------------------------
+
+def start_mirroring(window, callback, control_lost_callback=None):
+
+    global tkinter_window, refresh_callback, lost_callback
+
+    tkinter_window = window
+    refresh_callback = callback
+    lost_callback = control_lost_callback
+    poll_shared_state()
+    return()
+
+#----------------------------------------------------------------------
+# Externally called function to shut down the control process (if we
+# started it) - to be called when the panel is closed
+#----------------------------------------------------------------------
+
+def disconnect_from_control_process():
+    if control is not None:
+        if send_command(("quit",)): control.wait()
+    control_connection.close()
+    memory.close()
+    return()
+
+###############################################################################
@@ -0,0 +1,172 @@
+#----------------------------------------------------------------------
+# This Module staggers the point motor throws. Setting a route can throw
+# several points (and their "also_switch" points 101-110) at once - each a
+# DCC command on the bus and a solenoid pulse on a point motor feed. The
+# throws are queued here and sent in order, with no more than a given
+# number in progress at once on the DCC bus (and on each point motor feed).
+#
+# Each throw is in progress until the point "reports in" - 'throw_time'
+# milliseconds after it was sent (or when 'point_reported' is called, for
+# points with feedback - set 'throw_time' to None for these). Until all the
+# points being thrown have reported in, the signals reading from them stay
+# locked - the unlocks made by the interlocking for these signals are held
+# back (see 'install_filters'). Signals that are already cleared are left
+# alone (so the signalman can always put them back to danger). Once all the
+# points have reported in the callback is made (so the interlocking can be
+# processed again) and the time taken to set the points is logged.
+#
+# The DCC commands are picked up by replacing the library's update_dcc_point
+# function - so points without a DCC mapping (or not on any of the feeds
+# below) are thrown immediately, just as before. The FPLs don't have DCC
+# commands (they are only on the panel) so they aren't sequenced.
+#----------------------------------------------------------------------
+
+from model_railway_signals import *
+from model_railway_signals import dcc_control
+import layout_logging
+import route_conflicts
+
+import logging
+import time
+
+# The point motor feeds - the points (including the "also_switch" points) on each
+point_feeds = {"west": (1,101,2,102,3,103,4,104,5,105),
+               "east": (6,106,7,8,108,9,109,10,110)}
+
+max_throws = 2           # change to the number of throws the DCC bus can have in progress at once
+max_throws_per_feed = 1  # change to the number of throws each point motor feed can have in progress at once
+throw_time = 250         # change to the time (in ms) for a point to throw (None if the points report in)
+
+# The "also_switch" points are switched with points 1-10 (and read by the same signals)
+paired_points = {point_id + 100: point_id for point_id in range(1, 11)}
+
+# Global variables for the sequencer
+feed_of_point: dict = {}       # {point_id: feed}
+signals_of_point: dict = {}    # {point_id: set of the signals with a route over the point}
+subsidary_signals = set()      # The signals with subsidaries (that have a route)
+queued_throws: list = []       # [[point_id, switched], ...] - in the order they were made
+throws_in_progress: dict = {}  # {point_id: feed}
+feed_throws: dict = {}         # {feed: number of throws in progress}
+moving_points: dict = {}       # {point_id: number of throws queued or in progress}
+sequence_points: list = []     # The points thrown since the last time all had reported in
+sequence_start = None
+send_dcc_point = None          # The library function to send the DCC command for a point
+tkinter_window = None
+points_set_callback = None
+
+#----------------------------------------------------------------------
+# Internal function to send the queued throws (in order) - as many as the
+# DCC bus and the point motor feeds allow
+#----------------------------------------------------------------------
+
+def send_queued_throws():
+    index = 0
+    while index < len(queued_throws) and len(throws_in_progress) < max_throws:
+        point_id, switched = queued_throws[index]
+        feed = feed_of_point[point_id]
+        if point_id in throws_in_progress or feed_throws.get(feed, 0) >= max_throws_per_feed:
+            index = index + 1
+        else:
+            del queued_throws[index]
+            throws_in_progress[point_id] = feed
+            feed_throws[feed] = feed_throws.get(feed, 0) + 1
+            send_dcc_point(point_id, switched)
+            if throw_time is not None: tkinter_window.after(throw_time, point_reported, point_id)
+    return()
+
+#----------------------------------------------------------------------
+# Internal function to queue a throw - this replaces the library function
+# to send the DCC command for a point (see 'start_point_sequencer')
+#----------------------------------------------------------------------
+
+def queue_point_throw(point_id:int, switched:bool):
+    global sequence_start
+    if point_id not in feed_of_point or not dcc_control.point_mapped(point_id):
+        send_dcc_point(point_id, switched)
+    else:
+        if not moving_points: sequence_start = time.perf_counter()
+        moving_points[point_id] = moving_points.get(point_id, 0) + 1
+        sequence_points.append(point_id)
+        queued_throws.append([point_id, switched])
+        # The signals reading from the point are locked until it has reported in
+        signals, subsidaries = held_signals(), held_signals(subsidary=True)
+        if signals: lock_signal(*signals)
+        if subsidaries: lock_subsidary(*subsidaries)
+        send_queued_throws()
+    return()
+
+#----------------------------------------------------------------------
+# Externally called function for a point to report in (called after the
+# throw time - or by the point feedback if the points report in)
+#----------------------------------------------------------------------
+
+def point_reported(point_id:int):
+    global sequence_points
+    if point_id not in throws_in_progress:
+        print ("ERROR: point_reported - Point "+str(point_id)+" is not being thrown")
+    else:
+        feed = throws_in_progress.pop(point_id)
+        feed_throws[feed] = feed_throws[feed] - 1
+        moving_points[point_id] = moving_points[point_id] - 1
+        if moving_points[point_id] == 0: del moving_points[point_id]
+        send_queued_throws()
+        if not moving_points:
+            point_ids, sequence_points = sequence_points, []
+            if layout_logging.enabled(logging.INFO):
+                layout_logging.log_event("points_set", logging.INFO, points=point_ids,
+                                         ms=round(1000.0*(time.perf_counter()-sequence_start),1))
+            points_set_callback(point_ids)
+    return()
+
+#----------------------------------------------------------------------
+# Externally called function to return the signals (or subsidaries) held
+# locked by the points that are still being thrown (those that are ON)
+#----------------------------------------------------------------------
+
+def held_signals(subsidary:bool=False):
+    signals = set()
+    for point_id in moving_points.keys():
+        signals.update(signals_of_point.get(paired_points.get(point_id, point_id), ()))
+    if subsidary: return(sorted(sig_id for sig_id in signals & subsidary_signals if not subsidary_clear(sig_id)))
+    return(sorted(sig_id for sig_id in signals if not signal_clear(sig_id)))
+
+#----------------------------------------------------------------------
+# Externally called function to hold back the signal (and subsidary)
+# unlocks made by the given modules (those that make the unlocks - e.g.
+# 'interlocking' or the generated rules) while points are being thrown.
+# The library functions in each module are replaced (in the same way as
+# 'rule_evaluator' does)
+#----------------------------------------------------------------------
+
+def install_filters(modules:list):
+    def filtered(function, subsidary:bool):
+        def filtered_function(*sig_ids:int):
+            if moving_points: sig_ids = [sig_id for sig_id in sig_ids if sig_id not in held_signals(subsidary)]
+            if sig_ids: function(*sig_ids)
+        return(filtered_function)
+    filters = {"unlock_signal": filtered(unlock_signal, False), "unlock_subsidary": filtered(unlock_subsidary, True)}
+    for module in modules:
+        for name, function in filters.items():
+            if name in module.__dict__: module.__dict__[name] = function
+    return()
+
+#----------------------------------------------------------------------
+# Externally called function to start the sequencer. The callback is made
+# (with the points thrown) once all the points being thrown have reported in
+#----------------------------------------------------------------------
+
+def start_point_sequencer(window, points_set_callback_function, modules:list):
+    global tkinter_window, points_set_callback, send_dcc_point
+    tkinter_window = window
+    points_set_callback = points_set_callback_function
+    for feed, point_ids in point_feeds.items():
+        for point_id in point_ids: feed_of_point[point_id] = feed
+    for sig_id, aspects, points in route_conflicts.station_routes.values():
+        for point_id in points.keys(): signals_of_point.setdefault(point_id, set()).add(sig_id)
+        if True in aspects: subsidary_signals.add(sig_id)
+    install_filters(modules)
+    send_dcc_point = dcc_control.update_dcc_point
+    dcc_control.update_dcc_point = queue_point_throw
+    return()
+
+###############################################################################
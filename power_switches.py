@@ -10,6 +10,8 @@ from tkinter import *
 import tkinter.font
 
 from model_railway_signals import *
+import layout_logging
+import logging
 
 # Global variables for the track power sections
 
@@ -58,7 +60,7 @@ def toggle_switch (switch_id:int,button_id:int, ext_callback=switch_null ):
 
     # Validate the switch exists 
     if not switch_exists(switch_id):
-        print ("ERROR: toggle_switch - Switch "+str(switch_id)+" does not exist")
+        layout_logging.log_event("switch_error", logging.ERROR, function="toggle_switch", switch=switch_id, error="does not exist")
     else:
 
         switch = switches[str(switch_id)]
@@ -114,9 +116,9 @@ def create_switch (canvas, switch_id:int, x:int, y:int, switch_callback = switch
 
     # Verify that a switch with the same ID does not already exist
     if switch_exists(switch_id):
-        print ("ERROR: create_switch - switch ID "+str(switch_id)+" already exists")
+        layout_logging.log_event("switch_error", logging.ERROR, function="create_switch", switch=switch_id, error="already exists")
     elif switch_id < 1:
-        print ("ERROR: create_switch - switch ID must be greater than zero")
+        layout_logging.log_event("switch_error", logging.ERROR, function="create_switch", switch=switch_id, error="ID must be greater than zero")
     else: # we're good to go on and create the switch
         
         # set the font size for the buttons
@@ -163,15 +165,15 @@ def switch_active (switch_id:int, button_id:int=1):
 
     # Validate the switch exists
     if not switch_exists(switch_id):
-        print ("ERROR: switch_active - switch "+str(switch_id)+" does not exist")
+        layout_logging.log_event("switch_error", logging.ERROR, function="switch_active", switch=switch_id, error="does not exist")
         switched = False
     else:   
         # get the switch that we are interested in
         switch = switches[str(switch_id)]
         #validate the button exists
         if str("button"+str(button_id)) not in switch.keys():
-            print ("ERROR: switch_actives - button "+str(button_id)+
-                   " does not exist for switch "+str(switch_id))
+            layout_logging.log_event("switch_error", logging.ERROR, function="switch_active", switch=switch_id,
+                                     button=button_id, error="button does not exist")
             switched = False
         else:
             switched = switch["switch"+str(button_id)]
@@ -186,7 +188,7 @@ def set_switch (switch_id:int,button_id:int=1):
 
     # Validate the switch exists
     if not switch_exists(switch_id):
-        print ("ERROR: set_switch - switch "+str(switch_id)+" does not exist")
+        layout_logging.log_event("switch_error", logging.ERROR, function="set_switch", switch=switch_id, error="does not exist")
     elif not switch_active(switch_id,button_id):
         toggle_switch (switch_id,button_id)
     return()
@@ -194,7 +196,7 @@ def set_switch (switch_id:int,button_id:int=1):
 def clear_switch (switch_id:int,button_id:int=1):
     # Validate the switch exists
     if not switch_exists(switch_id):
-        print ("ERROR: clear_switch - switch "+str(switch_id)+" does not exist")
+        layout_logging.log_event("switch_error", logging.ERROR, function="clear_switch", switch=switch_id, error="does not exist")
     if switch_active(switch_id,button_id):
         toggle_switch (switch_id,button_id)
     return()
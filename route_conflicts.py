@@ -0,0 +1,164 @@
+#----------------------------------------------------------------------
+# This Module holds the routes through the station and the conflicts
+# between them - used by 'interlocking' to lock signals against conflicting
+# movements (e.g. Signal 2 can't be cleared into platform 3 if signal 10
+# or 11 has already been cleared into platform 3 from the other end, or if
+# signal 6 has been cleared for a departure from platform 3 onto the branch)
+#
+# Every route (a signal and the point settings for the route) is listed
+# once, along with the routes that conflict with it. These are turned into
+# a "route table" where each route is a single bit of an integer - so the
+# conflicts of each route are a single integer (a bitset) and the routes
+# currently cleared are another. Checking whether a route is blocked by a
+# conflicting route is then a single AND - however many routes there are.
+#
+# The route table is the same for every evaluation - only the routes that
+# are cleared need working out each time (from the signals and points).
+# The functions to read the signals and points are passed in (rather than
+# being imported here) so the rules can also be evaluated against a copy of
+# the layout state (see 'rule_evaluator').
+#----------------------------------------------------------------------
+
+# The aspects of a signal that clear each route
+main = (False,)
+subsidary = (True,)
+main_and_subsidary = (False, True)
+
+#----------------------------------------------------------------------
+# The routes through the station - {route: (signal, aspects, points)} where
+# the points are {point_id: switched} for the points set for the route
+#----------------------------------------------------------------------
+
+station_routes = {
+    # West box
+    "1"               : (1, main, {}),
+    "2_platform3"     : (2, main_and_subsidary, {2:False, 4:False}),
+    "2_goods_loop"    : (2, main_and_subsidary, {2:False, 4:True, 5:False}),
+    "3_up_main"       : (3, main, {1:False, 2:False}),
+    "3_platform3"     : (3, main, {1:False, 2:True, 4:False}),
+    "3_goods_loop"    : (3, main, {1:False, 2:True, 4:True, 5:False}),
+    "5_goods_yard"    : (5, subsidary, {5:True}),
+    "5_mpd"           : (5, subsidary, {5:False, 4:False}),
+    "5_branch"        : (5, main_and_subsidary, {5:False, 4:True, 2:False}),
+    "5_down_main"     : (5, main, {5:False, 4:True, 2:True, 1:True}),
+    "6_branch"        : (6, main_and_subsidary, {4:False, 2:False}),
+    "6_down_main"     : (6, main, {4:False, 2:True, 1:True}),
+    "12_down_main"    : (12, main, {3:False, 1:False}),
+    "13_down_main"    : (13, main, {3:True, 1:False}),
+    "14_goods_loop"   : (14, main, {5:True}),
+    "15_goods_loop"   : (15, main, {5:False, 4:False}),
+    # East box
+    "4_up_main"       : (4, main, {8:False, 9:False}),
+    "7_goods_yard"    : (7, subsidary, {6:False}),
+    "7_branch"        : (7, main_and_subsidary, {6:True, 8:False}),
+    "7_up_main"       : (7, main, {6:True, 8:True, 9:False}),
+    "8_branch"        : (8, main_and_subsidary, {6:False, 8:False}),
+    "8_up_main"       : (8, main, {6:False, 8:True, 9:False}),
+    "9"               : (9, main, {}),
+    "10_platform3"    : (10, main_and_subsidary, {8:False, 6:False}),
+    "10_goods_loop"   : (10, main_and_subsidary, {8:False, 6:True}),
+    "11_main"         : (11, main, {9:False}),
+    "11_platform3"    : (11, main, {9:True, 8:True, 6:False}),
+    "11_goods_loop"   : (11, main, {9:True, 8:True, 6:True}),
+    "16_goods_loop"   : (16, main, {10:False, 6:False}),
+    }
+
+#----------------------------------------------------------------------
+# The routes that conflict with each route - i.e. the route can't be cleared
+# if any of these routes has already been cleared. A signal on its own (e.g.
+# "5") means any route from that signal. The conflicts work both ways (a
+# route listed here can't be cleared if the route has already been cleared)
+# so each conflict only needs listing once
+#----------------------------------------------------------------------
+
+station_conflicts = {
+    # West box
+    "1"               : ["5_branch", "6_branch"],
+    "2_platform3"     : ["10_platform3", "11_platform3", "6"],
+    "2_goods_loop"    : ["16_goods_loop", "10_goods_loop", "11_goods_loop", "5"],
+    "3_platform3"     : ["10_platform3", "11_platform3"],
+    "3_goods_loop"    : ["16_goods_loop", "10_goods_loop", "11_goods_loop"],
+    "5_goods_yard"    : ["14"],
+    "5_mpd"           : ["15"],
+    "5_branch"        : ["1", "2"],
+    "6_branch"        : ["1", "2"],
+    "14_goods_loop"   : ["16_goods_loop", "10_goods_loop", "11_goods_loop", "5"],
+    "15_goods_loop"   : ["16_goods_loop", "10_goods_loop", "11_goods_loop", "5"],
+    # East box
+    "7_goods_yard"    : ["16"],
+    "7_branch"        : ["9", "10"],
+    "8_branch"        : ["9", "10"],
+    "9"               : ["8_branch", "7_branch"],
+    "10_platform3"    : ["2_platform3", "3_platform3", "8"],
+    "10_goods_loop"   : ["14_goods_loop", "15_goods_loop", "2_goods_loop", "3_goods_loop", "5"],
+    "11_platform3"    : ["2_platform3", "3_platform3"],
+    "11_goods_loop"   : ["14_goods_loop", "15_goods_loop", "2_goods_loop", "3_goods_loop"],
+    "16_goods_loop"   : ["14_goods_loop", "15_goods_loop", "2_goods_loop", "3_goods_loop", "7"],
+    }
+
+#----------------------------------------------------------------------
+# Externally called function to create a route table from the routes and
+# their conflicts (in the format above). The table holds, for each route,
+# its bit, the bits of the points that must be switched (and of all the
+# points that must be set) for the route and the bitset of its conflicts
+# (including the routes that list it as a conflict)
+#----------------------------------------------------------------------
+
+def create_route_table(routes:dict, conflicts:dict):
+    table = {"bits":{}, "conflicts":{}, "signals":{}}
+    for index, (route, (sig_id, aspects, points)) in enumerate(routes.items()):
+        point_mask, switched_points = 0, 0
+        for point_id, switched in points.items():
+            point_mask = point_mask | (1 << point_id)
+            if switched: switched_points = switched_points | (1 << point_id)
+        table["bits"][route] = 1 << index
+        for aspect in aspects:
+            table["signals"].setdefault((sig_id, aspect), []).append((1 << index, point_mask, switched_points))
+    for route in routes.keys():
+        table["conflicts"][route] = 0
+        for conflict in conflicts.get(route, []):
+            if conflict in routes:
+                table["conflicts"][route] = table["conflicts"][route] | table["bits"][conflict]
+            elif conflict.isdigit():
+                for other_route, (sig_id, aspects, points) in routes.items():
+                    if sig_id == int(conflict): table["conflicts"][route] = table["conflicts"][route] | table["bits"][other_route]
+            else:
+                print ("ERROR: create_route_table - route "+route+" - unknown conflicting route "+conflict)
+    # A route conflicts with the routes that list it as a conflict
+    for route in routes.keys():
+        for other_route in routes.keys():
+            if table["conflicts"][other_route] & table["bits"][route]:
+                table["conflicts"][route] = table["conflicts"][route] | table["bits"][other_route]
+    table["points"] = sorted({point_id for sig_id, aspects, points in routes.values() for point_id in points.keys()})
+    return(table)
+
+# The route table for the station
+route_table = create_route_table(station_routes, station_conflicts)
+
+#----------------------------------------------------------------------
+# Externally called function to find the routes currently cleared (a
+# signal cleared with the points set for the route) - returned as a bitset.
+# The functions to read the points and signals are passed in
+#----------------------------------------------------------------------
+
+def find_cleared_routes(point_switched, signal_clear, subsidary_clear, table:dict=route_table):
+    switched_points = 0
+    for point_id in table["points"]:
+        if point_switched(point_id): switched_points = switched_points | (1 << point_id)
+    cleared_routes = 0
+    for (sig_id, aspect), routes in table["signals"].items():
+        if subsidary_clear(sig_id) if aspect else signal_clear(sig_id):
+            for route_bit, point_mask, route_points in routes:
+                if switched_points & point_mask == route_points:
+                    cleared_routes = cleared_routes | route_bit
+    return(cleared_routes)
+
+#----------------------------------------------------------------------
+# Externally called function to check if a route is blocked by any of the
+# routes currently cleared (as returned by find_cleared_routes)
+#----------------------------------------------------------------------
+
+def route_blocked(route:str, cleared_routes:int, table:dict=route_table):
+    return(table["conflicts"][route] & cleared_routes != 0)
+
+###############################################################################
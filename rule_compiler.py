@@ -0,0 +1,218 @@
+#----------------------------------------------------------------------
+# This Module compiles the layout rules in 'rule_spec' into a python module
+# ('generated_rules') of straight-line functions with the same names as the
+# hand written rules - so they can be used in their place (see
+# 'install_generated_rules') and by 'rule_evaluator'.
+#
+# Each generated function reads every point, signal, section and switch it
+# needs exactly once (into a local variable) at the start, works out the
+# routes that are cleared (with the route table from 'route_conflicts'
+# folded into constants) and then evaluates the rules as plain if/elif/else
+# statements on the local variables. For example:
+#     p4 = point_switched(4)
+#     ...
+#     if not p4 and cleared_routes & 0x6000880:
+#         lock_signal(2)
+#
+# The generated module is only written (and compiled to a .pyc file) when
+# the rules have changed - so normally the compiled module is just loaded.
+# 'check_generated_rules' checks the generated rules always give the same
+# results as the hand written ones.
+#
+# To generate the module: python3 rule_compiler.py
+#----------------------------------------------------------------------
+
+import route_conflicts
+import rule_spec
+
+import ast
+import importlib
+import importlib.util
+import os
+import py_compile
+import re
+import sys
+
+# The name of the generated module (in the same directory as this module)
+generated_module_name = "generated_rules"
+
+# The functions used to read each type of input in the conditions
+input_functions = {"P": "point_switched", "F": "fpl_active", "S": "signal_clear",
+                   "U": "subsidary_clear", "O": "section_occupied", "W": "switch_active"}
+
+# The actions that can be used in the rules
+action_functions = ("lock_signal", "unlock_signal", "lock_subsidary", "unlock_subsidary",
+                    "lock_point", "unlock_point", "set_signal_override", "clear_signal_override",
+                    "set_switch", "clear_switch", "interlock_main_and_subsidary")
+
+#----------------------------------------------------------------------
+# Internal class to compile a condition - the inputs (e.g. "P4") are replaced
+# by their local variables ("p4") and blocked("route") by a check of the
+# cleared routes against the (constant) conflicts of the route. The inputs
+# and the routes used are recorded as the condition is compiled
+#----------------------------------------------------------------------
+
+class ConditionCompiler(ast.NodeTransformer):
+
+    allowed_nodes = (ast.Expression, ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not, ast.Load)
+
+    def __init__(self, inputs:set, routes:set):
+        self.inputs = inputs
+        self.routes = routes
+
+    def visit_Name(self, node):
+        match = re.fullmatch("([PFSUOW])([0-9]+)", node.id)
+        if match is None: raise ValueError("unknown input "+node.id)
+        self.inputs.add((match.group(1), int(match.group(2))))
+        return(ast.Name(id=node.id.lower(), ctx=ast.Load()))
+
+    def visit_Call(self, node):
+        if (not isinstance(node.func, ast.Name) or node.func.id != "blocked" or len(node.args) != 1
+                or not isinstance(node.args[0], ast.Constant) or node.args[0].value not in route_conflicts.station_routes):
+            raise ValueError("unknown function or route "+ast.unparse(node))
+        conflicts = route_conflicts.route_table["conflicts"][node.args[0].value]
+        for route, route_bit in route_conflicts.route_table["bits"].items():
+            if conflicts & route_bit: self.routes.add(route)
+        if conflicts == 0: return(ast.Constant(False))
+        return(ast.BinOp(ast.Name(id="cleared_routes", ctx=ast.Load()), ast.BitAnd(), ast.Constant(conflicts)))
+
+    def generic_visit(self, node):
+        if not isinstance(node, self.allowed_nodes): raise ValueError("unsupported expression "+ast.dump(node))
+        return(super().generic_visit(node))
+
+def compile_condition(condition:str, inputs:set, routes:set):
+    tree = ConditionCompiler(inputs, routes).visit(ast.parse(condition, mode="eval"))
+    source = ast.unparse(tree)
+    # Show the conflicts of each route as hex (so the bits can be seen)
+    return(re.sub("cleared_routes & ([0-9]+)", lambda match: "cleared_routes & "+hex(int(match.group(1))), source))
+
+#----------------------------------------------------------------------
+# Internal function to compile an action into lines of source (with the
+# given indent) - interlock_main_and_subsidary is expanded in place
+#----------------------------------------------------------------------
+
+def compile_action(action:str, inputs:set, indent:str):
+    call = ast.parse(action, mode="eval").body
+    if (not isinstance(call, ast.Call) or not isinstance(call.func, ast.Name) or call.func.id not in action_functions
+            or not all(isinstance(arg, ast.Constant) and isinstance(arg.value, int) for arg in call.args)):
+        raise ValueError("unsupported action "+action)
+    if call.func.id == "interlock_main_and_subsidary":
+        sig_id = str(call.args[0].value)
+        inputs.update({("S", int(sig_id)), ("U", int(sig_id))})
+        return([indent+"if u"+sig_id+": lock_signal("+sig_id+")",
+                indent+"else: unlock_signal("+sig_id+")",
+                indent+"if s"+sig_id+": lock_subsidary("+sig_id+")",
+                indent+"else: unlock_subsidary("+sig_id+")"])
+    return([indent+ast.unparse(call)])
+
+#----------------------------------------------------------------------
+# Internal function to compile the condition for a route being cleared
+# (the signal - or subsidary - is clear and the points are set for it)
+#----------------------------------------------------------------------
+
+def compile_route(route:str, inputs:set):
+    sig_id, aspects, points = route_conflicts.station_routes[route]
+    aspect_names = ["U"+str(sig_id) if aspect else "S"+str(sig_id) for aspect in aspects]
+    terms = ["("+" or ".join(aspect_names)+")" if len(aspect_names) > 1 else aspect_names[0]]
+    terms.extend(("P" if switched else "not P")+str(point_id) for point_id, switched in points.items())
+    return(compile_condition(" and ".join(terms), inputs, set()))
+
+#----------------------------------------------------------------------
+# Internal function to compile a function (a list of rules - see 'rule_spec')
+#----------------------------------------------------------------------
+
+def compile_function(name:str, rules:list):
+    inputs, routes, body = set(), set(), []
+    for rule in rules:
+        for index, (condition, actions) in enumerate(rule):
+            if condition == "else":
+                indent = "        " if index > 0 else "    "
+                if index > 0: body.append("    else:")
+            else:
+                indent = "        "
+                body.append("    "+("if " if index == 0 else "elif ")+compile_condition(condition, inputs, routes)+":")
+            for action in actions:
+                body.extend(compile_action(action, inputs, indent))
+    route_lines = []
+    if routes:
+        route_lines.append("    cleared_routes = 0")
+        for route in route_conflicts.station_routes.keys():
+            if route in routes:
+                route_lines.append("    if "+compile_route(route, inputs)+": cleared_routes = cleared_routes | "+
+                                   hex(route_conflicts.route_table["bits"][route])+"   # "+route)
+    input_lines = ["    "+kind.lower()+str(item_id)+" = "+input_functions[kind]+"("+str(item_id)+")"
+                   for kind, item_id in sorted(inputs)]
+    return(["def "+name+"():"] + input_lines + route_lines + body + ["    return()", ""])
+
+#----------------------------------------------------------------------
+# Externally called function to generate the source of the module
+#----------------------------------------------------------------------
+
+def generate_source():
+    source = ["#----------------------------------------------------------------------",
+              "# Generated by 'rule_compiler' from 'rule_spec' - DO NOT EDIT",
+              "#----------------------------------------------------------------------",
+              "",
+              "from model_railway_signals import *",
+              "from power_switches import switch_active, set_switch, clear_switch",
+              ""]
+    for name, rules in rule_spec.rule_functions.items():
+        source.extend(compile_function(name, rules))
+    return("\n".join(source))
+
+#----------------------------------------------------------------------
+# Externally called function to generate the module (if the rules have
+# changed) and compile it. Returns the file name (or None if it failed)
+#----------------------------------------------------------------------
+
+def generate_rules():
+    module_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), generated_module_name+".py")
+    try:
+        source = generate_source()
+    except (ValueError, SyntaxError) as error:
+        print ("ERROR: generate_rules - could not compile the rules - "+str(error))
+        return(None)
+    try:
+        existing_source = None
+        if os.path.exists(module_file):
+            with open(module_file) as file: existing_source = file.read()
+        compiled_file = importlib.util.cache_from_source(module_file)
+        if source != existing_source or not os.path.exists(compiled_file):
+            if source != existing_source:
+                with open(module_file, "w") as file: file.write(source)
+            py_compile.compile(module_file, cfile=compiled_file, doraise=True)
+    except (OSError, py_compile.PyCompileError) as error:
+        print ("ERROR: generate_rules - could not write "+module_file+" - "+str(error))
+        return(None)
+    return(module_file)
+
+#----------------------------------------------------------------------
+# Externally called function to generate (if needed) and load the module.
+# Returns the module (or None if it could not be generated)
+#----------------------------------------------------------------------
+
+def load_generated_rules():
+    if generate_rules() is None: return(None)
+    return(importlib.import_module(generated_module_name))
+
+#----------------------------------------------------------------------
+# Externally called function to use the generated rules in place of the
+# hand written rules in the given modules
+#----------------------------------------------------------------------
+
+def install_generated_rules(generated_rules, interlocking_module, sections_module, power_switches_module):
+    interlocking_module.set_initial_interlocking_conditions = generated_rules.set_initial_interlocking_conditions
+    interlocking_module.process_interlocking_west = generated_rules.process_interlocking_west
+    interlocking_module.process_interlocking_east = generated_rules.process_interlocking_east
+    sections_module.override_signals_based_on_track_occupancy = generated_rules.override_signals_based_on_track_occupancy
+    power_switches_module.update_track_power_section_switches = generated_rules.update_track_power_section_switches
+    return()
+
+if __name__ == "__main__":
+    module_file = generate_rules()
+    if module_file is not None: print ("Generated "+module_file)
+    # The library leaves threads running so we can't just return
+    sys.stdout.flush()
+    os._exit(0)
+
+###############################################################################
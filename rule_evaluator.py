@@ -0,0 +1,223 @@
+#----------------------------------------------------------------------
+# This Module evaluates the layout rules (the interlocking, the signal
+# overrides based on track occupancy, the signal aspect refresh sequence
+# and the automatic power section switching) against a COPY of the layout
+# state rather than against the "live" signals, points and switches.
+#
+# We load private copies of the 'interlocking', 'sections' and 'power_switches'
+# modules and replace the library functions they use (point_switched,
+# lock_signal etc) with functions that read from the state we are given and
+# record the results. This means the rules are only ever written once (in
+# the normal modules) and nothing on the schematic is touched - so the
+# evaluation can be run on another thread, or as a "what if" query.
+#
+# Each "evaluator" is a dictionary holding its own copies of the modules
+# so different threads can each use their own evaluator at the same time
+#
+# The State is in the format returned by snapshot.capture_layout_state()
+# The Outputs are returned as a dictionary of the form:
+#   {"signal_locks"    : {"1": locked, ...},
+#    "subsidary_locks" : {"2": locked, ...},
+#    "point_locks"     : {"1": locked, ...},
+#    "overrides"       : {"1": overridden, ...},
+#    "switches"        : {"1": [button1_active, button2_active], ...},
+#    "aspects"         : [[sig_id, route, sig_ahead_id], ...] }
+# where "aspects" is the sequence of set_route/update_signal calls (in the
+# order they need to be made - i.e. the most forward signal first)
+#
+# The track occupancy changes following a "signal passed" event can also be
+# evaluated - these are returned as a dictionary of the form:
+#   {"sections"      : {"20": occupied, ...},
+#    "timed_signals" : [[sig_id, start_delay, time_delay], ...],
+#    "safety_events" : [{"type": "spad", "signal": 20}, ...] }
+#----------------------------------------------------------------------
+
+import importlib.util
+
+# The rule modules we evaluate (and the order we evaluate them in)
+rule_modules = ("sections", "power_switches", "interlocking")
+
+# Use the rules generated from 'rule_spec' (see 'rule_compiler') in place of
+# the hand written rules - for all evaluators unless told otherwise
+use_generated_rules = False
+
+# Incremented whenever the rules are reloaded (see 'hot_reload') - evaluators
+# created for an earlier version should be created again to load the new rules
+rules_version = 0
+
+#----------------------------------------------------------------------
+# Internal function to create the replacement library functions for an
+# evaluator. These read from (and record to) the evaluator dictionary
+#----------------------------------------------------------------------
+
+def create_shadow_functions(evaluator:dict):
+
+    # Functions to read the state of the layout
+    def point_switched(point_id:int):
+        return (evaluator["state"]["points"].get(str(point_id), (False,True))[0])
+
+    def fpl_active(point_id:int):
+        return (evaluator["state"]["points"].get(str(point_id), (False,True))[1])
+
+    def signal_clear(sig_id:int):
+        return (evaluator["state"]["signals"].get(str(sig_id), (False,False))[0])
+
+    def subsidary_clear(sig_id:int):
+        return (evaluator["state"]["signals"].get(str(sig_id), (False,False))[1])
+
+    def section_occupied(section_id:int):
+        return (evaluator["state"]["sections"].get(str(section_id), False))
+
+    # Functions to record the results of the evaluation
+    def record(group:str, item_ids, value):
+        for item_id in item_ids: evaluator["outputs"][group][str(item_id)] = value
+
+    def lock_signal(*sig_ids:int): record("signal_locks", sig_ids, True)
+    def unlock_signal(*sig_ids:int): record("signal_locks", sig_ids, False)
+    def lock_subsidary(*sig_ids:int): record("subsidary_locks", sig_ids, True)
+    def unlock_subsidary(*sig_ids:int): record("subsidary_locks", sig_ids, False)
+    def lock_point(*point_ids:int): record("point_locks", point_ids, True)
+    def unlock_point(*point_ids:int): record("point_locks", point_ids, False)
+    def set_signal_override(*sig_ids:int): record("overrides", sig_ids, True)
+    def clear_signal_override(*sig_ids:int): record("overrides", sig_ids, False)
+    def set_section_occupied(section_id:int): record("sections", [section_id], True)
+    def clear_section_occupied(section_id:int): record("sections", [section_id], False)
+
+    def trigger_timed_signal(sig_id:int, start_delay:int=0, time_delay:int=5):
+        evaluator["outputs"]["timed_signals"].append([sig_id, start_delay, time_delay])
+
+    # Safety events (e.g. SPADs) are recorded rather than published
+    def publish_safety_event(event_type, **fields):
+        evaluator["outputs"].setdefault("safety_events", []).append(dict(fields, type=event_type.name))
+
+    # Functions for the signal aspect refresh sequence - the route is
+    # always set before the signal is updated (for a given signal)
+    def set_route(sig_id:int, route=None, theatre_text:str="NONE"):
+        evaluator["routes"][str(sig_id)] = route
+
+    def update_signal(sig_id:int, sig_ahead_id:int=0):
+        route = evaluator["routes"].get(str(sig_id))
+        evaluator["outputs"]["aspects"].append([sig_id, route, sig_ahead_id])
+
+    # Functions to replace the switch functions in the 'power_switches' module.
+    # Setting one button of a two way switch clears the other button (just like
+    # the real switches). The final state of all switches is then recorded
+    def switch_active(switch_id:int, button_id:int=1):
+        return (evaluator["outputs"]["switches"].get(str(switch_id), [False,False])[button_id-1])
+
+    def set_switch(switch_id:int, button_id:int=1):
+        buttons = [False,False]
+        buttons[button_id-1] = True
+        evaluator["outputs"]["switches"][str(switch_id)] = buttons
+
+    def clear_switch(switch_id:int, button_id:int=1):
+        buttons = list(evaluator["outputs"]["switches"].get(str(switch_id), [False,False]))
+        buttons[button_id-1] = False
+        evaluator["outputs"]["switches"][str(switch_id)] = buttons
+
+    return({"point_switched":point_switched, "fpl_active":fpl_active,
+            "signal_clear":signal_clear, "subsidary_clear":subsidary_clear,
+            "section_occupied":section_occupied,
+            "set_section_occupied":set_section_occupied,
+            "clear_section_occupied":clear_section_occupied,
+            "trigger_timed_signal":trigger_timed_signal,
+            "publish_safety_event":publish_safety_event,
+            "lock_signal":lock_signal, "unlock_signal":unlock_signal,
+            "lock_subsidary":lock_subsidary, "unlock_subsidary":unlock_subsidary,
+            "lock_point":lock_point, "unlock_point":unlock_point,
+            "set_signal_override":set_signal_override,
+            "clear_signal_override":clear_signal_override,
+            "set_route":set_route, "update_signal":update_signal,
+            "switch_active":switch_active, "set_switch":set_switch,
+            "clear_switch":clear_switch })
+
+#----------------------------------------------------------------------
+# Internal function to load a private copy of a rule module and replace
+# the library functions it uses with the shadow functions. Python looks up
+# the names when the functions are called, so replacing the names in the
+# module once it has been loaded is all we need to do
+#----------------------------------------------------------------------
+
+def load_rule_module(module_name:str, shadow_functions:dict):
+    spec = importlib.util.find_spec(module_name)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    for name, function in shadow_functions.items():
+        if name in module.__dict__: module.__dict__[name] = function
+    return(module)
+
+#----------------------------------------------------------------------
+# Externally called function to create a new evaluator. The rules can be
+# taken from other modules providing the same functions (e.g. a generated
+# layout - see 'layout_generator') by giving the module names to use:
+#   {"sections": "synthetic_sections", ...}
+# If generated_rules is True (or not given and use_generated_rules is True)
+# then the rules generated from 'rule_spec' are used instead (these are
+# only for our own layout)
+#----------------------------------------------------------------------
+
+def create_evaluator(module_names:dict={}, generated_rules:bool=None):
+    evaluator = {"state":{}, "outputs":{}, "routes":{}, "rules_version":rules_version}
+    shadow_functions = create_shadow_functions(evaluator)
+    for module_name in rule_modules:
+        evaluator[module_name] = load_rule_module(module_names.get(module_name, module_name), shadow_functions)
+    if generated_rules is None: generated_rules = use_generated_rules and not module_names
+    if generated_rules:
+        import rule_compiler
+        if rule_compiler.generate_rules() is not None:
+            generated = load_rule_module(rule_compiler.generated_module_name, shadow_functions)
+            rule_compiler.install_generated_rules(generated, evaluator["interlocking"],
+                                evaluator["sections"], evaluator["power_switches"])
+    return(evaluator)
+
+#----------------------------------------------------------------------
+# Externally called function to evaluate all the layout rules against the
+# given state (which is not changed) - returns a dictionary of the outputs
+#----------------------------------------------------------------------
+
+def evaluate(evaluator:dict, state):
+
+    evaluator["state"] = state
+    evaluator["routes"] = {}
+    evaluator["outputs"] = {"signal_locks":{}, "subsidary_locks":{}, "point_locks":{},
+                            "overrides":{}, "aspects":[], "switches":{}}
+    # The power switches start off in their current state
+    for switch_id, buttons in state["switches"].items():
+        evaluator["outputs"]["switches"][switch_id] = list(buttons)
+
+    # Evaluate the rules in the same order as the layout callbacks
+    evaluator["sections"].override_signals_based_on_track_occupancy()
+    evaluator["sections"].refresh_signal_aspects()
+    evaluator["power_switches"].update_track_power_section_switches()
+    evaluator["interlocking"].process_interlocking_east()
+    evaluator["interlocking"].process_interlocking_west()
+
+    return(evaluator["outputs"])
+
+#----------------------------------------------------------------------
+# Externally called function to evaluate just the interlocking against the
+# given state (which is not changed) - returns a dictionary of the locks.
+# Much quicker than evaluating all the rules (for "what if" queries)
+#----------------------------------------------------------------------
+
+def evaluate_interlocking(evaluator:dict, state):
+
+    evaluator["state"] = state
+    evaluator["outputs"] = {"signal_locks":{}, "subsidary_locks":{}, "point_locks":{}}
+    evaluator["interlocking"].process_interlocking_east()
+    evaluator["interlocking"].process_interlocking_west()
+    return(evaluator["outputs"])
+
+#----------------------------------------------------------------------
+# Externally called function to evaluate the track occupancy changes for
+# a "signal passed" event against the given state (which is not changed)
+#----------------------------------------------------------------------
+
+def evaluate_signal_passed(evaluator:dict, state, sig_id:int):
+
+    evaluator["state"] = state
+    evaluator["outputs"] = {"sections":{}, "timed_signals":[], "safety_events":[]}
+    evaluator["sections"].update_track_occupancy(sig_id)
+    return(evaluator["outputs"])
+
+###############################################################################
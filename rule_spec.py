@@ -0,0 +1,248 @@
+#----------------------------------------------------------------------
+# This Module holds the layout rules (the interlocking, the signal overrides
+# based on track occupancy and the automatic power section switching) as a
+# declarative specification. 'rule_compiler' turns this into a python module
+# of straight-line functions that can be used in place of the hand written
+# rules in 'interlocking', 'sections' and 'power_switches' - and
+# 'check_generated_rules' checks the two always give the same results. The
+# hand written rules are used unless 'use_generated_rules' is selected in
+# 'my_layout' (so they are the ones to change first).
+#
+# Each function is a list of rules. Each rule is a list of [condition, actions]
+# where only the actions for the first condition that is true are done (just
+# like an if/elif/else). A condition of "else" is always true.
+#
+# The conditions are python expressions (and, or, not, brackets) of:
+#   P4  - point 4 is switched          F4  - the FPL of point 4 is active
+#   S6  - signal 6 is clear            U6  - the subsidary of signal 6 is clear
+#   O22 - section 22 is occupied       W10 - switch 10 (button 1) is active
+#   blocked("2_platform3") - the route is blocked by a conflicting route
+#                            that is cleared (see 'route_conflicts')
+#
+# The actions are calls to the library (or 'power_switches') functions, e.g.
+# "lock_signal(2)" or "set_switch(6,2)". interlock_main_and_subsidary(2) locks
+# the main signal if the subsidary is clear (and the other way round)
+#
+# Track occupancy sections: 20 Down Platform, 21 Down Loop, 22 Down East,
+# 23 Down West, 24 Up East, 25 Up West, 26 Up Platform, 27 Goods Loop,
+# 28 Branch East, 29 Branch West, 30 Branch Platform (see 'sections')
+#
+# Power sections: 1 Goods Loop, 2 Branch Platform, 3 Up Platform, 4 Down Loop,
+# 5 Down Platform, 6 Branch West, 7 Branch East, 10 Manual Power Switching
+# (see 'power_switches')
+#----------------------------------------------------------------------
+
+# The actions to lock a signal and its subsidary
+def lock_signal_and_subsidary(sig_id:int):
+    return(["lock_signal("+str(sig_id)+")", "lock_subsidary("+str(sig_id)+")"])
+
+#----------------------------------------------------------------------
+# Interlocking - initial conditions
+#----------------------------------------------------------------------
+
+initial_interlocking_conditions = [
+    [["else", ["lock_signal(5,7,13,14)"]]],
+    ]
+
+#----------------------------------------------------------------------
+# Interlocking - West box
+#----------------------------------------------------------------------
+
+interlocking_west = [
+    # Signal 1 - Branch Line towards Signal 2
+    [["blocked('1')", ["lock_signal(1)"]],
+     ["else", ["unlock_signal(1)"]]],
+    # Signal 2 - Branch Line into Platform 3 or Goods loop
+    [["P2 or not F2 or not F4", lock_signal_and_subsidary(2)],
+     ["not P4 and blocked('2_platform3')", lock_signal_and_subsidary(2)],
+     ["not P4", ["interlock_main_and_subsidary(2)"]],
+     ["not P5 and blocked('2_goods_loop')", lock_signal_and_subsidary(2)],
+     ["not P5", ["interlock_main_and_subsidary(2)"]],
+     ["else", lock_signal_and_subsidary(2)]],
+    # Signal 3 - Up Main into Platform 1, Platform 3 or Goods loop
+    [["not F1 or P1 or not F2", ["lock_signal(3)"]],
+     ["not P2", ["unlock_signal(3)"]],
+     ["not P4 and blocked('3_platform3')", ["lock_signal(3)"]],
+     ["not P4", ["unlock_signal(3)"]],
+     ["not P5 and blocked('3_goods_loop')", ["lock_signal(3)"]],
+     ["not P5", ["unlock_signal(3)"]],
+     ["else", ["lock_signal(3)"]]],
+    # Signal 5 - Routes onto Branch or Down Main (subsidary onto Branch, MPD or Goods Yard)
+    [["P5 and blocked('5_goods_yard')", lock_signal_and_subsidary(5)],
+     ["P5", ["lock_signal(5)", "unlock_subsidary(5)"]],
+     ["not F4", lock_signal_and_subsidary(5)],
+     ["not P4 and blocked('5_mpd')", lock_signal_and_subsidary(5)],
+     ["not P4", ["lock_signal(5)", "unlock_subsidary(5)"]],
+     ["not F2", lock_signal_and_subsidary(5)],
+     ["not P2 and blocked('5_branch')", lock_signal_and_subsidary(5)],
+     ["not P2", ["interlock_main_and_subsidary(5)"]],
+     ["not P1 or not F1", lock_signal_and_subsidary(5)],
+     ["else", ["unlock_signal(5)", "lock_subsidary(5)"]]],
+    # Signal 6 - Routes onto Branch or Down Main (subsidary onto Branch only)
+    [["P4 or not F4 or not F2", lock_signal_and_subsidary(6)],
+     ["not P2 and blocked('6_branch')", lock_signal_and_subsidary(6)],
+     ["not P2", ["interlock_main_and_subsidary(6)"]],
+     ["not P1 or not F1", lock_signal_and_subsidary(6)],
+     ["else", ["unlock_signal(6)", "lock_subsidary(6)"]]],
+    # Signal 12 - Route onto Down Main only
+    [["P3 or not F3 or P1 or not F1", ["lock_signal(12)"]],
+     ["else", ["unlock_signal(12)"]]],
+    # Signal 13 - Route onto Down Main only
+    [["not P3 or not F3 or P1 or not F1", ["lock_signal(13)"]],
+     ["else", ["unlock_signal(13)"]]],
+    # Signal 14 - Exit from Goods Yard to Goods Loop
+    [["not P5 or blocked('14_goods_loop')", ["lock_signal(14)"]],
+     ["else", ["unlock_signal(14)"]]],
+    # Signal 15 - Exit from MPD to Goods Loop
+    [["P5 or P4 or not F4 or blocked('15_goods_loop')", ["lock_signal(15)"]],
+     ["else", ["unlock_signal(15)"]]],
+    # Points 1 to 5
+    [["S3 or S12 or S13 or (P1 and P2 and (S5 or S6))", ["lock_point(1)"]],
+     ["else", ["unlock_point(1)"]]],
+    [["S3 or S2 or U2 or (not P4 and (S6 or U6)) or (P4 and not P5 and (S5 or U5))", ["lock_point(2)"]],
+     ["else", ["unlock_point(2)"]]],
+    [["S12 or S13", ["lock_point(3)"]],
+     ["else", ["unlock_point(3)"]]],
+    [["S15 or S2 or U2 or S6 or U6 or (not P5 and (S5 or U5)) or (P2 and S3)", ["lock_point(4)"]],
+     ["else", ["unlock_point(4)"]]],
+    [["S14 or S15 or S5 or U5 or (P4 and (S2 or U2)) or (P2 and P4 and S3)", ["lock_point(5)"]],
+     ["else", ["unlock_point(5)"]]],
+    ]
+
+#----------------------------------------------------------------------
+# Interlocking - East box
+#----------------------------------------------------------------------
+
+interlocking_east = [
+    # Signal 4 - Route onto Up Main
+    [["P8 or not F8 or P9 or not F9", ["lock_signal(4)"]],
+     ["else", ["unlock_signal(4)"]]],
+    # Signal 7 - Routes onto Branch or Up Main (subsidary onto Branch or Goods Yard)
+    [["not F6", lock_signal_and_subsidary(7)],
+     ["not P6 and blocked('7_goods_yard')", lock_signal_and_subsidary(7)],
+     ["not P6", ["lock_signal(7)", "unlock_subsidary(7)"]],
+     ["not F8", lock_signal_and_subsidary(7)],
+     ["not P8 and blocked('7_branch')", lock_signal_and_subsidary(7)],
+     ["not P8", ["interlock_main_and_subsidary(7)"]],
+     ["P9 or not F9", lock_signal_and_subsidary(7)],
+     ["else", ["unlock_signal(7)", "lock_subsidary(7)"]]],
+    # Signal 8 - Routes onto Branch or Up Main (subsidary onto Branch only)
+    [["P6 or not F6 or not F8", lock_signal_and_subsidary(8)],
+     ["not P8 and blocked('8_branch')", lock_signal_and_subsidary(8)],
+     ["not P8", ["interlock_main_and_subsidary(8)"]],
+     ["P9 or not F9", lock_signal_and_subsidary(8)],
+     ["else", ["unlock_signal(8)", "lock_subsidary(8)"]]],
+    # Signal 9 - Branch Line towards Signal 10
+    [["blocked('9')", ["lock_signal(9)"]],
+     ["else", ["unlock_signal(9)"]]],
+    # Signal 10 - Branch Line into Platform 3 or Goods loop
+    [["P8 or not F8 or not F6", lock_signal_and_subsidary(10)],
+     ["not P6 and blocked('10_platform3')", lock_signal_and_subsidary(10)],
+     ["not P6", ["interlock_main_and_subsidary(10)"]],
+     ["blocked('10_goods_loop')", lock_signal_and_subsidary(10)],
+     ["else", ["interlock_main_and_subsidary(10)"]]],
+    # Signal 11 - Down Main into Platform 1, Down Loop, Platform 3 or Goods loop
+    [["not F9", ["lock_signal(11)"]],
+     ["not P9 and not F7", ["lock_signal(11)"]],
+     ["not P9", ["unlock_signal(11)"]],
+     ["not P8 or not F8 or not F6", ["lock_signal(11)"]],
+     ["not P6 and blocked('11_platform3')", ["lock_signal(11)"]],
+     ["not P6", ["unlock_signal(11)"]],
+     ["blocked('11_goods_loop')", ["lock_signal(11)"]],
+     ["else", ["unlock_signal(11)"]]],
+    # Signal 16 - Exit from Goods Yard to Goods Loop
+    [["P10 or P6 or not F6 or blocked('16_goods_loop')", ["lock_signal(16)"]],
+     ["else", ["unlock_signal(16)"]]],
+    # Points 6 to 10
+    [["S16 or S10 or U10 or S8 or U8 or S7 or U7 or (P8 and P9 and S11)", ["lock_point(6)"]],
+     ["else", ["unlock_point(6)"]]],
+    [["not P9 and S11", ["lock_point(7)"]],
+     ["else", ["unlock_point(7)"]]],
+    [["(P9 and S11) or S10 or U10 or (not P6 and (S8 or U8)) or (P6 and (S7 or U7)) or S4", ["lock_point(8)"]],
+     ["else", ["unlock_point(8)"]]],
+    [["S11 or S4 or (P8 and (S7 or S8))", ["lock_point(9)"]],
+     ["else", ["unlock_point(9)"]]],
+    [["S16 or (not P6 and U7)", ["lock_point(10)"]],
+     ["else", ["unlock_point(10)"]]],
+    ]
+
+#----------------------------------------------------------------------
+# Signal overrides based on track occupancy
+#----------------------------------------------------------------------
+
+signal_overrides = [
+    [["else", ["clear_signal_override(1,2,3,4,5,6,7,8,9,10,11,12,13,20,22)"]]],
+    # Down Line Sections
+    [["O22", ["set_signal_override(20)"]]],
+    [["O20 and P7 and not P9", ["set_signal_override(11)"]]],
+    [["O21 and not P7 and not P9", ["set_signal_override(11)"]]],
+    [["O23 and P1 and P2 and not P4", ["set_signal_override(6)"]],
+     ["O23 and P1 and P2 and P4", ["set_signal_override(5)"]],
+     ["O23 and P3", ["set_signal_override(13)"]],
+     ["O23", ["set_signal_override(12)"]]],
+    # Up Line Sections
+    [["O25", ["set_signal_override(22)"]]],
+    [["O26 and not P2", ["set_signal_override(3)"]]],
+    [["O24 and not P8", ["set_signal_override(4)"]],
+     ["O24 and not P6", ["set_signal_override(8)"]],
+     ["O24", ["set_signal_override(7)"]]],
+    # Station and Branch Sections
+    [["O29", ["set_signal_override(1)"]]],
+    [["O29 and not P2 and not P4", ["set_signal_override(6)"]],
+     ["O29 and not P2 and P4", ["set_signal_override(5)"]]],
+    [["O28", ["set_signal_override(9)"]]],
+    [["O28 and not P8 and not P6", ["set_signal_override(8)"]],
+     ["O28 and not P8 and P6", ["set_signal_override(7)"]]],
+    [["O30 and not P2 and not P4", ["set_signal_override(2)"]],
+     ["O30 and P2 and not P4", ["set_signal_override(3)"]]],
+    [["O30 and not P6 and not P8", ["set_signal_override(10)"]],
+     ["O30 and not P6 and P8 and P9", ["set_signal_override(11)"]]],
+    [["O27 and not P2 and P4", ["set_signal_override(2)"]],
+     ["O27 and P2 and P4", ["set_signal_override(3)"]]],
+    [["O27 and P6 and not P8", ["set_signal_override(10)"]],
+     ["O27 and P6 and P8 and P9", ["set_signal_override(11)"]]],
+    ]
+
+#----------------------------------------------------------------------
+# Automatic power section switching (only if manual switching is not active)
+#----------------------------------------------------------------------
+
+power_switching = [
+    # Down Loop
+    [["not W10 and (S12 or (S11 and not P9 and not P7))", ["set_switch(4)"]],
+     ["not W10", ["clear_switch(4)"]]],
+    # Down Platform
+    [["not W10 and (S13 or (S11 and not P9 and P7))", ["set_switch(5)"]],
+     ["not W10", ["clear_switch(5)"]]],
+    # Up Platform
+    [["not W10 and (S4 or (S3 and not P2))", ["set_switch(3)"]],
+     ["not W10", ["clear_switch(3)"]]],
+    # Branch West (button 1 for main routes, button 2 for shunting)
+    [["not W10 and (S1 or S2 or ((S5 or S6) and not P2))", ["set_switch(6,1)"]],
+     ["not W10 and (U2 or U6 or (U5 and P4 and not P5))", ["set_switch(6,2)"]],
+     ["not W10", ["clear_switch(6,1)", "clear_switch(6,2)"]]],
+    # Branch East (button 1 for main routes, button 2 for shunting)
+    [["not W10 and (S9 or S10 or ((S7 or S8) and not P8))", ["set_switch(7,1)"]],
+     ["not W10 and (U10 or U8 or (U7 and P6))", ["set_switch(7,2)"]],
+     ["not W10", ["clear_switch(7,1)", "clear_switch(7,2)"]]],
+    # Goods Loop (button 1 for the West end, button 2 for the East end)
+    [["not W10 and (S15 or S14 or S5 or U5 or ((S2 or U2) and P4) or (S3 and P2 and P4))", ["set_switch(1,1)"]],
+     ["not W10 and (S16 or S7 or U7 or ((S10 or U10) and P6) or (S11 and P9 and P6))", ["set_switch(1,2)"]],
+     ["not W10", ["clear_switch(1,1)", "clear_switch(1,2)"]]],
+    # Branch Platform (button 1 for the West end, button 2 for the East end)
+    [["not W10 and (S6 or U6 or ((S2 or U2) and not P4) or (S3 and P2 and not P4))", ["set_switch(2,1)"]],
+     ["not W10 and (S8 or U8 or ((S10 or U10) and not P6) or (S11 and P9 and not P6))", ["set_switch(2,2)"]],
+     ["not W10", ["clear_switch(2,1)", "clear_switch(2,2)"]]],
+    ]
+
+#----------------------------------------------------------------------
+# The functions to generate (with the same names as the hand written rules)
+#----------------------------------------------------------------------
+
+rule_functions = {"set_initial_interlocking_conditions": initial_interlocking_conditions,
+                  "process_interlocking_west": interlocking_west,
+                  "process_interlocking_east": interlocking_east,
+                  "override_signals_based_on_track_occupancy": signal_overrides,
+                  "update_track_power_section_switches": power_switching}
+
+###############################################################################
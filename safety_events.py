@@ -0,0 +1,238 @@
+#----------------------------------------------------------------------
+# This Module provides a "safety event" stream - SPADs, signals overridden
+# while they are cleared, points moved while they are locked and track
+# occupancy inconsistencies (a train entering a section that is already
+# occupied, or leaving a section that isn't). Any number of subscribers
+# (e.g. an audible alarm, a flash of the panel, the log and a count of the
+# events) can then be told about each event.
+#
+# Events are published into a ring buffer (of a fixed size) which never
+# blocks - if a subscriber falls too far behind then the oldest events are
+# lost (and the number of events it has missed is counted). Subscribers are
+# either called on the tkinter thread (for anything that changes the panel)
+# or on their own thread (for anything that might be slow, e.g. writing to
+# a file) - never by the code publishing the event.
+#
+# SPADs and occupancy inconsistencies are published by 'sections' (as the
+# signals are passed). Points moved while locked are published as the point
+# is moved - the library's toggle_point is replaced (for the point buttons
+# and the points switched with another point) as is the toggle_point used
+# by each of the given modules (e.g. for a restored session). Signals
+# overridden while cleared are found by a check of the signals (on the
+# tkinter thread) so they are caught however the override is set - e.g.
+# by the library's timed signals.
+#
+# Each event is a dictionary: {"sequence": 12, "type": safety_event_type.spad,
+#                              "time": 1700000000.1, "signal": 20}
+#----------------------------------------------------------------------
+
+from model_railway_signals import signals_common
+from model_railway_signals import points as library_points
+import layout_logging
+
+import collections
+import enum
+import logging
+import threading
+import time
+
+# The types of safety event
+class safety_event_type(enum.Enum):
+    spad = 1
+    override_while_clear = 2
+    point_moved_while_locked = 3
+    occupancy_inconsistent = 4
+
+# The events that sound the alarm and flash the panel
+alarm_event_types = (safety_event_type.spad, safety_event_type.point_moved_while_locked)
+
+# The number of events held in the ring buffer
+buffer_size = 256
+
+# How often the signals are checked and the events are passed
+# on to the subscribers on the tkinter thread (in milliseconds)
+check_interval = 100
+
+# Global variables for the event stream
+event_buffer = collections.deque(maxlen=buffer_size)
+events_published = 0
+buffer_lock = threading.Lock()
+subscribers: list = []
+event_counts: dict = {}      # The number of each type of event {"spad": 2, ...}
+tkinter_window = None
+panel_canvas = None
+normal_background = None
+
+# Global variables for the checks of the signals and points
+signals_overridden_while_clear = set()
+signals_passed = set()       # Signals passed since the last check (expected to be overridden)
+ignored_points = set()       # Points that are moved by something else (e.g. another signal box)
+library_toggle_point = None  # The library function to toggle a point (once it has been replaced)
+
+#----------------------------------------------------------------------
+# Externally called function to publish an event (with any named fields)
+# This can be called from any thread and never blocks
+#----------------------------------------------------------------------
+
+def publish_safety_event(event_type:safety_event_type, **fields):
+    global events_published
+    with buffer_lock:
+        events_published = events_published + 1
+        event = {"sequence": events_published, "type": event_type, "time": time.time()}
+        event.update(fields)
+        event_buffer.append(event)
+        for subscriber in subscribers:
+            if subscriber["wakeup"] is not None: subscriber["wakeup"].set()
+    return()
+
+#----------------------------------------------------------------------
+# Internal function to pass any new events on to a subscriber
+#----------------------------------------------------------------------
+
+def deliver_events(subscriber:dict):
+    with buffer_lock:
+        events = [event for event in event_buffer if event["sequence"] >= subscriber["next_sequence"]]
+        if events and events[0]["sequence"] > subscriber["next_sequence"]:
+            subscriber["missed"] = subscriber["missed"] + events[0]["sequence"] - subscriber["next_sequence"]
+        subscriber["next_sequence"] = events_published + 1
+    for event in events:
+        try:
+            subscriber["callback"](event)
+        except Exception as error:
+            layout_logging.log_event("safety_event_error", logging.ERROR, function="deliver_events",
+                                     subscriber=subscriber["name"], error=str(error))
+    return()
+
+def thread_to_deliver_events(subscriber:dict):
+    while True:
+        subscriber["wakeup"].wait()
+        subscriber["wakeup"].clear()
+        deliver_events(subscriber)
+
+#----------------------------------------------------------------------
+# Externally called function to subscribe to the events. The callback is
+# made (with the event) on the tkinter thread if on_tkinter_thread is True
+# (once the events have been started) or otherwise on its own thread.
+# Returns the subscriber (which includes the count of missed events)
+#----------------------------------------------------------------------
+
+def subscribe(name:str, callback, on_tkinter_thread:bool=False):
+    with buffer_lock:
+        subscriber = {"name":name, "callback":callback, "next_sequence":events_published + 1,
+                      "missed":0, "wakeup":None if on_tkinter_thread else threading.Event()}
+        subscribers.append(subscriber)
+    if not on_tkinter_thread:
+        deliverer = threading.Thread(target=thread_to_deliver_events, args=(subscriber,), daemon=True)
+        deliverer.start()
+    return(subscriber)
+
+#----------------------------------------------------------------------
+# Externally called function to note that a signal has been passed (so
+# the signal being overridden straight afterwards is expected)
+#----------------------------------------------------------------------
+
+def note_signal_passed(sig_id:int):
+    signals_passed.add(str(sig_id))
+    return()
+
+#----------------------------------------------------------------------
+# Internal function to check the signals for signals that have been
+# overridden while they are cleared (uses the library's own record)
+#----------------------------------------------------------------------
+
+def check_signals():
+    for sig_id, signal in signals_common.signals.items():
+        if signal.get("sigclear") and signal.get("override"):
+            if sig_id not in signals_overridden_while_clear:
+                signals_overridden_while_clear.add(sig_id)
+                if sig_id not in signals_passed:
+                    publish_safety_event(safety_event_type.override_while_clear, signal=int(sig_id))
+        else:
+            signals_overridden_while_clear.discard(sig_id)
+    signals_passed.clear()
+    return()
+
+def check_and_deliver():
+    check_signals()
+    for subscriber in subscribers:
+        if subscriber["wakeup"] is None: deliver_events(subscriber)
+    tkinter_window.after(check_interval, check_and_deliver)
+    return()
+
+#----------------------------------------------------------------------
+# Internal function to toggle a point - the event is published if the point
+# is locked when it is moved (uses the library's own record of the lock)
+#----------------------------------------------------------------------
+
+def toggle_point(point_id:int, *args):
+    if point_id not in ignored_points:
+        point = library_points.points.get(str(point_id))
+        if point is not None and point["locked"]:
+            publish_safety_event(safety_event_type.point_moved_while_locked, point=point_id)
+    library_toggle_point(point_id, *args)
+    return()
+
+#----------------------------------------------------------------------
+# Externally called function to replace the toggle_point used by the library
+# (for the point buttons) and by each of the given modules - so the points
+# moved while locked are caught as they are moved
+#----------------------------------------------------------------------
+
+def install_filters(modules:list):
+    global library_toggle_point
+    if library_toggle_point is None:
+        library_toggle_point = library_points.toggle_point
+        library_points.toggle_point = toggle_point
+    for module in modules:
+        if "toggle_point" in module.__dict__: module.__dict__["toggle_point"] = toggle_point
+    return()
+
+#----------------------------------------------------------------------
+# The standard subscribers - logging each event, counting them, sounding
+# the alarm and flashing the panel
+#----------------------------------------------------------------------
+
+def log_event(event:dict):
+    fields = {name: value for name, value in event.items() if name not in ("type", "time")}
+    layout_logging.log_event(event["type"].name, logging.WARNING, **fields)
+    return()
+
+def count_event(event:dict):
+    event_counts[event["type"].name] = event_counts.get(event["type"].name, 0) + 1
+    return()
+
+def sound_alarm(event:dict):
+    if event["type"] in alarm_event_types: tkinter_window.bell()
+    return()
+
+def flash_panel(event:dict, flashes:int=6):
+    if event["type"] in alarm_event_types or flashes % 2 == 1:
+        if flashes % 2 == 0: panel_canvas.configure(background="red")
+        else: panel_canvas.configure(background=normal_background)
+        if flashes > 1: tkinter_window.after(250, lambda: flash_panel(event, flashes - 1))
+    return()
+
+#----------------------------------------------------------------------
+# Externally called function to start checking the signals and points and
+# passing the events on to the subscribers (after the panel has been
+# created). The toggle_point used by each of the given modules is replaced
+# and the standard subscribers are also started
+#----------------------------------------------------------------------
+
+def start_safety_events(window, canvas, modules:list=[]):
+
+    global tkinter_window, panel_canvas, normal_background
+
+    tkinter_window = window
+    panel_canvas = canvas
+    normal_background = canvas.cget("background")
+    check_signals()
+    install_filters(modules)
+    subscribe("log", log_event)
+    subscribe("count", count_event)
+    subscribe("alarm", sound_alarm, on_tkinter_thread=True)
+    subscribe("flash", flash_panel, on_tkinter_thread=True)
+    tkinter_window.after(check_interval, check_and_deliver)
+    return()
+
+###############################################################################
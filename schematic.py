@@ -1,5 +1,8 @@
 from model_railway_signals import *
 import power_switches
+import viewport
+
+import time
 
 # The default colours for the schematic
 off_colour = "grey75" # sections that are switched off
@@ -80,26 +83,23 @@ def create_track_schematic (canvas, point_callback, fpl_enabled:bool=True):
     #------------------------------------------------------------------------------------
 
     # Goods yard LH headshunt
-    lines1 = [canvas.create_line(450,240,450,260,fill=off_colour,width=3)] # End stop
-    lines2 = [canvas.create_line(450,250,575,250,fill=off_colour,width=3)]  # up to point 5
-    lines3 = create_point (canvas,5,point_type.RH,600,250,off_colour,also_switch=105,
+    lines1 = [canvas.create_line(450,240,450,260,450,250,575,250,fill=off_colour,width=3)] # End stop up to point 5
+    lines2 = create_point (canvas,5,point_type.RH,600,250,off_colour,also_switch=105,
                 point_callback=point_callback)
-    lines4 = [canvas.create_line(625,250,875,250,fill=off_colour,width=3)]  # from point 5 to point 18
-    lines5 = [canvas.create_line(600,275,700,375,fill=off_colour,width=3)]  # from point 5 to point 105
-    lines6 = create_point (canvas,18,point_type.LH,900,250,off_colour,
+    lines3 = [canvas.create_line(625,250,875,250,fill=off_colour,width=3)]  # from point 5 to point 18
+    lines4 = [canvas.create_line(600,275,700,375,fill=off_colour,width=3)]  # from point 5 to point 105
+    lines5 = create_point (canvas,18,point_type.LH,900,250,off_colour,
                 point_callback=point_callback)
 
     # Goods yard RH headshunt
-    lines7 = create_point (canvas,110,point_type.RH,1225,400,off_colour,auto=True,
+    lines6 = create_point (canvas,110,point_type.RH,1225,400,off_colour,auto=True,
                 orientation=180, point_callback=point_callback)
-    lines8 = [canvas.create_line(1250,400,1500,400,fill=off_colour,width=3)] # point 101 Headshunt
-    lines9 = [canvas.create_line(1500,390,1500,410,fill=off_colour,width=3)] # End stop
+    lines7 = [canvas.create_line(1250,400,1500,400,1500,390,1500,410,fill=off_colour,width=3)] # point 101 Headshunt & End stop
 
-    goods_yard = lines1 + lines2 + lines3 + lines4 + lines5 + lines6 + lines7 + lines8 + lines9
+    goods_yard = lines1 + lines2 + lines3 + lines4 + lines5 + lines6 + lines7
 
     # Draw the sidings - all are switchable depending on the point settings
-    siding1 = [canvas.create_line(900,225,1075,50,fill=off_colour,width=3), # point 18 siding
-               canvas.create_line(1068,43,1082,57,fill=off_colour,width=3)] # End stop
+    siding1 = [canvas.create_line(900,225,1075,50,1068,43,1082,57,fill=off_colour,width=3)] # point 18 siding & End stop
 
     lines1 = [canvas.create_line(925,250,975,250,fill=off_colour,width=3)] # point 18 to point 14
     lines2 = create_point (canvas,14,point_type.LH,1000,250,off_colour,
@@ -128,24 +128,18 @@ def create_track_schematic (canvas, point_callback, fpl_enabled:bool=True):
                 point_callback=point_callback)
     point17 = lines1 + lines2
 
-    lines1 = [canvas.create_line(1150,75,1175,50,fill=off_colour,width=3)] # point 17 to top siding
-    lines2 = [canvas.create_line(1175,50,1500,50,fill=off_colour,width=3)] # top siding
-    lines3 = [canvas.create_line(1500,40,1500,60,fill=off_colour,width=3)] # End stop
-    siding2 = lines1 + lines2 + lines3
+    siding2 = [canvas.create_line(1150,75,1175,50,1500,50,1500,40,1500,60,
+                fill=off_colour,width=3)] # point 17 to top siding & End stop
 
-    siding3 = [canvas.create_line(1175,100,1500,100,fill=off_colour,width=3),
-               canvas.create_line(1500,90,1500,110,fill=off_colour,width=3)] # End stop
+    siding3 = [canvas.create_line(1175,100,1500,100,1500,90,1500,110,fill=off_colour,width=3)] # point 17 siding & End stop
     
-    siding4 = [canvas.create_line(1125,150,1500,150,fill=off_colour,width=3), # point 16 siding
-               canvas.create_line(1500,140,1500,160,fill=off_colour,width=3)] # End stop
+    siding4 = [canvas.create_line(1125,150,1500,150,1500,140,1500,160,fill=off_colour,width=3)] # point 16 siding & End stop
     
-    siding5 = [canvas.create_line(1075,200,1500,200,fill=off_colour,width=3), # point 15 siding
-               canvas.create_line(1500,190,1500,210,fill=off_colour,width=3)] # End stop
+    siding5 = [canvas.create_line(1075,200,1500,200,1500,190,1500,210,fill=off_colour,width=3)] # point 15 siding & End stop
 
     # Bottom ladder of sidings
     
-    siding6 =  [canvas.create_line(1150,250,1500,250,fill=off_colour,width=3), # point 13 siding
-                canvas.create_line(1500,240,1500,260,fill=off_colour,width=3)] # End stop
+    siding6 =  [canvas.create_line(1150,250,1500,250,1500,240,1500,260,fill=off_colour,width=3)] # point 13 siding & End stop
 
     lines1 = [canvas.create_line(1125,275,1150,300,fill=off_colour,width=3)] # point 13 to point 12
     lines2 = create_point (canvas,12,point_type.RH,1175,300,off_colour,
@@ -157,11 +151,9 @@ def create_track_schematic (canvas, point_callback, fpl_enabled:bool=True):
                 point_callback=point_callback)
     point10 = lines1 + lines2
 
-    siding7 = [canvas.create_line(1200,300,1500,300,fill=off_colour,width=3), # point 12 siding
-               canvas.create_line(1500,290,1500,310,fill=off_colour,width=3)] # End stop
+    siding7 = [canvas.create_line(1200,300,1500,300,1500,290,1500,310,fill=off_colour,width=3)] # point 12 siding & End stop
 
-    siding8 = [canvas.create_line(1250,350,1500,350,fill=off_colour,width=3), # point 10 siding
-               canvas.create_line(1500,340,1500,360,fill=off_colour,width=3)] # End stop
+    siding8 = [canvas.create_line(1250,350,1500,350,1500,340,1500,360,fill=off_colour,width=3)] # point 10 siding & End stop
 
     #------------------------------------------------------------------------------------
     # Draw the Motive Power Depot
@@ -172,8 +164,7 @@ def create_track_schematic (canvas, point_callback, fpl_enabled:bool=True):
                         orientation=180, point_callback=point_callback)
     mpd = lines1 + lines2  # The Main MPD Section 
     
-    mpd1 = [canvas.create_line(475,375,325,225,fill=off_colour,width=3), # point 19 siding
-              canvas.create_line(318,232,332,218,fill=off_colour,width=3)] # End stop
+    mpd1 = [canvas.create_line(475,375,325,225,318,232,332,218,fill=off_colour,width=3)] # point 19 siding & End stop
     
     lines1 = [canvas.create_line(425,400,450,400,fill=off_colour,width=3)]  # point 20 to point 19
     lines2 = create_point(canvas,20,point_type.RH,400,400,off_colour,
@@ -185,20 +176,17 @@ def create_track_schematic (canvas, point_callback, fpl_enabled:bool=True):
     lines2 = [canvas.create_line(300,400,375,400,fill=off_colour,width=3)] # point 21 to point 20
     point21 = lines1 + lines2
     
-    mpd6 = [canvas.create_line(100,400,250,400,fill=off_colour,width=3), # point 21 siding 1
-            canvas.create_line(100,390,100,410,fill=off_colour,width=3)] # End stop
+    mpd6 = [canvas.create_line(250,400,100,400,100,390,100,410,fill=off_colour,width=3)] # point 21 siding 1 & End stop
 
-    mpd5 = [canvas.create_line(275,375,250,350,fill=off_colour,width=3),
-            canvas.create_line(100,350,250,350,fill=off_colour,width=3), # point 21 siding 2
-            canvas.create_line(100,340,100,360,fill=off_colour,width=3)] # End stop
+    mpd5 = [canvas.create_line(275,375,250,350,100,350,100,340,100,360,
+                fill=off_colour,width=3)] # point 21 siding 2 & End stop
 
     lines1 = create_point(canvas,22,point_type.RH,300,300,off_colour,
                         orientation=180, point_callback=point_callback)
     lines2 = [canvas.create_line(400,375,325,300,fill=off_colour,width=3)] 
     point22 = lines1 + lines2
     
-    mpd2 = [canvas.create_line(300,275,200,175,fill=off_colour,width=3), # point 22 siding
-              canvas.create_line(193,182,207,168,fill=off_colour,width=3)] # End stop
+    mpd2 = [canvas.create_line(300,275,200,175,193,182,207,168,fill=off_colour,width=3)] # point 22 siding & End stop
     canvas.create_oval (200,175,250,225, width=3, outline=off_colour)
 
 
@@ -207,12 +195,10 @@ def create_track_schematic (canvas, point_callback, fpl_enabled:bool=True):
     lines2 = [canvas.create_line(250,300,275,300,fill=off_colour,width=3)] 
     point23 = lines1 + lines2
 
-    mpd4 = [canvas.create_line(100,300,200,300,fill=off_colour,width=3), # point 23 siding 1
-            canvas.create_line(100,290,100,310,fill=off_colour,width=3)] # End stop
+    mpd4 = [canvas.create_line(200,300,100,300,100,290,100,310,fill=off_colour,width=3)] # point 23 siding 1 & End stop
 
-    mpd3 = [canvas.create_line(225,275,200,250,fill=off_colour,width=3),
-            canvas.create_line(100,250,200,250,fill=off_colour,width=3), # point 23 siding 2
-            canvas.create_line(100,240,100,260,fill=off_colour,width=3)] # End stop
+    mpd3 = [canvas.create_line(225,275,200,250,100,250,100,240,100,260,
+                fill=off_colour,width=3)] # point 23 siding 2 & End stop
 
     #------------------------------------------------------------------------------------
     # Draw the Goods loop and associated auto sections
@@ -315,8 +301,7 @@ def create_track_schematic (canvas, point_callback, fpl_enabled:bool=True):
 
     canvas.create_line(475,600,600,600,fill=down_colour,width=3) # point 1 to point 103
     create_point(canvas,103,point_type.RH,625,600,down_colour,auto=True)
-    canvas.create_line(575,640,575,660,fill=down_colour,width=3) # End stop
-    canvas.create_line(575,650,600,650,fill=down_colour,width=3) # End stop to point 3
+    canvas.create_line(575,640,575,660,575,650,600,650,fill=down_colour,width=3) # End stop to point 3
 
     create_point(canvas,3,point_type.RH,625,650,down_colour,fpl=fpl_enabled,also_switch=103,
                 orientation=180, point_callback=point_callback)
@@ -449,6 +434,50 @@ def create_layout_signals(canvas, sig_callback):
                             
     return()
 
+#----------------------------------------------------------------------
+# Internal function to change the colour of a track section. The colour
+# each drawing object was last set to is remembered so only the objects
+# that actually change colour are re-configured (and redrawn). Changes to
+# objects that can't currently be seen are held back (see 'viewport')
+#----------------------------------------------------------------------
+
+drawn_colours: dict = {}
+
+def colour_section(canvas, section_objects:list, colour:str):
+    for i in section_objects:
+        if drawn_colours.get(i) != colour:
+            viewport.configure_item (canvas, i, fill=colour)
+            drawn_colours[i] = colour
+    return()
+
+#----------------------------------------------------------------------
+# Externally called function to return the number of drawing objects on
+# the canvas and the time (in milliseconds) to redraw every track section,
+# to update the schematic when nothing has changed and to rescale the
+# canvas (as happens when the window is resized)
+#----------------------------------------------------------------------
+
+def measure_track_schematic(canvas, repeats:int=20):
+    timings = {"full_redraw":0.0, "update":0.0, "resize":0.0}
+    for repeat in range(repeats):
+        drawn_colours.clear()
+        start_time = time.perf_counter()
+        update_track_schematic(canvas)
+        canvas.update_idletasks()
+        timings["full_redraw"] += time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        update_track_schematic(canvas)
+        canvas.update_idletasks()
+        timings["update"] += time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        canvas.scale("all", 0, 0, 1.0, 1.0)
+        canvas.update_idletasks()
+        timings["resize"] += time.perf_counter() - start_time
+    results = {"canvas_items": len(canvas.find_all())}
+    for name, total_time in timings.items():
+        results[name+"_ms"] = round(1000.0 * total_time / repeats, 3)
+    return(results)
+
 #----------------------------------------------------------------------
 # Externally called function to colour the track sections according to the
 # track power section switches and the point settings (to reflect what
@@ -481,23 +510,23 @@ def update_track_schematic(canvas):
     if power_switches.switch_active(6,1): lh_headshunt_colour = branch_colour 
     elif power_switches.switch_active(6,2): lh_headshunt_colour = local_colour
     else: lh_headshunt_colour = off_colour
-    for i in lh_headshunt: canvas.itemconfig (i, fill=lh_headshunt_colour)
+    colour_section(canvas, lh_headshunt, lh_headshunt_colour)
     
     # rh Headshunt
     if power_switches.switch_active(7,1): rh_headshunt_colour = branch_colour 
     elif power_switches.switch_active(7,2): rh_headshunt_colour = local_colour
     else: rh_headshunt_colour = off_colour
-    for i in rh_headshunt: canvas.itemconfig (i, fill=rh_headshunt_colour)
+    colour_section(canvas, rh_headshunt, rh_headshunt_colour)
     
     # goods yard and headshunt
     if power_switches.switch_active(8,1): goods_yard_colour = local_colour 
     else: goods_yard_colour = off_colour
-    for i in goods_yard: canvas.itemconfig (i, fill=goods_yard_colour)
+    colour_section(canvas, goods_yard, goods_yard_colour)
 
     # Motive Power Depot
     if power_switches.switch_active(9,1): mpd_colour = local_colour 
     else: mpd_colour = off_colour
-    for i in mpd: canvas.itemconfig (i, fill=mpd_colour)
+    colour_section(canvas, mpd, mpd_colour)
 
     #-----------------------------------------------------------------------------------------------
     # Work through the auto sections in the appropriate sequence of inheritence
@@ -506,11 +535,11 @@ def update_track_schematic(canvas):
 
     if point_switched(1): lh_auto_sec1_colour = down_colour
     else: lh_auto_sec1_colour = up_colour
-    for i in lh_auto_sec1: canvas.itemconfig (i, fill=lh_auto_sec1_colour)
+    colour_section(canvas, lh_auto_sec1, lh_auto_sec1_colour)
 
     if point_switched(2): lh_auto_sec2_colour = lh_auto_sec1_colour
     else: lh_auto_sec2_colour = lh_headshunt_colour
-    for i in lh_auto_sec2:canvas.itemconfig(i, fill=lh_auto_sec2_colour)
+    colour_section(canvas, lh_auto_sec2, lh_auto_sec2_colour)
     
     if point_switched(4): lh_auto_sec3_colour = lh_auto_sec2_colour
     else: lh_auto_sec3_colour = mpd_colour
@@ -518,11 +547,11 @@ def update_track_schematic(canvas):
     
     if point_switched(9): rh_auto_sec1_colour = down_colour
     else: rh_auto_sec1_colour = up_colour
-    for i in rh_auto_sec1: canvas.itemconfig (i,fill=rh_auto_sec1_colour)
+    colour_section(canvas, rh_auto_sec1, rh_auto_sec1_colour)
 
     if point_switched(8): rh_auto_sec2_colour = rh_auto_sec1_colour
     else: rh_auto_sec2_colour = rh_headshunt_colour
-    for i in rh_auto_sec2: canvas.itemconfig (i, fill=rh_auto_sec2_colour)
+    colour_section(canvas, rh_auto_sec2, rh_auto_sec2_colour)
     
     if point_switched(6): rh_auto_sec3_colour = rh_auto_sec2_colour
     else: rh_auto_sec3_colour = goods_yard_colour
@@ -547,109 +576,117 @@ def update_track_schematic(canvas):
         rh_auto_sec3_colour = off_colour
         lh_auto_sec3_colour = off_colour
 
-    for i in goods_loop: canvas.itemconfig (i, fill=goods_loop_colour)
-    for i in rh_auto_sec3: canvas.itemconfig (i, fill=rh_auto_sec3_colour)
-    for i in lh_auto_sec3: canvas.itemconfig (i, fill=lh_auto_sec3_colour)
+    colour_section(canvas, goods_loop, goods_loop_colour)
+    colour_section(canvas, rh_auto_sec3, rh_auto_sec3_colour)
+    colour_section(canvas, lh_auto_sec3, lh_auto_sec3_colour)
 
     if power_switches.switch_active(2,1):
-        for i in platform3: canvas.itemconfig(i,fill = lh_auto_sec2_colour)
+        colour_section(canvas, platform3, lh_auto_sec2_colour)
     elif power_switches.switch_active(2,2):
-        for i in platform3: canvas.itemconfig(i,fill = rh_auto_sec2_colour)
+        colour_section(canvas, platform3, rh_auto_sec2_colour)
     else:
-        for i in platform3: canvas.itemconfig(i,fill = off_colour)
+        colour_section(canvas, platform3, off_colour)
 
     if power_switches.switch_active(3,1):
-        for i in platform2: canvas.itemconfig (i, fill = up_colour)
+        colour_section(canvas, platform2, up_colour)
     else:
-        for i in platform2: canvas.itemconfig (i, fill = off_colour)
+        colour_section(canvas, platform2, off_colour)
 
     if power_switches.switch_active(4,1):
-        for i in through_loop: canvas.itemconfig (i, fill = down_colour)
+        colour_section(canvas, through_loop, down_colour)
     else:
-        for i in through_loop: canvas.itemconfig (i, fill = off_colour)
+        colour_section(canvas, through_loop, off_colour)
 
     if power_switches.switch_active(5,1):
-        for i in platform1: canvas.itemconfig (i, fill = down_colour)
+        colour_section(canvas, platform1, down_colour)
     else:
-        for i in platform1: canvas.itemconfig (i, fill = off_colour)
+        colour_section(canvas, platform1, off_colour)
     
     #-----------------------------------------------------------------------------------------------
     # Change the colours of the the goods yard sections according to the point settings
     # (Track power is switched by the point settings - fed from the LH Headshunt
     #-----------------------------------------------------------------------------------------------
 
-    # The easiest thing to do is to switch off everything and then only switch on what we need
-    all_sidings = (point10 + point12 + point13 + point14 + point15 + point16 + point17 +
-            siding1 + siding2 + siding3 + siding4 + siding5 + siding6 + siding7 + siding8)
-    for i in all_sidings: canvas.itemconfig (i, fill = off_colour)
+    # Work out which sidings are fed (following the points) and then colour each siding once
+    # (so only the sidings that actually change colour are redrawn)
+    all_sidings = (point10, point12, point13, point14, point15, point16, point17,
+            siding1, siding2, siding3, siding4, siding5, siding6, siding7, siding8)
+    fed_sidings = []
 
     if point_switched(18):
-        for i in siding1: canvas.itemconfig (i, fill = goods_yard_colour)  
+        fed_sidings.append(siding1)
     else :
-        for i in point14: canvas.itemconfig (i, fill = goods_yard_colour)
+        fed_sidings.append(point14)
         if point_switched(14):
-            for i in point15: canvas.itemconfig (i, fill = goods_yard_colour)
+            fed_sidings.append(point15)
             if point_switched(15):
-                for i in point16: canvas.itemconfig (i, fill = goods_yard_colour)
+                fed_sidings.append(point16)
                 if point_switched(16):
-                    for i in point17: canvas.itemconfig (i, fill = goods_yard_colour)
+                    fed_sidings.append(point17)
                     
                     if point_switched(17):
-                        for i in siding2: canvas.itemconfig (i, fill = goods_yard_colour)
+                        fed_sidings.append(siding2)
                     else:
-                        for i in siding3: canvas.itemconfig (i, fill = goods_yard_colour)
+                        fed_sidings.append(siding3)
                 else: #point16 not switched
-                    for i in siding4: canvas.itemconfig (i, fill = goods_yard_colour)  
+                    fed_sidings.append(siding4)
             else: #point15 not switched
-                for i in siding5: canvas.itemconfig (i, fill = goods_yard_colour)
+                fed_sidings.append(siding5)
         else: #point14 not switched
-            for i in point13: canvas.itemconfig (i, fill = goods_yard_colour)
+            fed_sidings.append(point13)
             if point_switched(13):
-                for i in point12: canvas.itemconfig (i, fill = goods_yard_colour)
+                fed_sidings.append(point12)
                 if point_switched(12):
-                    for i in point10: canvas.itemconfig (i, fill = goods_yard_colour)
+                    fed_sidings.append(point10)
                     if not point_switched(10):
-                        for i in siding8: canvas.itemconfig (i, fill = goods_yard_colour)
+                        fed_sidings.append(siding8)
                 else: #point12  not switched
-                    for i in siding7: canvas.itemconfig (i, fill = goods_yard_colour)
+                    fed_sidings.append(siding7)
             else: #point13 not switched
-                for i in siding6: canvas.itemconfig (i, fill = goods_yard_colour)
+                fed_sidings.append(siding6)
+
+    for siding in all_sidings:
+        if siding in fed_sidings: colour_section(canvas, siding, goods_yard_colour)
+        else: colour_section(canvas, siding, off_colour)
  
     #-----------------------------------------------------------------------------------------------
     # Change the colours of the the MPD sections according to the point settings
     # (Track power is switched by the point settings - if MPD section switch is active)
     #-----------------------------------------------------------------------------------------------
 
-    # The easiest thing to do is to switch off everything and then only switch on what we need
-    all_sidings = point20 + point21 + point22 + point23 + mpd1 + mpd2 + mpd3 +mpd4 + mpd5 + mpd6
-    for i in all_sidings: canvas.itemconfig (i, fill = off_colour)
+    # Work out which sidings are fed (following the points) and then colour each siding once
+    all_sidings = (point20, point21, point22, point23, mpd1, mpd2, mpd3, mpd4, mpd5, mpd6)
+    fed_sidings = []
 
     if point_switched(19):
-        for i in mpd1: canvas.itemconfig (i, fill = mpd_colour)  
+        fed_sidings.append(mpd1)
     else:
-        for i in point20: canvas.itemconfig (i, fill = mpd_colour)
+        fed_sidings.append(point20)
         
         if point_switched(20):
-            for i in point22: canvas.itemconfig (i, fill = mpd_colour)
+            fed_sidings.append(point22)
             
             if point_switched(22):
-                for i in mpd2: canvas.itemconfig (i, fill = mpd_colour)
+                fed_sidings.append(mpd2)
                 
             else: # point 22 not switched
-                for i in point23: canvas.itemconfig (i, fill = mpd_colour)
+                fed_sidings.append(point23)
                 if point_switched(23):
-                    for i in mpd3: canvas.itemconfig (i, fill = mpd_colour)
+                    fed_sidings.append(mpd3)
                 else: # point 23 not switched
-                    for i in mpd4: canvas.itemconfig (i, fill = mpd_colour)
+                    fed_sidings.append(mpd4)
                     
         else: # point 20 not switched
-            for i in point21: canvas.itemconfig (i, fill = mpd_colour)
+            fed_sidings.append(point21)
             if point_switched(21):
-                for i in mpd5: canvas.itemconfig (i, fill = mpd_colour)
+                fed_sidings.append(mpd5)
             else: # point 21 not switched
-                for i in mpd6: canvas.itemconfig (i, fill = mpd_colour)
+                fed_sidings.append(mpd6)
+
+    for siding in all_sidings:
+        if siding in fed_sidings: colour_section(canvas, siding, mpd_colour)
+        else: colour_section(canvas, siding, off_colour)
 
-            
     return()
 
 
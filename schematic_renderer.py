@@ -0,0 +1,351 @@
+#----------------------------------------------------------------------
+# This Module renders the schematic to an SVG (or PNG) image without using
+# tkinter - so it can be run without a display (e.g. on the build machine
+# for visual regression checks, or to create status thumbnails for a
+# dashboard or screenshots for bug reports).
+#
+# We load a private copy of the 'schematic' module (in the same way as the
+# rule modules are loaded by 'rule_evaluator') and let it draw onto a
+# "recording" canvas that just remembers the drawing objects. The library
+# functions that create the points and signals are replaced by functions
+# that draw the point blades and a simple signal (post and a single lamp
+# showing the aspect) onto the same canvas. The track colours come from the
+# normal 'update_track_schematic' function and the point, signal and power
+# switch state from the rules (evaluated against the state we are given).
+#
+# The rendering is incremental - the SVG element (or the area of the PNG
+# image) for each drawing object is only redrawn if it has changed since
+# the last time the image was rendered.
+#
+# PNG images need the Pillow library (pip install pillow) - SVG images
+# don't need anything else.
+#
+# To run: python3 schematic_renderer.py [image_file]  (renders the last
+# saved layout state - see 'snapshot' - to 'schematic.svg' by default)
+#----------------------------------------------------------------------
+
+from model_railway_signals import *
+from model_railway_signals import common
+import rule_evaluator
+import snapshot
+
+import math
+import os
+import sys
+
+try:
+    from PIL import Image, ImageDraw
+except ImportError:
+    Image = None
+
+# The size and background colour of the image (the same as the panel)
+image_width = 1900
+image_height = 1000
+background_colour = "grey85"
+
+#----------------------------------------------------------------------
+# The recording canvas - provides the tkinter canvas functions used by the
+# schematic and remembers the drawing objects (and which have changed)
+#----------------------------------------------------------------------
+
+class RecordingCanvas():
+
+    def __init__(self):
+        self.items = {}
+        self.changed = set()
+
+    def create_item(self, item_type:str, coords, options:dict):
+        # The coordinates can be given as numbers or as (nested) lists of points
+        flat_coords = []
+        while coords:
+            value, coords = coords[0], coords[1:]
+            if isinstance(value, (tuple, list)): coords = tuple(value) + tuple(coords)
+            else: flat_coords.append(value)
+        item_id = len(self.items) + 1
+        self.items[item_id] = {"type": item_type, "coords": [float(value) for value in flat_coords],
+                               "fill": options.get("fill", "black" if item_type == "line" else ""), "outline": options.get("outline", "black"),
+                               "width": float(options.get("width", 1)), "state": options.get("state", "normal")}
+        self.changed.add(item_id)
+        return(item_id)
+
+    def create_line(self, *coords, **options):
+        return(self.create_item("line", coords, options))
+
+    def create_oval(self, *coords, **options):
+        return(self.create_item("oval", coords, options))
+
+    def itemconfig(self, item_id, **options):
+        item = self.items[item_id]
+        for name, value in options.items():
+            if item.get(name) != value:
+                item[name] = value
+                self.changed.add(item_id)
+        return()
+
+    itemconfigure = itemconfig
+
+#----------------------------------------------------------------------
+# Internal functions to replace the library functions that create the points
+# and signals. These just draw onto the recording canvas and remember the
+# drawing objects (and the signal type) so they can be updated later
+#----------------------------------------------------------------------
+
+def create_drawing_functions(renderer:dict):
+
+    def create_point(canvas, point_id:int, pointtype, x:int, y:int, colour:str,
+                     orientation:int=0, reverse:bool=False, **options):
+        # The same geometry as the library points
+        direction = +10 if pointtype == point_type.RH else -10
+        blade1 = canvas.create_line(common.rotate_line(x,y,-25,0,-10,0,orientation), fill=colour, width=3)
+        blade2 = canvas.create_line(common.rotate_line(x,y,-25,0,-15,direction,orientation), fill=colour, width=3)
+        route1 = canvas.create_line(common.rotate_line(x,y,-10,0,+25,0,orientation), fill=colour, width=3)
+        route2 = canvas.create_line(common.rotate_line(x,y,-15,direction,0,2.5*direction,orientation), fill=colour, width=3)
+        if reverse: blade1, blade2 = blade2, blade1
+        canvas.itemconfig(blade2, state="hidden")
+        renderer["points"][str(point_id)] = {"blade1":blade1, "blade2":blade2}
+        return([blade1, blade2, route1, route2])
+
+    def create_signal(canvas, sig_id:int, x:int, y:int, orientation:int, ground:bool, options:dict):
+        canvas.create_line(common.rotate_line(x,y,0,0,0,-20,orientation), width=2)
+        canvas.create_line(common.rotate_line(x,y,0,-20,+30,-20,orientation), width=3)
+        lamp = canvas.create_oval(common.rotate_line(x,y,+30,-26,+42,-14,orientation), fill="grey", outline="black")
+        renderer["signals"][str(sig_id)] = {"lamp": lamp, "ground": ground,
+                    "subtype": options.get("signal_subtype", signal_sub_type.four_aspect),
+                    "automatic": options.get("fully_automatic", False)}
+        return()
+
+    def create_colour_light_signal(canvas, sig_id:int, x:int, y:int, orientation:int=0, **options):
+        create_signal(canvas, sig_id, x, y, orientation, False, options)
+        return()
+
+    def create_ground_position_signal(canvas, sig_id:int, x:int, y:int, orientation:int=0, **options):
+        create_signal(canvas, sig_id, x, y, orientation, True, options)
+        return()
+
+    return({"create_point":create_point,
+            "create_colour_light_signal":create_colour_light_signal,
+            "create_ground_position_signal":create_ground_position_signal})
+
+#----------------------------------------------------------------------
+# Externally called function to create a new renderer (and draw the
+# schematic onto its recording canvas). The schematic can be taken from
+# another module providing the same functions (e.g. a generated layout -
+# see 'layout_generator') in the same way as for 'rule_evaluator'
+#----------------------------------------------------------------------
+
+def create_renderer(module_names:dict={}):
+    renderer = {"points":{}, "signals":{}, "canvas":RecordingCanvas(),
+                "evaluator":rule_evaluator.create_evaluator(module_names),
+                "svg_elements":{}, "svg_changed":set(), "image":None, "png_changed":set()}
+    shadow_functions = rule_evaluator.create_shadow_functions(renderer["evaluator"])
+    shadow_functions.update(create_drawing_functions(renderer))
+    schematic = rule_evaluator.load_rule_module(module_names.get("schematic","schematic"), shadow_functions)
+    # The schematic reads the power switches via the 'power_switches' module
+    schematic.power_switches = renderer["evaluator"]["power_switches"]
+    null_callback = lambda *args: None
+    schematic.create_track_schematic(renderer["canvas"], null_callback)
+    schematic.create_layout_signals(renderer["canvas"], null_callback)
+    renderer["schematic"] = schematic
+    return(renderer)
+
+#----------------------------------------------------------------------
+# Internal function to work out the aspect colour for each signal from
+# the evaluated rules. The aspects are worked out in the order of the
+# refresh sequence (i.e. the signal ahead is always worked out first)
+#----------------------------------------------------------------------
+
+def signal_colours(renderer:dict, state:dict, outputs:dict):
+    colours = {}
+    for sig_id, signal in renderer["signals"].items():
+        if signal["automatic"]: clear = True
+        else: clear = state["signals"].get(sig_id, (False,False))[0]
+        if outputs["overrides"].get(sig_id, False): clear = False
+        if signal["ground"]: colours[sig_id] = "white" if clear else "red"
+        elif not clear and signal["subtype"] == signal_sub_type.distant: colours[sig_id] = "yellow"
+        elif not clear: colours[sig_id] = "red"
+        else: colours[sig_id] = "green"
+    for sig_id, route, sig_ahead_id in outputs["aspects"]:
+        signal = renderer["signals"].get(str(sig_id))
+        if signal is None or signal["ground"] or colours[str(sig_id)] != "green": continue
+        aspect_ahead = colours.get(str(sig_ahead_id))
+        if aspect_ahead == "red" and signal["subtype"] in (signal_sub_type.three_aspect,
+                signal_sub_type.four_aspect, signal_sub_type.distant):
+            colours[str(sig_id)] = "yellow"
+        elif aspect_ahead == "yellow" and signal["subtype"] == signal_sub_type.four_aspect:
+            colours[str(sig_id)] = "yellow"
+    return(colours)
+
+#----------------------------------------------------------------------
+# Externally called function to update the schematic to the given layout
+# state (in the 'snapshot' format) - only the drawing objects that change
+# are marked to be redrawn the next time the image is rendered
+#----------------------------------------------------------------------
+
+def update_renderer(renderer:dict, state:dict):
+    canvas = renderer["canvas"]
+    outputs = rule_evaluator.evaluate(renderer["evaluator"], state)
+    for point_id, point in renderer["points"].items():
+        switched = state["points"].get(point_id, (False,True))[0]
+        canvas.itemconfig(point["blade1"], state="hidden" if switched else "normal")
+        canvas.itemconfig(point["blade2"], state="normal" if switched else "hidden")
+    renderer["schematic"].update_track_schematic(canvas)
+    for sig_id, colour in signal_colours(renderer, state, outputs).items():
+        canvas.itemconfig(renderer["signals"][sig_id]["lamp"], fill=colour)
+    return()
+
+#----------------------------------------------------------------------
+# Internal function to pass on the objects that have changed on the canvas
+# to each type of image (as each is rendered separately)
+#----------------------------------------------------------------------
+
+def take_changes(renderer:dict):
+    renderer["svg_changed"].update(renderer["canvas"].changed)
+    renderer["png_changed"].update(renderer["canvas"].changed)
+    renderer["canvas"].changed.clear()
+    return()
+
+#----------------------------------------------------------------------
+# Internal function to convert a tkinter colour to an SVG/Pillow colour.
+# These are mostly the same apart from the "grey0" to "grey100" shades
+#----------------------------------------------------------------------
+
+def image_colour(colour:str):
+    if colour == "": return("none")
+    for prefix in ("grey", "gray"):
+        if colour.startswith(prefix) and colour[len(prefix):].isdigit():
+            level = round(2.55 * int(colour[len(prefix):]))
+            return("#%02x%02x%02x" % (level, level, level))
+    return(colour)
+
+#----------------------------------------------------------------------
+# Externally called function to render the schematic as an SVG image
+# (returned as a string). Only the elements that have changed since the
+# last time the image was rendered are re-created
+#----------------------------------------------------------------------
+
+def render_svg(renderer:dict):
+    canvas = renderer["canvas"]
+    take_changes(renderer)
+    for item_id in renderer["svg_changed"]:
+        item = canvas.items[item_id]
+        coords = item["coords"]
+        if item["state"] == "hidden":
+            element = ""
+        elif item["type"] == "line":
+            element = ('<polyline points="%s" fill="none" stroke="%s" stroke-width="%g"/>' %
+                       (" ".join("%g" % value for value in coords), image_colour(item["fill"]), item["width"]))
+        else:
+            element = ('<ellipse cx="%g" cy="%g" rx="%g" ry="%g" fill="%s" stroke="%s" stroke-width="%g"/>' %
+                       ((coords[0]+coords[2])/2, (coords[1]+coords[3])/2, abs(coords[2]-coords[0])/2,
+                        abs(coords[3]-coords[1])/2, image_colour(item["fill"]), image_colour(item["outline"]),
+                        item["width"]))
+        renderer["svg_elements"][item_id] = element
+    renderer["svg_changed"].clear()
+    elements = [renderer["svg_elements"][item_id] for item_id in sorted(renderer["svg_elements"].keys())]
+    return('<svg xmlns="http://www.w3.org/2000/svg" width="%d" height="%d" viewBox="0 0 %d %d" '
+           'stroke-linecap="round">\n<rect width="100%%" height="100%%" fill="%s"/>\n%s\n</svg>\n' %
+           (image_width, image_height, image_width, image_height, image_colour(background_colour),
+            "\n".join(element for element in elements if element)))
+
+#----------------------------------------------------------------------
+# Internal functions to draw the objects onto the (cached) PNG image
+#----------------------------------------------------------------------
+
+def pillow_colour(colour:str):
+    colour = image_colour(colour)
+    return(None if colour == "none" else colour)
+
+def item_bounds(item:dict):
+    xs, ys, margin = item["coords"][0::2], item["coords"][1::2], item["width"] + 1
+    return((min(xs)-margin, min(ys)-margin, max(xs)+margin, max(ys)+margin))
+
+def bounds_overlap(bounds1, bounds2):
+    return(bounds1[0] <= bounds2[2] and bounds2[0] <= bounds1[2] and
+           bounds1[1] <= bounds2[3] and bounds2[1] <= bounds1[3])
+
+def area_box(bounds, scale:float):
+    return((math.floor(bounds[0]*scale), math.floor(bounds[1]*scale),
+            math.ceil(bounds[2]*scale)+1, math.ceil(bounds[3]*scale)+1))
+
+def draw_item(draw, item:dict, scale:float):
+    coords = [value * scale for value in item["coords"]]
+    if item["state"] == "hidden": return()
+    if item["type"] == "line":
+        width = max(1, round(item["width"] * scale))
+        draw.line(coords, fill=pillow_colour(item["fill"]), width=width, joint="curve")
+    else:
+        draw.ellipse((min(coords[0],coords[2]), min(coords[1],coords[3]), max(coords[0],coords[2]),
+                      max(coords[1],coords[3])), fill=pillow_colour(item["fill"]), outline=pillow_colour(item["outline"]),
+                     width=max(1, round(item["width"] * scale)))
+    return()
+
+#----------------------------------------------------------------------
+# Externally called function to render the schematic as a PNG image (the
+# scale can be reduced to create thumbnails). The image is kept so only
+# the areas of the image containing objects that have changed (since the
+# last time the image was rendered) are cleared and redrawn
+#----------------------------------------------------------------------
+
+def render_png(renderer:dict, image_file:str, scale:float=1.0):
+    if Image is None:
+        print ("ERROR: render_png - the Pillow library is needed to create PNG images (pip install pillow)")
+        return()
+    canvas = renderer["canvas"]
+    take_changes(renderer)
+    if renderer["image"] is None or renderer["image_scale"] != scale:
+        image_size = (math.ceil(image_width*scale), math.ceil(image_height*scale))
+        renderer["image"] = Image.new("RGB", image_size, image_colour(background_colour))
+        renderer["area_image"] = Image.new("RGB", image_size, image_colour(background_colour))
+        renderer["image_scale"] = scale
+        changed_areas = None
+    else:
+        changed_areas = [area_box(item_bounds(canvas.items[item_id]), scale) for item_id in renderer["png_changed"]]
+    if changed_areas is None:
+        draw = ImageDraw.Draw(renderer["image"])
+        for item in canvas.items.values(): draw_item(draw, item, scale)
+    elif changed_areas:
+        # Clear the changed areas and redraw everything that overlaps them. This
+        # is done on a separate image (the objects that overlap an area would
+        # otherwise draw over the objects outside it) and the areas copied across
+        draw = ImageDraw.Draw(renderer["area_image"])
+        for box in changed_areas:
+            draw.rectangle((box[0], box[1], box[2]-1, box[3]-1), fill=image_colour(background_colour))
+        areas = [[value / scale for value in box] for box in changed_areas]
+        for item in canvas.items.values():
+            bounds = item_bounds(item)
+            if any(bounds_overlap(bounds, area) for area in areas):
+                draw_item(draw, item, scale)
+        for box in changed_areas:
+            renderer["image"].paste(renderer["area_image"].crop(box), box[:2])
+    renderer["png_changed"].clear()
+    renderer["image"].save(image_file)
+    return()
+
+#----------------------------------------------------------------------
+# Externally called function to render a layout state (in the 'snapshot'
+# format) to an image file - PNG if the file name ends in '.png' (otherwise
+# an SVG image). The renderer is returned so it can be re-used
+#----------------------------------------------------------------------
+
+def render_layout_state(state:dict, image_file:str, renderer:dict=None):
+    if renderer is None: renderer = create_renderer()
+    update_renderer(renderer, state)
+    if image_file.lower().endswith(".png"):
+        render_png(renderer, image_file)
+    else:
+        with open(image_file, "w") as file:
+            file.write(render_svg(renderer))
+    return(renderer)
+
+if __name__ == "__main__":
+    image_file = sys.argv[1] if len(sys.argv) > 1 else "schematic.svg"
+    state = snapshot.default_layout_state()
+    saved_state = snapshot.load_layout_state()
+    if saved_state is not None: snapshot.merge_delta(state, saved_state)
+    render_layout_state(state, image_file)
+    print ("Schematic rendered to "+image_file)
+    # The library leaves threads running so we can't just return
+    sys.stdout.flush()
+    os._exit(0)
+
+###############################################################################
@@ -10,6 +10,7 @@
 #----------------------------------------------------------------------
 
 from model_railway_signals import *
+from safety_events import safety_event_type, publish_safety_event
 
 # Global variables for the track occupancy sections
 # Effectively constants to "lable" the switches
@@ -54,6 +55,26 @@ def create_track_occupancy_switches(canvas, callback):
 
     return()
 
+#----------------------------------------------------------------------
+# Internal Functions to set and clear a Track Occupancy section as a train
+# passes a signal - a train entering a section that is already occupied or
+# leaving a section that isn't occupied is reported as a safety event
+#----------------------------------------------------------------------
+
+def occupy_section(sig_passed:int, section_id:int):
+    if section_occupied(section_id):
+        publish_safety_event(safety_event_type.occupancy_inconsistent, signal=sig_passed,
+                             section=section_id, occupied=True)
+    set_section_occupied(section_id)
+    return()
+
+def release_section(sig_passed:int, section_id:int):
+    if not section_occupied(section_id):
+        publish_safety_event(safety_event_type.occupancy_inconsistent, signal=sig_passed,
+                             section=section_id, occupied=False)
+    clear_section_occupied(section_id)
+    return()
+
 #----------------------------------------------------------------------
 # Externally called Function to update the Track Occupancy indicators/switches
 # based on the signal that has been passed and the route that has been set up
@@ -70,70 +91,70 @@ def update_track_occupancy(sig_passed:int):
     
     # This is effectively the "entry" Signal to area of control
     if sig_passed == 20:
-        if not signal_clear(20): print ("SPAD - Signal 20")
-        set_section_occupied (occupied_down_east)
+        if not signal_clear(20): publish_safety_event(safety_event_type.spad, signal=20)
+        occupy_section(sig_passed, occupied_down_east)
         
     elif sig_passed == 11:
-        if not signal_clear(11): print ("SPAD - Signal 11")
-        clear_section_occupied(occupied_down_east)
+        if not signal_clear(11): publish_safety_event(safety_event_type.spad, signal=11)
+        release_section(sig_passed, occupied_down_east)
         if not point_switched(9) and not point_switched(7):
              # Movement into the Down loop
-            set_section_occupied(occupied_down_loop)
+            occupy_section(sig_passed, occupied_down_loop)
         elif not point_switched(9) and point_switched(7):
              # Movement into the down platform
-            set_section_occupied(occupied_down_platform)
+            occupy_section(sig_passed, occupied_down_platform)
         elif point_switched(9) and not point_switched(6):
              # Movement into the branch platform
-            set_section_occupied(occupied_branch_platform)
+            occupy_section(sig_passed, occupied_branch_platform)
         else :  # Movement into the goods loop
-            set_section_occupied(occupied_goods_loop)
+            occupy_section(sig_passed, occupied_goods_loop)
            
     elif sig_passed == 12:
-        if not signal_clear(12): print ("SPAD - Signal 12")
-        set_section_occupied(occupied_down_west)
+        if not signal_clear(12): publish_safety_event(safety_event_type.spad, signal=12)
+        occupy_section(sig_passed, occupied_down_west)
         trigger_timed_signal(21,5,5)
-        clear_section_occupied(occupied_down_loop)
+        release_section(sig_passed, occupied_down_loop)
 
     elif sig_passed == 13:
-        if not signal_clear(13): print ("SPAD - Signal 13")
-        set_section_occupied(occupied_down_west)
+        if not signal_clear(13): publish_safety_event(safety_event_type.spad, signal=13)
+        occupy_section(sig_passed, occupied_down_west)
         trigger_timed_signal(21,5,5)
-        clear_section_occupied(occupied_down_platform)
+        release_section(sig_passed, occupied_down_platform)
 
     elif sig_passed == 21:
         # This is effectively the "exit" Signal from our area of control
         # This signal is fully automatic so we only need to clear the section
-        clear_section_occupied(occupied_down_west)
+        release_section(sig_passed, occupied_down_west)
 
     # Up Main Signals ########################################
         
     # This is effectively the "entry" Signal to our area of control
     elif sig_passed == 22: 
-        if not signal_clear(22): print ("SPAD - Signal 22")
-        set_section_occupied(occupied_up_west)
+        if not signal_clear(22): publish_safety_event(safety_event_type.spad, signal=22)
+        occupy_section(sig_passed, occupied_up_west)
 
     elif sig_passed == 3:
-        if not signal_clear(3): print ("SPAD - Signal 3")
-        clear_section_occupied(occupied_up_west)
+        if not signal_clear(3): publish_safety_event(safety_event_type.spad, signal=3)
+        release_section(sig_passed, occupied_up_west)
         if not point_switched(2):
             # movement into up platform
-            set_section_occupied(occupied_up_platform)
+            occupy_section(sig_passed, occupied_up_platform)
         elif point_switched(2) and not point_switched(4):
             # movement into branch platform
-            set_section_occupied(occupied_branch_platform)
+            occupy_section(sig_passed, occupied_branch_platform)
         else :  # movement into the goods loop
-            set_section_occupied(occupied_goods_loop)
+            occupy_section(sig_passed, occupied_goods_loop)
             
     elif sig_passed == 4:
-        if not signal_clear(4): print ("SPAD - Signal 4")
-        set_section_occupied(occupied_up_east)
-        clear_section_occupied(occupied_up_platform)
+        if not signal_clear(4): publish_safety_event(safety_event_type.spad, signal=4)
+        occupy_section(sig_passed, occupied_up_east)
+        release_section(sig_passed, occupied_up_platform)
         trigger_timed_signal(23,5,5)
         
     elif sig_passed == 23:
         # This is effectively the "exit" Signal from our area of control
         # This signal is fully automatic so we only need to clear the section
-        clear_section_occupied(occupied_up_east)
+        release_section(sig_passed, occupied_up_east)
         
         
     # Remaining Signals - These lines are 2-way running ########################################
@@ -143,94 +164,94 @@ def update_track_occupancy(sig_passed:int):
     elif sig_passed == 1:
         if signal_clear(1):
             # assume west-to-east -train entering our area of control
-            set_section_occupied(occupied_branch_west)
+            occupy_section(sig_passed, occupied_branch_west)
         else:
             # assume east to west - train exiting our area of control
-            clear_section_occupied(occupied_branch_west)
+            release_section(sig_passed, occupied_branch_west)
 
     elif sig_passed == 2:
         if signal_clear(2) or subsidary_clear(2): # assume west-to-east
-            clear_section_occupied(occupied_branch_west)
+            release_section(sig_passed, occupied_branch_west)
             if not point_switched(4):
                 # movement into branch platform
-                set_section_occupied(occupied_branch_platform)
+                occupy_section(sig_passed, occupied_branch_platform)
             else :  # movement into the goods loop
-                set_section_occupied(occupied_goods_loop)
+                occupy_section(sig_passed, occupied_goods_loop)
         else:
-            set_section_occupied(occupied_branch_west)
+            occupy_section(sig_passed, occupied_branch_west)
 
     elif sig_passed == 5:
         if signal_clear(5) or subsidary_clear(5): # assume east-to-west
-            clear_section_occupied(occupied_goods_loop)
+            release_section(sig_passed, occupied_goods_loop)
             if not point_switched(5):
                 if point_switched(4) and not point_switched(2):
                     # movement onto branch
-                    set_section_occupied(occupied_branch_west)
+                    occupy_section(sig_passed, occupied_branch_west)
                 elif point_switched(4) and point_switched(2):
                     # movement onto down main
-                    set_section_occupied(occupied_down_west)
+                    occupy_section(sig_passed, occupied_down_west)
                     trigger_timed_signal(21,5,5)
         else:
-            set_section_occupied(occupied_goods_loop)
+            occupy_section(sig_passed, occupied_goods_loop)
 
     elif sig_passed == 6:
         if signal_clear(6) or subsidary_clear(6): # assume east-to-west
-            clear_section_occupied(occupied_branch_platform)
+            release_section(sig_passed, occupied_branch_platform)
             if not point_switched(2):
                 # movement onto branch
-                set_section_occupied(occupied_branch_west)
+                occupy_section(sig_passed, occupied_branch_west)
             else: # movement onto down main
-                set_section_occupied(occupied_down_west)
+                occupy_section(sig_passed, occupied_down_west)
                 trigger_timed_signal(21,5,5)
 
         else:
-            set_section_occupied(occupied_branch_platform)
+            occupy_section(sig_passed, occupied_branch_platform)
             
     elif sig_passed == 7:
         if signal_clear(7) or subsidary_clear(7): # assume west-to-east
-            clear_section_occupied(occupied_goods_loop)
+            release_section(sig_passed, occupied_goods_loop)
             if point_switched(6) and not point_switched(8):
                 # movement onto branch
-                set_section_occupied(occupied_branch_east)
+                occupy_section(sig_passed, occupied_branch_east)
             elif point_switched(6) and point_switched(8):
                 # movement onto down main
-                set_section_occupied(occupied_up_east)
+                occupy_section(sig_passed, occupied_up_east)
                 trigger_timed_signal(23,5,5)
 
         else:
-            set_section_occupied(occupied_goods_loop)
+            occupy_section(sig_passed, occupied_goods_loop)
                 
     elif sig_passed == 8:
         if signal_clear(8) or subsidary_clear(8): # assume west-to-east
-            clear_section_occupied(occupied_branch_platform)
+            release_section(sig_passed, occupied_branch_platform)
             if not point_switched(8):
                 # movement onto branch
-                set_section_occupied(occupied_branch_east)
+                occupy_section(sig_passed, occupied_branch_east)
             else: # movement onto up main
-                set_section_occupied(occupied_up_east)
+                occupy_section(sig_passed, occupied_up_east)
                 trigger_timed_signal(23,5,5)
         else:
-            set_section_occupied(occupied_branch_platform)
+            occupy_section(sig_passed, occupied_branch_platform)
             
     # This is effectively the "entry" Signal to our block section from the branch
     elif sig_passed == 9:
         if signal_clear(9):
             # assume east-to-west - entering our area of control
-            set_section_occupied(occupied_branch_east)
+            occupy_section(sig_passed, occupied_branch_east)
         else:
             # assume west-to-east - entering our area of control
-            clear_section_occupied(occupied_branch_east)
+            release_section(sig_passed, occupied_branch_east)
 
     elif sig_passed == 10:
         if signal_clear(10) or subsidary_clear(10): # assume east-to-west
-            clear_section_occupied(occupied_branch_east)
+            release_section(sig_passed, occupied_branch_east)
             if not point_switched(6):
                 # movement into branch platform
-                set_section_occupied(occupied_branch_platform)
+                occupy_section(sig_passed, occupied_branch_platform)
             else :  # movement into the goods loop
-                set_section_occupied(occupied_goods_loop)
+                occupy_section(sig_passed, occupied_goods_loop)
         else:
-            set_section_occupied(occupied_branch_east)
+            occupy_section(sig_passed, occupied_branch_east)
 
     return()
 
@@ -0,0 +1,156 @@
+#----------------------------------------------------------------------
+# This Module records the history of the layout - every change to the
+# track occupancy sections, signals (and the aspects they are showing),
+# points and power section switches and every safety event - with the time
+# of the change, so the sessions can be analysed afterwards (see
+# 'occupancy_analytics' and 'history_export').
+#
+# The history is appended to a file of fixed size binary records (so it
+# can be read straight into columns by numpy without any parsing):
+#   time  - float64 (seconds since the epoch)
+#   kind  - uint8   (index into 'history_kinds' - e.g. 0 = section)
+#   id    - uint16  (the section, signal, point or switch ID)
+#   value - int16   (e.g. 1 = occupied, 0 = clear)
+# Aspects are recorded as the library's aspect_type value (e.g. 1 = RED) and
+# safety events as the safety_event_type value (with the ID of the signal -
+# or the point for points moved while locked)
+# All values are recorded at the start of each session (and a "session"
+# record marks the start and end of each session) - after that only the
+# values that have changed are recorded.
+#----------------------------------------------------------------------
+
+from model_railway_signals import signals_common
+from safety_events import safety_event_type
+import safety_events
+import snapshot
+import sections
+import power_switches
+
+import struct
+import time
+
+# The file the history is appended to
+history_file = "session_history.bin"
+
+# The kinds of record (the 'kind' of each record is the index into this)
+history_kinds = ("section", "signal", "subsidary", "point", "fpl", "switch1", "switch2", "session",
+                 "aspect", "safety_event")
+
+# The format of each record (little endian, no padding)
+record_format = struct.Struct("<dBHh")
+
+# How each group of the layout state (see 'snapshot') is recorded - the
+# kind of record for each value (a single value or a list of values)
+group_kinds = {"sections": ("section",),
+               "signals": ("signal", "subsidary"),
+               "points": ("point", "fpl"),
+               "switches": ("switch1", "switch2"),
+               "aspects": ("aspect",)}
+
+# Global variables for the history
+history = None
+last_recorded_state: dict = {}
+
+#----------------------------------------------------------------------
+# Internal function to write a record to the history file
+#----------------------------------------------------------------------
+
+def write_record(record_time:float, kind:str, item_id:int, value:int):
+    history.write(record_format.pack(record_time, history_kinds.index(kind), item_id, value))
+    return()
+
+#----------------------------------------------------------------------
+# Internal function to get the aspects all the signals are showing (taken
+# from the library's own record of each signal) - {"1": 1, ...}
+#----------------------------------------------------------------------
+
+def capture_aspects():
+    aspects = {}
+    for sig_id, signal in signals_common.signals.items():
+        if "displayedaspect" in signal: aspects[sig_id] = signal["displayedaspect"].value
+    return(aspects)
+
+#----------------------------------------------------------------------
+# Externally called function to record any changes to the layout state
+# (in the 'snapshot' format - or taken from the layout, including the
+# aspects, if not given). To be called following every change
+#----------------------------------------------------------------------
+
+def record_changes(state:dict=None):
+    if history is None: return()
+    if state is None: state = dict(snapshot.capture_layout_state(), aspects=capture_aspects())
+    record_time = time.time()
+    for group, items in state.items():
+        kinds = group_kinds[group]
+        last_items = last_recorded_state.setdefault(group, {})
+        for item_id, values in items.items():
+            if not isinstance(values, list): values = [values]
+            last_values = last_items.get(item_id, [None] * len(kinds))
+            for kind, value, last_value in zip(kinds, values, last_values):
+                if value != last_value: write_record(record_time, kind, int(item_id), int(value))
+            last_items[item_id] = list(values)
+    history.flush()
+    return()
+
+#----------------------------------------------------------------------
+# Internal function to record a safety event (subscribed to the safety
+# events on the tkinter thread - so the same thread as all other records)
+#----------------------------------------------------------------------
+
+def record_safety_event(event:dict):
+    if history is None: return()
+    item_id = event.get("point", 0) if event["type"] == safety_event_type.point_moved_while_locked else event.get("signal", 0)
+    write_record(event["time"], "safety_event", int(item_id), event["type"].value)
+    history.flush()
+    return()
+
+#----------------------------------------------------------------------
+# Externally called function to return the name of each item in the
+# history - {(kind, item_id): name} - the sections and power sections are
+# named as in the 'sections' and 'power_switches' modules
+#----------------------------------------------------------------------
+
+def item_names():
+    names = {}
+    for name, value in vars(sections).items():
+        if name.startswith("occupied_"): names[(history_kinds.index("section"), value)] = name[len("occupied_"):]
+    for name, value in vars(power_switches).items():
+        if name.startswith("power_") and isinstance(value, int):
+            names[(history_kinds.index("switch1"), value)] = name[len("power_"):]
+            names[(history_kinds.index("switch2"), value)] = name[len("power_"):]
+    for sig_id in snapshot.signal_ids + (20, 21, 22, 23):
+        for kind in ("signal", "subsidary", "aspect"):
+            names[(history_kinds.index(kind), sig_id)] = "signal_"+str(sig_id)
+    for point_id in snapshot.point_ids:
+        for kind in ("point", "fpl"):
+            names[(history_kinds.index(kind), point_id)] = "point_"+str(point_id)
+    names[(history_kinds.index("session"), 0)] = "session"
+    return(names)
+
+#----------------------------------------------------------------------
+# Externally called functions to start and stop recording the history.
+# The complete state is recorded at the start of every session
+#----------------------------------------------------------------------
+
+def start_history():
+    global history, last_recorded_state
+    try:
+        history = open(history_file, "ab")
+    except OSError as error:
+        print ("ERROR: start_history - could not open "+history_file+" - "+str(error))
+        return()
+    last_recorded_state = {}
+    write_record(time.time(), "session", 0, 1)
+    record_changes()
+    safety_events.subscribe("history", record_safety_event, on_tkinter_thread=True)
+    return()
+
+def stop_history():
+    global history
+    if history is not None:
+        write_record(time.time(), "session", 0, 0)
+        history.close()
+        history = None
+    return()
+
+###############################################################################
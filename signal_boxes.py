@@ -0,0 +1,532 @@
+#----------------------------------------------------------------------
+# This Module allows the station to be run as separate signal boxes (just
+# like the real thing) - each running as its own process (on the same or on
+# different hosts) with its own panel. Each box owns its own points and
+# signals and only runs the interlocking for those points and signals.
+#
+# The boxes exchange the "boundary" state - i.e. the state of the points and
+# signals that are owned by one box but are referred to by the interlocking
+# of another box (e.g. the West box needs to know if signals 10 and 11 in the
+# East box are clear). The boundary is worked out from the interlocking code
+# itself (by finding all the point_switched, fpl_active, signal_clear and
+# subsidary_clear calls in each box's interlocking function) and from the
+# routes that conflict with each box's routes (the points and signals read by
+# these routes - see 'route_conflicts') so nothing needs to be changed here
+# if the interlocking changes. The track occupancy sections
+# are shared by all boxes so any changes to these are also exchanged.
+#
+# The boundary state is only sent once a change has been made - so on its
+# own it can't stop two boxes clearing conflicting routes within the time it
+# takes to get there (e.g. signal 2 in the West box and signal 10 in the East
+# box both into platform 3). A route that conflicts with a route from a signal
+# in another box therefore needs a "slot" from that box (just like the real
+# thing) before its signal can show a proceed aspect:
+#   - While the slot for the route that is set isn't held, the signal is held
+#     at danger (overridden) and its subsidary is locked. Clearing the signal
+#     requests the slot from the other box (for a route with only a subsidary
+#     aspect the slot is requested as soon as the route is set). To clear the
+#     subsidary for a route that also has a main aspect, clear the signal
+#     first to get the slot
+#   - The other box grants the slot once none of its conflicting routes are
+#     cleared. Its signals for the conflicting routes are then locked until
+#     the slot is released
+#   - Once the slot is held the signal shows its aspect (and the subsidary
+#     is unlocked). The slot is released once the route is no longer set -
+#     or once the signal (and subsidary) are back at danger and the other box
+#     has requested a conflicting slot
+# If both boxes request conflicting slots at the same time then the box that
+# comes first in 'signal_boxes' keeps its request - the other box withdraws
+# its request (and requests the slot again until it is granted)
+#
+# The message protocol is one JSON object per line over a TCP connection:
+#   {"box": "west", "state": {"points":{"1":[switched, fpl_active]},
+#                             "signals":{"3":[clear, subsidary_clear]},
+#                             "sections":{"25":occupied}}}
+#   {"box": "west", "slot": ["request", "2_platform3"]}   (or "grant"/"release")
+# Only the items that have changed are sent. A complete set of the items (and
+# the slots requested and held) is sent when a connection is first made - as
+# anything waiting to be sent when a connection is lost is thrown away. Each
+# box listens on its own address and connects to the addresses of all the
+# other boxes
+#
+# To add another box, just add it to 'signal_boxes' below (and split the
+# interlocking code into a function for each box)
+#----------------------------------------------------------------------
+
+from model_railway_signals import *
+import interlocking
+import route_conflicts
+import safety_events
+import snapshot
+
+import ast
+import inspect
+import json
+import queue
+import socket
+import threading
+import time
+
+# The signal boxes - the points and signals each box owns, the name of the
+# interlocking function for the box (looked up in 'interlocking' each time it
+# is called - so the rules reloaded by 'hot_reload' or installed by
+# 'rule_compiler' are used) and the address the box listens on for the
+# other boxes
+signal_boxes = {
+    "west": {"points"       : (1,2,3,4,5),
+             "signals"      : (1,2,3,5,6,12,13,14,15),
+             "interlocking" : "process_interlocking_west",
+             "address"      : ("localhost", 6011) },
+    "east": {"points"       : (6,7,8,9,10),
+             "signals"      : (4,7,8,9,10,11,16),
+             "interlocking" : "process_interlocking_east",
+             "address"      : ("localhost", 6012) } }
+
+# How often the tkinter thread checks for messages (in milliseconds)
+poll_interval = 20
+
+# Global variables for this box
+this_box = None
+boundary: dict = {}          # The items we send to each other box {"east": {"points":(...), "signals":(...)}}
+last_sent: dict = {}         # The items we last sent to each other box
+outgoing: dict = {}          # The queue of messages for each other box
+incoming = queue.Queue()     # Messages received from the other boxes
+state_lock = threading.Lock()
+tkinter_window = None
+refresh_callback = None
+remote_fpls: dict = {}       # The FPLs of the points owned by the other boxes {point_id: fpl_active}
+
+# Global variables for the slots - each slot is (route, box_name)
+slot_routes: dict = {}       # Our routes that need a slot {route: {the boxes to get the slot from}}
+subsidary_signals = set()    # The signals with a subsidary (for the routes in 'route_conflicts')
+slots_requested = set()      # The slots we have requested from another box (not yet granted)
+slots_held = set()           # The slots another box has granted to us
+slots_waiting = set()        # The slots another box has requested from us (not yet granted)
+slots_granted = set()        # The slots we have granted to another box
+
+#----------------------------------------------------------------------
+# Internal function to find all the points and signals that a function
+# refers to - returns {"points": {point_ids}, "signals": {sig_ids}}
+#----------------------------------------------------------------------
+
+def items_referred_to(function):
+    items = {"points":set(), "signals":set()}
+    tree = ast.parse(inspect.getsource(function))
+    for node in ast.walk(tree):
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and
+                len(node.args) == 1 and isinstance(node.args[0], ast.Constant)):
+            if node.func.id in ("point_switched", "fpl_active"):
+                items["points"].add(node.args[0].value)
+            elif node.func.id in ("signal_clear", "subsidary_clear"):
+                items["signals"].add(node.args[0].value)
+    return(items)
+
+#----------------------------------------------------------------------
+# Internal function to find all the points and signals read by the routes
+# that conflict with the routes of the given signals (the interlocking reads
+# these through 'route_conflicts' rather than calling point_switched etc.)
+# Returns {"points": {point_ids}, "signals": {sig_ids}}
+#----------------------------------------------------------------------
+
+def items_read_by_routes(sig_ids:tuple):
+    items = {"points":set(), "signals":set()}
+    table = route_conflicts.route_table
+    for route, (sig_id, aspects, points) in route_conflicts.station_routes.items():
+        if sig_id in sig_ids:
+            for other_route, (other_sig_id, other_aspects, other_points) in route_conflicts.station_routes.items():
+                if table["conflicts"][route] & table["bits"][other_route]:
+                    items["points"].update(other_points.keys())
+                    items["signals"].add(other_sig_id)
+    return(items)
+
+#----------------------------------------------------------------------
+# Internal functions to find the routes that conflict with a route, the
+# routes from a signal that are set (by the points) and whether a route is
+# cleared (the route is set and its signal or subsidary is clear)
+#----------------------------------------------------------------------
+
+def conflicting_routes(route:str):
+    table = route_conflicts.route_table
+    return({other_route for other_route in route_conflicts.station_routes.keys()
+            if table["conflicts"][route] & table["bits"][other_route]})
+
+def routes_set(sig_id:int):
+    return([route for route, (route_sig_id, aspects, points) in route_conflicts.station_routes.items()
+            if route_sig_id == sig_id and all(point_switched(point_id) == switched
+                                              for point_id, switched in points.items())])
+
+def route_cleared(route:str):
+    sig_id, aspects, points = route_conflicts.station_routes[route]
+    return(route in routes_set(sig_id) and any(subsidary_clear(sig_id) if aspect else signal_clear(sig_id)
+                                               for aspect in aspects))
+
+#----------------------------------------------------------------------
+# Externally called function to work out the boundary between the boxes
+# Returns a dictionary of the items each box needs to send to each other
+# box: {"west": {"east": {"points": (6,8,9), "signals": (10,11,16)}}, ...}
+#----------------------------------------------------------------------
+
+def find_boundaries():
+    boundaries = {}
+    for box_name, box in signal_boxes.items():
+        boundaries[box_name] = {}
+        for other_box_name, other_box in signal_boxes.items():
+            if other_box_name != box_name:
+                needed = items_referred_to(getattr(interlocking, other_box["interlocking"]))
+                route_items = items_read_by_routes(other_box["signals"])
+                needed["points"].update(route_items["points"])
+                needed["signals"].update(route_items["signals"])
+                boundaries[box_name][other_box_name] = {
+                    "points": tuple(sorted(needed["points"] & set(box["points"]))),
+                    "signals": tuple(sorted(needed["signals"] & set(box["signals"]))) }
+    return(boundaries)
+
+#----------------------------------------------------------------------
+# Internal function to return the current state of the items we send to
+# another box (in the 'snapshot' format)
+#----------------------------------------------------------------------
+
+def capture_boundary_state(other_box_name:str):
+    state = {"points":{}, "signals":{}, "sections":{}}
+    for point_id in boundary[other_box_name]["points"]:
+        state["points"][str(point_id)] = [point_switched(point_id), fpl_active(point_id)]
+    for sig_id in boundary[other_box_name]["signals"]:
+        state["signals"][str(sig_id)] = [signal_clear(sig_id), subsidary_clear(sig_id)]
+    for section_id in snapshot.section_ids:
+        state["sections"][str(section_id)] = section_occupied(section_id)
+    return(state)
+
+#----------------------------------------------------------------------
+# Internal function to mirror the state received from another box on our
+# panel. The points and signals are locked on our panel (they are owned by
+# the other box) and must stay locked - so the FPLs aren't changed on our
+# panel (toggling an FPL off enables the point button). The FPLs are held
+# here instead and read by the rules through 'fpl_active' (see
+# 'install_filters'). The points are moved and the signals changed with
+# the library functions that leave the (locked) buttons as they are
+#----------------------------------------------------------------------
+
+def mirror_layout_state(state:dict):
+    for point_id, (switched, fpl) in state.get("points",{}).items():
+        remote_fpls[int(point_id)] = fpl
+        if point_switched(int(point_id)) != switched: toggle_point(int(point_id))
+    for section_id, occupied in state.get("sections",{}).items():
+        if occupied: set_section_occupied(int(section_id))
+        else: clear_section_occupied(int(section_id))
+    for sig_id, (sig_clear, sub_clear) in state.get("signals",{}).items():
+        if signal_clear(int(sig_id)) != sig_clear: toggle_signal(int(sig_id))
+        if subsidary_clear(int(sig_id)) != sub_clear: toggle_subsidary(int(sig_id))
+    return()
+
+#----------------------------------------------------------------------
+# Thread to send messages to another box. We keep trying to connect. When
+# a connection is made, the complete boundary state is sent first (so any
+# messages queued up before this are thrown away) and then the changes
+#----------------------------------------------------------------------
+
+def thread_to_send_messages(other_box_name:str):
+    while True:
+        try:
+            box_socket = socket.create_connection(signal_boxes[other_box_name]["address"])
+        except OSError:
+            time.sleep(1.0)
+            continue
+        print ("Signal Box "+this_box+": Connected to "+other_box_name+" box")
+        with state_lock:
+            while not outgoing[other_box_name].empty(): outgoing[other_box_name].get()
+            message = {"box":this_box, "state":last_sent[other_box_name],
+                       "slots":{"requested":[route for route, box_name in slots_requested if box_name == other_box_name],
+                                "held":[route for route, box_name in slots_held if box_name == other_box_name]}}
+        try:
+            while True:
+                box_socket.sendall((json.dumps(message, separators=(",",":"))+"\n").encode())
+                message = outgoing[other_box_name].get()
+        except OSError:
+            print ("Signal Box "+this_box+": Lost connection to "+other_box_name+" box")
+            box_socket.close()
+
+#----------------------------------------------------------------------
+# Threads to listen for connections from the other boxes and to receive
+# the messages (these are queued up for the tkinter thread to apply)
+#----------------------------------------------------------------------
+
+def thread_to_receive_messages(box_socket):
+    with box_socket, box_socket.makefile("r") as messages:
+        for line in messages:
+            try:
+                incoming.put(json.loads(line))
+            except ValueError:
+                print ("ERROR: Signal Box "+this_box+" - invalid message received")
+    return()
+
+def thread_to_listen_for_boxes():
+    listener = socket.create_server(signal_boxes[this_box]["address"])
+    while True:
+        box_socket, address = listener.accept()
+        receiver = threading.Thread(target=thread_to_receive_messages, args=(box_socket,), daemon=True)
+        receiver.start()
+
+#----------------------------------------------------------------------
+# Externally called function to send the changes to the boundary state to
+# the other boxes (to be called following every change on this box)
+#----------------------------------------------------------------------
+
+def send_boundary_state():
+    with state_lock:
+        for other_box_name in boundary.keys():
+            state = capture_boundary_state(other_box_name)
+            delta = snapshot.state_delta(last_sent[other_box_name], state)
+            if delta:
+                outgoing[other_box_name].put({"box":this_box, "state":delta})
+                last_sent[other_box_name] = state
+    return()
+
+#----------------------------------------------------------------------
+# Internal functions to send a slot message to another box and to apply the
+# slot messages received from another box (on the tkinter thread). A slot
+# granted to us that we have since withdrawn (or that conflicts with a slot
+# we have granted to the box since) is given straight back. The slots sent
+# when a connection is made replace those we had for the box
+#----------------------------------------------------------------------
+
+def send_slot_message(box_name:str, action:str, route:str):
+    with state_lock:
+        outgoing[box_name].put({"box":this_box, "slot":[action, route]})
+    return()
+
+def receive_slot_message(box_name:str, action:str, route:str):
+    slot = (route, box_name)
+    if action == "request":
+        slots_waiting.add(slot)
+    elif action == "grant" and slot in slots_requested and not any(
+            (other_route, box_name) in slots_granted for other_route in conflicting_routes(route)):
+        with state_lock:
+            slots_requested.discard(slot)
+            slots_held.add(slot)
+    elif action == "grant":
+        with state_lock: slots_requested.discard(slot)
+        send_slot_message(box_name, "release", route)
+    elif action == "release":
+        slots_waiting.discard(slot)
+        slots_granted.discard(slot)
+    else:
+        print ("ERROR: Signal Box "+this_box+" - invalid slot message received from "+box_name+" box")
+    return()
+
+def receive_slots(box_name:str, slots:dict):
+    for slot in [slot for slot in slots_waiting | slots_granted if slot[1] == box_name]:
+        slots_waiting.discard(slot)
+        slots_granted.discard(slot)
+    slots_waiting.update((route, box_name) for route in slots["requested"])
+    slots_granted.update((route, box_name) for route in slots["held"])
+    return()
+
+#----------------------------------------------------------------------
+# Internal function to apply a message received from another box. Shared
+# sections received from another box are also noted as "sent" so we don't
+# just send them straight back again
+#----------------------------------------------------------------------
+
+def apply_message(message:dict):
+    if "state" in message:
+        mirror_layout_state(message["state"])
+        with state_lock:
+            for other_box_name in last_sent.keys():
+                last_sent[other_box_name]["sections"].update(message["state"].get("sections",{}))
+    if "slots" in message:
+        receive_slots(message["box"], message["slots"])
+    if "slot" in message:
+        receive_slot_message(message["box"], *message["slot"])
+    return()
+
+#----------------------------------------------------------------------
+# Internal function to apply the messages received from the other boxes
+# (runs on the tkinter thread)
+#----------------------------------------------------------------------
+
+def poll_for_messages():
+    changed = False
+    while not incoming.empty():
+        apply_message(incoming.get())
+        changed = True
+    if changed: refresh_callback()
+    tkinter_window.after(poll_interval, poll_for_messages)
+    return()
+
+#----------------------------------------------------------------------
+# Internal function to return whether one of our signals is held at danger
+# (i.e. the slot for the route that is set isn't held)
+#----------------------------------------------------------------------
+
+def signal_waiting_for_slot(sig_id:int):
+    for route in routes_set(sig_id):
+        if route in slot_routes and not {(route, box_name) for box_name in slot_routes[route]} <= slots_held:
+            return(True)
+    return(False)
+
+#----------------------------------------------------------------------
+# Internal function to grant the slots requested by the other boxes. A slot
+# is granted once none of our conflicting routes are cleared (with the slot
+# held) - a slot we hold for a conflicting route that isn't being used is
+# given back. If we are waiting for a conflicting slot ourselves then the
+# box that comes first in 'signal_boxes' keeps its request
+#----------------------------------------------------------------------
+
+def grant_waiting_slots():
+    box_names = list(signal_boxes.keys())
+    for route, box_name in sorted(slots_waiting):
+        our_slots = [(our_route, box_name) for our_route in conflicting_routes(route) if our_route in slot_routes]
+        if any(route_cleared(slot[0]) and slot in slots_held for slot in our_slots): continue
+        waiting = [slot for slot in our_slots if slot in slots_requested or
+                   (route_cleared(slot[0]) and slot not in slots_held)]
+        if waiting and box_names.index(this_box) < box_names.index(box_name): continue
+        for slot in our_slots:
+            if slot in slots_requested or slot in slots_held:
+                with state_lock:
+                    slots_requested.discard(slot)
+                    slots_held.discard(slot)
+                send_slot_message(box_name, "release", slot[0])
+        slots_waiting.discard((route, box_name))
+        slots_granted.add((route, box_name))
+        send_slot_message(box_name, "grant", route)
+    return()
+
+#----------------------------------------------------------------------
+# Internal function to lock our signals for the slots - to be called after
+# the interlocking has been processed (which may have unlocked them):
+#   - Our signals for the routes that conflict with the slots we have
+#     granted are locked (until the slots are released)
+#   - Our signals for the routes that need a slot are held at danger until
+#     the slot is held - the slot is requested once the signal is cleared
+#     (or straight away for a route with only a subsidary aspect)
+#   - The slots for our routes that are no longer set are released (and any
+#     slots still to be granted for them are withdrawn)
+#----------------------------------------------------------------------
+
+def lock_signals_for_slots():
+    our_signals = signal_boxes[this_box]["signals"]
+    grant_waiting_slots()
+    for route, box_name in slots_granted:
+        for our_route in conflicting_routes(route):
+            sig_id = route_conflicts.station_routes[our_route][0]
+            if sig_id in our_signals and our_route in routes_set(sig_id):
+                lock_signal(sig_id)
+                if sig_id in subsidary_signals: lock_subsidary(sig_id)
+    for sig_id in our_signals:
+        for route in routes_set(sig_id):
+            if route not in slot_routes: continue
+            slots = {(route, box_name) for box_name in slot_routes[route]}
+            if slots <= slots_held: continue
+            set_signal_override(sig_id)
+            if sig_id in subsidary_signals: lock_subsidary(sig_id)
+            if signal_clear(sig_id) or route_conflicts.station_routes[route][1] == route_conflicts.subsidary:
+                for slot in slots - slots_held - slots_requested:
+                    with state_lock: slots_requested.add(slot)
+                    send_slot_message(slot[1], "request", route)
+    for slot in sorted(slots_requested | slots_held):
+        if slot[0] not in routes_set(route_conflicts.station_routes[slot[0]][0]):
+            with state_lock:
+                slots_requested.discard(slot)
+                slots_held.discard(slot)
+            send_slot_message(slot[1], "release", slot[0])
+    return()
+
+#----------------------------------------------------------------------
+# Externally called function to replace the library functions in the given
+# modules (those that run the rules - e.g. 'interlocking', 'sections' or the
+# generated rules) in the same way as 'rule_evaluator' does:
+#   - 'fpl_active' returns the FPLs mirrored from the other boxes for the
+#     points owned by the other boxes (see 'mirror_layout_state')
+#   - 'clear_signal_override' doesn't clear the override of a signal that is
+#     held at danger until its slot is held
+#----------------------------------------------------------------------
+
+def install_filters(modules:list):
+    def filtered_fpl_active(point_id:int):
+        if point_id in remote_fpls: return(remote_fpls[point_id])
+        return(fpl_active(point_id))
+    def filtered_clear_signal_override(*sig_ids:int):
+        sig_ids = [sig_id for sig_id in sig_ids if not signal_waiting_for_slot(sig_id)]
+        if sig_ids: clear_signal_override(*sig_ids)
+    filters = {"fpl_active": filtered_fpl_active, "clear_signal_override": filtered_clear_signal_override}
+    for module in modules:
+        for name, function in filters.items():
+            if name in module.__dict__: module.__dict__[name] = function
+    return()
+
+#----------------------------------------------------------------------
+# Externally called function to process the interlocking for this box only
+# (and then to lock the signals for the slots)
+#----------------------------------------------------------------------
+
+def process_interlocking():
+    getattr(interlocking, signal_boxes[this_box]["interlocking"])()
+    lock_signals_for_slots()
+    return()
+
+#----------------------------------------------------------------------
+# Internal function to set up this box (without starting the threads). The
+# points and signals owned by the other boxes are locked on our panel (they
+# just mirror the other boxes)
+#----------------------------------------------------------------------
+
+def set_up_signal_box(box_name:str):
+
+    global this_box, boundary
+
+    this_box = box_name
+    boundary = find_boundaries()[this_box]
+    for slots in (slots_requested, slots_held, slots_waiting, slots_granted): slots.clear()
+    slot_routes.clear()
+    remote_fpls.clear()
+    subsidary_signals.clear()
+    for sig_id, aspects, points in route_conflicts.station_routes.values():
+        if True in aspects: subsidary_signals.add(sig_id)
+
+    for other_box_name, other_box in signal_boxes.items():
+        if other_box_name != this_box:
+            lock_point(*other_box["points"])
+            for point_id in other_box["points"]: remote_fpls[point_id] = fpl_active(point_id)
+            # These points are moved by the other box while they are locked
+            safety_events.ignored_points.update(other_box["points"])
+            lock_signal(*other_box["signals"])
+            lock_subsidary(*other_box["signals"])
+            last_sent[other_box_name] = capture_boundary_state(other_box_name)
+            outgoing[other_box_name] = queue.Queue()
+            # Our routes that conflict with the routes from the signals of the other box
+            for route, (sig_id, aspects, points) in route_conflicts.station_routes.items():
+                if sig_id in signal_boxes[this_box]["signals"]:
+                    for other_route in conflicting_routes(route):
+                        if route_conflicts.station_routes[other_route][0] in other_box["signals"]:
+                            slot_routes.setdefault(route, set()).add(other_box_name)
+    return()
+
+#----------------------------------------------------------------------
+# Externally called function to start running as one of the signal boxes
+# (after the panel has been created). The refresh_callback is made (on the
+# tkinter thread) following any change received from another box (to
+# refresh the interlocking, aspects etc). The given modules are those that
+# run the rules (see 'install_filters')
+#----------------------------------------------------------------------
+
+def start_signal_box(box_name:str, window, callback, modules:list):
+
+    global tkinter_window, refresh_callback
+
+    tkinter_window = window
+    refresh_callback = callback
+    set_up_signal_box(box_name)
+    install_filters(modules)
+    # Any signals restored as clear are held at danger until their slots are held
+    lock_signals_for_slots()
+
+    for other_box_name in outgoing.keys():
+        sender = threading.Thread(target=thread_to_send_messages, args=(other_box_name,), daemon=True)
+        sender.start()
+
+    listener = threading.Thread(target=thread_to_listen_for_boxes, daemon=True)
+    listener.start()
+    tkinter_window.after(poll_interval, poll_for_messages)
+    return()
+
+###############################################################################
@@ -0,0 +1,355 @@
+#----------------------------------------------------------------------
+# This Module deals with saving and restoring the operating state of the
+# layout between sessions (point settings, FPLs, signals and subsidaries,
+# track occupancy sections and track power section switches). The state
+# is held as a simple dictionary (keyed by the string ID of each item,
+# just like the library's own dictionaries) so it can be written to file.
+#
+# A full snapshot is written to the snapshot file at startup. Thereafter
+# only the items that have changed (the "delta") are appended to a journal
+# file following each change. After a number of deltas the journal is
+# "compacted" back into a new snapshot. The snapshot file is always replaced
+# atomically (and the directory synced) so a crash or power cut can never
+# leave a half written file. Each line of the journal is written straight
+# away but synced to disk on a thread of its own (so the tkinter thread never
+# waits for the disk) - a power cut can lose the last few lines of the
+# journal (and an incomplete last line is ignored) but a crash can't
+#
+# Every save is numbered - the snapshot holds the number of the save it was
+# written for and each journal entry the number of its own save. If we crash
+# after a new snapshot has been written but before the journal is emptied,
+# the entries in the journal are older than the snapshot - so they are
+# skipped when the state is loaded (rather than replayed over the newer
+# snapshot). The files are of the form:
+#   snapshot: {"sequence": 105, "state": {"points": {...}, ...}}
+#   journal:  {"sequence": 106, "delta": {"signals": {"2": [true, false]}}}
+#----------------------------------------------------------------------
+
+from model_railway_signals import *
+from model_railway_signals import signals_common
+from model_railway_signals import points as library_points
+import interlocking
+import power_switches
+import sections
+
+import copy
+import json
+import os
+import threading
+
+# Global variables for the files we use (in the current working directory)
+snapshot_file = "layout_state.json"
+journal_file = "layout_state.journal"
+
+# The number of deltas to append to the journal before we compact it
+deltas_before_compaction = 100
+
+# The items we save/restore. Auto points (101-110) are switched along with
+# their "also_switch" points and the fully automatic signals (20-23) look
+# after themselves so neither of these need to be saved
+point_ids = (1,2,3,4,5,6,7,8,9,10,12,13,14,15,16,17,18,19,20,21,22,23)
+signal_ids = (1,2,3,4,5,6,7,8,9,10,11,12,13,14,15,16)
+section_ids = (sections.occupied_down_platform, sections.occupied_down_loop,
+               sections.occupied_down_east, sections.occupied_down_west,
+               sections.occupied_up_east, sections.occupied_up_west,
+               sections.occupied_up_platform, sections.occupied_goods_loop,
+               sections.occupied_branch_east, sections.occupied_branch_west,
+               sections.occupied_branch_platform)
+switch_ids = (power_switches.power_goods_loop, power_switches.power_branch_platform,
+              power_switches.power_up_platform, power_switches.power_down_loop,
+              power_switches.power_down_platform, power_switches.power_branch_west,
+              power_switches.power_branch_east, power_switches.power_goods_yard,
+              power_switches.power_mpd, power_switches.power_switch_override)
+
+# The last state written to file (what we compare against to find the delta)
+# and the number of deltas that have been appended to the journal so far
+last_saved_state: dict = {}
+deltas_in_journal = 0
+
+# Global variables for syncing the journal to disk (on its own thread)
+sync_requested = threading.Event()
+sync_thread = None
+save_sequence = 0            # The number of the last save (written or loaded)
+
+#----------------------------------------------------------------------
+# Externally called function to return the current state of the layout
+# as a dictionary of the form:
+#   {"points"   : {"1": [switched, fpl_active], ...},
+#    "signals"  : {"1": [signal_clear, subsidary_clear], ...},
+#    "sections" : {"20": occupied, ...},
+#    "switches" : {"1": [button1_active, button2_active], ...} }
+#----------------------------------------------------------------------
+
+def capture_layout_state():
+
+    state = {"points":{}, "signals":{}, "sections":{}, "switches":{}}
+    for point_id in point_ids:
+        state["points"][str(point_id)] = [point_switched(point_id), fpl_active(point_id)]
+    for sig_id in signal_ids:
+        state["signals"][str(sig_id)] = [signal_clear(sig_id), subsidary_clear(sig_id)]
+    for section_id in section_ids:
+        state["sections"][str(section_id)] = section_occupied(section_id)
+    for switch_id in switch_ids:
+        state["switches"][str(switch_id)] = [power_switches.switch_active(switch_id,1),
+                                             power_switches.switch_active(switch_id,2)]
+    return(state)
+
+#----------------------------------------------------------------------
+# Externally called function to return the state of the layout at startup
+# (i.e. as created) - All points normal with their FPLs active, all signals
+# ON, all sections clear and all the power section switches OFF
+#----------------------------------------------------------------------
+
+def default_layout_state():
+
+    state = {"points":{}, "signals":{}, "sections":{}, "switches":{}}
+    for point_id in point_ids: state["points"][str(point_id)] = [False, True]
+    for sig_id in signal_ids: state["signals"][str(sig_id)] = [False, False]
+    for section_id in section_ids: state["sections"][str(section_id)] = False
+    for switch_id in switch_ids: state["switches"][str(switch_id)] = [False, False]
+    return(state)
+
+#----------------------------------------------------------------------
+# Internal function to return the items that differ between two states
+# (in the same format as the state itself - so it can be merged back)
+#----------------------------------------------------------------------
+
+def state_delta(old_state:dict, new_state:dict):
+
+    delta = {}
+    for group in new_state.keys():
+        old_group = old_state.get(group, {})
+        for item_id, value in new_state[group].items():
+            if old_group.get(item_id) != value:
+                if group not in delta.keys(): delta[group] = {}
+                delta[group][item_id] = value
+    return(delta)
+
+#----------------------------------------------------------------------
+# Internal function to merge a delta into a state (modifies the state)
+#----------------------------------------------------------------------
+
+def merge_delta(state:dict, delta:dict):
+    for group in delta.keys():
+        if group not in state.keys(): state[group] = {}
+        state[group].update(delta[group])
+    return()
+
+#----------------------------------------------------------------------
+# Internal function to sync the directory holding a file - so a file that
+# has just been renamed is still there (under its new name) after a power
+# cut. Directories can only be synced on Linux (and other posix systems)
+#----------------------------------------------------------------------
+
+def sync_directory(file_name:str):
+    if os.name == "posix":
+        directory = os.open(os.path.dirname(os.path.abspath(file_name)), os.O_RDONLY)
+        try: os.fsync(directory)
+        finally: os.close(directory)
+    return()
+
+#----------------------------------------------------------------------
+# Thread to sync the journal to disk whenever lines have been appended to
+# it (all the lines appended while we were syncing are synced together)
+#----------------------------------------------------------------------
+
+def thread_to_sync_journal():
+    while True:
+        sync_requested.wait()
+        sync_requested.clear()
+        try:
+            with open(journal_file, "a") as file: os.fsync(file.fileno())
+        except OSError as error:
+            print ("ERROR: thread_to_sync_journal - could not sync "+journal_file+" - "+str(error))
+
+def request_journal_sync():
+    global sync_thread
+    if sync_thread is None:
+        sync_thread = threading.Thread(target=thread_to_sync_journal, daemon=True)
+        sync_thread.start()
+    sync_requested.set()
+    return()
+
+#----------------------------------------------------------------------
+# Internal function to write a complete snapshot to file. We write to a
+# temporary file first and then rename it over the old one (the rename is
+# atomic) - the journal is then emptied as everything is in the snapshot
+#----------------------------------------------------------------------
+
+def write_snapshot(state:dict):
+
+    global deltas_in_journal, save_sequence
+
+    save_sequence = save_sequence + 1
+    temp_file = snapshot_file + ".tmp"
+    with open(temp_file, "w") as file:
+        json.dump({"sequence":save_sequence, "state":state}, file, separators=(",",":"))
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_file, snapshot_file)
+    sync_directory(snapshot_file)
+    # If we crash before the journal is emptied then the deltas in it are
+    # older than the snapshot (so they are skipped on the next load)
+    open(journal_file, "w").close()
+    deltas_in_journal = 0
+    return()
+
+#----------------------------------------------------------------------
+# Externally called function to save the state of the layout - To be called
+# following every change. Only the items that have changed since the last
+# save are written (appended to the journal as a single line). The state
+# is taken from the layout unless it is specified by the calling programme
+#----------------------------------------------------------------------
+
+def save_layout_state(state:dict=None):
+
+    global last_saved_state, deltas_in_journal, save_sequence
+
+    if state is None: state = capture_layout_state()
+    delta = state_delta(last_saved_state, state)
+    if delta:
+        if deltas_in_journal >= deltas_before_compaction:
+            write_snapshot(state)
+        else:
+            save_sequence = save_sequence + 1
+            with open(journal_file, "a") as file:
+                file.write(json.dumps({"sequence":save_sequence, "delta":delta}, separators=(",",":")) + "\n")
+            request_journal_sync()
+            deltas_in_journal = deltas_in_journal + 1
+        # Take a copy - the calling programme may go on to change its state
+        last_saved_state = copy.deepcopy(state)
+    return()
+
+#----------------------------------------------------------------------
+# Externally called function to load the last saved state (the snapshot
+# with the deltas in the journal saved after it applied). Returns None if
+# there is no saved state. An incomplete last line of the journal (i.e. we
+# crashed part way through writing it) is ignored. The saves carry on from
+# the number of the last save loaded
+#----------------------------------------------------------------------
+
+def load_layout_state():
+
+    global save_sequence
+
+    state, snapshot_sequence = None, 0
+    if os.path.exists(snapshot_file):
+        try:
+            with open(snapshot_file, "r") as file:
+                saved = json.load(file)
+            state, snapshot_sequence = saved["state"], saved["sequence"]
+        except (OSError, ValueError, KeyError, TypeError) as error:
+            print ("ERROR: load_layout_state - could not read "+snapshot_file+" - "+str(error))
+            state = None
+    save_sequence = max(save_sequence, snapshot_sequence)
+    if os.path.exists(journal_file):
+        with open(journal_file, "r") as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                    sequence, delta = entry["sequence"], entry["delta"]
+                except (ValueError, KeyError, TypeError):
+                    print ("ERROR: load_layout_state - ignoring incomplete journal entry")
+                    break
+                # Entries saved before the snapshot are already in it
+                if sequence <= snapshot_sequence: continue
+                if state is None: state = {}
+                merge_delta(state, delta)
+                save_sequence = max(save_sequence, sequence)
+    return(state)
+
+#----------------------------------------------------------------------
+# Externally called function to apply a saved state to the layout in a
+# single batch (to be called before the window is first drawn). Only the
+# items that differ from the current state are changed. The points are
+# changed first, then the sections and switches and finally the signals.
+# No callbacks are made so the calling programme needs to refresh the
+# interlocking, signal aspects and schematic once this has been done
+#
+# If check_locks is set then locked points and signals are left as they are
+# (and reported) - the interlocking is processed once the points have been
+# set and again after each signal change (so a saved state with conflicting
+# routes can never be restored). This isn't needed to mirror a state that
+# has already been checked against the locks (e.g. by the control process)
+#----------------------------------------------------------------------
+
+def point_locked(point_id:int):
+    return(library_points.points[str(point_id)]["locked"])
+
+def signal_locked(sig_id:int, lock_name:str):
+    return(signals_common.signals[str(sig_id)][lock_name])
+
+def process_interlocking():
+    interlocking.process_interlocking_east()
+    interlocking.process_interlocking_west()
+    return()
+
+def apply_layout_state(state:dict, check_locks:bool=False):
+
+    for point_id, (switched, fpl) in state.get("points",{}).items():
+        if check_locks and point_locked(int(point_id)):
+            if point_switched(int(point_id)) != switched or fpl_active(int(point_id)) != fpl:
+                print ("ERROR: apply_layout_state - Point "+point_id+" is locked - not restored")
+            continue
+        if point_switched(int(point_id)) != switched: toggle_point(int(point_id))
+        if fpl_active(int(point_id)) != fpl: toggle_fpl(int(point_id))
+
+    for section_id, occupied in state.get("sections",{}).items():
+        if occupied: set_section_occupied(int(section_id))
+        else: clear_section_occupied(int(section_id))
+
+    for switch_id, buttons in state.get("switches",{}).items():
+        # Clear the buttons first (setting one button clears the other)
+        for button_id in (1,2):
+            if not buttons[button_id-1]:
+                power_switches.clear_switch(int(switch_id),button_id)
+        for button_id in (1,2):
+            if buttons[button_id-1]:
+                power_switches.set_switch(int(switch_id),button_id)
+
+    if check_locks: process_interlocking()
+    for sig_id, (sig_clear, sub_clear) in state.get("signals",{}).items():
+        for cleared, is_clear, toggle, lock_name in ((sig_clear, signal_clear, toggle_signal, "siglocked"),
+                                    (sub_clear, subsidary_clear, toggle_subsidary, "sublocked")):
+            if is_clear(int(sig_id)) == cleared: continue
+            if check_locks and signal_locked(int(sig_id), lock_name):
+                print ("ERROR: apply_layout_state - Signal "+sig_id+" is locked - not restored")
+            else:
+                toggle(int(sig_id))
+                if check_locks: process_interlocking()
+
+    return()
+
+#----------------------------------------------------------------------
+# Externally called function to start saving from the current state of the
+# layout (e.g. once the control process that was saving it has been lost).
+# The saves carry on from the number of the last save on file
+#----------------------------------------------------------------------
+
+def start_saving():
+    global last_saved_state
+    load_layout_state()
+    last_saved_state = capture_layout_state()
+    write_snapshot(last_saved_state)
+    return()
+
+#----------------------------------------------------------------------
+# Externally called function to restore the last saved session (if there
+# is one) and then start saving from the current state. Returns True if a
+# saved state was found and applied to the layout (the locked points and
+# signals are left as they are - see 'apply_layout_state')
+#----------------------------------------------------------------------
+
+def restore_layout_state():
+
+    global last_saved_state
+
+    state = load_layout_state()
+    if state is not None:
+        apply_layout_state(state, check_locks=True)
+    # Start the new session with a full snapshot and an empty journal
+    last_saved_state = capture_layout_state()
+    write_snapshot(last_saved_state)
+    return(state is not None)
+
+###############################################################################
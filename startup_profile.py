@@ -0,0 +1,43 @@
+#----------------------------------------------------------------------
+# This Module times each phase of the startup of the layout (so we can see
+# where the time goes on the Pi). It should be the first module imported
+# so the time taken to import everything else is included. Each phase is
+# timed from the end of the previous phase:
+#
+#   import startup_profile
+#   ...
+#   startup_profile.phase_complete("imports")
+#   ...
+#   startup_profile.report_startup_timings()
+#----------------------------------------------------------------------
+
+import time
+
+# Global variables for the startup timings
+start_time = time.perf_counter()
+last_time = start_time
+phases: list = []            # The time taken by each phase [[phase_name, seconds], ...]
+
+#----------------------------------------------------------------------
+# Externally called function to note the end of a phase of the startup
+#----------------------------------------------------------------------
+
+def phase_complete(phase_name:str):
+    global last_time
+    time_now = time.perf_counter()
+    phases.append([phase_name, time_now - last_time])
+    last_time = time_now
+    return()
+
+#----------------------------------------------------------------------
+# Externally called function to print the time taken by each phase
+#----------------------------------------------------------------------
+
+def report_startup_timings():
+    print ("Startup timings:")
+    for phase_name, phase_time in phases:
+        print ("  "+format(phase_name, "<32")+format(1000.0 * phase_time, "8.1f")+" ms")
+    print ("  "+format("total", "<32")+format(1000.0 * (last_time - start_time), "8.1f")+" ms")
+    return()
+
+###############################################################################
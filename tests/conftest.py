@@ -0,0 +1,30 @@
+#----------------------------------------------------------------------
+# The layout modules are tested against the headless stand-in for the
+# signals library (see 'headless_signals') - so the tests run without a
+# display. It has to be installed before any of the layout modules are
+# imported (they import the library as they are imported)
+#----------------------------------------------------------------------
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import headless_signals
+headless_signals.install()
+
+#----------------------------------------------------------------------
+# Fixture to create the layout (with nothing set) for a test
+#----------------------------------------------------------------------
+
+@pytest.fixture
+def layout():
+    import interlocking
+    headless_signals.reset()
+    canvas = headless_signals.create_layout()
+    interlocking.set_initial_interlocking_conditions()
+    return(canvas)
+
+###############################################################################
@@ -0,0 +1,84 @@
+#----------------------------------------------------------------------
+# Tests for the state machines of the automatic signals (see
+# 'automatic_signals') - run against the virtual clock of the headless
+# library (the times are in seconds)
+#----------------------------------------------------------------------
+
+import copy
+
+import pytest
+
+import automatic_signals
+import headless_signals
+import sections
+
+from headless_signals import aspect_type
+
+@pytest.fixture
+def passed(layout, monkeypatch):
+    for name in ("set_signal_override", "clear_signal_override", "trigger_timed_signal"):
+        monkeypatch.setattr(sections, name, getattr(sections, name))
+    monkeypatch.setattr(automatic_signals, "automatic_signals", copy.deepcopy(automatic_signals.automatic_signals))
+    for name in ("machines", "watched_sections", "section_states"):
+        monkeypatch.setattr(automatic_signals, name, {})
+    signals_passed = []
+    def signal_callback(sig_id, callback_type):
+        signals_passed.append(sig_id)
+        sections.update_track_occupancy(sig_id)
+        automatic_signals.process_changes()
+    automatic_signals.start_automatic_signals(headless_signals.window, signal_callback, [sections])
+    return(signals_passed)
+
+def set_section(section_id:int, occupied:bool):
+    if occupied: headless_signals.set_section_occupied(section_id)
+    else: headless_signals.clear_section_occupied(section_id)
+    automatic_signals.process_changes()
+    return()
+
+def shown_aspect(sig_id:int):
+    signal = headless_signals.signals[str(sig_id)]
+    return(signal["overriddenaspect"] if signal["override"] else None)
+
+def test_fleeting_entry_signal_clears_behind_the_train(passed):
+    assert shown_aspect(20) is None
+    set_section(sections.occupied_down_east, True)
+    assert shown_aspect(20) == aspect_type.RED
+    set_section(sections.occupied_down_east, False)
+    assert shown_aspect(20) is None
+
+def test_entry_signal_held_until_released(passed):
+    automatic_signals.set_fleeting(20, False)
+    set_section(sections.occupied_down_east, True)
+    set_section(sections.occupied_down_east, False)
+    assert automatic_signals.machines[20]["state"] == "held"
+    assert shown_aspect(20) == aspect_type.RED
+    automatic_signals.release_automatic_signal(20)
+    assert shown_aspect(20) is None
+
+def test_exit_signal_steps_through_its_aspects(passed):
+    set_section(sections.occupied_down_west, True)
+    headless_signals.advance_clock(5)
+    assert passed == [21]
+    assert not headless_signals.section_occupied(sections.occupied_down_west)
+    assert shown_aspect(21) == aspect_type.RED
+    headless_signals.advance_clock(5)
+    assert shown_aspect(21) == aspect_type.YELLOW
+    headless_signals.advance_clock(5)
+    assert shown_aspect(21) == aspect_type.DOUBLE_YELLOW
+    headless_signals.advance_clock(5)
+    assert shown_aspect(21) is None
+
+def test_train_waits_at_exit_signal_until_it_steps(passed):
+    automatic_signals.automatic_signals[21]["run_time"] = 2
+    set_section(sections.occupied_down_west, True)
+    headless_signals.advance_clock(2)
+    # The next train reaches the signal (after 2 seconds) while it is still at danger
+    set_section(sections.occupied_down_west, True)
+    headless_signals.advance_clock(4)
+    assert passed == [21]
+    assert automatic_signals.machines[21]["trains_waiting"] == 1
+    headless_signals.advance_clock(1)
+    assert passed == [21, 21]
+    assert shown_aspect(21) == aspect_type.RED
+
+###############################################################################
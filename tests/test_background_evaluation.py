@@ -0,0 +1,53 @@
+#----------------------------------------------------------------------
+# Tests for applying the evaluated outputs (see 'background_evaluation')
+#----------------------------------------------------------------------
+
+import background_evaluation
+import headless_signals
+import rule_evaluator
+import snapshot
+
+import queue
+
+def evaluate_layout(evaluator):
+    return(rule_evaluator.evaluate(evaluator, background_evaluation.freeze_state(snapshot.capture_layout_state())))
+
+def test_stale_locks_are_released_by_the_later_outputs(layout):
+    evaluator = rule_evaluator.create_evaluator()
+    background_evaluation.applied_outputs.clear()
+    background_evaluation.apply_outputs(evaluate_layout(evaluator), stale=False)
+    assert not headless_signals.signals["10"]["siglocked"]
+    # Signal 2 is cleared and then restored before the first evaluation is applied
+    headless_signals.toggle_signal(2)
+    cleared_outputs = evaluate_layout(evaluator)
+    headless_signals.toggle_signal(2)
+    restored_outputs = evaluate_layout(evaluator)
+    assert cleared_outputs["signal_locks"]["10"] and not restored_outputs["signal_locks"]["10"]
+    # The first outputs are stale (their locks are applied) - the later ones release them
+    assert not background_evaluation.apply_outputs(cleared_outputs, stale=True)
+    assert headless_signals.signals["10"]["siglocked"]
+    assert background_evaluation.apply_outputs(restored_outputs, stale=False)
+    assert not headless_signals.signals["10"]["siglocked"]
+    assert not background_evaluation.applied_outputs["signal_locks"]["10"]
+
+def test_conflicting_signal_is_locked_before_the_evaluation(layout, monkeypatch):
+    monkeypatch.setattr(background_evaluation, "request_queue", queue.Queue())
+    monkeypatch.setattr(background_evaluation, "applied_outputs", {})
+    monkeypatch.setattr(background_evaluation, "interlocking_evaluator", rule_evaluator.create_evaluator())
+    background_evaluation.apply_outputs(evaluate_layout(background_evaluation.interlocking_evaluator), stale=False)
+    assert not headless_signals.signals["10"]["siglocked"]
+    # Signal 2 is cleared - signal 10 is locked without waiting for the worker thread
+    headless_signals.press_signal_button(2)
+    background_evaluation.request_evaluation()
+    assert headless_signals.signals["10"]["siglocked"]
+    assert background_evaluation.request_queue.qsize() == 1
+    # Signal 2 is restored - signal 10 stays locked until the evaluation is applied
+    headless_signals.press_signal_button(2)
+    background_evaluation.request_evaluation()
+    assert headless_signals.signals["10"]["siglocked"]
+    generation, state = background_evaluation.request_queue.get()
+    generation, state = background_evaluation.request_queue.get()
+    assert background_evaluation.apply_outputs(rule_evaluator.evaluate(rule_evaluator.create_evaluator(), state), stale=False)
+    assert not headless_signals.signals["10"]["siglocked"]
+
+###############################################################################
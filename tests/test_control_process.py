@@ -0,0 +1,51 @@
+#----------------------------------------------------------------------
+# Tests for the shared memory block of the control process and losing the
+# control process from the panel (see 'control_process' and 'panel_client')
+#----------------------------------------------------------------------
+
+from multiprocessing import shared_memory
+import os
+import struct
+
+import control_process
+import panel_client
+
+class shared_block:
+    def __init__(self):
+        self.buf = bytearray(control_process.shared_memory_size)
+
+class broken_connection:
+    def send(self, command):
+        raise BrokenPipeError("Broken pipe")
+
+def test_read_gives_up_while_the_block_is_still_being_written(monkeypatch):
+    monkeypatch.setattr(control_process, "read_attempts", 10)
+    block = shared_block()
+    control_process.write_shared_state(block, bytes(control_process.shared_memory_size - 4))
+    assert control_process.read_shared_state(block)[0] == 2
+    # The control process died part way through writing the block
+    struct.pack_into("<I", block.buf, 0, 3)
+    assert control_process.read_shared_state(block) == (None, None)
+
+def test_shared_memory_left_by_a_crash_is_replaced(monkeypatch):
+    monkeypatch.setattr(control_process, "shared_memory_name", "my_layout_state_test_"+str(os.getpid()))
+    stale_block = shared_memory.SharedMemory(name=control_process.shared_memory_name, create=True, size=16)
+    stale_block.close()
+    new_block = control_process.create_shared_memory()
+    try:
+        assert new_block.size >= control_process.shared_memory_size
+    finally:
+        new_block.close()
+        new_block.unlink()
+
+def test_failed_send_falls_back_to_the_panel(layout, monkeypatch):
+    lost = []
+    monkeypatch.setattr(panel_client, "control_connection", broken_connection())
+    monkeypatch.setattr(panel_client, "control_lost", False)
+    monkeypatch.setattr(panel_client, "lost_callback", lambda: lost.append(True))
+    assert not panel_client.send_point_change(1)
+    assert not panel_client.send_signal_passed(2)
+    # The lost callback is only made once
+    assert lost == [True] and panel_client.control_lost
+
+###############################################################################
@@ -0,0 +1,11 @@
+#----------------------------------------------------------------------
+# Tests that the rules generated from 'rule_spec' give the same results as
+# the hand written rules (see 'check_generated_rules')
+#----------------------------------------------------------------------
+
+import check_generated_rules
+
+def test_generated_rules_match_hand_written_rules():
+    assert check_generated_rules.check_generated_rules(4000, seed=1) == 0
+
+###############################################################################
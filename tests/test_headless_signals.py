@@ -0,0 +1,84 @@
+#----------------------------------------------------------------------
+# Tests for the headless stand-in for the signals library - the virtual
+# clock, the timed signals and the panel buttons (see 'headless_signals')
+#----------------------------------------------------------------------
+
+import headless_signals
+
+from model_railway_signals import *
+from model_railway_signals.signals_colour_lights import aspect_type
+
+def test_events_run_in_time_order(layout):
+    events = []
+    headless_signals.schedule_event(2.0, events.append, "second")
+    headless_signals.schedule_event(1.0, events.append, "first")
+    headless_signals.schedule_event(1.0, events.append, "first again")
+    cancelled = headless_signals.schedule_event(1.5, events.append, "cancelled")
+    headless_signals.window.after_cancel(cancelled)
+    # Events scheduled by an event run if they fall due before the end
+    headless_signals.schedule_event(0.5, headless_signals.schedule_event, 0.25, events.append, "scheduled")
+    headless_signals.advance_clock(1.0)
+    assert events == ["scheduled", "first", "first again"]
+    assert headless_signals.clock == 1.0
+    headless_signals.advance_clock(5.0)
+    assert events == ["scheduled", "first", "first again", "second"]
+    assert headless_signals.clock == 6.0
+
+def test_timed_signal_steps_through_its_aspects(layout):
+    callbacks = []
+    signal = headless_signals.signals["3"]
+    signal["externalcallback"] = lambda sig_id, callback_type: callbacks.append(callback_type)
+    toggle_signal(3)
+    trigger_timed_signal(3, start_delay=2, time_delay=5)
+    headless_signals.advance_clock(2.0)
+    assert signal["override"] and signal["overriddenaspect"] == aspect_type.RED
+    assert callbacks == [sig_callback_type.sig_passed]
+    headless_signals.advance_clock(5.0)
+    assert signal["overriddenaspect"] == aspect_type.YELLOW
+    headless_signals.advance_clock(5.0)
+    assert signal["overriddenaspect"] == aspect_type.DOUBLE_YELLOW
+    # The layout signals are only redrawn when the layout refreshes them
+    update_signal(3)
+    assert signal["displayedaspect"] == aspect_type.DOUBLE_YELLOW
+    headless_signals.advance_clock(5.0)
+    update_signal(3)
+    assert not signal["override"] and signal["displayedaspect"] == aspect_type.GREEN
+    assert callbacks == [sig_callback_type.sig_passed] + [sig_callback_type.sig_updated] * 3
+
+def test_three_aspect_timed_signal_skips_double_yellow(layout):
+    signal = headless_signals.signals["1"]
+    toggle_signal(1)
+    trigger_timed_signal(1, time_delay=5)
+    headless_signals.advance_clock(5.0)
+    assert signal["overriddenaspect"] == aspect_type.YELLOW
+    headless_signals.advance_clock(5.0)
+    assert not signal["override"] and signal["overriddenaspect"] == aspect_type.RED
+
+def test_disabled_buttons_do_nothing(layout):
+    # A point with its FPL active (or locked) can't be moved
+    assert fpl_active(1) and not headless_signals.press_point_button(1)
+    assert headless_signals.press_fpl_button(1) and headless_signals.press_point_button(1)
+    assert point_switched(1) and point_switched(101)
+    lock_point(1)
+    assert fpl_active(1) and not headless_signals.press_fpl_button(1)
+    # A locked signal can't be cleared and an automatic signal has no button
+    lock_signal(3)
+    assert not headless_signals.press_signal_button(3) and not signal_clear(3)
+    unlock_signal(3)
+    assert headless_signals.press_signal_button(3) and signal_clear(3)
+    assert not headless_signals.press_signal_button(20)
+    assert not headless_signals.press_subsidary_button(1)
+
+def test_library_points_dictionary(layout):
+    from model_railway_signals import points
+    lock_point(2)
+    assert points.points["2"] == {"switched": False, "locked": True, "fpllock": True, "hasfpl": True, "alsoswitch": 102}
+    assert "11" not in points.points
+
+def test_reset_clears_the_layout(layout):
+    headless_signals.schedule_event(1.0, print, "never")
+    headless_signals.reset()
+    assert not headless_signals.signals and not headless_signals.scheduled_events
+    assert not any(headless_signals.point_exists) and headless_signals.clock == 0.0
+
+###############################################################################
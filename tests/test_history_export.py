@@ -0,0 +1,76 @@
+#----------------------------------------------------------------------
+# Tests for exporting the session history a chunk at a time (see
+# 'history_export') - the exported columns must match the records
+#----------------------------------------------------------------------
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import history_export
+import sections
+import session_history
+
+start_time = 1700000000.0
+
+def history_records():
+    records = [(start_time, "session", 0, 1)]
+    for count in range(25):
+        records.append((start_time + count, "section", sections.occupied_down_loop, count % 2))
+        records.append((start_time + count + 0.5, "signal", 3, count % 2))
+        records.append((start_time + count + 0.75, "point", 2, 1 - count % 2))
+    records.append((start_time + 30.0, "section", 999, 1))
+    records.append((start_time + 60.0, "session", 0, 0))
+    return(records)
+
+def write_history(history_file, records):
+    with open(history_file, "wb") as file:
+        for record_time, kind, item_id, value in records:
+            file.write(session_history.record_format.pack(record_time, session_history.history_kinds.index(kind), item_id, value))
+    return()
+
+@pytest.fixture
+def history_file(tmp_path):
+    history_file = str(tmp_path / "session_history.bin")
+    write_history(history_file, history_records())
+    return(history_file)
+
+def expected_names(records):
+    item_names = session_history.item_names()
+    return([item_names.get((session_history.history_kinds.index(kind), item_id), "") for time, kind, item_id, value in records])
+
+def test_npz_export_matches_the_records(tmp_path, history_file):
+    records = history_records()
+    export_file = str(tmp_path / "history.npz")
+    # A small chunk size so the columns are written over several chunks
+    assert history_export.export_history(export_file, history_file, records_per_chunk=7) == len(records)
+    with np.load(export_file) as exported:
+        assert exported["time"].tolist() == [record[0] for record in records]
+        assert [str(exported["kinds"][index]) for index in exported["kind"]] == [record[1] for record in records]
+        assert exported["id"].tolist() == [record[2] for record in records]
+        assert exported["value"].tolist() == [record[3] for record in records]
+        assert [str(exported["names"][index]) for index in exported["name"]] == expected_names(records)
+    assert expected_names(records)[1] == "down_loop" and expected_names(records)[-2] == ""
+
+@pytest.mark.parametrize("extension", [".parquet", ".arrow"])
+def test_arrow_export_matches_the_records(tmp_path, history_file, extension):
+    pyarrow = pytest.importorskip("pyarrow")
+    import pyarrow.ipc
+    import pyarrow.parquet
+    records = history_records()
+    export_file = str(tmp_path / ("history"+extension))
+    assert history_export.export_history(export_file, history_file, records_per_chunk=7) == len(records)
+    if extension == ".parquet": table = pyarrow.parquet.read_table(export_file)
+    else: table = pyarrow.ipc.open_file(export_file).read_all()
+    columns = table.to_pydict()
+    assert [value.timestamp() for value in columns["time"]] == [record[0] for record in records]
+    assert columns["kind"] == [record[1] for record in records]
+    assert columns["id"] == [record[2] for record in records]
+    assert columns["name"] == expected_names(records)
+    assert columns["value"] == [record[3] for record in records]
+
+def test_export_errors(tmp_path, history_file):
+    assert history_export.export_history(str(tmp_path / "history.npz"), str(tmp_path / "missing.bin")) is None
+    assert history_export.export_history(str(tmp_path / "history.csv"), history_file) is None
+
+###############################################################################
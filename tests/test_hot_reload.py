@@ -0,0 +1,67 @@
+#----------------------------------------------------------------------
+# Tests for reloading a rule module while the layout is running (see
+# 'hot_reload') - the module is written to a temporary directory so the
+# real rules are never edited
+#----------------------------------------------------------------------
+
+import sys
+
+import pytest
+
+import headless_signals
+import hot_reload
+
+rules_before = """
+from model_railway_signals import *
+
+locked_signal = 10
+
+def process_interlocking():
+    if signal_clear(2): lock_signal(locked_signal)
+    else: unlock_signal(locked_signal)
+
+def old_rule():
+    return(True)
+"""
+
+rules_after = """
+from model_railway_signals import *
+
+locked_signal = 11
+
+def process_interlocking():
+    if signal_clear(2): lock_signal(locked_signal, 3)
+    else: unlock_signal(locked_signal, 3)
+"""
+
+@pytest.fixture
+def rules(layout, tmp_path, monkeypatch):
+    rules_file = tmp_path / "reloaded_rules.py"
+    rules_file.write_text(rules_before)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setattr(hot_reload, "loaded_sources", {})
+    monkeypatch.setattr(hot_reload, "reloadable_modules", ("reloaded_rules",))
+    import reloaded_rules
+    hot_reload.start_hot_reload()
+    yield rules_file
+    del sys.modules["reloaded_rules"]
+
+def test_edited_rule_takes_effect(rules):
+    import reloaded_rules
+    # A reference taken at startup (e.g. a callback) - it runs the new rule
+    process_interlocking = reloaded_rules.process_interlocking
+    rules.write_text(rules_after)
+    changes = hot_reload.reload_changed_modules()
+    assert changes == {"reloaded_rules": ["locked_signal", "process_interlocking", "-old_rule"]}
+    headless_signals.toggle_signal(2)
+    process_interlocking()
+    assert [headless_signals.signals[sig_id]["siglocked"] for sig_id in ("3", "10", "11")] == [True, False, True]
+    assert not hasattr(reloaded_rules, "old_rule")
+
+def test_module_with_an_error_is_not_reloaded(rules):
+    import reloaded_rules
+    rules.write_text(rules_after + "\ndef broken(:\n")
+    assert hot_reload.reload_changed_modules() == {}
+    assert reloaded_rules.locked_signal == 10 and hasattr(reloaded_rules, "old_rule")
+
+###############################################################################
@@ -0,0 +1,30 @@
+#----------------------------------------------------------------------
+# Tests for the layout rules using the fuzzer (see 'layout_fuzzer') - the
+# sequences of presses that broke the rules before they were fixed and a
+# short random run
+#----------------------------------------------------------------------
+
+import layout_fuzzer
+
+# Points 8 set for the up main (with point 9 normal) and signal 8 cleared
+departure_onto_up_main = [("fpl", 8), ("point", 8), ("fpl", 8), ("signal", 8)]
+
+def test_point_9_locked_under_departure_onto_up_main():
+    # Point 9 was only locked when it was switched - so it could be moved under the route
+    assert layout_fuzzer.run_sequence(departure_onto_up_main + [("fpl", 9), ("point", 9)]) is None
+    assert layout_fuzzer.headless_signals.point_locked[9]
+
+def test_switch_press_keeps_cleared_route_powered():
+    # Signal 3 cleared along the up main (power section 3) - pressing the
+    # power section switch mustn't switch the section off under the route
+    # (the fuzzer's switch callback is the same as the one in 'my_layout')
+    assert layout_fuzzer.run_sequence([("signal", 3), ("switch", 3, 1), ("switch", 3, 1)]) is None
+
+def test_random_presses_break_no_rules():
+    # A short run with a fixed seed (so a failure can be repeated with
+    # 'python layout_fuzzer.py 5000 1 1')
+    steps, failures = layout_fuzzer.fuzz_layout(5000, seed=1)
+    assert steps == 5000
+    assert failures == []
+
+###############################################################################
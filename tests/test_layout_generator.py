@@ -0,0 +1,56 @@
+#----------------------------------------------------------------------
+# Tests for the synthetic layouts used by the benchmarks (see
+# 'layout_generator' and 'layout_benchmarks'). The benchmarks themselves
+# run each layout in a new process with the real library - here the
+# generated rules and schematic are loaded against the headless library
+#----------------------------------------------------------------------
+
+import pytest
+
+import layout_benchmarks
+import layout_generator
+import rule_evaluator
+import schematic_renderer
+
+@pytest.fixture
+def synthetic_layout(tmp_path, monkeypatch):
+    layout = layout_generator.write_layout(str(tmp_path), stations=2, loops=3, yards=1, sidings=4, block_sections=2)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    return(layout)
+
+def default_state(counts:dict):
+    return({"points": {str(item_id): [False, True] for item_id in range(1, counts["points"]+1)},
+            "signals": {str(item_id): [False, False] for item_id in range(1, counts["signals"]+1)},
+            "sections": {str(item_id): False for item_id in range(1, counts["sections"]+1)},
+            "switches": {str(item_id): [False, False] for item_id in range(1, counts["switches"]+1)}})
+
+def test_layout_grows_with_the_parameters():
+    counts = layout_generator.create_layout(stations=2, loops=3)["counts"]
+    bigger_counts = layout_generator.create_layout(stations=4, loops=3)["counts"]
+    for item_type, count in counts.items():
+        assert bigger_counts[item_type] > count
+
+def test_block_signals_overridden_by_the_section_ahead(synthetic_layout):
+    evaluator = rule_evaluator.create_evaluator(layout_generator.module_names)
+    state = default_state(synthetic_layout["counts"])
+    assert not any(rule_evaluator.evaluate(evaluator, state)["overrides"].values())
+    block_signals = [signal for signal in layout_generator.all_signals(synthetic_layout) if signal["type"] == "block"]
+    assert block_signals
+    for signal in block_signals:
+        state["sections"][str(signal["ahead"])] = True
+        overrides = rule_evaluator.evaluate(evaluator, state)["overrides"]
+        assert [sig_id for sig_id, overridden in overrides.items() if overridden] == [str(signal["id"])]
+        state["sections"][str(signal["ahead"])] = False
+
+def test_generated_schematic_can_be_drawn(synthetic_layout):
+    renderer = schematic_renderer.create_renderer(layout_generator.module_names)
+    schematic_renderer.update_renderer(renderer, default_state(synthetic_layout["counts"]))
+    assert len(renderer["signals"]) == synthetic_layout["counts"]["signals"]
+    assert "<polyline" in schematic_renderer.render_svg(renderer)
+
+def test_summarise_times():
+    assert layout_benchmarks.summarise_times([]) == {"mean": 0.0, "p95": 0.0, "max": 0.0}
+    times = [index / 1000.0 for index in range(1, 101)]
+    assert layout_benchmarks.summarise_times(times, 1) == {"mean": 50.5, "p95": 95.0, "max": 100.0}
+
+###############################################################################
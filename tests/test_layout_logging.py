@@ -0,0 +1,43 @@
+#----------------------------------------------------------------------
+# Tests for the structured logging on the background thread (see
+# 'layout_logging')
+#----------------------------------------------------------------------
+
+import json
+import logging
+import logging.handlers
+
+import pytest
+
+import layout_logging
+
+@pytest.fixture
+def root_logger():
+    root_logger = logging.getLogger()
+    handlers, level = list(root_logger.handlers), root_logger.level
+    yield(root_logger)
+    layout_logging.stop_logging()
+    for handler in list(root_logger.handlers): root_logger.removeHandler(handler)
+    for handler in handlers: root_logger.addHandler(handler)
+    root_logger.setLevel(level)
+
+def test_events_written_to_the_console_and_the_log_file(root_logger, tmp_path, capsys):
+    log_file = str(tmp_path / "layout_log.jsonl")
+    layout_logging.start_logging(logging.INFO, log_file)
+    layout_logging.log_event("spad", logging.WARNING, signal=20, ms=1.5)
+    layout_logging.log_event("not_logged", logging.DEBUG, signal=1)
+    # Stopping writes out everything still on the queue
+    layout_logging.stop_logging()
+    assert capsys.readouterr().err.splitlines() == ["WARNING: spad signal=20 ms=1.5"]
+    with open(log_file) as file: entries = [json.loads(line) for line in file]
+    assert len(entries) == 1
+    assert {name: value for name, value in entries[0].items() if name != "time"} == {
+        "level": "WARNING", "event": "spad", "signal": 20, "ms": 1.5}
+
+def test_enabled_follows_the_level(root_logger):
+    layout_logging.start_logging(logging.WARNING)
+    assert layout_logging.enabled(logging.ERROR) and not layout_logging.enabled(logging.INFO)
+    # The library's logging goes the same way
+    assert isinstance(root_logger.handlers[0], logging.handlers.QueueHandler) and len(root_logger.handlers) == 1
+
+###############################################################################
@@ -0,0 +1,87 @@
+#----------------------------------------------------------------------
+# Tests for the low power profile - capping the schematic redraws, batching
+# the signal aspect DCC commands and backing off the polls (see 'low_power')
+#----------------------------------------------------------------------
+
+import types
+
+import pytest
+
+import background_evaluation
+import headless_signals
+import low_power
+import schematic
+import snapshot
+
+from model_railway_signals import *
+from model_railway_signals import dcc_control
+
+@pytest.fixture
+def profile(layout, monkeypatch):
+    for name, value in (("tkinter_window", None), ("panel_canvas", None), ("redraw_pending", False),
+                        ("normal_intervals", {}), ("send_dcc_signal", None), ("batched_aspects", {}),
+                        ("batch_pending", False), ("saved_counts", dict.fromkeys(low_power.saved_counts, 0))):
+        monkeypatch.setattr(low_power, name, value)
+    # The profile runs on the virtual clock
+    monkeypatch.setattr(low_power, "time", types.SimpleNamespace(monotonic=lambda: headless_signals.clock))
+    monkeypatch.setattr(dcc_control, "update_dcc_signal", dcc_control.update_dcc_signal)
+    monkeypatch.setattr(snapshot, "save_layout_state", lambda state=None: None)
+    monkeypatch.setattr(background_evaluation, "poll_interval", background_evaluation.poll_interval)
+    for module_name, function_names in low_power.activity_functions.items():
+        module = low_power.sys.modules.get(module_name)
+        for function_name in function_names:
+            if module is not None: monkeypatch.setattr(module, function_name, getattr(module, function_name))
+    redraws = []
+    monkeypatch.setattr(schematic, "update_track_schematic", redraws.append)
+    low_power.start_low_power(headless_signals.window, layout)
+    return(redraws)
+
+def test_redraws_are_combined_and_skipped(profile, layout):
+    toggle_point(1)
+    low_power.request_schematic_update(layout)
+    toggle_point(2)
+    low_power.request_schematic_update(layout)
+    # Nothing is redrawn until the interval since the last redraw is up
+    assert profile == [] and low_power.saved_counts["redraws_combined"] == 1
+    headless_signals.advance_clock(low_power.min_redraw_interval / 1000.0 + 0.01)
+    assert profile == [layout]
+    # Nothing has changed since the last redraw
+    headless_signals.advance_clock(1.0)
+    low_power.request_schematic_update(layout)
+    assert profile == [layout] and low_power.saved_counts["redraws_skipped"] == 1
+    headless_signals.advance_clock(1.0)
+    low_power.request_schematic_update(layout, force=True)
+    assert profile == [layout, layout]
+
+def test_aspects_batched_but_danger_sent_straight_away(profile, monkeypatch):
+    monkeypatch.setitem(headless_signals.dcc_signal_mappings, "3", {})
+    signal = headless_signals.signals["3"]
+    toggle_signal(3)
+    update_signal(3)
+    update_signal(3, sig_ahead_id=4)
+    assert signal["displayedaspect"] == headless_signals.aspect_type.YELLOW
+    assert headless_signals.dcc_signal_commands == []
+    headless_signals.advance_clock(low_power.dcc_batch_interval / 1000.0)
+    # Only the last aspect is sent
+    assert [command[1:] for command in headless_signals.dcc_signal_commands] == [[3, dcc_control.signal_state_type.caution]]
+    assert low_power.saved_counts["dcc_aspects_replaced"] == 1
+    update_signal(3)
+    toggle_signal(3)
+    update_signal(3)
+    # The danger aspect replaces the aspect waiting to be sent
+    assert [command[1:] for command in headless_signals.dcc_signal_commands] == [[3, dcc_control.signal_state_type.caution],
+                                                                              [3, dcc_control.signal_state_type.danger]]
+    headless_signals.advance_clock(1.0)
+    assert len(headless_signals.dcc_signal_commands) == 2
+
+def test_polls_backed_off_when_idle(profile):
+    normal_interval = background_evaluation.poll_interval
+    headless_signals.advance_clock(low_power.idle_time)
+    assert background_evaluation.poll_interval == max(normal_interval, low_power.idle_polls["background_evaluation"][1])
+    assert background_evaluation.poll_interval > normal_interval
+    # The next change wakes the polls up
+    snapshot.save_layout_state()
+    assert background_evaluation.poll_interval == normal_interval
+    assert not low_power.normal_intervals
+
+###############################################################################
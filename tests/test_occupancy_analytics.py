@@ -0,0 +1,41 @@
+#----------------------------------------------------------------------
+# Tests for the analysis of the session history (see 'occupancy_analytics')
+#----------------------------------------------------------------------
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import occupancy_analytics
+import sections
+import session_history
+import snapshot
+
+def write_history(history_file, records):
+    with open(history_file, "wb") as file:
+        for record in records:
+            record_time, kind, item_id, value = record
+            file.write(session_history.record_format.pack(record_time, session_history.history_kinds.index(kind), item_id, value))
+    return()
+
+def test_values_at_with_no_records():
+    no_changes = (np.zeros(0), np.zeros(0, dtype=np.int16))
+    assert occupancy_analytics.values_at(no_changes, np.array([1.0, 2.0])).tolist() == [0, 0]
+
+def test_history_with_an_item_that_never_appears(tmp_path):
+    # The down platform is never recorded (and nor are any of the signals)
+    start_time = 1700000000.0
+    records = [(start_time, "session", 0, 1)]
+    for section_id in snapshot.section_ids:
+        if section_id != sections.occupied_down_platform: records.append((start_time, "section", section_id, 0))
+    records.append((start_time + 60.0, "section", sections.occupied_down_loop, 1))
+    records.append((start_time + 120.0, "section", sections.occupied_down_loop, 0))
+    records.append((start_time + 600.0, "session", 0, 0))
+    history_file = str(tmp_path / "session_history.bin")
+    write_history(history_file, records)
+    results = occupancy_analytics.analyse_history(history_file)
+    assert results["utilisation"]["down_platform"] == 0.0
+    assert results["utilisation"]["down_loop"] == pytest.approx(0.1)
+    assert results["dwell_times"]["down_platform"] == {"count": 0}
+
+###############################################################################
@@ -0,0 +1,91 @@
+#----------------------------------------------------------------------
+# Tests for staggering the point motor throws and holding the signals
+# locked until the points have reported in (see 'point_sequencer')
+#----------------------------------------------------------------------
+
+import pytest
+
+import headless_signals
+import interlocking
+import point_sequencer
+import route_conflicts
+
+from model_railway_signals import dcc_control
+
+def process_interlocking():
+    interlocking.process_interlocking_east()
+    interlocking.process_interlocking_west()
+    return()
+
+@pytest.fixture
+def sequencer(layout, monkeypatch):
+    for name, value in (("feed_of_point", {}), ("signals_of_point", {}), ("subsidary_signals", set()),
+                        ("queued_throws", []), ("throws_in_progress", {}), ("feed_throws", {}),
+                        ("moving_points", {}), ("sequence_points", []), ("sequence_start", None)):
+        monkeypatch.setattr(point_sequencer, name, value)
+    monkeypatch.setattr(dcc_control, "update_dcc_point", dcc_control.update_dcc_point)
+    for name in ("unlock_signal", "unlock_subsidary"):
+        monkeypatch.setitem(interlocking.__dict__, name, interlocking.__dict__[name])
+    for point_id in range(1, 11):
+        monkeypatch.setitem(headless_signals.dcc_point_mappings, str(point_id), {"address": point_id, "reversed": False})
+    points_set = []
+    def callback(point_ids):
+        points_set.append(point_ids)
+        process_interlocking()
+    point_sequencer.start_point_sequencer(headless_signals.window, callback, [interlocking])
+    return(points_set)
+
+def set_points(points:dict):
+    for point_id, switched in points.items():
+        if headless_signals.point_switched(point_id) != switched:
+            fpl_was_active = headless_signals.fpl_active(point_id)
+            if fpl_was_active: headless_signals.toggle_fpl(point_id)
+            headless_signals.toggle_point(point_id)
+            if fpl_was_active: headless_signals.toggle_fpl(point_id)
+    process_interlocking()
+    return()
+
+def sent_points():
+    return([point_id for time, point_id, switched in headless_signals.dcc_commands])
+
+def test_throws_are_limited_on_the_bus_and_each_feed(sequencer):
+    set_points({2: True, 4: True, 7: True, 9: True})
+    # One throw on each feed (and no more than two on the bus)
+    assert sent_points() == [2, 7]
+    assert set(point_sequencer.throws_in_progress) == {2, 7}
+    headless_signals.advance_clock(point_sequencer.throw_time / 1000.0)
+    assert sent_points() == [2, 7, 4, 9]
+    assert not sequencer
+    headless_signals.advance_clock(point_sequencer.throw_time / 1000.0)
+    assert sequencer == [[2, 4, 7, 9]]
+    assert not point_sequencer.moving_points and not point_sequencer.feed_throws.get("west")
+
+def test_signals_held_locked_until_the_points_report_in(sequencer):
+    sig_id, aspects, points = route_conflicts.station_routes["3_platform3"]
+    set_points(points)
+    # The interlocking would unlock the signal but the unlock is held back
+    assert headless_signals.signals[str(sig_id)]["siglocked"]
+    assert sig_id in point_sequencer.held_signals()
+    headless_signals.advance_clock(1.0)
+    assert sequencer and not point_sequencer.moving_points
+    assert not headless_signals.signals[str(sig_id)]["siglocked"]
+
+def test_cleared_signals_are_left_alone(sequencer):
+    sig_id, aspects, points = route_conflicts.station_routes["3_up_main"]
+    set_points(points)
+    headless_signals.advance_clock(1.0)
+    headless_signals.toggle_signal(sig_id)
+    process_interlocking()
+    # Signal 3 reads point 4 (for platform 3) but it is cleared for the main line
+    set_points({4: True})
+    assert 4 in point_sequencer.moving_points
+    assert sig_id not in point_sequencer.held_signals()
+    assert headless_signals.signal_clear(sig_id) and not headless_signals.signals[str(sig_id)]["siglocked"]
+
+def test_unmapped_points_are_thrown_straight_away(sequencer, monkeypatch):
+    monkeypatch.delitem(headless_signals.dcc_point_mappings, "2")
+    set_points({2: True})
+    assert not point_sequencer.moving_points and not point_sequencer.queued_throws
+    assert not point_sequencer.held_signals()
+
+###############################################################################
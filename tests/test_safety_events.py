@@ -0,0 +1,56 @@
+#----------------------------------------------------------------------
+# Tests for the safety event stream (see 'safety_events')
+#----------------------------------------------------------------------
+
+import logging
+
+import pytest
+
+import headless_signals
+import safety_events
+import snapshot
+
+@pytest.fixture
+def events(layout, monkeypatch):
+    monkeypatch.setattr(headless_signals.points, "toggle_point", headless_signals.toggle_point)
+    monkeypatch.setattr(safety_events, "library_toggle_point", None)
+    monkeypatch.setattr(safety_events, "subscribers", [])
+    monkeypatch.setattr(snapshot, "toggle_point", snapshot.toggle_point)
+    safety_events.install_filters([snapshot])
+    published = []
+    safety_events.subscribe("test", published.append, on_tkinter_thread=True)
+    return(published)
+
+def test_point_moved_while_locked(events):
+    headless_signals.lock_point(2)
+    snapshot.toggle_point(2)
+    safety_events.deliver_events(safety_events.subscribers[0])
+    assert [(event["type"], event["point"]) for event in events] == [(safety_events.safety_event_type.point_moved_while_locked, 2)]
+
+def test_point_moved_after_unlock_is_not_an_event(events):
+    # Unlocked and moved before the next check - this used to be reported
+    headless_signals.lock_point(2)
+    headless_signals.unlock_point(2)
+    headless_signals.press_fpl_button(2)
+    assert headless_signals.press_point_button(2)
+    safety_events.deliver_events(safety_events.subscribers[0])
+    assert events == []
+
+def test_point_moved_by_the_other_signal_box_is_not_an_event(events, monkeypatch):
+    monkeypatch.setattr(safety_events, "ignored_points", {2})
+    headless_signals.lock_point(2)
+    snapshot.toggle_point(2)
+    safety_events.deliver_events(safety_events.subscribers[0])
+    assert events == []
+
+def test_subscriber_failure_is_logged(events, caplog):
+    def failing_subscriber(event:dict):
+        raise ValueError("no alarm")
+    subscriber = safety_events.subscribe("failing", failing_subscriber, on_tkinter_thread=True)
+    safety_events.publish_safety_event(safety_events.safety_event_type.spad, signal=20)
+    with caplog.at_level(logging.ERROR):
+        safety_events.deliver_events(subscriber)
+    assert [record.msg for record in caplog.records] == ["safety_event_error"]
+    assert caplog.records[0].fields["subscriber"] == "failing"
+
+###############################################################################
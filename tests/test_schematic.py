@@ -0,0 +1,45 @@
+#----------------------------------------------------------------------
+# Tests for the schematic only recolouring the objects that change colour
+# (see 'update_track_schematic')
+#----------------------------------------------------------------------
+
+import power_switches
+import schematic
+
+class RecordingCanvas:
+    def __init__(self, canvas):
+        self.canvas, self.changes = canvas, []
+    def itemconfig(self, item_id, **options):
+        self.changes.append(item_id)
+        self.canvas.itemconfig(item_id, **options)
+    def __getattr__(self, name): return(getattr(self.canvas, name))
+
+def test_unchanged_update_reconfigures_nothing(layout, monkeypatch):
+    monkeypatch.setattr(schematic, "drawn_colours", {})
+    canvas = RecordingCanvas(layout)
+    schematic.update_track_schematic(canvas)
+    assert canvas.changes
+    canvas.changes.clear()
+    schematic.update_track_schematic(canvas)
+    assert canvas.changes == []
+
+def test_only_the_changed_items_are_recoloured(layout, monkeypatch):
+    monkeypatch.setattr(schematic, "drawn_colours", {})
+    canvas = RecordingCanvas(layout)
+    schematic.update_track_schematic(canvas)
+    canvas.changes.clear()
+    colours = {item_id: layout.itemcget(item_id, "fill") for item_id in layout.find_all()}
+    power_switches.toggle_switch(6, 1)
+    schematic.update_track_schematic(canvas)
+    recoloured = {item_id for item_id in layout.find_all() if layout.itemcget(item_id, "fill") != colours[item_id]}
+    assert set(schematic.lh_headshunt) <= recoloured
+    assert sorted(canvas.changes) == sorted(recoloured)
+    assert {layout.itemcget(item_id, "fill") for item_id in schematic.lh_headshunt} == {schematic.branch_colour}
+
+def test_measure_track_schematic(layout, monkeypatch):
+    monkeypatch.setattr(schematic, "drawn_colours", {})
+    results = schematic.measure_track_schematic(layout, repeats=2)
+    assert results["canvas_items"] == len(layout.find_all())
+    assert set(results) == {"canvas_items", "full_redraw_ms", "update_ms", "resize_ms"}
+
+###############################################################################
@@ -0,0 +1,72 @@
+#----------------------------------------------------------------------
+# Tests for rendering the schematic without a display - the incremental
+# renders must match a full render of the same state (see 'schematic_renderer')
+#----------------------------------------------------------------------
+
+import copy
+
+import pytest
+
+import schematic_renderer
+import snapshot
+
+def changed_state(state:dict):
+    new_state = copy.deepcopy(state)
+    new_state["points"]["2"] = [True, True]
+    new_state["points"]["4"] = [True, True]
+    new_state["signals"]["3"] = [True, False]
+    return(new_state)
+
+def full_render(state:dict):
+    renderer = schematic_renderer.create_renderer()
+    schematic_renderer.update_renderer(renderer, state)
+    return(schematic_renderer.render_svg(renderer))
+
+def test_unchanged_state_redraws_nothing():
+    state = snapshot.default_layout_state()
+    renderer = schematic_renderer.create_renderer()
+    schematic_renderer.update_renderer(renderer, state)
+    image = schematic_renderer.render_svg(renderer)
+    schematic_renderer.update_renderer(renderer, state)
+    assert not renderer["canvas"].changed
+    assert schematic_renderer.render_svg(renderer) == image
+
+def test_incremental_svg_matches_a_full_render():
+    state = snapshot.default_layout_state()
+    renderer = schematic_renderer.create_renderer()
+    schematic_renderer.update_renderer(renderer, state)
+    first_image = schematic_renderer.render_svg(renderer)
+    new_state = changed_state(state)
+    schematic_renderer.update_renderer(renderer, new_state)
+    changed = set(renderer["canvas"].changed)
+    # Only the point blades, the signal lamps and the track sections that change are redrawn
+    assert changed and len(changed) < len(renderer["canvas"].items) / 4
+    image = schematic_renderer.render_svg(renderer)
+    assert image != first_image
+    assert image == full_render(new_state)
+
+def test_signal_lamps_show_the_aspect():
+    state = snapshot.default_layout_state()
+    renderer = schematic_renderer.create_renderer()
+    schematic_renderer.update_renderer(renderer, changed_state(state))
+    lamp = renderer["canvas"].items[renderer["signals"]["3"]["lamp"]]
+    assert lamp["fill"] in ("green", "yellow")
+    schematic_renderer.update_renderer(renderer, state)
+    assert lamp["fill"] == "red"
+
+@pytest.mark.parametrize("scale", [1.0, 0.3])
+def test_incremental_png_matches_a_full_render(tmp_path, scale):
+    pytest.importorskip("PIL")
+    state = snapshot.default_layout_state()
+    renderer = schematic_renderer.create_renderer()
+    schematic_renderer.update_renderer(renderer, state)
+    schematic_renderer.render_png(renderer, str(tmp_path / "first.png"), scale)
+    new_state = changed_state(state)
+    schematic_renderer.update_renderer(renderer, new_state)
+    schematic_renderer.render_png(renderer, str(tmp_path / "incremental.png"), scale)
+    full_renderer = schematic_renderer.create_renderer()
+    schematic_renderer.update_renderer(full_renderer, new_state)
+    schematic_renderer.render_png(full_renderer, str(tmp_path / "full.png"), scale)
+    assert renderer["image"].tobytes() == full_renderer["image"].tobytes()
+
+###############################################################################
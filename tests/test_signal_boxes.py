@@ -0,0 +1,144 @@
+#----------------------------------------------------------------------
+# Tests for the boundary between the signal boxes (see 'signal_boxes')
+#----------------------------------------------------------------------
+
+import headless_signals
+import interlocking
+import sections
+import signal_boxes
+
+import queue
+
+import pytest
+
+# The boundary found from the hand written rules. The interlocking reads the
+# conflicting routes through 'route_conflicts' - so the West box also needs
+# point 10 (read by signal 16's route into the goods loop)
+expected_boundaries = {
+    "west": {"east": {"points": (1,2,4,5), "signals": (2,3,5,14,15)}},
+    "east": {"west": {"points": (6,8,9,10), "signals": (10,11,16)}} }
+
+def test_boundaries_from_the_hand_written_rules():
+    assert signal_boxes.find_boundaries() == expected_boundaries
+
+def test_boundaries_include_the_conflicting_routes():
+    # Signal 10 cleared into platform 3 locks signal 2 - so the West box needs
+    # to know about signal 10 (and the points its routes read)
+    boundaries = signal_boxes.find_boundaries()
+    assert 10 in boundaries["east"]["west"]["signals"]
+    assert {6, 8} <= set(boundaries["east"]["west"]["points"])
+
+#----------------------------------------------------------------------
+# Tests for the slots - signal 2 (West box) and signal 10 (East box) both
+# have routes into platform 3 (set with all the points normal). Only one of
+# them can ever show a proceed aspect - however the messages cross
+#----------------------------------------------------------------------
+
+@pytest.fixture
+def box(layout, monkeypatch):
+    # The filters are put back once the test has finished
+    monkeypatch.setattr(sections, "clear_signal_override", sections.clear_signal_override)
+    monkeypatch.setattr(interlocking, "fpl_active", interlocking.fpl_active)
+    def set_up(box_name):
+        signal_boxes.set_up_signal_box(box_name)
+        signal_boxes.install_filters([interlocking, sections])
+        signal_boxes.process_interlocking()
+    return(set_up)
+
+# Any other slots requested (e.g. for the shunting routes) are left out
+def slot_messages(box_name:str, routes:tuple=("2_platform3", "10_platform3")):
+    messages = []
+    while True:
+        try: message = signal_boxes.outgoing[box_name].get_nowait()
+        except queue.Empty: return(messages)
+        if "slot" in message and message["slot"][1] in routes: messages.append(message["slot"])
+
+def receive(box_name:str, action:str, route:str):
+    signal_boxes.apply_message({"box":box_name, "slot":[action, route]})
+    sections.override_signals_based_on_track_occupancy()
+    sections.refresh_signal_aspects()
+    signal_boxes.process_interlocking()
+
+def showing_proceed(sig_id:int):
+    return(headless_signals.signals[str(sig_id)]["displayedaspect"] != headless_signals.aspect_type.RED)
+
+def test_signal_held_at_danger_until_the_slot_is_granted(box):
+    box("west")
+    assert headless_signals.press_signal_button(2)
+    signal_boxes.process_interlocking()
+    assert not showing_proceed(2)
+    assert slot_messages("east") == [["request", "2_platform3"]]
+    receive("east", "grant", "2_platform3")
+    assert showing_proceed(2)
+    # The slot is kept until the route is changed (or the East box wants it)
+    assert headless_signals.press_signal_button(2)
+    signal_boxes.process_interlocking()
+    assert slot_messages("east") == []
+
+def test_requests_crossing_only_clear_one_signal(box):
+    # The East box comes after the West box in 'signal_boxes' - so it gives way
+    box("east")
+    assert headless_signals.press_signal_button(10)
+    signal_boxes.process_interlocking()
+    assert slot_messages("west") == [["request", "10_platform3"]]
+    receive("west", "request", "2_platform3")
+    assert slot_messages("west") == [["release", "10_platform3"], ["grant", "2_platform3"],
+                                     ["request", "10_platform3"]]
+    assert headless_signals.signals["10"]["siglocked"]
+    # The grant sent by the West box before it got our request is given back
+    receive("west", "grant", "10_platform3")
+    assert not showing_proceed(10)
+    assert slot_messages("west") == [["release", "10_platform3"], ["request", "10_platform3"]]
+    # Once the West box has finished with platform 3 we get the slot
+    receive("west", "release", "2_platform3")
+    receive("west", "grant", "10_platform3")
+    assert showing_proceed(10)
+
+def test_box_that_comes_first_keeps_its_request(box):
+    box("west")
+    assert headless_signals.press_signal_button(2)
+    signal_boxes.process_interlocking()
+    assert slot_messages("east") == [["request", "2_platform3"]]
+    receive("east", "request", "10_platform3")
+    assert slot_messages("east") == []
+    receive("east", "grant", "2_platform3")
+    assert showing_proceed(2)
+    assert slot_messages("east") == []
+    # Signal 2 back at danger - the slot is handed over to the East box
+    assert headless_signals.press_signal_button(2)
+    signal_boxes.process_interlocking()
+    assert slot_messages("east") == [["release", "2_platform3"], ["grant", "10_platform3"]]
+    assert headless_signals.signals["2"]["siglocked"]
+    assert not headless_signals.press_signal_button(2)
+
+def test_slots_restored_when_a_connection_is_made(box):
+    box("west")
+    signal_boxes.apply_message({"box":"east", "slots":{"requested":[], "held":["10_platform3"]}})
+    signal_boxes.process_interlocking()
+    assert not headless_signals.press_signal_button(2)
+    signal_boxes.apply_message({"box":"east", "slots":{"requested":[], "held":[]}})
+    signal_boxes.process_interlocking()
+    assert headless_signals.press_signal_button(2)
+
+#----------------------------------------------------------------------
+# Tests for mirroring the other box - the buttons for the points and
+# signals owned by the other box must stay locked on our panel
+#----------------------------------------------------------------------
+
+def test_mirrored_points_and_signals_stay_locked(box):
+    box("west")
+    signal_boxes.apply_message({"box":"east", "state":{"points":{"6":[True, False]}, "signals":{"10":[True, False]}}})
+    assert headless_signals.point_switched(6) and headless_signals.signal_clear(10)
+    assert not interlocking.fpl_active(6)
+    assert not headless_signals.press_point_button(6)
+    assert not headless_signals.press_fpl_button(6)
+    assert not headless_signals.press_signal_button(10)
+
+def test_interlocking_looked_up_when_called(box, monkeypatch):
+    box("west")
+    calls = []
+    monkeypatch.setattr(interlocking, "process_interlocking_west", lambda: calls.append("reloaded"))
+    signal_boxes.process_interlocking()
+    assert calls == ["reloaded"]
+
+###############################################################################
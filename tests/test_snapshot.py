@@ -0,0 +1,79 @@
+#----------------------------------------------------------------------
+# Tests for saving and loading the layout state (see 'snapshot')
+#----------------------------------------------------------------------
+
+import shutil
+
+import pytest
+
+import headless_signals
+import snapshot
+
+@pytest.fixture
+def saved_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot, "snapshot_file", str(tmp_path / "layout_state.json"))
+    monkeypatch.setattr(snapshot, "journal_file", str(tmp_path / "layout_state.journal"))
+    monkeypatch.setattr(snapshot, "deltas_before_compaction", 2)
+    monkeypatch.setattr(snapshot, "last_saved_state", {})
+    monkeypatch.setattr(snapshot, "deltas_in_journal", 0)
+    monkeypatch.setattr(snapshot, "save_sequence", 0)
+    return(tmp_path)
+
+def layout_state(point_1_switched:bool, signal_2_clear:bool):
+    return({"points": {"1": [point_1_switched, True]}, "signals": {"2": [signal_2_clear, False]}})
+
+def test_journal_is_replayed_over_the_snapshot(saved_files):
+    snapshot.write_snapshot(layout_state(False, False))
+    snapshot.save_layout_state(layout_state(True, False))
+    snapshot.save_layout_state(layout_state(True, True))
+    assert snapshot.load_layout_state() == layout_state(True, True)
+
+def test_crash_before_the_journal_is_emptied(saved_files):
+    snapshot.write_snapshot(layout_state(False, False))
+    snapshot.save_layout_state(layout_state(True, False))
+    snapshot.save_layout_state(layout_state(True, True))
+    # The next save is compacted into a new snapshot - but we "crash" after the
+    # snapshot has been written and before the journal has been emptied
+    journal_copy = str(saved_files / "journal_copy")
+    shutil.copy(snapshot.journal_file, journal_copy)
+    snapshot.save_layout_state(layout_state(False, False))
+    shutil.copy(journal_copy, snapshot.journal_file)
+    # The older deltas in the journal must not be replayed over the newer snapshot
+    assert snapshot.load_layout_state() == layout_state(False, False)
+
+def test_saves_carry_on_from_the_loaded_state(saved_files):
+    snapshot.write_snapshot(layout_state(False, False))
+    snapshot.save_layout_state(layout_state(True, False))
+    loaded_sequence = snapshot.save_sequence
+    snapshot.save_sequence = 0
+    assert snapshot.load_layout_state() == layout_state(True, False)
+    assert snapshot.save_sequence == loaded_sequence
+
+def test_conflicting_routes_are_not_restored(layout, saved_files):
+    # Signals 2 and 10 both cleared (their routes conflict) - as if the
+    # saved state had been edited or written by an older version
+    state = snapshot.capture_layout_state()
+    state["signals"]["2"] = [True, False]
+    state["signals"]["10"] = [True, False]
+    snapshot.write_snapshot(state)
+    assert snapshot.restore_layout_state()
+    assert headless_signals.signal_clear(2) and not headless_signals.signal_clear(10)
+    assert headless_signals.signals["10"]["siglocked"]
+
+def test_locked_point_is_not_moved(layout, saved_files):
+    state = snapshot.capture_layout_state()
+    state["points"]["2"] = [True, False]
+    headless_signals.lock_point(2)
+    snapshot.apply_layout_state(state, check_locks=True)
+    assert not headless_signals.point_switched(2)
+    # Without check_locks (e.g. mirroring the control process) it is moved
+    snapshot.apply_layout_state(state)
+    assert headless_signals.point_switched(2)
+
+def test_journal_is_synced_on_its_own_thread(saved_files):
+    snapshot.write_snapshot(layout_state(False, False))
+    snapshot.save_layout_state(layout_state(True, False))
+    assert snapshot.sync_thread.is_alive()
+    assert snapshot.load_layout_state() == layout_state(True, False)
+
+###############################################################################
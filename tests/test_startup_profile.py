@@ -0,0 +1,35 @@
+#----------------------------------------------------------------------
+# Tests for the startup timings (see 'startup_profile') and for loading the
+# optional subsystems only when they are selected (see 'my_layout')
+#----------------------------------------------------------------------
+
+import ast
+import os
+import types
+
+import startup_profile
+
+def test_phases_timed_from_the_end_of_the_last(monkeypatch, capsys):
+    times = iter([10.5, 10.75])
+    monkeypatch.setattr(startup_profile, "time", types.SimpleNamespace(perf_counter=lambda: next(times)))
+    monkeypatch.setattr(startup_profile, "start_time", 10.0)
+    monkeypatch.setattr(startup_profile, "last_time", 10.0)
+    monkeypatch.setattr(startup_profile, "phases", [])
+    startup_profile.phase_complete("imports")
+    startup_profile.phase_complete("panel")
+    assert startup_profile.phases == [["imports", 0.5], ["panel", 0.25]]
+    startup_profile.report_startup_timings()
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[1].split() == ["imports", "500.0", "ms"]
+    assert lines[2].split() == ["panel", "250.0", "ms"]
+    assert lines[3].split() == ["total", "750.0", "ms"]
+
+def test_optional_subsystems_not_imported_at_startup():
+    with open(os.path.join(os.path.dirname(startup_profile.__file__), "my_layout.py")) as file:
+        tree = ast.parse(file.read())
+    imported = {alias.name for node in tree.body if isinstance(node, ast.Import) for alias in node.names}
+    assert next(node for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))).names[0].name == "startup_profile"
+    for module_name in ("background_evaluation", "panel_client", "signal_boxes", "web_mimic"):
+        assert module_name not in imported
+
+###############################################################################
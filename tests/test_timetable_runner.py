@@ -0,0 +1,88 @@
+#----------------------------------------------------------------------
+# Tests for the queue of route requests and waking them up on the changes
+# they depend on (see 'timetable_runner')
+#----------------------------------------------------------------------
+
+import pytest
+
+import headless_signals
+import interlocking
+import sections
+import timetable_runner
+
+@pytest.fixture
+def runner(layout, monkeypatch):
+    for name, value in (("route_requests", {}), ("signal_queues", {}), ("watchers", {}),
+                        ("woken_requests", set()), ("last_state", None), ("processing", False)):
+        monkeypatch.setattr(timetable_runner, name, value)
+    # The same as the panel callbacks - the interlocking is processed and
+    # the runner then picks up the change
+    def callback(item_id, callback_type):
+        interlocking.process_interlocking_east()
+        interlocking.process_interlocking_west()
+        timetable_runner.process_changes()
+    timetable_runner.start_timetable_runner(callback, callback)
+    return(callback)
+
+def set_section(section_id:int, occupied:bool):
+    if occupied: headless_signals.set_section_occupied(section_id)
+    else: headless_signals.clear_section_occupied(section_id)
+    timetable_runner.process_changes()
+    return()
+
+def return_signal_to_on(sig_id:int):
+    headless_signals.toggle_signal(sig_id)
+    interlocking.process_interlocking_east()
+    interlocking.process_interlocking_west()
+    timetable_runner.process_changes()
+    return()
+
+def test_route_set_once_the_section_clears(runner):
+    set_section(sections.occupied_down_platform, True)
+    request_id = timetable_runner.queue_route_request(11, {9: False, 7: True}, when_clear=["down_platform"])
+    assert not headless_signals.signal_clear(11)
+    assert request_id in timetable_runner.route_requests
+    set_section(sections.occupied_down_platform, False)
+    assert headless_signals.signal_clear(11)
+    assert headless_signals.point_switched(7) and not headless_signals.point_switched(9)
+    assert not timetable_runner.route_requests and not timetable_runner.watchers
+
+def test_requests_for_a_signal_are_set_in_order(runner):
+    first = timetable_runner.queue_route_request(11, {9: False, 7: True})
+    second = timetable_runner.queue_route_request(11, {9: False, 7: False})
+    assert headless_signals.signal_clear(11) and headless_signals.point_switched(7)
+    assert list(timetable_runner.route_requests) == [second]
+    # The second route waits for the signal to be returned to ON
+    return_signal_to_on(11)
+    assert headless_signals.signal_clear(11) and not headless_signals.point_switched(7)
+    assert not timetable_runner.route_requests
+
+def test_request_only_woken_by_what_it_depends_on(runner, monkeypatch):
+    set_section(sections.occupied_down_platform, True)
+    request_id = timetable_runner.queue_route_request(11, {9: False, 7: True}, when_clear=["down_platform"])
+    tried = []
+    set_route_if_available = timetable_runner.set_route_if_available
+    monkeypatch.setattr(timetable_runner, "set_route_if_available",
+                        lambda request_id: tried.append(request_id) or set_route_if_available(request_id))
+    set_section(sections.occupied_branch_platform, True)
+    assert tried == []
+    set_section(sections.occupied_down_platform, False)
+    assert tried == [request_id]
+
+def test_points_left_set_while_the_signal_is_locked(runner, monkeypatch):
+    # As for the point sequencer - the signal stays locked until the points report in
+    def points_not_reported(point_id, callback_type):
+        runner(point_id, callback_type)
+        headless_signals.lock_signal(11)
+    monkeypatch.setattr(timetable_runner, "point_callback", points_not_reported)
+    request_id = timetable_runner.queue_route_request(11, {9: False, 7: True})
+    assert headless_signals.point_switched(7) and not headless_signals.signal_clear(11)
+    assert request_id in timetable_runner.route_requests
+    # The points report in (the signal is unlocked) - the request is woken up by the report
+    runner(7, None)
+    assert not headless_signals.signal_clear(11)
+    timetable_runner.points_reported([7])
+    assert headless_signals.signal_clear(11)
+    assert not timetable_runner.route_requests
+
+###############################################################################
@@ -0,0 +1,24 @@
+#----------------------------------------------------------------------
+# Tests for the accelerated-time train simulator (see 'train_simulator')
+#----------------------------------------------------------------------
+
+import pytest
+
+import train_simulator
+
+def test_trains_run_without_spads_or_deadlock():
+    results = train_simulator.run_simulation(number_of_trains=4, duration=3600.0, seed=1)
+    assert results["moves"] > 0 and results["spads"] == 0 and not results["deadlocked"]
+    assert sum(results["moves_by_journey"].values()) == results["moves"]
+    assert results["events"] > 0 and set(results["latency_ms"]) == {"mean", "p95", "max"}
+    # The same seed gives the same moves
+    assert train_simulator.run_simulation(number_of_trains=4, duration=3600.0, seed=1)["moves"] == results["moves"]
+
+@pytest.mark.parametrize("journey_name", sorted(train_simulator.journeys))
+def test_each_journey_can_be_made(monkeypatch, journey_name):
+    monkeypatch.setattr(train_simulator, "journeys", {journey_name: train_simulator.journeys[journey_name]})
+    results = train_simulator.run_simulation(number_of_trains=2, duration=1800.0, seed=2)
+    assert results["moves_by_journey"].get(journey_name, 0) >= 2
+    assert results["spads"] == 0 and not results["deadlocked"]
+
+###############################################################################
@@ -0,0 +1,33 @@
+#----------------------------------------------------------------------
+# Tests for holding back changes to objects that can't be seen (see 'viewport')
+#----------------------------------------------------------------------
+
+import pytest
+
+import viewport
+
+class RecordingCanvas:
+    def __init__(self): self.changes = []
+    def itemconfig(self, item_id, **options): self.changes.append((item_id, options))
+
+@pytest.fixture
+def canvas(monkeypatch):
+    canvas = RecordingCanvas()
+    monkeypatch.setattr(viewport, "viewport_canvas", canvas)
+    monkeypatch.setattr(viewport, "item_bounds", {1: (0, 0, 100, 100), 2: (1000, 0, 1100, 100)})
+    monkeypatch.setattr(viewport, "visible_items", {1})
+    monkeypatch.setattr(viewport, "pending_changes", {})
+    return(canvas)
+
+def test_changes_to_hidden_items_are_held_back(canvas):
+    viewport.configure_item(canvas, 1, fill="red")
+    viewport.configure_item(canvas, 2, fill="red")
+    assert canvas.changes == [(1, {"fill": "red"})]
+    assert viewport.pending_changes == {2: {"fill": "red"}}
+
+def test_items_created_after_the_index_are_changed_straight_away(canvas):
+    viewport.configure_item(canvas, 3, fill="green")
+    assert canvas.changes == [(3, {"fill": "green"})]
+    assert viewport.pending_changes == {}
+
+###############################################################################
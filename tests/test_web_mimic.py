@@ -0,0 +1,24 @@
+#----------------------------------------------------------------------
+# Tests for the WebSocket frames received from browsers (see 'web_mimic')
+#----------------------------------------------------------------------
+
+import io
+import struct
+
+import web_mimic
+
+def masked_frame(opcode:int, payload:bytes, length_field:bytes=None):
+    mask = b"\x01\x02\x03\x04"
+    if length_field is None: length_field = struct.pack("!B", 0x80 | len(payload))
+    masked = bytes(byte ^ mask[index % 4] for index, byte in enumerate(payload))
+    return(struct.pack("!B", 0x80 | opcode) + length_field + mask + masked)
+
+def test_close_frame_is_received():
+    assert web_mimic.receive_frame(io.BytesIO(masked_frame(0x8, b"\x03\xe8"))) == (0x8, b"\x03\xe8")
+
+def test_oversized_frame_closes_the_connection():
+    # A frame claiming to be 2^62 bytes long is never read
+    stream = io.BytesIO(masked_frame(0x1, b"", struct.pack("!BQ", 0x80 | 127, 1 << 62)))
+    assert web_mimic.receive_frame(stream) is None
+
+###############################################################################
@@ -0,0 +1,86 @@
+#----------------------------------------------------------------------
+# Tests for the "what if" route queries - the answers must match what the
+# interlocking does when the route is actually set (see 'what_if')
+#----------------------------------------------------------------------
+
+import pytest
+
+import headless_signals
+import interlocking
+import route_conflicts
+import snapshot
+import what_if
+
+def process_interlocking():
+    interlocking.process_interlocking_east()
+    interlocking.process_interlocking_west()
+    return()
+
+def set_points(points:dict):
+    for point_id, switched in points.items():
+        if headless_signals.point_switched(point_id) != switched:
+            fpl_was_active = headless_signals.fpl_active(point_id)
+            if fpl_was_active: headless_signals.toggle_fpl(point_id)
+            headless_signals.toggle_point(point_id)
+            if fpl_was_active: headless_signals.toggle_fpl(point_id)
+    process_interlocking()
+    return()
+
+def current_locks():
+    return({"points": {point_id for point_id in snapshot.point_ids if headless_signals.point_locked[point_id]},
+            "signals": {sig_id for sig_id in snapshot.signal_ids if headless_signals.signals[str(sig_id)]["siglocked"]},
+            "subsidaries": {sig_id for sig_id in snapshot.signal_ids
+                            if headless_signals.signals[str(sig_id)].get("sublocked", False)}})
+
+@pytest.mark.parametrize("route", sorted(route_conflicts.station_routes))
+def test_query_matches_setting_the_route(layout, route):
+    sig_id, aspects, points = route_conflicts.station_routes[route]
+    subsidary = True in aspects
+    result = what_if.query_route(sig_id, points, subsidary)
+    set_points(points)
+    signal = headless_signals.signals[str(sig_id)]
+    assert result["can_clear"] == (not signal["sublocked" if subsidary else "siglocked"])
+    if result["can_clear"]:
+        before = current_locks()
+        if subsidary: headless_signals.toggle_subsidary(sig_id)
+        else: headless_signals.toggle_signal(sig_id)
+        process_interlocking()
+        after = current_locks()
+        for group in ("points", "signals", "subsidaries"):
+            assert result["locks"][group] == sorted(after[group] - before[group])
+
+def test_query_changes_nothing_on_the_panel(layout):
+    state = snapshot.capture_layout_state()
+    colours = {item_id: dict(options) for item_id, options in layout.items.items()}
+    result = what_if.query_route(3, {2: True, 4: True}, include_aspects=True)
+    assert result["can_clear"] and result["locks"]["points"]
+    assert snapshot.capture_layout_state() == state
+    assert layout.items == colours
+
+def test_points_locked_by_another_route(layout):
+    sig_id, aspects, points = route_conflicts.station_routes["3_platform3"]
+    set_points(points)
+    headless_signals.toggle_signal(sig_id)
+    process_interlocking()
+    moved_points = {point_id: not switched for point_id, switched in points.items()}
+    result = what_if.query_route(sig_id, moved_points)
+    assert not result["can_clear"]
+    assert result["points_locked"] and result["points_locked"] == sorted(point_id for point_id in points if headless_signals.point_locked[point_id])
+
+def test_query_matches_the_locks_of_a_cleared_route(layout):
+    sig_id, aspects, points = route_conflicts.station_routes["3_platform3"]
+    set_points(points)
+    headless_signals.toggle_signal(sig_id)
+    process_interlocking()
+    locked_signals = 0
+    for route, (other_sig_id, other_aspects, other_points) in route_conflicts.station_routes.items():
+        if other_sig_id == sig_id or any(headless_signals.point_switched(point_id) != switched
+                                         for point_id, switched in other_points.items()): continue
+        subsidary = True in other_aspects
+        signal = headless_signals.signals[str(other_sig_id)]
+        locked = signal["sublocked" if subsidary else "siglocked"]
+        assert what_if.query_route(other_sig_id, other_points, subsidary)["can_clear"] == (not locked)
+        locked_signals = locked_signals + locked
+    assert locked_signals
+
+###############################################################################
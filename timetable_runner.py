@@ -0,0 +1,243 @@
+#----------------------------------------------------------------------
+# This Module runs a timetable (or any other sequence of moves) by holding a
+# queue of route requests - e.g. "signal 11 into the platform when the down
+# loop clears" - and setting each route (the points and then the signal) as
+# soon as it becomes available. Requests for the same signal are set in the
+# order they were queued (and each waits for the signal to be returned to ON
+# after the last move). Requests for different signals are independent.
+#
+# The runner is event driven - a request is only looked at again when one of
+# the sections, signals or points it depends on changes (they are found once,
+# when the request is queued):
+#   - the sections in its "when_clear" and "when_occupied" conditions
+#   - its own signal (which must be ON before the route can be set)
+#   - the signals of any routes that conflict with it (or that lock any of its
+#     points) and the points of those routes (see 'route_conflicts')
+# So hundreds of requests can be queued without slowing down each change on
+# the layout. Whether the route can be set is found out with 'what_if' before
+# anything is changed. The points are then set and the signal is cleared if
+# the interlocking allows. If the point motors are thrown in sequence (see
+# 'point_sequencer') the signal stays locked until the points have reported
+# in - so the points are left set (which is safe as no signal has been
+# cleared over them) and the request is looked at again once they have
+# reported in (see 'points_reported'). The points are also left set if the
+# signal is still locked for any other reason (the request stays queued).
+#
+# The changes are picked up after every change to the layout (in the same
+# way as the layout state is saved - see 'my_layout'). The points and signals
+# are changed through the same callbacks as the panel buttons, so the layout
+# rules are applied (and the changes saved) just as they would be for the
+# signalman.
+#
+# The timetable file is a list of requests (as JSON) - the sections can be
+# given by ID or by name (the name in 'sections' without "occupied_"):
+#   [{"signal": 11, "points": {"9": false, "7": true}, "when_clear": ["down_platform"]},
+#    {"signal": 10, "subsidary": true, "points": {"8": false, "6": false}, "when_occupied": [26]}]
+#----------------------------------------------------------------------
+
+from model_railway_signals import *
+from model_railway_signals import signals_common
+import layout_logging
+import route_conflicts
+import sections
+import snapshot
+import what_if
+
+import json
+import logging
+
+# Global variables for the queue of route requests
+route_requests: dict = {}    # {request_id: request} - see queue_route_request
+signal_queues: dict = {}     # {sig_id: [request_id, ...]} - the requests for each signal (in order)
+watchers: dict = {}          # {(group, item_id): set of request_ids} - group as in the layout state
+woken_requests = set()       # Requests to look at on the next pass
+last_request_id = 0
+last_state = None            # The state of the layout at the last pass
+processing = False
+point_callback = None
+signal_callback = None
+
+#----------------------------------------------------------------------
+# Internal function to find the signals and points a route request depends
+# on (for the station routes the request would set - or any signal or point
+# if the request doesn't match a station route)
+#----------------------------------------------------------------------
+
+def find_dependencies(sig_id:int, points:dict, subsidary:bool):
+    dependent_signals, dependent_points = {sig_id}, set(points.keys())
+    table = route_conflicts.route_table
+    matched = False
+    for route, (route_sig_id, aspects, route_points) in route_conflicts.station_routes.items():
+        if (route_sig_id == sig_id and subsidary in aspects and
+                all(points.get(point_id) == switched for point_id, switched in route_points.items())):
+            matched = True
+            for other_route, (other_sig_id, other_aspects, other_points) in route_conflicts.station_routes.items():
+                if table["conflicts"][route] & table["bits"][other_route] or set(other_points) & set(route_points):
+                    dependent_signals.add(other_sig_id)
+                    dependent_points.update(other_points.keys())
+    if not matched:
+        dependent_signals.update(snapshot.signal_ids)
+    return(dependent_signals, dependent_points)
+
+#----------------------------------------------------------------------
+# Internal function to return the ID of a section (given by ID or name)
+#----------------------------------------------------------------------
+
+def section_id_of(section):
+    if isinstance(section, int): return(section)
+    return(getattr(sections, "occupied_"+section))
+
+#----------------------------------------------------------------------
+# Externally called function to queue a route request. The route is set (the
+# points set as given and then the signal - or subsidary - cleared) once the
+# sections in when_clear are all clear and those in when_occupied are all
+# occupied - and the interlocking allows. Returns the ID of the request
+#----------------------------------------------------------------------
+
+def queue_route_request(sig_id:int, points:dict={}, subsidary:bool=False, when_clear:list=[], when_occupied:list=[]):
+    global last_request_id
+    last_request_id = last_request_id + 1
+    request = {"signal": sig_id, "points": dict(points), "subsidary": subsidary,
+               "when_clear": [section_id_of(section) for section in when_clear],
+               "when_occupied": [section_id_of(section) for section in when_occupied]}
+    dependent_signals, dependent_points = find_dependencies(sig_id, request["points"], subsidary)
+    request["watching"] = ([("sections", str(section_id)) for section_id in request["when_clear"] + request["when_occupied"]] +
+                           [("signals", str(dependent_sig_id)) for dependent_sig_id in dependent_signals] +
+                           [("points", str(point_id)) for point_id in dependent_points])
+    for item in request["watching"]: watchers.setdefault(item, set()).add(last_request_id)
+    route_requests[last_request_id] = request
+    signal_queues.setdefault(sig_id, []).append(last_request_id)
+    woken_requests.add(last_request_id)
+    process_changes()
+    return(last_request_id)
+
+#----------------------------------------------------------------------
+# Externally called function to remove a request from the queue (once it has
+# been set or if it is no longer wanted)
+#----------------------------------------------------------------------
+
+def cancel_route_request(request_id:int):
+    if request_id not in route_requests:
+        print ("ERROR: cancel_route_request - Request "+str(request_id)+" is not queued")
+    else:
+        request = route_requests.pop(request_id)
+        for item in request["watching"]:
+            watchers[item].discard(request_id)
+            if not watchers[item]: del watchers[item]
+        signal_queue = signal_queues[request["signal"]]
+        signal_queue.remove(request_id)
+        # The next request for the signal can now be set
+        if signal_queue: woken_requests.add(signal_queue[0])
+        else: del signal_queues[request["signal"]]
+        woken_requests.discard(request_id)
+    return()
+
+#----------------------------------------------------------------------
+# Internal function to try to set the route for a request - returns True
+# if the route has been set (and the request can be removed from the queue)
+# If the signal is still locked once the points have been set then the
+# points are left set and False is returned (see the top of this module)
+#----------------------------------------------------------------------
+
+def set_route_if_available(request_id:int):
+    request = route_requests[request_id]
+    sig_id = request["signal"]
+    # Requests for a signal are set in order
+    if signal_queues[sig_id][0] != request_id: return(False)
+    if any(section_occupied(section_id) for section_id in request["when_clear"]): return(False)
+    if not all(section_occupied(section_id) for section_id in request["when_occupied"]): return(False)
+    # The signal must be returned to ON after the last move before it is used again
+    if signal_clear(sig_id) or subsidary_clear(sig_id): return(False)
+    if not what_if.query_route(sig_id, request["points"], request["subsidary"])["can_clear"]: return(False)
+    # Set the points (the FPL is released and re-applied around the change) - the
+    # layout rules are then applied once for all the points
+    points_changed = [point_id for point_id, switched in request["points"].items() if point_switched(point_id) != switched]
+    for point_id in points_changed:
+        fpl_was_active = fpl_active(point_id)
+        if fpl_was_active: toggle_fpl(point_id)
+        toggle_point(point_id)
+        if fpl_was_active: toggle_fpl(point_id)
+    if points_changed: point_callback(points_changed[-1], point_callback_type.point_switched)
+    # Clear the signal (if the interlocking still allows)
+    if request["subsidary"]:
+        if signals_common.signals[str(sig_id)]["sublocked"]: return(False)
+        toggle_subsidary(sig_id)
+        signal_callback(sig_id, sig_callback_type.sub_switched)
+    else:
+        if signals_common.signals[str(sig_id)]["siglocked"]: return(False)
+        toggle_signal(sig_id)
+        signal_callback(sig_id, sig_callback_type.sig_switched)
+    if layout_logging.enabled(logging.INFO):
+        layout_logging.log_event("route_request_set", logging.INFO, request=request_id, signal=sig_id,
+                                 subsidary=request["subsidary"], queued=len(route_requests)-1)
+    return(True)
+
+#----------------------------------------------------------------------
+# Externally called function to look at the requests that depend on anything
+# that has changed since the last time - to be called following every change
+# to the layout. Any route that becomes available is set (which will in turn
+# change the layout - so we keep going until nothing else changes)
+#----------------------------------------------------------------------
+
+def process_changes():
+    global last_state, processing
+    # Setting a route changes the layout (so we get called again)
+    if processing or point_callback is None: return()
+    processing = True
+    while True:
+        state = snapshot.capture_layout_state()
+        if last_state is not None:
+            for group, items in snapshot.state_delta(last_state, state).items():
+                for item_id in items.keys():
+                    woken_requests.update(watchers.get((group, item_id), ()))
+        last_state = state
+        if not woken_requests: break
+        for request_id in sorted(woken_requests):
+            woken_requests.discard(request_id)
+            if request_id in route_requests and set_route_if_available(request_id):
+                cancel_route_request(request_id)
+    processing = False
+    return()
+
+#----------------------------------------------------------------------
+# Externally called function to look again at the requests that depend on
+# the given points once they have been set (see 'point_sequencer') - the
+# points are set on the panel straight away but the signals reading them
+# stay locked until the points have reported in
+#----------------------------------------------------------------------
+
+def points_reported(point_ids:list):
+    for point_id in point_ids: woken_requests.update(watchers.get(("points", str(point_id)), ()))
+    process_changes()
+    return()
+
+#----------------------------------------------------------------------
+# Externally called function to queue all the requests in a timetable file
+# (see the top of this module for the format). Returns the number queued
+#----------------------------------------------------------------------
+
+def load_timetable(timetable_file:str):
+    try:
+        with open(timetable_file) as file: timetable = json.load(file)
+        requests = [(entry["signal"], {int(point_id): switched for point_id, switched in entry.get("points", {}).items()},
+                     entry.get("subsidary", False), [section_id_of(section) for section in entry.get("when_clear", [])],
+                     [section_id_of(section) for section in entry.get("when_occupied", [])]) for entry in timetable]
+    except (OSError, ValueError, KeyError, AttributeError, TypeError) as error:
+        print ("ERROR: load_timetable - could not load "+timetable_file+" - "+str(error))
+        return(0)
+    for request in requests: queue_route_request(*request)
+    return(len(requests))
+
+#----------------------------------------------------------------------
+# Externally called function to start the runner. The callbacks are those
+# used for the panel buttons (so the layout rules are applied to the changes)
+#----------------------------------------------------------------------
+
+def start_timetable_runner(point_callback_function, signal_callback_function):
+    global point_callback, signal_callback
+    point_callback = point_callback_function
+    signal_callback = signal_callback_function
+    process_changes()
+    return()
+
+###############################################################################
@@ -0,0 +1,332 @@
+#----------------------------------------------------------------------
+# This Module runs a number of "virtual" trains around the layout so the
+# signalling can be load tested (e.g. before running a full exhibition
+# timetable). It doesn't need the panel - the layout rules ('sections',
+# 'interlocking' and 'power_switches') are evaluated against a copy of the
+# layout state (see 'rule_evaluator') just as they are by the control process.
+#
+# Each train works through one of the 'journeys' below. A "signalman" sets
+# the points and clears each signal as the train approaches it (if the
+# interlocking allows). The "driver" looks at the signal when it comes into
+# sight - if it is showing danger (ON or overridden) the train stops at the
+# signal and waits for it to clear. When the train passes a signal we make
+# the same "signal passed" evaluation as the layout - and the timed signals
+# (see 'trigger_timed_signal') are run by the simulation clock. Trains that
+# pass a signal showing danger (e.g. because it was overridden after the
+# driver saw it) are counted as SPADs.
+#
+# The simulation clock can run as fast as possible or a given number of
+# times faster than real time (e.g. 50 times) - in which case we also report
+# how far the processing fell behind the clock (the "lag"). A report of the
+# throughput (completed moves per hour), SPADs, processing latency and any
+# deadlock (trains waiting with nothing left to happen) is returned.
+#
+# To run: python3 train_simulator.py [number_of_trains] [hours] [speedup]
+#----------------------------------------------------------------------
+
+import layout_benchmarks
+import rule_evaluator
+import snapshot
+
+import heapq
+import os
+import random
+import sys
+import time
+
+# The journeys the trains can make. Each step is a signal the train has to
+# pass (in order) - the type of signal, the points the signalman has to set
+# for the route and the running time (in seconds) from the previous signal.
+#   "controlled" - a signal the signalman has to clear for the train
+#   "automatic"  - a fully automatic signal (ON if overridden)
+# The automatic signals are worked from the rules - as they are on the panel
+# unless 'automatic_signal_working' is selected in 'my_layout' - so they show
+# clear unless the rules override them (e.g. signal 20 while the down east
+# section is occupied). The state machines of 'automatic_signals' (e.g. a
+# signal held at danger with fleeting turned off) are not modelled
+#   "exit"       - the train leaves our area of control (passing the back of
+#                  a signal on the branch - which should be ON)
+# The main line journeys leave our area of control via the timed signals
+# (21 and 23), which are triggered by the layout rules. The branch is single
+# track so only one train is allowed on the branch at a time (the "token")
+journeys = {
+    "down_loop"       : {"token": None,
+                         "steps": [(20, "automatic", {}, 30),
+                                   (11, "controlled", {9:False, 7:False}, 60),
+                                   (12, "controlled", {3:False, 1:False}, 90)] },
+    "down_platform"   : {"token": None,
+                         "steps": [(20, "automatic", {}, 30),
+                                   (11, "controlled", {9:False, 7:True}, 60),
+                                   (13, "controlled", {3:True, 1:False}, 120)] },
+    "up_main"         : {"token": None,
+                         "steps": [(22, "automatic", {}, 30),
+                                   (3, "controlled", {1:False, 2:False}, 60),
+                                   (4, "controlled", {9:False, 8:False}, 120)] },
+    "branch_east"     : {"token": "branch",
+                         "steps": [(1, "controlled", {}, 30),
+                                   (2, "controlled", {2:False, 4:False}, 60),
+                                   (8, "controlled", {6:False, 8:False}, 120),
+                                   (9, "exit", {}, 30)] },
+    "branch_west"     : {"token": "branch",
+                         "steps": [(9, "controlled", {}, 30),
+                                   (10, "controlled", {6:False, 8:False}, 60),
+                                   (6, "controlled", {4:False, 2:False}, 120),
+                                   (1, "exit", {}, 30)] } }
+
+# Timings for the drivers (in seconds) - the time before reaching a signal
+# that it comes into sight, the time to restart after stopping at a signal
+# and the time between leaving our area of control and coming back again
+sighting_time = 5
+restart_time = 5
+turnaround_time = 120
+
+# The fully automatic signals (these are always "clear" - but can be overridden)
+automatic_signal_ids = (20,21,22,23)
+
+#----------------------------------------------------------------------
+# Internal function to schedule an event on the simulation clock
+#----------------------------------------------------------------------
+
+def schedule(simulation:dict, delay:float, function, *args):
+    simulation["count"] = simulation["count"] + 1
+    heapq.heappush(simulation["events"], (simulation["clock"] + delay, simulation["count"], function, args))
+    return()
+
+#----------------------------------------------------------------------
+# Internal function to evaluate the layout rules following a change (just
+# like the control process) - updates the power switches and the locks
+#----------------------------------------------------------------------
+
+def evaluate_layout(simulation:dict):
+    outputs = rule_evaluator.evaluate(simulation["evaluator"], simulation["state"])
+    simulation["state"]["switches"] = outputs["switches"]
+    for group in simulation["outputs"].keys():
+        simulation["outputs"][group].update(outputs[group])
+    simulation["evaluations"] = simulation["evaluations"] + 1
+    return()
+
+#----------------------------------------------------------------------
+# Internal function to return whether a signal is showing clear to a driver
+#----------------------------------------------------------------------
+
+def signal_showing_clear(simulation:dict, sig_id:int):
+    if simulation["outputs"]["overrides"].get(str(sig_id), False): return(False)
+    if sig_id in automatic_signal_ids: return(True)
+    return(simulation["state"]["signals"][str(sig_id)][0])
+
+#----------------------------------------------------------------------
+# Internal function for the signalman to set up the routes that have been
+# asked for (in the order they were asked for). The points are only changed
+# if they are not locked and the signal is only cleared if it isn't locked.
+# Anything that can't be done yet is tried again following the next change
+#----------------------------------------------------------------------
+
+def set_up_routes(simulation:dict):
+    state, outputs = simulation["state"], simulation["outputs"]
+    for train in list(simulation["routes_wanted"]):
+        sig_id, sig_type, points, run_time = train["journey"]["steps"][train["step"]]
+        points_to_change = [point_id for point_id, switched in points.items()
+                            if state["points"][str(point_id)][0] != switched]
+        if any(outputs["point_locks"].get(str(point_id), False) for point_id in points_to_change):
+            continue
+        if points_to_change:
+            for point_id in points_to_change:
+                state["points"][str(point_id)] = [points[point_id], True]
+            evaluate_layout(simulation)
+        if not outputs["signal_locks"].get(str(sig_id), False):
+            state["signals"][str(sig_id)] = [True, False]
+            evaluate_layout(simulation)
+            simulation["routes_wanted"].remove(train)
+    return()
+
+#----------------------------------------------------------------------
+# Internal function to accept the next train offered to us (for each entry
+# signal or token), set up the routes that have been asked for and let any
+# trains waiting at signals go. This is called following every change
+#----------------------------------------------------------------------
+
+def process_changes(simulation:dict):
+    for token, trains in simulation["trains_offered"].items():
+        entry_signal = trains[0]["journey"]["steps"][0][0] if trains else None
+        if trains and token not in simulation["tokens_issued"] and entry_signal not in simulation["approaches"]:
+            train_enters_approach(simulation, trains.pop(0))
+    set_up_routes(simulation)
+    for train in list(simulation["trains_waiting"]):
+        sig_id = train["journey"]["steps"][train["step"]][0]
+        if signal_showing_clear(simulation, sig_id):
+            simulation["trains_waiting"].remove(train)
+            schedule(simulation, restart_time, train_passes_signal, train)
+    return()
+
+#----------------------------------------------------------------------
+# The train events. A train enters the approach to each signal in turn (the
+# signalman is asked for the route) and then sights the signal and passes it
+#----------------------------------------------------------------------
+
+def train_offered(simulation:dict, train:dict):
+    train["journey_name"] = simulation["random"].choice(simulation["journey_names"])
+    train["journey"] = journeys[train["journey_name"]]
+    train["step"] = 0
+    train["offered_at"] = simulation["clock"]
+    # Trains are offered to us in turn for each token (or each entry signal)
+    token = train["journey"]["token"] or train["journey"]["steps"][0][0]
+    train["token"] = token
+    simulation["trains_offered"].setdefault(token, []).append(train)
+    process_changes(simulation)
+    return()
+
+def train_enters_approach(simulation:dict, train:dict):
+    sig_id, sig_type, points, run_time = train["journey"]["steps"][train["step"]]
+    if train["step"] == 0:
+        simulation["tokens_issued"].add(train["token"])
+    simulation["approaches"][sig_id] = train
+    if sig_type == "controlled": simulation["routes_wanted"].append(train)
+    run_time = run_time / train["speed"]
+    if sig_type == "exit":
+        schedule(simulation, run_time, train_passes_signal, train)
+    else:
+        schedule(simulation, max(run_time - sighting_time, 0), train_sights_signal, train)
+    return()
+
+def train_sights_signal(simulation:dict, train:dict):
+    sig_id = train["journey"]["steps"][train["step"]][0]
+    if signal_showing_clear(simulation, sig_id):
+        schedule(simulation, min(sighting_time, train["journey"]["steps"][train["step"]][3]/train["speed"]),
+                 train_passes_signal, train)
+    else:
+        simulation["trains_waiting"].append(train)
+    return()
+
+def train_passes_signal(simulation:dict, train:dict):
+    state = simulation["state"]
+    sig_id, sig_type, points, run_time = train["journey"]["steps"][train["step"]]
+    if sig_type != "exit" and not signal_showing_clear(simulation, sig_id):
+        simulation["spads"][str(sig_id)] = simulation["spads"].get(str(sig_id), 0) + 1
+    del simulation["approaches"][sig_id]
+    process_signal_passed(simulation, sig_id)
+    # The signalman puts the signal back to ON once the train has passed
+    if sig_type == "controlled":
+        state["signals"][str(sig_id)] = [False, False]
+        evaluate_layout(simulation)
+    train["step"] = train["step"] + 1
+    if train["step"] < len(train["journey"]["steps"]):
+        train_enters_approach(simulation, train)
+    else:
+        # The train has left our area of control (main line trains leave via
+        # the timed signals - which look after themselves)
+        simulation["tokens_issued"].discard(train["token"])
+        simulation["moves"] = simulation["moves"] + 1
+        simulation["moves_by_journey"][train["journey_name"]] = simulation["moves_by_journey"].get(train["journey_name"], 0) + 1
+        simulation["journey_times"].append(simulation["clock"] - train["offered_at"])
+        schedule(simulation, turnaround_time, train_offered, train)
+    process_changes(simulation)
+    return()
+
+#----------------------------------------------------------------------
+# Internal function to evaluate a "signal passed" event (for the trains and
+# the timed signals) and start any timed signals that are triggered
+#----------------------------------------------------------------------
+
+def process_signal_passed(simulation:dict, sig_id:int):
+    changes = rule_evaluator.evaluate_signal_passed(simulation["evaluator"], simulation["state"], sig_id)
+    simulation["state"]["sections"].update(changes["sections"])
+    for timed_sig_id, start_delay, time_delay in changes["timed_signals"]:
+        # The library generates a "signal passed" event after the start delay
+        schedule(simulation, start_delay, timed_signal_passed, timed_sig_id)
+    evaluate_layout(simulation)
+    return()
+
+def timed_signal_passed(simulation:dict, sig_id:int):
+    process_signal_passed(simulation, sig_id)
+    process_changes(simulation)
+    return()
+
+#----------------------------------------------------------------------
+# Externally called function to run the simulation for a number of trains
+# over the given time (in simulated seconds). The speedup is the number of
+# times faster than real time to run the clock (0 = as fast as possible).
+# Returns a dictionary of the results
+#----------------------------------------------------------------------
+
+def run_simulation(number_of_trains:int=4, duration:float=3600.0, speedup:float=0.0, seed:int=1):
+
+    simulation = {"clock": 0.0, "count": 0, "events": [], "random": random.Random(seed),
+                  "journey_names": sorted(journeys.keys()),
+                  "state": snapshot.default_layout_state(),
+                  "outputs": {"signal_locks":{}, "subsidary_locks":{}, "point_locks":{}, "overrides":{}},
+                  "evaluator": rule_evaluator.create_evaluator(),
+                  "routes_wanted": [], "trains_waiting": [], "trains_offered": {},
+                  "tokens_issued": set(), "approaches": {},
+                  "moves": 0, "moves_by_journey": {}, "journey_times": [], "spads": {}, "evaluations": 0 }
+    for sig_id in automatic_signal_ids:
+        simulation["state"]["signals"][str(sig_id)] = [True, False]
+    evaluate_layout(simulation)
+
+    # The trains arrive at random over the first few minutes
+    for train_id in range(1, number_of_trains+1):
+        train = {"id": train_id, "speed": simulation["random"].uniform(0.8, 1.25)}
+        schedule(simulation, simulation["random"].uniform(0, turnaround_time), train_offered, train)
+
+    latencies, lags = [], []
+    start_time = time.perf_counter()
+    while simulation["events"] and simulation["events"][0][0] <= duration:
+        clock, count, function, args = heapq.heappop(simulation["events"])
+        due_time = start_time + clock / speedup if speedup > 0 else None
+        if due_time is not None and due_time > time.perf_counter():
+            time.sleep(due_time - time.perf_counter())
+        event_start_time = time.perf_counter()
+        simulation["clock"] = clock
+        function(simulation, *args)
+        finish_time = time.perf_counter()
+        latencies.append(finish_time - event_start_time)
+        if due_time is not None: lags.append(max(finish_time - due_time, 0.0))
+    wall_time = time.perf_counter() - start_time
+
+    # Nothing left to happen but trains are still waiting for signals
+    deadlocked = not simulation["events"] and bool(simulation["trains_waiting"] or simulation["routes_wanted"])
+    simulated_time = duration if not deadlocked else simulation["clock"]
+    return({"trains": number_of_trains,
+            "simulated_time": round(simulated_time, 1),
+            "wall_time": round(wall_time, 3),
+            "speedup_achieved": round(simulated_time / wall_time, 1) if wall_time > 0 else None,
+            "moves": simulation["moves"],
+            "moves_by_journey": simulation["moves_by_journey"],
+            "moves_per_hour": round(3600.0 * simulation["moves"] / simulated_time, 1) if simulated_time > 0 else 0.0,
+            "mean_journey_time": (round(sum(simulation["journey_times"]) / len(simulation["journey_times"]), 1)
+                                  if simulation["journey_times"] else None),
+            "spads": sum(simulation["spads"].values()),
+            "spads_by_signal": simulation["spads"],
+            "events": len(latencies),
+            "evaluations": simulation["evaluations"],
+            "latency_ms": layout_benchmarks.summarise_times(latencies, 3),
+            "lag_ms": layout_benchmarks.summarise_times(lags, 3) if speedup > 0 else None,
+            "deadlocked": deadlocked })
+
+#----------------------------------------------------------------------
+# Externally called function to print the results of a simulation
+#----------------------------------------------------------------------
+
+def print_results(results:dict):
+    print ("Trains: "+str(results["trains"])+"  Simulated: "+str(results["simulated_time"])+" s"+
+           "  Wall: "+str(results["wall_time"])+" s  ("+str(results["speedup_achieved"])+"x real time)")
+    print ("Moves: "+str(results["moves"])+"  ("+str(results["moves_per_hour"])+" per hour)"+
+           "  Mean journey time: "+str(results["mean_journey_time"])+" s")
+    print ("Moves by journey: "+str(results["moves_by_journey"]))
+    print ("SPADs: "+str(results["spads"])+"  "+str(results["spads_by_signal"]))
+    print ("Events: "+str(results["events"])+"  Evaluations: "+str(results["evaluations"])+
+           "  Latency (ms): "+str(results["latency_ms"]))
+    if results["lag_ms"] is not None: print ("Lag behind the clock (ms): "+str(results["lag_ms"]))
+    if results["deadlocked"]: print ("DEADLOCK - trains are waiting with nothing left to happen")
+    return()
+
+if __name__ == "__main__":
+    arguments = [float(argument) for argument in sys.argv[1:4]]
+    number_of_trains = int(arguments[0]) if len(arguments) > 0 else 4
+    hours = arguments[1] if len(arguments) > 1 else 1.0
+    speedup = arguments[2] if len(arguments) > 2 else 0.0
+    print_results(run_simulation(number_of_trains, hours*3600.0, speedup))
+    # The library leaves threads running so we can't just return
+    sys.stdout.flush()
+    os._exit(0)
+
+###############################################################################
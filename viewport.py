@@ -0,0 +1,240 @@
+#----------------------------------------------------------------------
+# This Module allows the panel to be zoomed (with the mouse wheel) and
+# panned (by dragging with the middle mouse button) - the Home key goes
+# back to showing the whole layout. It replaces the rescaling of all the
+# drawing objects when the window is resized (see 'ResizingCanvas').
+#
+# All the drawing objects on the canvas are held in a spatial index (a
+# uniform grid of cells over the layout) so we can quickly find the objects
+# that can currently be seen. Only these objects are rescaled when the panel
+# is zoomed or the window resized - the others are rescaled when they come
+# into view. Panning just scrolls the canvas (so nothing is rescaled). Any
+# colour changes to track sections that can't be seen (see the 'schematic'
+# colour_section function) are also held back until they come into view.
+# This means the time taken to redraw the panel depends on how much of the
+# layout is visible rather than on the size of the layout.
+#
+# Note that the points and signals are tkinter buttons (so tkinter already
+# knows which one has been clicked) and the library updates the point blades
+# and signal aspects directly - so these are always updated immediately.
+# The index can also be used to find the objects at a position on the
+# panel (see 'items_at').
+#
+# All positions are held in "layout" coordinates - i.e. as drawn by the
+# schematic on the original 1900x1000 canvas
+#----------------------------------------------------------------------
+
+# The size of the layout (as drawn by the schematic)
+layout_width = 1900
+layout_height = 1000
+
+# The size of each cell of the spatial index
+cell_size = 100
+
+# The margin (around the drawing object coordinates) used for the index -
+# this allows for the widths of the lines and the sizes of the buttons
+item_margin = 50
+
+# The change in zoom for each step of the mouse wheel (and the limits)
+zoom_step = 1.25
+max_zoom = 8.0
+
+# Global variables for the viewport
+viewport_canvas = None
+grid: dict = {}              # The objects in each cell {(column,row): [item_ids]}
+item_bounds: dict = {}       # The bounds of each object {item_id: (x1,y1,x2,y2)}
+item_scales: dict = {}       # The (x,y) scale each object was last drawn at {item_id: (1.0,1.0)}
+pending_changes: dict = {}   # Changes to objects that can't be seen {item_id: {"fill":"red"}}
+visible_items = set()
+fit_scale = [1.0, 1.0]       # The scale to fit the layout to the window
+zoom = 1.0
+
+# Tcl script to read the coordinates of all the drawing objects in one go
+# (The "%c" is replaced with the name of the canvas)
+coords_script = """
+set result {}
+foreach i [%c find all] { lappend result $i [%c coords $i] }
+set result
+"""
+
+#----------------------------------------------------------------------
+# Internal function to return the cells of the index covering an area
+#----------------------------------------------------------------------
+
+def cells_covering(x1:float, y1:float, x2:float, y2:float):
+    cells = []
+    for column in range(int(x1 // cell_size), int(x2 // cell_size) + 1):
+        for row in range(int(y1 // cell_size), int(y2 // cell_size) + 1):
+            cells.append((column, row))
+    return(cells)
+
+#----------------------------------------------------------------------
+# Internal function to build the index of all the drawing objects
+#----------------------------------------------------------------------
+
+def build_index():
+    grid.clear()
+    item_bounds.clear()
+    item_scales.clear()
+    values = viewport_canvas.tk.splitlist(viewport_canvas.tk.eval(coords_script.replace("%c", str(viewport_canvas))))
+    for index in range(0, len(values), 2):
+        item_id = int(values[index])
+        coords = [float(value) for value in viewport_canvas.tk.splitlist(values[index+1])]
+        if not coords: continue
+        bounds = (min(coords[0::2]) - item_margin, min(coords[1::2]) - item_margin,
+                  max(coords[0::2]) + item_margin, max(coords[1::2]) + item_margin)
+        item_bounds[item_id] = bounds
+        item_scales[item_id] = (1.0, 1.0)
+        for cell in cells_covering(*bounds):
+            grid.setdefault(cell, []).append(item_id)
+    return()
+
+#----------------------------------------------------------------------
+# Internal function to return the current (x,y) scale of the layout
+#----------------------------------------------------------------------
+
+def current_scale():
+    return(fit_scale[0] * zoom, fit_scale[1] * zoom)
+
+#----------------------------------------------------------------------
+# Externally called function to return the objects at a position on the
+# canvas widget (e.g. from a mouse event) - uses the index
+#----------------------------------------------------------------------
+
+def items_at(x:int, y:int):
+    xscale, yscale = current_scale()
+    layout_x = viewport_canvas.canvasx(x) / xscale
+    layout_y = viewport_canvas.canvasy(y) / yscale
+    items = []
+    for item_id in grid.get((int(layout_x // cell_size), int(layout_y // cell_size)), []):
+        x1, y1, x2, y2 = item_bounds[item_id]
+        if x1 <= layout_x <= x2 and y1 <= layout_y <= y2: items.append(item_id)
+    return(items)
+
+#----------------------------------------------------------------------
+# Internal function to bring the objects that can be seen up to date. Any
+# that were drawn at a different scale are rescaled and any changes that
+# were held back while they couldn't be seen are made
+#----------------------------------------------------------------------
+
+def update_visible_items():
+    global visible_items
+    xscale, yscale = current_scale()
+    width, height = viewport_canvas.winfo_width(), viewport_canvas.winfo_height()
+    x1 = viewport_canvas.canvasx(0) / xscale
+    y1 = viewport_canvas.canvasy(0) / yscale
+    x2 = viewport_canvas.canvasx(width) / xscale
+    y2 = viewport_canvas.canvasy(height) / yscale
+    new_visible_items = set()
+    for cell in cells_covering(x1, y1, x2, y2):
+        new_visible_items.update(grid.get(cell, []))
+    for item_id in new_visible_items:
+        item_xscale, item_yscale = item_scales[item_id]
+        if item_xscale != xscale or item_yscale != yscale:
+            viewport_canvas.scale(item_id, 0, 0, xscale/item_xscale, yscale/item_yscale)
+            item_scales[item_id] = (xscale, yscale)
+        if item_id in pending_changes:
+            viewport_canvas.itemconfig(item_id, **pending_changes.pop(item_id))
+    visible_items = new_visible_items
+    return()
+
+#----------------------------------------------------------------------
+# Externally called function to change a drawing object - if the object
+# can't currently be seen the change is held back until it comes into view.
+# Objects created after the index was built aren't in the index (so we can't
+# tell when they come into view) - these are always changed straight away
+#----------------------------------------------------------------------
+
+def configure_item(canvas, item_id:int, **options):
+    if canvas is not viewport_canvas or item_id in visible_items or item_id not in item_bounds:
+        canvas.itemconfig(item_id, **options)
+    else:
+        pending_changes.setdefault(item_id, {}).update(options)
+    return()
+
+#----------------------------------------------------------------------
+# Internal function to set the area of the canvas that can be scrolled
+#----------------------------------------------------------------------
+
+def set_scroll_region():
+    xscale, yscale = current_scale()
+    viewport_canvas.configure(scrollregion=(0, 0, layout_width*xscale, layout_height*yscale))
+    return()
+
+#----------------------------------------------------------------------
+# Externally called function to fit the layout to a new window size
+# (to be called by the canvas when it is resized)
+#----------------------------------------------------------------------
+
+def canvas_resized(width:int, height:int):
+    fit_scale[0] = width / layout_width
+    fit_scale[1] = height / layout_height
+    set_scroll_region()
+    update_visible_items()
+    return()
+
+#----------------------------------------------------------------------
+# Internal functions to zoom (keeping the point of the layout under the
+# mouse in the same place), pan and reset the view
+#----------------------------------------------------------------------
+
+def zoom_at(x:int, y:int, factor:float):
+    global zoom
+    xscale, yscale = current_scale()
+    layout_x = viewport_canvas.canvasx(x) / xscale
+    layout_y = viewport_canvas.canvasy(y) / yscale
+    zoom = min(max(zoom * factor, 1.0), max_zoom)
+    xscale, yscale = current_scale()
+    set_scroll_region()
+    viewport_canvas.xview_moveto((layout_x * xscale - x) / (layout_width * xscale))
+    viewport_canvas.yview_moveto((layout_y * yscale - y) / (layout_height * yscale))
+    update_visible_items()
+    return()
+
+def mouse_wheel(event):
+    if event.num == 4 or event.delta > 0: zoom_at(event.x, event.y, zoom_step)
+    else: zoom_at(event.x, event.y, 1.0/zoom_step)
+    return()
+
+def start_pan(event):
+    viewport_canvas.scan_mark(event.x, event.y)
+    return()
+
+def pan(event):
+    viewport_canvas.scan_dragto(event.x, event.y, gain=1)
+    update_visible_items()
+    return()
+
+def reset_view(event=None):
+    global zoom
+    zoom = 1.0
+    set_scroll_region()
+    viewport_canvas.xview_moveto(0)
+    viewport_canvas.yview_moveto(0)
+    update_visible_items()
+    return()
+
+#----------------------------------------------------------------------
+# Externally called function to make the panel zoomable (to be called once
+# all the drawing objects have been created - and before the window is
+# first drawn, as they are all assumed to be at their original size)
+#----------------------------------------------------------------------
+
+def start_viewport(window, canvas):
+
+    global viewport_canvas, visible_items
+
+    viewport_canvas = canvas
+    build_index()
+    visible_items = set(item_bounds.keys())
+    canvas.configure(confine=True)
+    set_scroll_region()
+    canvas.bind("<Button-4>", mouse_wheel, add="+")
+    canvas.bind("<Button-5>", mouse_wheel, add="+")
+    canvas.bind("<MouseWheel>", mouse_wheel, add="+")
+    canvas.bind("<ButtonPress-2>", start_pan, add="+")
+    canvas.bind("<B2-Motion>", pan, add="+")
+    window.bind("<Home>", reset_view, add="+")
+    return()
+
+###############################################################################
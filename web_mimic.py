@@ -0,0 +1,418 @@
+#----------------------------------------------------------------------
+# This Module serves a read-only "mimic" of the panel to web browsers (e.g.
+# for the audience at an exhibition or for remote operators). It runs a
+# small HTTP/WebSocket server inside the application - the browser loads
+# the page and then opens a WebSocket to receive the state of the panel.
+#
+# The mimic is taken from the drawing objects on the tkinter canvas itself
+# (track sections, point blades, signal aspects and the buttons for the
+# track occupancy sections and power switches) so it always matches the
+# panel. When a browser connects it is sent the complete drawing. After that
+# the canvas is checked once per "frame" and only the changes (the colour,
+# state or text of each drawing object that has changed) are sent as a
+# single message for all the changes in that frame. The complete drawing
+# is only read again if the window is resized.
+#
+# Each browser has its own queue of messages (and its own thread to send
+# them) so a slow or stalled browser can never hold up the panel. If a
+# browser falls too far behind its queue is emptied and it is just sent the
+# complete drawing again. Nothing can be changed from the browser.
+#
+# Messages (JSON):
+#   {"type":"full", "view":[width, height, background], "items":{"12": {...}}}
+#   {"type":"delta", "items":{"12": {"fill":"green"}, ...}}
+#----------------------------------------------------------------------
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import base64
+import hashlib
+import json
+import queue
+import struct
+import threading
+
+# How often the canvas is checked for changes (in milliseconds)
+frame_interval = 50
+
+# The number of frames a browser can fall behind before it is re-sent the
+# complete drawing (rather than all the changes it has missed)
+max_queued_frames = 100
+
+# The largest frame we accept from a browser (in bytes) - browsers only ever
+# send us small control frames so anything bigger closes the connection
+max_frame_size = 4096
+
+# Global variables for the mimic
+tkinter_window = None
+mimic_canvas = None
+geometry: dict = {}          # The drawing objects {"12": {"type":"line", "coords":[...], ...}}
+appearance: dict = {}        # The appearance of each object {"12": {"state":"", "fill":"green", ...}}
+view = []                    # [width, height, background colour]
+clients: list = []           # The connected browsers (each a dictionary with its own queue)
+state_lock = threading.Lock()
+geometry_changed = True
+
+# Tcl scripts to read all the drawing objects in one go (much quicker than
+# making a separate call from python for every attribute of every object)
+# The "%c" is replaced with the name of the canvas
+geometry_script = """
+set result {}
+foreach i [%c find all] {
+    set type [%c type $i]
+    set width {}
+    set anchor {}
+    catch {set width [%c itemcget $i -width]}
+    catch {set anchor [%c itemcget $i -anchor]}
+    lappend result $i $type [%c coords $i] $width $anchor
+}
+set result
+"""
+
+appearance_script = """
+set result {}
+foreach i [%c find all] {
+    set type [%c type $i]
+    set fill {}
+    set outline {}
+    set text {}
+    if {$type eq "window"} {
+        set w [%c itemcget $i -window]
+        catch {set fill [$w cget -bg]}
+        catch {set outline [$w cget -fg]}
+        catch {set text [$w cget -text]}
+    } else {
+        catch {set fill [%c itemcget $i -fill]}
+        catch {set outline [%c itemcget $i -outline]}
+        catch {set text [%c itemcget $i -text]}
+    }
+    lappend result $i [%c itemcget $i -state] $fill $outline $text
+}
+set result
+"""
+
+#----------------------------------------------------------------------
+# Internal functions to read the drawing objects from the canvas (these
+# must be called from the tkinter thread)
+#----------------------------------------------------------------------
+
+def read_geometry():
+    values = mimic_canvas.tk.splitlist(mimic_canvas.tk.eval(geometry_script.replace("%c", str(mimic_canvas))))
+    new_geometry = {}
+    for index in range(0, len(values), 5):
+        item_id, item_type, coords, width, anchor = values[index:index+5]
+        new_geometry[item_id] = {"type": item_type,
+                                 "coords": [round(float(value), 1) for value in mimic_canvas.tk.splitlist(coords)],
+                                 "width": width, "anchor": anchor}
+    return(new_geometry)
+
+def read_appearance():
+    values = mimic_canvas.tk.splitlist(mimic_canvas.tk.eval(appearance_script.replace("%c", str(mimic_canvas))))
+    new_appearance = {}
+    for index in range(0, len(values), 5):
+        item_id, state, fill, outline, text = values[index:index+5]
+        new_appearance[item_id] = {"state": state, "fill": fill, "outline": outline, "text": text}
+    return(new_appearance)
+
+#----------------------------------------------------------------------
+# Internal function to return the complete drawing (as a JSON message)
+#----------------------------------------------------------------------
+
+def full_message():
+    with state_lock:
+        items = {item_id: dict(geometry[item_id], **appearance.get(item_id, {})) for item_id in geometry.keys()}
+        return(json.dumps({"type":"full", "view":view, "items":items}, separators=(",",":")))
+
+#----------------------------------------------------------------------
+# Internal function to queue a message for all the browsers. A browser
+# that has fallen too far behind is just sent the complete drawing next
+#----------------------------------------------------------------------
+
+def send_to_clients(message):
+    with state_lock:
+        for client in clients:
+            try:
+                client["queue"].put_nowait(message)
+            except queue.Full:
+                while not client["queue"].empty(): client["queue"].get_nowait()
+                client["queue"].put_nowait("full")
+    return()
+
+#----------------------------------------------------------------------
+# Internal function to check the canvas for changes (runs on the tkinter
+# thread once per frame). All the changes in the frame are sent together
+#----------------------------------------------------------------------
+
+def check_for_changes():
+    global geometry, appearance, view, geometry_changed
+    if clients:
+        if geometry_changed:
+            with state_lock:
+                geometry = read_geometry()
+                appearance = read_appearance()
+                view = [mimic_canvas.winfo_width(), mimic_canvas.winfo_height(), mimic_canvas.cget("background")]
+                geometry_changed = False
+            send_to_clients("full")
+        else:
+            new_appearance = read_appearance()
+            changes = {}
+            for item_id, attributes in new_appearance.items():
+                old_attributes = appearance.get(item_id, {})
+                changed = {name: value for name, value in attributes.items() if old_attributes.get(name) != value}
+                if changed: changes[item_id] = changed
+            if changes:
+                with state_lock: appearance = new_appearance
+                send_to_clients(json.dumps({"type":"delta", "items":changes}, separators=(",",":")))
+    else:
+        # Nobody is watching - we just read it all again when somebody connects
+        geometry_changed = True
+    tkinter_window.after(frame_interval, check_for_changes)
+    return()
+
+def canvas_resized(event):
+    global geometry_changed
+    geometry_changed = True
+    return()
+
+#----------------------------------------------------------------------
+# Internal functions to send and receive WebSocket frames (RFC 6455). We
+# only ever send text frames - and only need to know when the browser
+# closes the connection (frames from the browser are always masked). A frame
+# bigger than the 'max_frame_size' is treated as the connection closing
+#----------------------------------------------------------------------
+
+def send_frame(connection, text:str):
+    payload = text.encode()
+    if len(payload) < 126:
+        header = struct.pack("!BB", 0x81, len(payload))
+    elif len(payload) < 65536:
+        header = struct.pack("!BBH", 0x81, 126, len(payload))
+    else:
+        header = struct.pack("!BBQ", 0x81, 127, len(payload))
+    connection.sendall(header + payload)
+    return()
+
+def receive_frame(stream):
+    header = stream.read(2)
+    if len(header) < 2: return(None)
+    opcode, length = header[0] & 0x0F, header[1] & 0x7F
+    if length == 126: length = struct.unpack("!H", stream.read(2))[0]
+    elif length == 127: length = struct.unpack("!Q", stream.read(8))[0]
+    if length > max_frame_size: return(None)
+    mask = stream.read(4) if header[1] & 0x80 else b"\x00\x00\x00\x00"
+    payload = bytes(byte ^ mask[index % 4] for index, byte in enumerate(stream.read(length)))
+    return(opcode, payload)
+
+def thread_to_receive_frames(client:dict, stream):
+    try:
+        while True:
+            frame = receive_frame(stream)
+            if frame is None or frame[0] == 0x8: break
+    except OSError:
+        pass
+    client["queue"].put(None)
+    return()
+
+#----------------------------------------------------------------------
+# The HTTP request handler - serves the page and the WebSocket connections
+# (each connection is handled on its own thread by the server)
+#----------------------------------------------------------------------
+
+class MimicRequestHandler(BaseHTTPRequestHandler):
+
+    # Browsers will only accept the WebSocket handshake from HTTP/1.1
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path == "/ws" and self.headers.get("Upgrade", "").lower() == "websocket":
+            self.serve_websocket()
+        elif self.path in ("/", "/index.html"):
+            page = mimic_page.encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(page)))
+            self.end_headers()
+            self.wfile.write(page)
+        else:
+            self.send_error(404)
+
+    def serve_websocket(self):
+        key = self.headers.get("Sec-WebSocket-Key", "")
+        accept = base64.b64encode(hashlib.sha1((key+"258EAFA5-E914-47DA-95CA-C5AB0DC85B11").encode()).digest())
+        self.send_response(101)
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Accept", accept.decode())
+        self.end_headers()
+        client = {"queue": queue.Queue(maxsize=max_queued_frames)}
+        client["queue"].put("full")
+        with state_lock: clients.append(client)
+        receiver = threading.Thread(target=thread_to_receive_frames, args=(client, self.rfile), daemon=True)
+        receiver.start()
+        try:
+            while True:
+                message = client["queue"].get()
+                if message is None: break
+                if message == "full":
+                    # Wait until the tkinter thread has read the drawing
+                    if geometry_changed and not geometry: continue
+                    message = full_message()
+                send_frame(self.connection, message)
+        except OSError:
+            pass
+        with state_lock: clients.remove(client)
+        self.close_connection = True
+
+    def log_message(self, format, *args):
+        # Don't fill the console up with every request
+        return()
+
+#----------------------------------------------------------------------
+# Externally called function to start serving the mimic on the given port
+# (to be called once the panel has been created). The mimic can then be
+# viewed at http://<host>:<port>/ - by default only on this computer (set
+# the host to "" to serve it on all the network interfaces)
+#----------------------------------------------------------------------
+
+def start_web_mimic(window, canvas, port:int=8080, host:str="localhost"):
+
+    global tkinter_window, mimic_canvas
+
+    tkinter_window = window
+    mimic_canvas = canvas
+    mimic_canvas.bind("<Configure>", canvas_resized, add="+")
+    try:
+        server = ThreadingHTTPServer((host, port), MimicRequestHandler)
+    except OSError as error:
+        print ("ERROR: start_web_mimic - could not start the server on port "+str(port)+" - "+str(error))
+        return()
+    server.daemon_threads = True
+    server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+    server_thread.start()
+    print ("Web mimic available at http://"+(host or "<this host>")+":"+str(port)+"/")
+    tkinter_window.after(frame_interval, check_for_changes)
+    return()
+
+#----------------------------------------------------------------------
+# The mimic page - draws the canvas objects as SVG and applies the changes
+#----------------------------------------------------------------------
+
+mimic_page = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>My Model Railway</title>
+<style>
+  html, body { margin:0; height:100%; background:#202020; }
+  svg { width:100%; height:100%; }
+  #status { position:fixed; top:4px; right:8px; font:12px sans-serif; color:#c0c0c0; }
+</style>
+</head>
+<body>
+<div id="status">Connecting...</div>
+<svg id="mimic" xmlns="http://www.w3.org/2000/svg"></svg>
+<script>
+const svgns = "http://www.w3.org/2000/svg";
+const svg = document.getElementById("mimic");
+const status = document.getElementById("status");
+let items = {};
+
+// Tk colour names are mostly the same as the browser ones - apart from the
+// "grey0" to "grey100" shades (and the "gray" spellings) used on the panel
+function colour(value) {
+  if (value === "") return "none";
+  const grey = /^gr[ae]y(\d+)$/.exec(value);
+  if (grey) { const level = Math.round(2.55 * grey[1]); return "rgb(" + level + "," + level + "," + level + ")"; }
+  return value;
+}
+
+function create(id, item) {
+  const c = item.coords;
+  let element, label = null;
+  if (item.type === "line") {
+    element = document.createElementNS(svgns, "polyline");
+    element.setAttribute("points", c.join(" "));
+    element.setAttribute("fill", "none");
+    element.setAttribute("stroke-width", item.width || 1);
+    element.setAttribute("stroke-linejoin", "round");
+  } else if (item.type === "oval") {
+    element = document.createElementNS(svgns, "ellipse");
+    element.setAttribute("cx", (c[0]+c[2])/2); element.setAttribute("cy", (c[1]+c[3])/2);
+    element.setAttribute("rx", Math.abs(c[2]-c[0])/2); element.setAttribute("ry", Math.abs(c[3]-c[1])/2);
+  } else if (item.type === "polygon") {
+    element = document.createElementNS(svgns, "polygon");
+    element.setAttribute("points", c.join(" "));
+  } else if (item.type === "rectangle") {
+    element = document.createElementNS(svgns, "rect");
+    element.setAttribute("x", Math.min(c[0],c[2])); element.setAttribute("y", Math.min(c[1],c[3]));
+    element.setAttribute("width", Math.abs(c[2]-c[0])); element.setAttribute("height", Math.abs(c[3]-c[1]));
+  } else if (item.type === "text") {
+    element = document.createElementNS(svgns, "text");
+    element.setAttribute("x", c[0]); element.setAttribute("y", c[1]);
+    element.setAttribute("text-anchor", "middle"); element.setAttribute("font-size", "12");
+  } else if (item.type === "window") {
+    // Buttons (sections, switches, points and signals) - drawn as labelled boxes
+    element = document.createElementNS(svgns, "g");
+    const box = document.createElementNS(svgns, "rect");
+    let x = c[0] - 40;
+    if (item.anchor === "e") x = c[0] - 80;
+    if (item.anchor === "w") x = c[0];
+    box.setAttribute("x", x); box.setAttribute("y", c[1]-10);
+    box.setAttribute("width", 80); box.setAttribute("height", 20); box.setAttribute("rx", 3);
+    label = document.createElementNS(svgns, "text");
+    label.setAttribute("x", x+40); label.setAttribute("y", c[1]+4);
+    label.setAttribute("text-anchor", "middle"); label.setAttribute("font-size", "10");
+    element.appendChild(box); element.appendChild(label);
+    element.box = box;
+  } else {
+    return;
+  }
+  element.label = label;
+  svg.appendChild(element);
+  items[id] = {type:item.type, element:element};
+  update(id, item);
+}
+
+function update(id, changes) {
+  const item = items[id];
+  if (!item) return;
+  const element = item.element;
+  if ("state" in changes) element.style.display = (changes.state === "hidden" ? "none" : "");
+  if (item.type === "line") {
+    if ("fill" in changes) element.setAttribute("stroke", colour(changes.fill));
+  } else if (item.type === "window") {
+    if ("fill" in changes) element.box.setAttribute("fill", colour(changes.fill));
+    if ("outline" in changes) element.label.setAttribute("fill", colour(changes.outline));
+    if ("text" in changes) element.label.textContent = changes.text;
+  } else if (item.type === "text") {
+    if ("fill" in changes) element.setAttribute("fill", colour(changes.fill));
+    if ("text" in changes) element.textContent = changes.text;
+  } else {
+    if ("fill" in changes) element.setAttribute("fill", colour(changes.fill));
+    if ("outline" in changes) element.setAttribute("stroke", colour(changes.outline));
+  }
+}
+
+function connect() {
+  const socket = new WebSocket((location.protocol === "https:" ? "wss://" : "ws://") + location.host + "/ws");
+  socket.onopen = () => { status.textContent = ""; };
+  socket.onclose = () => { status.textContent = "Disconnected - retrying..."; setTimeout(connect, 2000); };
+  socket.onmessage = (event) => {
+    const message = JSON.parse(event.data);
+    if (message.type === "full") {
+      while (svg.firstChild) svg.removeChild(svg.firstChild);
+      items = {};
+      svg.setAttribute("viewBox", "0 0 " + message.view[0] + " " + message.view[1]);
+      document.body.style.background = colour(message.view[2]);
+      for (const id of Object.keys(message.items).sort((a, b) => a - b)) create(id, message.items[id]);
+    } else {
+      for (const id in message.items) update(id, message.items[id]);
+    }
+  };
+}
+connect();
+</script>
+</body>
+</html>
+"""
+
+###############################################################################
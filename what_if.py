@@ -0,0 +1,134 @@
+#----------------------------------------------------------------------
+# This Module answers "what if" questions about the layout without changing
+# anything - e.g. "if I set points 2 and 4, could signal 3 clear, and what
+# would it lock?". The layout rules are evaluated (see 'rule_evaluator')
+# against a copy of the layout state with the changes made, so nothing on
+# the panel is locked, unlocked or redrawn.
+#
+# Only the groups of the state that are changed are copied (and only the
+# interlocking is evaluated unless the aspects are asked for) so a query
+# takes microseconds - quick enough to be made as the mouse moves over the
+# panel. The queries should be made on the tkinter thread (they share one
+# evaluator) - other threads should create their own evaluator.
+#
+# query_route returns a dictionary of the form:
+#   {"can_clear"        : True,
+#    "points_locked"    : [],          # points that need moving but are locked
+#    "locks"            : {"points": [1,2,4,5], "signals": [10,11,16], "subsidaries": [10]},
+#    "route"            : route_type.LH1,   # only if include_aspects is True
+#    "signal_ahead"     : 7,                # only if include_aspects is True
+#    "overridden"       : False }           # only if include_aspects is True
+# where "locks" are the points and signals that clearing the signal would lock
+# (that aren't already locked)
+#----------------------------------------------------------------------
+
+import rule_evaluator
+import snapshot
+
+import os
+import sys
+import time
+
+# The evaluator used for the queries (created when first needed)
+query_evaluator = None
+
+#----------------------------------------------------------------------
+# Internal function to return the evaluator used for the queries
+#----------------------------------------------------------------------
+
+def get_query_evaluator():
+    global query_evaluator
+    if query_evaluator is None or query_evaluator["rules_version"] != rule_evaluator.rules_version:
+        query_evaluator = rule_evaluator.create_evaluator()
+    return(query_evaluator)
+
+#----------------------------------------------------------------------
+# Internal function to return a copy of the state with the changes made.
+# Only the groups that are changed are copied (the state isn't changed)
+#   points   - {point_id: switched} (the FPLs are taken as active)
+#   signals  - {sig_id: [clear, subsidary_clear]}
+#   sections - {section_id: occupied}
+#----------------------------------------------------------------------
+
+def apply_changes(state:dict, points:dict, signals:dict, sections:dict):
+    new_state = dict(state)
+    if points:
+        new_state["points"] = dict(state["points"])
+        for point_id, switched in points.items(): new_state["points"][str(point_id)] = [switched, True]
+    if signals:
+        new_state["signals"] = dict(state["signals"])
+        for sig_id, aspects in signals.items(): new_state["signals"][str(sig_id)] = list(aspects)
+    if sections:
+        new_state["sections"] = dict(state["sections"])
+        for section_id, occupied in sections.items(): new_state["sections"][str(section_id)] = occupied
+    return(new_state)
+
+#----------------------------------------------------------------------
+# Internal function to return the IDs locked in one set of locks but not in
+# another (e.g. the points locked after a change that weren't before)
+#----------------------------------------------------------------------
+
+def newly_locked(locks_before:dict, locks_after:dict):
+    return(sorted(int(item_id) for item_id, locked in locks_after.items() if locked and not locks_before.get(item_id, False)))
+
+#----------------------------------------------------------------------
+# Externally called function to evaluate the rules with the given changes
+# made to the layout state (the current state of the layout if a state is
+# not given). Only the interlocking is evaluated (returning the locks)
+# unless include_aspects is True - in which case all the rules are evaluated
+# (see 'rule_evaluator' for the outputs). Nothing on the panel is changed
+#----------------------------------------------------------------------
+
+def query_layout(points:dict={}, signals:dict={}, sections:dict={}, state:dict=None, include_aspects:bool=False):
+    if state is None: state = snapshot.capture_layout_state()
+    new_state = apply_changes(state, points, signals, sections)
+    if include_aspects: return(rule_evaluator.evaluate(get_query_evaluator(), new_state))
+    return(rule_evaluator.evaluate_interlocking(get_query_evaluator(), new_state))
+
+#----------------------------------------------------------------------
+# Externally called function to find out if a signal (or its subsidary)
+# could be cleared once the given points are set ({point_id: switched}) and
+# what clearing it would lock (see the top of this module for the results)
+#----------------------------------------------------------------------
+
+def query_route(sig_id:int, points:dict={}, subsidary:bool=False, state:dict=None, include_aspects:bool=False):
+
+    if state is None: state = snapshot.capture_layout_state()
+    # The points that need moving must not be locked now
+    points_locked = []
+    if any(state["points"][str(point_id)][0] != switched for point_id, switched in points.items()):
+        current_locks = query_layout(state=state)["point_locks"]
+        points_locked = sorted(point_id for point_id, switched in points.items()
+                               if state["points"][str(point_id)][0] != switched and current_locks.get(str(point_id), False))
+    # The signal must not be locked once the points are set
+    before = query_layout(points=points, state=state)
+    locked = before["subsidary_locks" if subsidary else "signal_locks"].get(str(sig_id), False)
+    # Find out what clearing the signal would lock
+    aspects = [False, True] if subsidary else [True, False]
+    after = query_layout(points=points, signals={sig_id: aspects}, state=state, include_aspects=include_aspects)
+    result = {"can_clear": not locked and not points_locked, "points_locked": points_locked,
+              "locks": {"points": newly_locked(before["point_locks"], after["point_locks"]),
+                        "signals": newly_locked(before["signal_locks"], after["signal_locks"]),
+                        "subsidaries": newly_locked(before["subsidary_locks"], after["subsidary_locks"])}}
+    if include_aspects:
+        result["route"], result["signal_ahead"] = None, 0
+        for aspect_sig_id, route, sig_ahead_id in after["aspects"]:
+            if aspect_sig_id == sig_id: result["route"], result["signal_ahead"] = route, sig_ahead_id
+        result["overridden"] = after["overrides"].get(str(sig_id), False)
+    return(result)
+
+if __name__ == "__main__":
+    # An example query (against the default layout state) and how long it takes
+    state = snapshot.default_layout_state()
+    print ("If points 2 and 4 are switched, signal 3: "+
+           str(query_route(3, {2:True, 4:True}, state=state, include_aspects=True)))
+    for include_aspects in (False, True):
+        start_time = time.perf_counter()
+        for count in range(10000): query_route(3, {2:True, 4:True}, state=state, include_aspects=include_aspects)
+        print ("Query time (include_aspects="+str(include_aspects)+"): "+
+               format(100.0 * (time.perf_counter() - start_time), ".1f")+" us")
+    # The library leaves threads running so we can't just return
+    sys.stdout.flush()
+    os._exit(0)
+
+###############################################################################